@@ -1,8 +1,9 @@
 import snowflake.connector
-import pandas as pd
 import os
+from snowflake_fetch import fetch_dataframe, iter_dataframe_batches
+from query_timing import traced, query_spans, phase, add_query_id
 
-def query_snowflake(start_date, end_date):
+def get_connection():
     user = os.getenv('USER')
     password = os.getenv('PASSWORD')
     account = os.getenv('ACCOUNT')
@@ -10,7 +11,7 @@ def query_snowflake(start_date, end_date):
     database = os.getenv('DATABASE')
     schema = os.getenv('SCHEMA')
 
-    ctx = snowflake.connector.connect(
+    return snowflake.connector.connect(
         user=user,
         password=password,
         account=account,
@@ -19,18 +20,47 @@ def query_snowflake(start_date, end_date):
         schema=schema
     )
 
-    cs = ctx.cursor()
-
+def build_query(start_date, end_date):
     # Read the SQL query from the file
     with open('query.sql', 'r') as file:
         query = file.read()
 
     # Format the query with the dates
-    formatted_query = query.format(start_date=start_date, end_date=end_date)
+    return query.format(start_date=start_date, end_date=end_date)
 
-    cs.execute(formatted_query)
-    df = pd.DataFrame.from_records(iter(cs), columns=[x[0] for x in cs.description])
-    cs.close()
-    ctx.close()
+@traced("Snowflake", section="ifrs9_report")
+def query_snowflake(start_date, end_date):
+    with phase('connect'):
+        ctx = get_connection()
+    cs = ctx.cursor()
+    try:
+        with phase('execute'):
+            cs.execute(build_query(start_date, end_date))
+        add_query_id(cs.sfqid)
+        # Build the DataFrame from the connector's Arrow batches
+        return fetch_dataframe(cs)
+    finally:
+        cs.close()
+        ctx.close()
 
-    return df
+def query_snowflake_batches(start_date, end_date):
+    """
+    Yield the query result as a sequence of DataFrames, one per Arrow result batch,
+    so large extracts never have to be held in memory as a single DataFrame.
+    """
+    with query_spans.span("Snowflake", "query_snowflake_batches", section="ifrs9_report") as span:
+        with phase('connect'):
+            ctx = get_connection()
+        cs = ctx.cursor()
+        try:
+            with phase('execute'):
+                cs.execute(build_query(start_date, end_date))
+            add_query_id(cs.sfqid)
+            span.rows, span.bytes = 0, 0
+            for df in iter_dataframe_batches(cs):
+                span.rows += len(df)
+                span.bytes += int(df.memory_usage(index=True).sum())
+                yield df
+        finally:
+            cs.close()
+            ctx.close()
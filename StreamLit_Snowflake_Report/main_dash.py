@@ -9,13 +9,29 @@ import os
 # Load environment variables
 load_dotenv()
 
-# Import the query_snowflake function from the snowflake_queries.py file
-from function_con_snowflake import query_snowflake
+# Import the query functions from the function_con_snowflake.py file
+from function_con_snowflake import build_query, query_snowflake_batches
+from query_cache import query_cache
+from query_timing import performance_panel
+import pandas as pd
+import io
+
+def cached_batches(start_date, end_date):
+    # Extracts already downloaded in this process are read back from the cache's Parquet file
+    return query_cache.iter_batches(
+        'snowflake',
+        build_query(start_date, end_date),
+        lambda: query_snowflake_batches(start_date, end_date),
+        dataset='ifrs9'
+    )
 
 # Streamlit app
 def main():
     st.title("IFRS9 - Data Download App")
 
+    # Query timings panel
+    performance_panel()
+
     # Date pickers for start and end dates
     start_date = st.date_input("Start date")
     end_date = st.date_input("End date")
@@ -23,17 +39,23 @@ def main():
     if start_date and end_date:
         # Button to show preview
         if st.button("Show preview"):
-            df_sample = query_snowflake(str(start_date), str(end_date)).head(10)  # Adjusted to get sample data
+            # Only the first result batch is needed for the sample
+            batches = cached_batches(str(start_date), str(end_date))
+            df_sample = next(batches, pd.DataFrame()).head(10)
+            batches.close()
             st.dataframe(df_sample)
 
         # Button to download full data
         if st.button("Download Data"):
-            df_full = query_snowflake(str(start_date), str(end_date))
-            # Convert DataFrame to CSV for download
-            csv = df_full.to_csv(index=False).encode('utf-8')
+            # Encode the CSV batch by batch into a single bytes buffer instead of building the
+            # full DataFrame (or a full text copy) first; the buffer is handed over as is
+            buffer = io.BytesIO()
+            for i, df_batch in enumerate(cached_batches(str(start_date), str(end_date))):
+                buffer.write(df_batch.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+            buffer.seek(0)
             st.download_button(
                 label="Download data as CSV",
-                data=csv,
+                data=buffer,
                 file_name='data.csv',
                 mime='text/csv',
             )
@@ -0,0 +1,16 @@
+# snowflake_fetch.py
+#
+# La lectura por lotes Arrow es común a todas las aplicaciones: el código está en
+# streamlit_common/snowflake_fetch.py (raíz del repositorio) y este módulo sólo lo expone con el
+# nombre que importan las páginas.
+
+import os
+import sys
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from streamlit_common import link_module
+
+link_module(__name__, 'streamlit_common.snowflake_fetch')
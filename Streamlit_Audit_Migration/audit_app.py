@@ -9,6 +9,23 @@ from sections.compare_records_by_date import compare_records_by_date
 from sections.compare_columns import compare_columns
 from sections.generate_report import generate_report
 from sections.top_frequent_data import top_frequent_data  # Importar el nuevo módulo
+from sections.row_reconciliation import row_reconciliation
+from sections.stream_diff import full_partition_diff
+from sections.column_fingerprint import column_fingerprint
+from sections.audit_campaign import audit_campaign
+from scripts.campaign import CAMPAIGN_WORKERS
+from scripts.column_fingerprint import COLUMN_FINGERPRINT_TOLERANCE
+from scripts.date_counts import GRANULARITIES
+from scripts.key_sample import KEY_SAMPLE_ROWS
+from scripts.query_cache import query_cache
+from scripts.audit_store import audit_store
+from scripts.snowflake_connection import snowflake_catalog
+from scripts.redshift_connection import redshift_catalog
+from scripts.approximate_profile import ApproximateSettings, APPROX_SAMPLE_PERCENT
+from scripts.audit_pipeline import AUDIT_WINDOW_DAYS
+from scripts.query_timing import query_section, performance_panel
+from scripts.task_executor import task_executor
+from utils.helpers import cancel_superseded_queries, session_results
 import pandas as pd
 from datetime import datetime, timedelta
 
@@ -64,26 +81,104 @@ def get_user_inputs():
         help="Seleccione la fecha para la cual desea realizar la muestra de datos."
     )
 
+    # Ventana de las comprobaciones por rango de fechas: comparación por fecha, conciliación de
+    # filas, campaña e informe
+    dates_window = st.sidebar.date_input(
+        "Ventana de Auditoría", value=(sample_date - timedelta(days=AUDIT_WINDOW_DAYS - 1), sample_date),
+        min_value=datetime(2000, 1, 1).date(), max_value=datetime(2100, 12, 31).date(), key="dates_window",
+        help="Primera y última fecha de la comparación por fecha, la conciliación de filas, la campaña y el "
+             "informe; los días cerrados ya contados se toman de la caché."
+    )
+    dates_granularity = st.sidebar.selectbox(
+        "Agrupar Fechas por", list(GRANULARITIES), format_func=GRANULARITIES.get,
+        help="Con ventanas largas, agrupar por semana o mes permite localizar cuándo empezó la divergencia."
+    )
+
+    key_columns_text = st.sidebar.text_input(
+        "Columnas Clave",
+        value="",
+        help="Columnas que identifican una fila, separadas por comas. Se usan en la conciliación de filas para localizar las claves distintas."
+    )
+    key_columns = [c.strip() for c in key_columns_text.split(',') if c.strip()]
+
+    async_mode = st.sidebar.checkbox(
+        "Modo Asíncrono",
+        value=os.getenv('AUDIT_ASYNC_MODE', '0') == '1',
+        help="Envía todas las consultas por columna a la vez sin un hilo por consulta y muestra el avance."
+    )
+
+    exact_counts = st.sidebar.checkbox(
+        "Conteo Total Exacto",
+        value=False,
+        help="Cuenta el total con COUNT(*) aunque coincidan los conteos de los metadatos del catálogo."
+    )
+
+    # Modo aproximado para tablas muy grandes: estimaciones con cota de error en lugar de conteos exactos
+    audit_mode = st.sidebar.radio(
+        "Modo de Auditoría",
+        ["Exacto", "Aproximado"],
+        help="El modo aproximado usa muestreo y funciones aproximadas (APPROX_TOP_K, HyperLogLog) "
+             "con cotas de error. Usa el modo exacto para la aprobación final."
+    )
+    approximate = None
+    if audit_mode == "Aproximado":
+        sample_percent = st.sidebar.number_input(
+            "Muestreo (%)",
+            min_value=0.01,
+            max_value=100.0,
+            value=min(APPROX_SAMPLE_PERCENT, 100.0),
+            help="Porcentaje de filas que se leen en los conteos y datos más frecuentes; 100 = sin muestreo."
+        )
+        approximate = ApproximateSettings(sample_percent=sample_percent)
+
+    # Los resultados se guardan en una caché compartida, por partición en el almacén de
+    # auditorías y por sección en la sesión; este botón fuerza a volver a consultar la tabla completa
+    if st.sidebar.button("Limpiar Caché de la Tabla"):
+        removed = query_cache.invalidate(dataset=full_table_name)
+        removed += snowflake_catalog.invalidate(full_table_name) + redshift_catalog.invalidate(full_table_name)
+        removed_partitions = audit_store.invalidate(full_table_name)
+        removed_session = session_results().invalidate(full_table_name)
+        st.sidebar.success(
+            f"Se eliminaron {removed} resultados en caché, {removed_partitions} resultados por partición "
+            f"y {removed_session} resultados de la sesión."
+        )
     
-    return full_table_name, date_column, sample_date
+    return (
+        full_table_name, date_column, sample_date, dates_window, dates_granularity, key_columns, async_mode,
+        approximate, exact_counts
+    )
 
 # Función principal
 def main():
+    # Cancelar las consultas que siguen en curso de la ejecución anterior de esta sesión
+    cancel_superseded_queries()
     init_app()
-    full_table_name, date_column, sample_date = get_user_inputs()
+    (
+        full_table_name, date_column, sample_date, dates_window, dates_granularity, key_columns, async_mode,
+        approximate, exact_counts
+    ) = get_user_inputs()
     
     # Botón para verificar existencia de la tabla
     if st.button("Verificar Tabla"):
         if not full_table_name:
             st.error("Por favor, ingresa el nombre de una tabla.")
         else:
-            verify_table(full_table_name)
+            with query_section("verify_table"):
+                verify_table(full_table_name, date_column, sample_date)
     
     # Separador
     st.markdown("---")
     
     # Sección para consultas de muestra
-    st.header("Prueba de Consulta de Muestra: SELECT * WHERE DATE(time_extracted) = 'YYYY-MM-DD' LIMIT 10")
+    st.header("Consulta de Muestra")
+    st.caption(
+        "Con columnas clave, ambos almacenes devuelven las mismas filas (las de menor hash de la clave) "
+        "y se comparan celda a celda; sin ellas, SELECT * ... LIMIT 10 en cada almacén."
+    )
+    
+    sample_rows = st.number_input(
+        "Filas de la muestra por clave", min_value=10, max_value=100000, value=KEY_SAMPLE_ROWS, step=100
+    )
     
     if st.button("Ejecutar Consulta de Muestra"):
         if not full_table_name:
@@ -91,7 +186,8 @@ def main():
         elif not date_column:
             st.error("Por favor, ingresa el nombre de la columna de fecha.")
         else:
-            run_sample_query(full_table_name, date_column, sample_date)
+            with query_section("sample_query"):
+                run_sample_query(full_table_name, date_column, sample_date, key_columns, sample_rows=int(sample_rows))
     
     # Separador
     st.markdown("---")
@@ -103,21 +199,29 @@ def main():
         if not full_table_name:
             st.error("Por favor, ingresa el nombre de una tabla para comparar la cantidad total de registros.")
         else:
-            compare_total_records(full_table_name)
+            with query_section("compare_total_records"):
+                compare_total_records(full_table_name, date_column, sample_date, exact=exact_counts)
     
     # Separador
     st.markdown("---")
     
     # Sección para comparación de registros por fecha
-    st.header("Comparación de Registros por Fecha (Últimos 5 Días)")
+    st.header("Comparación de Registros por Fecha")
+    st.caption("Cuenta los registros de cada fecha de la ventana de auditoría, agrupados como se indica en la barra lateral.")
     
     if st.button("Comparar Registros por Fecha"):
         if not full_table_name:
             st.error("Por favor, ingresa el nombre de una tabla para comparar los registros por fecha.")
         elif not date_column:
             st.error("Por favor, ingresa el nombre de la columna de fecha.")
+        elif len(dates_window) != 2:
+            st.error("Por favor, selecciona la primera y la última fecha de la ventana.")
         else:
-            compare_records_by_date(full_table_name, date_column, sample_date)
+            with query_section("compare_records_by_date"):
+                compare_records_by_date(
+                    full_table_name, date_column, *dates_window, granularity=dates_granularity,
+                    approximate=approximate
+                )
     
     # Separador
     st.markdown("---")
@@ -129,7 +233,8 @@ def main():
         if not full_table_name:
             st.error("Por favor, ingresa el nombre de una tabla para comparar las columnas.")
         else:
-            compare_columns(full_table_name)
+            with query_section("compare_columns"):
+                compare_columns(full_table_name, date_column, sample_date)
     
     # Separador
     st.markdown("---")
@@ -143,7 +248,97 @@ def main():
         elif not date_column:
             st.error("Por favor, ingresa el nombre de la columna de fecha.")
         else:
-            top_frequent_data(full_table_name, date_column, sample_date, top_n=3, max_columns=None)  # max_columns=10 para pruebas
+            with query_section("top_frequent_data"):
+                top_frequent_data(full_table_name, date_column, sample_date, top_n=3, max_columns=None, async_mode=async_mode, approximate=approximate)  # max_columns=10 para pruebas
+    
+    # Separador
+    st.markdown("---")
+    
+    # Sección: Huella Estadística de las Columnas
+    st.header("Huella Estadística de las Columnas")
+    
+    fingerprint_days = st.number_input(
+        "Días hasta la fecha de muestreo", min_value=1, max_value=31, value=5, step=1, key="fingerprint_days",
+        help="1 = sólo la fecha de muestreo. El informe usa la ventana de auditoría."
+    )
+    fingerprint_tolerance = st.number_input(
+        "Tolerancia relativa", min_value=0.0, max_value=1.0, value=COLUMN_FINGERPRINT_TOLERANCE, format="%g",
+        help="Diferencia relativa admitida en mínimos, máximos y sumas numéricas; los conteos deben ser idénticos."
+    )
+    
+    if st.button("Comparar Huella de Columnas"):
+        if not full_table_name:
+            st.error("Por favor, ingresa el nombre de una tabla para comparar la huella de las columnas.")
+        elif not date_column:
+            st.error("Por favor, ingresa el nombre de la columna de fecha.")
+        else:
+            with query_section("column_fingerprint"):
+                column_fingerprint(
+                    full_table_name, date_column, sample_date, days=int(fingerprint_days), tolerance=fingerprint_tolerance
+                )
+    
+    # Separador
+    st.markdown("---")
+    
+    # Sección: Conciliación de Filas
+    st.header("Conciliación de Filas (Ventana de Auditoría)")
+    
+    if st.button("Conciliar Filas"):
+        if not full_table_name:
+            st.error("Por favor, ingresa el nombre de una tabla para conciliar las filas.")
+        elif not date_column:
+            st.error("Por favor, ingresa el nombre de la columna de fecha.")
+        elif len(dates_window) != 2:
+            st.error("Por favor, selecciona la primera y la última fecha de la ventana.")
+        else:
+            with query_section("row_reconciliation"):
+                row_reconciliation(full_table_name, date_column, *dates_window, key_columns)
+    
+    # Separador
+    st.markdown("---")
+    
+    # Sección: Comparación Completa de una Fecha
+    st.header("Comparación Completa de una Fecha")
+    st.caption("Cruza todas las filas de la fecha de muestreo por lotes, con memoria acotada, y guarda las diferencias en Parquet.")
+    
+    if st.button("Comparar Fecha Completa"):
+        if not full_table_name:
+            st.error("Por favor, ingresa el nombre de una tabla para comparar la fecha.")
+        elif not date_column:
+            st.error("Por favor, ingresa el nombre de la columna de fecha.")
+        else:
+            with query_section("stream_diff"):
+                full_partition_diff(full_table_name, date_column, sample_date, key_columns)
+    
+    # Separador
+    st.markdown("---")
+    
+    # Sección: Campaña de Auditoría de Varias Tablas
+    st.header("Campaña de Auditoría (Varias Tablas, Ventana de Auditoría)")
+    
+    campaign_tables = st.text_area(
+        "Tablas (una por línea, opcionalmente 'schema.table:columna_de_fecha')",
+        value=full_table_name or ""
+    )
+    campaign_schema = st.text_input("Esquema completo (opcional)", value="")
+    campaign_workers = st.number_input(
+        "Tablas en paralelo", min_value=1, max_value=32, value=CAMPAIGN_WORKERS, step=1
+    )
+    
+    if st.button("Ejecutar Campaña"):
+        if not campaign_tables.strip() and not campaign_schema.strip():
+            st.error("Por favor, ingresa al menos una tabla o un esquema para la campaña.")
+        elif not date_column:
+            st.error("Por favor, ingresa el nombre de la columna de fecha.")
+        elif len(dates_window) != 2:
+            st.error("Por favor, selecciona la primera y la última fecha de la ventana.")
+        else:
+            with query_section("audit_campaign"):
+                audit_campaign(
+                    campaign_tables, campaign_schema.strip(), date_column, *dates_window,
+                    workers=int(campaign_workers), approximate=approximate, exact_counts=exact_counts,
+                    date_granularity=dates_granularity
+                )
     
     # Separador
     st.markdown("---")
@@ -154,8 +349,22 @@ def main():
     if st.sidebar.button("Generar Informe"):
         if not full_table_name:
             st.sidebar.error("Por favor, ingresa el nombre de una tabla para generar el informe.")
+        elif len(dates_window) != 2:
+            st.sidebar.error("Por favor, selecciona la primera y la última fecha de la ventana.")
         else:
-            generate_report(full_table_name, date_column, sample_date)
+            with query_section("generate_report"):
+                generate_report(
+                    full_table_name, date_column, *dates_window, key_columns,
+                    approximate=approximate, exact_counts=exact_counts,
+                    fingerprint_tolerance=fingerprint_tolerance, date_granularity=dates_granularity
+                )
+
+    # Tiempos de las consultas de esta y anteriores ejecuciones
+    performance_panel()
+    tasks = task_executor.recent()
+    if not tasks.empty:
+        with st.sidebar.expander("Tareas en paralelo"):
+            st.dataframe(tasks.head(50), hide_index=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+# audit_cli.py
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from scripts.approximate_profile import ApproximateSettings, APPROX_SAMPLE_PERCENT, APPROX_TOP_K_COUNTERS
+from scripts.column_fingerprint import COLUMN_FINGERPRINT_TOLERANCE
+from scripts.date_counts import GRANULARITIES
+from scripts.audit_pipeline import AUDIT_WINDOW_DAYS
+from scripts.campaign import (
+    CAMPAIGN_WORKERS, SNOWFLAKE_CAMPAIGN_CONCURRENCY, REDSHIFT_CAMPAIGN_CONCURRENCY,
+    parse_campaign_tables, schema_tables, attach_sizes, run_campaign, write_campaign_summary
+)
+
+# Auditoría de migración sin interfaz, para ejecutarla desde cron o repartirla entre procesos:
+#
+#   python audit_cli.py esquema.tabla [esquema.otra_tabla:fecha_carga ...] --date-column time_extracted \
+#       --start-date 2024-06-01 --end-date 2024-06-05 --key-columns id
+#   python audit_cli.py --schema INFORMATION_DELIVERY_PROD.mfs_lending --workers 8
+#
+# Cada tabla puede indicar su columna de fecha con 'tabla:columna'. Las tablas se auditan en
+# paralelo, de mayor a menor tamaño; por cada una se escriben el informe PDF y un JSON con los
+# resultados en --output-dir, y al final un resumen de la campaña en CSV y JSON.
+# Código de salida: 0 sin discrepancias, 1 con discrepancias, 2 si alguna comprobación falló.
+
+EXIT_OK = 0
+EXIT_DISCREPANCIES = 1
+EXIT_ERRORS = 2
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida (se espera YYYY-MM-DD): {value}")
+
+
+def parse_args(argv=None):
+    yesterday = datetime.today().date() - timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Auditoría de migración de tablas de Snowflake a Redshift.")
+    parser.add_argument('tables', nargs='*', help="Tablas a auditar (table, schema.table o database.schema.table), opcionalmente con ':columna_de_fecha'.")
+    parser.add_argument('--tables-file', help="Archivo con una tabla por línea (mismo formato que los argumentos).")
+    parser.add_argument('--schema', action='append', default=[], help="Auditar todas las tablas del esquema (se puede repetir).")
+    parser.add_argument('--workers', type=int, default=CAMPAIGN_WORKERS, help="Tablas que se auditan a la vez.")
+    parser.add_argument('--snowflake-concurrency', type=int, default=SNOWFLAKE_CAMPAIGN_CONCURRENCY, help="Consultas simultáneas máximas en Snowflake.")
+    parser.add_argument('--redshift-concurrency', type=int, default=REDSHIFT_CAMPAIGN_CONCURRENCY, help="Consultas simultáneas máximas en Redshift.")
+    parser.add_argument('--date-column', default='time_extracted', help="Columna de fecha de extracción.")
+    parser.add_argument('--end-date', type=parse_date, default=yesterday, help="Última fecha del rango (por defecto, ayer).")
+    parser.add_argument('--start-date', type=parse_date, help="Primera fecha del rango (por defecto, la ventana de AUDIT_WINDOW_DAYS días que termina en --end-date).")
+    parser.add_argument('--key-columns', default='', help="Columnas clave separadas por comas para la conciliación de filas.")
+    parser.add_argument('--top-n', type=int, default=3, help="Datos más frecuentes por columna.")
+    parser.add_argument('--exact-counts', action='store_true', help="Contar los totales con COUNT(*) aunque coincidan los metadatos.")
+    parser.add_argument('--approximate', action='store_true', help="Modo aproximado (muestreo y funciones aproximadas).")
+    parser.add_argument('--sample-percent', type=float, default=APPROX_SAMPLE_PERCENT, help="Porcentaje de filas en el modo aproximado.")
+    parser.add_argument('--top-k-counters', type=int, default=APPROX_TOP_K_COUNTERS, help="Contadores de APPROX_TOP_K en el modo aproximado.")
+    parser.add_argument('--date-granularity', choices=list(GRANULARITIES), default='day', help="Agrupación de la comparación de registros por fecha.")
+    parser.add_argument('--fingerprint-tolerance', type=float, default=COLUMN_FINGERPRINT_TOLERANCE, help="Tolerancia relativa de mínimos, máximos y sumas en la huella de las columnas.")
+    parser.add_argument('--output-dir', default='audit_reports', help="Carpeta de los resultados JSON y del resumen.")
+    parser.add_argument('--no-pdf', action='store_true', help="No generar el informe PDF.")
+    args = parser.parse_args(argv)
+    if args.start_date is None:
+        args.start_date = args.end_date - timedelta(days=AUDIT_WINDOW_DAYS - 1)
+    if args.start_date > args.end_date:
+        parser.error("--start-date no puede ser posterior a --end-date")
+    if not args.tables and not args.tables_file and not args.schema:
+        parser.error("indica al menos una tabla, --tables-file o --schema")
+    return args
+
+
+def collect_tables(args):
+    """Tablas de la campaña: argumentos, archivo y esquemas completos, sin repetir."""
+    specs = list(args.tables)
+    if args.tables_file:
+        with open(args.tables_file, encoding='utf-8') as f:
+            specs.extend(f.read().splitlines())
+    tables = attach_sizes(parse_campaign_tables(specs, args.date_column))
+    for schema_name in args.schema:
+        found, error = schema_tables(schema_name, args.date_column)
+        if error:
+            print(f"Aviso al listar el esquema {schema_name}: {error}", file=sys.stderr)
+        tables.extend(found)
+
+    unique = {}
+    for table in tables:
+        unique.setdefault(table.table_name.lower(), table)
+    return list(unique.values())
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    approximate = None
+    if args.approximate:
+        approximate = ApproximateSettings(sample_percent=args.sample_percent, top_k_counters=args.top_k_counters)
+    key_columns = [c.strip() for c in args.key_columns.split(',') if c.strip()]
+
+    tables = collect_tables(args)
+    if not tables:
+        print("No hay tablas que auditar.", file=sys.stderr)
+        return EXIT_ERRORS
+    print(f"Auditando {len(tables)} tablas ({args.start_date} a {args.end_date}) con {args.workers} trabajadores...")
+
+    exit_code = EXIT_OK
+    entries = []
+    campaign = run_campaign(
+        tables, args.start_date, args.end_date, key_columns,
+        top_n=args.top_n, approximate=approximate, exact_counts=args.exact_counts,
+        fingerprint_tolerance=args.fingerprint_tolerance, date_granularity=args.date_granularity,
+        workers=args.workers, snowflake_concurrency=args.snowflake_concurrency,
+        redshift_concurrency=args.redshift_concurrency, output_dir=args.output_dir,
+        write_pdf=not args.no_pdf
+    )
+    for entry in campaign:
+        entries.append(entry)
+        result = entry.result
+        print(f"[{len(entries)}/{len(tables)}] {entry.table.table_name}: {entry.status} ({entry.duration:.0f} s)")
+        if entry.error:
+            print(f"  ERROR: {entry.error}", file=sys.stderr)
+        if result is not None:
+            for discrepancy in result.discrepancies:
+                print(f"  DISCREPANCIA: {discrepancy}")
+            for error in result.errors:
+                print(f"  ERROR: {error}", file=sys.stderr)
+            if result.report_path:
+                print(f"  Informe: {result.report_path}")
+        if entry.json_path:
+            print(f"  Resultados: {entry.json_path}")
+
+        if entry.status == 'error':
+            exit_code = EXIT_ERRORS
+        elif entry.status == 'discrepancias' and exit_code == EXIT_OK:
+            exit_code = EXIT_DISCREPANCIES
+
+    csv_path, json_path = write_campaign_summary(entries, args.output_dir)
+    print(f"Resumen de la campaña: {csv_path} y {json_path}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# scripts/approximate_profile.py
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from scripts.frequency_profile import LONG_COLUMNS, value_expression, sample_clauses
+
+# Modo de auditoría aproximado para tablas muy grandes. Los conteos se estiman sobre una muestra
+# de Bernoulli de las filas (SAMPLE BERNOULLI en Snowflake, RANDOM() en Redshift) y se escalan al
+# total; los valores más frecuentes usan APPROX_TOP_K en Snowflake y un GROUP BY sobre la muestra
+# en Redshift, y los valores distintos, HyperLogLog en ambos almacenes (APPROX_COUNT_DISTINCT y
+# APPROXIMATE COUNT(DISTINCT)). Cada estimación va acompañada de su cota de error (~95 %), y dos
+# estimaciones coinciden cuando su diferencia no supera la suma de las cotas. El modo exacto
+# sigue siendo el que vale para dar por buena una migración.
+
+APPROX_SAMPLE_PERCENT = float(os.getenv('APPROX_SAMPLE_PERCENT', 10))
+APPROX_TOP_K_COUNTERS = int(os.getenv('APPROX_TOP_K_COUNTERS', 1000))
+CONFIDENCE_Z = 1.96
+
+# Error relativo típico de HyperLogLog según la documentación de cada almacén
+DISTINCT_RELATIVE_ERROR = {'snowflake': 0.0162, 'redshift': 0.02}
+
+NUMERIC_TYPES = ('number', 'numeric', 'decimal', 'int', 'float', 'double', 'real')
+
+
+@dataclass
+class ApproximateSettings:
+    """
+    Parámetros del modo aproximado.
+
+    Attributes:
+        sample_percent (float): Porcentaje de filas que se leen; 100 para no muestrear.
+        top_k_counters (int): Contadores de APPROX_TOP_K en Snowflake; más contadores, menos error.
+    """
+    sample_percent: float = APPROX_SAMPLE_PERCENT
+    top_k_counters: int = APPROX_TOP_K_COUNTERS
+
+    @property
+    def sampled(self):
+        """True si se lee sólo una muestra de las filas."""
+        return self.sample_percent < 100
+
+    @property
+    def fraction(self):
+        return min(self.sample_percent, 100) / 100
+
+    def describe(self):
+        """Descripción corta para la interfaz y el informe."""
+        sampling = f"muestreo del {self.sample_percent:g} % de las filas" if self.sampled else "sin muestreo"
+        return f"Modo aproximado ({sampling}; cotas de error al 95 %)"
+
+
+def is_numeric_type(data_type):
+    data_type = (data_type or '').lower()
+    return any(name in data_type for name in NUMERIC_TYPES)
+
+
+def approx_top_k_query(table_name, date_column, sample_date, columns, top_n, data_types, settings):
+    """
+    Construye la consulta de Snowflake que obtiene con APPROX_TOP_K los top_n valores de todas
+    las columnas en una sola lectura (opcionalmente muestreada) de la fecha de muestreo.
+
+    Returns:
+        str: Consulta que devuelve sampled_rows y una columna top_<i> por columna analizada.
+    """
+    data_types = data_types or {}
+    table_sample, sample_filter = sample_clauses('snowflake', settings.sample_percent)
+    select_values = ",\n            ".join(
+        f"COALESCE({value_expression(column, data_types.get(column.lower()), 'snowflake')}, 'None') AS v{i}"
+        for i, column in enumerate(columns)
+    )
+    counters = max(settings.top_k_counters, top_n)
+    select_top_k = ",\n        ".join(
+        f"APPROX_TOP_K(v{i}, {top_n}, {counters}) AS top_{i}" for i in range(len(columns))
+    )
+    return f"""
+    WITH base AS (
+        SELECT
+            {select_values}
+        FROM {table_name}{table_sample}
+        WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'{sample_filter}
+    )
+    SELECT
+        COUNT(*) AS sampled_rows,
+        {select_top_k}
+    FROM base;
+    """
+
+
+def parse_approx_top_k(df, columns, settings):
+    """
+    Convierte el resultado de approx_top_k_query al formato largo con la cota de error de cada conteo.
+
+    El error de APPROX_TOP_K es como mucho filas leídas / contadores por valor y se suma al del muestreo.
+    """
+    row = df.rename(columns=lambda x: x.lower()).iloc[0]
+    sampled_rows = int(row['sampled_rows'] or 0)
+    records = []
+    for i, column in enumerate(columns):
+        items = row[f'top_{i}']
+        if isinstance(items, str):
+            items = json.loads(items)
+        for value, count in items or []:
+            records.append((column, str(value), count))
+    frame = pd.DataFrame(records, columns=LONG_COLUMNS)
+    sketch_error = sampled_rows / max(settings.top_k_counters, 1)
+    return scale_sampled_counts(frame, settings.fraction, sketch_error)
+
+
+def scale_sampled_counts(df, fraction, sketch_error=0.0):
+    """
+    Escala los conteos de una muestra al total y añade la columna error_bound: la semiamplitud
+    del intervalo ~95 % del conteo binomial más el error propio del algoritmo (sketch_error,
+    en filas de la muestra).
+    """
+    df = df.copy()
+    counts = pd.to_numeric(df['count']).astype(float)
+    df['count'] = (counts / fraction).round().astype('int64')
+    bound = (CONFIDENCE_Z * np.sqrt(counts * (1 - fraction)) + sketch_error) / fraction
+    df['error_bound'] = np.ceil(bound).astype('int64')
+    return df
+
+
+def approx_count_by_date_query(table_name, date_column, start_date, end_date, warehouse, sample_percent):
+    """Conteo por fecha sobre una muestra de las filas; se escala con scale_sampled_counts."""
+    table_sample, sample_filter = sample_clauses(warehouse, sample_percent)
+    return f"""
+        SELECT DATE({date_column}) AS extraction_date, COUNT(*) AS count
+        FROM {table_name}{table_sample}
+        WHERE DATE({date_column}) BETWEEN '{start_date.strftime('%Y-%m-%d')}' AND '{end_date.strftime('%Y-%m-%d')}'{sample_filter}
+        GROUP BY DATE({date_column})
+        ORDER BY extraction_date DESC
+    """
+
+
+def approx_column_stats_query(table_name, date_column, sample_date, columns, data_types, warehouse):
+    """
+    Construye la consulta de valores distintos (HyperLogLog) y mediana aproximada de cada columna.
+    No se muestrea: los valores distintos de una muestra no se pueden escalar al total.
+
+    Cada estadística es una rama de un UNION ALL con un único agregado, porque Redshift no admite
+    varios agregados ordenados (PERCENTILE_DISC) sobre columnas distintas en la misma consulta;
+    al ser almacenes columnares cada rama sólo lee su columna.
+
+    Returns:
+        str: Consulta que devuelve column_name, statistic ('distinct' o 'median') y value.
+    """
+    data_types = data_types or {}
+    text_type = "VARCHAR(256)" if warehouse == 'redshift' else "VARCHAR"
+    where = f"WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'"
+    branches = []
+    for column in columns:
+        if warehouse == 'redshift':
+            distinct = f"APPROXIMATE COUNT(DISTINCT {column})"
+            median = f"APPROXIMATE PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY {column})"
+        else:
+            distinct = f"APPROX_COUNT_DISTINCT({column})"
+            median = f"APPROX_PERCENTILE({column}, 0.5)"
+        branches.append(
+            f"SELECT '{column}' AS column_name, 'distinct' AS statistic, "
+            f"CAST({distinct} AS {text_type}) AS value FROM {table_name} {where}"
+        )
+        if is_numeric_type(data_types.get(column.lower())):
+            branches.append(
+                f"SELECT '{column}' AS column_name, 'median' AS statistic, "
+                f"CAST({median} AS {text_type}) AS value FROM {table_name} {where}"
+            )
+    return "\nUNION ALL\n".join(branches)
+
+
+def compare_with_bounds(df_snowflake, df_redshift, on):
+    """
+    Compara conteos estimados de ambos almacenes: coinciden si la diferencia no supera la suma
+    de sus cotas de error. Un DataFrame sin error_bound se considera exacto (cota 0).
+
+    Returns:
+        pd.DataFrame: Claves de `on`, count_snowflake, count_redshift, error_bound y match.
+    """
+    def prepare(df, suffix):
+        if 'error_bound' not in df.columns:
+            df = df.assign(error_bound=0)
+        return df[on + ['count', 'error_bound']].rename(
+            columns={'count': f'count_{suffix}', 'error_bound': f'error_bound_{suffix}'}
+        )
+
+    comparison_df = pd.merge(prepare(df_snowflake, 'snowflake'), prepare(df_redshift, 'redshift'), on=on, how='outer')
+    value_columns = ['count_snowflake', 'count_redshift', 'error_bound_snowflake', 'error_bound_redshift']
+    comparison_df[value_columns] = comparison_df[value_columns].fillna(0)
+    comparison_df['error_bound'] = comparison_df['error_bound_snowflake'] + comparison_df['error_bound_redshift']
+    comparison_df['match'] = (
+        (comparison_df['count_snowflake'] - comparison_df['count_redshift']).abs() <= comparison_df['error_bound']
+    )
+    return comparison_df.drop(columns=['error_bound_snowflake', 'error_bound_redshift'])
+
+
+def compare_approximate_frequencies(df_snowflake, df_redshift, top_n):
+    """
+    Versión aproximada de frequency_profile.compare_top_frequent_batch: compara con tolerancia
+    los conteos estimados de cada (column_name, value) y deja como máximo top_n filas por columna.
+    """
+    comparison_df = compare_with_bounds(df_snowflake, df_redshift, ['column_name', 'value'])
+    comparison_df = comparison_df.sort_values(
+        ['column_name', 'count_snowflake', 'count_redshift', 'value'],
+        ascending=[True, False, False, True],
+        kind='stable'
+    )
+    return comparison_df.groupby('column_name', sort=False).head(top_n).reset_index(drop=True)
+
+
+def compare_column_stats(stats_snowflake, stats_redshift):
+    """
+    Compara los valores distintos aproximados y muestra las medianas aproximadas de cada columna.
+
+    Args:
+        stats_snowflake (pd.DataFrame): Resultado de approx_column_stats_query en Snowflake.
+        stats_redshift (pd.DataFrame): Resultado de approx_column_stats_query en Redshift.
+
+    Returns:
+        pd.DataFrame: column_name, distinct_snowflake, distinct_redshift, error_bound, match,
+        median_snowflake y median_redshift. Las medianas no se comparan: Snowflake interpola
+        (t-digest) y Redshift devuelve un valor de la columna.
+    """
+    def wide(df, warehouse):
+        df = df.rename(columns=lambda x: x.lower())
+        df = df.pivot_table(index='column_name', columns='statistic', values='value', aggfunc='first')
+        df = df.reindex(columns=['distinct', 'median'])
+        distinct = pd.to_numeric(df['distinct'])
+        return pd.DataFrame({
+            f'distinct_{warehouse}': distinct,
+            f'bound_{warehouse}': np.ceil(CONFIDENCE_Z * DISTINCT_RELATIVE_ERROR[warehouse] * distinct),
+            f'median_{warehouse}': df['median'],
+        })
+
+    comparison_df = wide(stats_snowflake, 'snowflake').join(wide(stats_redshift, 'redshift'), how='outer')
+    comparison_df['error_bound'] = comparison_df['bound_snowflake'].fillna(0) + comparison_df['bound_redshift'].fillna(0)
+    comparison_df['match'] = (
+        (comparison_df['distinct_snowflake'] - comparison_df['distinct_redshift']).abs() <= comparison_df['error_bound']
+    )
+    return comparison_df.reset_index()[[
+        'column_name', 'distinct_snowflake', 'distinct_redshift', 'error_bound', 'match',
+        'median_snowflake', 'median_redshift'
+    ]]
@@ -0,0 +1,270 @@
+# scripts/async_queries.py
+
+import asyncio
+import os
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from scripts.query_cache import query_cache
+from scripts.query_timing import query_spans, phase, add_query_id
+from scripts.query_control import (
+    query_tracker, statement_timeout, timeout_message, QueryCancelledError, QueryTimeoutError
+)
+from scripts.snowflake_connection import (
+    snowflake_pool, _cancel_snowflake_query, snowflake_query_finished, top_frequent_query_snowflake
+)
+from scripts.redshift_connection import (
+    redshift_connection_params, _cancel_redshift_backend, top_frequent_query_redshift
+)
+from scripts.snowflake_fetch import fetch_dataframe
+from scripts.redshift_fetch import fetch_cursor_dataframe
+
+# Modo asíncrono: las consultas se envían sin bloquear y un único hilo con un bucle asyncio
+# espera a todas a la vez. En Snowflake se usa execute_async y se consulta el estado de cada
+# query ID (una sola conexión admite varias consultas en curso); en Redshift se usan
+# conexiones asíncronas de psycopg2, una por consulta simultánea. Las llamadas del conector
+# de Snowflake, las cancelaciones (que abren su propia conexión) y la lectura de la caché son
+# bloqueantes: se ejecutan en hilos con asyncio.to_thread para que el bucle siga atendiendo al
+# resto de consultas.
+
+REDSHIFT_ASYNC_MAX_CONNECTIONS = int(os.getenv('REDSHIFT_ASYNC_MAX_CONNECTIONS', 8))
+POLL_MIN_INTERVAL = 0.05
+POLL_MAX_INTERVAL = 1.0
+
+
+async def _wait_redshift(conn):
+    """Espera a que una conexión asíncrona de psycopg2 complete la operación en curso."""
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        future = loop.create_future()
+        ready = lambda: future.done() or future.set_result(None)
+        fd = conn.fileno()
+        if state == extensions.POLL_READ:
+            loop.add_reader(fd, ready)
+            try:
+                await future
+            finally:
+                loop.remove_reader(fd)
+        elif state == extensions.POLL_WRITE:
+            loop.add_writer(fd, ready)
+            try:
+                await future
+            finally:
+                loop.remove_writer(fd)
+        else:
+            raise psycopg2.OperationalError(f"Estado inesperado de la conexión: {state}")
+
+
+def _cache_key_params(params, cache_params):
+    # Misma clave que las funciones síncronas, que pasan cache_params como parámetros de la caché
+    # cuando la consulta no tiene parámetros propios; con ambos se combinan
+    if cache_params is None:
+        return params
+    if params is None:
+        return cache_params
+    return [params, cache_params]
+
+
+class AsyncQueryRunner:
+    """
+    Ejecuta consultas de Snowflake y Redshift de forma concurrente dentro de un bucle asyncio.
+
+    Args:
+        redshift_max_connections (int): Consultas simultáneas máximas en Redshift.
+    """
+
+    def __init__(self, redshift_max_connections=REDSHIFT_ASYNC_MAX_CONNECTIONS):
+        self._snowflake_conn = None
+        self._snowflake_connecting = asyncio.Lock()
+        self._redshift_idle = []
+        self._redshift_slots = asyncio.Semaphore(redshift_max_connections)
+
+    async def snowflake(self, query, params=None, query_class=None, dataset=None, cache_params=None):
+        """
+        Ejecuta una consulta en Snowflake y devuelve el resultado como DataFrame.
+        Si se indica `dataset` el resultado se lee y se guarda en la caché compartida;
+        `cache_params` se añade a la clave de caché sin enviarse a la consulta.
+        """
+        with query_spans.span("Snowflake", f"async_{query_class or 'query'}") as span:
+            df = await self._snowflake(query, params, query_class, dataset, _cache_key_params(params, cache_params))
+            span.record_result(df)
+            return df
+
+    async def redshift(self, query, params=None, query_class=None, dataset=None, cache_params=None):
+        """
+        Ejecuta una consulta en Redshift sobre una conexión asíncrona y devuelve el resultado
+        como DataFrame. Si se indica `dataset` el resultado se lee y se guarda en la caché compartida;
+        `cache_params` se añade a la clave de caché sin enviarse a la consulta.
+        """
+        with query_spans.span("Redshift", f"async_{query_class or 'query'}") as span:
+            df = await self._redshift(query, params, query_class, dataset, _cache_key_params(params, cache_params))
+            span.record_result(df)
+            return df
+
+    async def _snowflake(self, query, params, query_class, dataset, cache_key_params):
+        if dataset is not None:
+            cached = await asyncio.to_thread(query_cache.get, 'snowflake', query, cache_key_params)
+            if cached is not None:
+                return cached
+        async with self._snowflake_connecting:
+            if self._snowflake_conn is None:
+                with phase('connect'):
+                    self._snowflake_conn = await asyncio.to_thread(snowflake_pool.acquire)
+        conn = self._snowflake_conn
+        timeout = statement_timeout(query_class)
+        deadline = time.monotonic() + timeout if timeout else None
+        cs = conn.cursor()
+        try:
+            with phase('execute'):
+                await asyncio.to_thread(cs.execute_async, query, params)
+                query_id = cs.sfqid
+                add_query_id(query_id)
+                with query_tracker.track("Snowflake", query_id, _cancel_snowflake_query, query_class) as handle:
+                    wait = POLL_MIN_INTERVAL
+                    try:
+                        while not await asyncio.to_thread(snowflake_query_finished, conn, handle, deadline):
+                            await asyncio.sleep(wait)
+                            wait = min(wait * 2, POLL_MAX_INTERVAL)
+                    except asyncio.CancelledError:
+                        await asyncio.to_thread(handle.cancel)
+                        raise
+                await asyncio.to_thread(cs.get_results_from_sfqid, query_id)
+            df = await asyncio.to_thread(fetch_dataframe, cs)
+        finally:
+            cs.close()
+        if dataset is not None:
+            await asyncio.to_thread(query_cache.put, 'snowflake', query, df, params=cache_key_params, dataset=dataset)
+        return df
+
+    async def _redshift(self, query, params, query_class, dataset, cache_key_params):
+        if dataset is not None:
+            cached = await asyncio.to_thread(query_cache.get, 'redshift', query, cache_key_params)
+            if cached is not None:
+                return cached
+        timeout = statement_timeout(query_class)
+        async with self._redshift_slots:
+            with phase('connect'):
+                conn = await self._acquire_redshift()
+            try:
+                cur = conn.cursor()
+                cur.execute("SET statement_timeout TO %s", (int(timeout * 1000) if timeout else 0,))
+                await _wait_redshift(conn)
+                pid = conn.get_backend_pid()
+                add_query_id(f"pid:{pid}")
+                with query_tracker.track("Redshift", pid, _cancel_redshift_backend, query_class) as handle:
+                    if handle.cancelled:
+                        raise QueryCancelledError(f"Consulta del backend {pid} cancelada")
+                    try:
+                        with phase('execute'):
+                            cur.execute(query, params)
+                            await _wait_redshift(conn)
+                    except asyncio.CancelledError:
+                        await asyncio.to_thread(handle.cancel)
+                        raise
+                    except extensions.QueryCanceledError as e:
+                        if handle.cancelled:
+                            raise QueryCancelledError(f"Consulta del backend {pid} cancelada") from e
+                        raise QueryTimeoutError(timeout_message(query_class, timeout)) from e
+                df = fetch_cursor_dataframe(cur)
+                cur.close()
+            except BaseException:
+                # El estado de la conexión es incierto: se descarta
+                conn.close()
+                raise
+            self._redshift_idle.append(conn)
+        if dataset is not None:
+            await asyncio.to_thread(query_cache.put, 'redshift', query, df, params=cache_key_params, dataset=dataset)
+        return df
+
+    async def _acquire_redshift(self):
+        while self._redshift_idle:
+            conn = self._redshift_idle.pop()
+            if conn.closed == 0:
+                return conn
+        conn = psycopg2.connect(async_=1, **redshift_connection_params())
+        try:
+            await _wait_redshift(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def close(self):
+        """Cierra las conexiones de Redshift y devuelve la de Snowflake al pool."""
+        for conn in self._redshift_idle:
+            conn.close()
+        self._redshift_idle = []
+        if self._snowflake_conn is not None:
+            self._snowflake_conn.close()
+            self._snowflake_conn = None
+
+
+async def _run_all(factories, on_progress):
+    runner = AsyncQueryRunner()
+
+    async def run(index, factory):
+        try:
+            return index, (await factory(runner), None)
+        except Exception as e:
+            return index, (None, str(e))
+
+    try:
+        results = [None] * len(factories)
+        pending = [run(index, factory) for index, factory in enumerate(factories)]
+        for done, next_result in enumerate(asyncio.as_completed(pending), start=1):
+            index, result = await next_result
+            results[index] = result
+            if on_progress is not None:
+                on_progress(done, len(factories))
+        return results
+    finally:
+        runner.close()
+
+
+def run_async_queries(factories, on_progress=None):
+    """
+    Ejecuta varias consultas de forma concurrente en el hilo actual.
+
+    Args:
+        factories (list): Funciones que reciben un AsyncQueryRunner y devuelven la corrutina
+            de la consulta, p. ej. lambda runner: runner.snowflake(query).
+        on_progress (callable): Se llama con (completadas, total) cada vez que termina una consulta.
+
+    Returns:
+        list: Tuplas (DataFrame, error) en el mismo orden que `factories`.
+    """
+    if not factories:
+        return []
+    return asyncio.run(_run_all(factories, on_progress))
+
+
+def get_top_frequent_data_async(table_name, date_column, sample_date, columns, top_n=5, on_progress=None, cache_params=None):
+    """
+    Obtiene los top_n datos más frecuentes de varias columnas en Snowflake y Redshift,
+    con todas las consultas en curso a la vez.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes a obtener.
+        on_progress (callable): Se llama con (completadas, total) cada vez que termina una consulta.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición).
+
+    Returns:
+        dict: Por columna, [(df_snowflake, error_snowflake), (df_redshift, error_redshift)].
+    """
+    factories = []
+    for column in columns:
+        snowflake_query = top_frequent_query_snowflake(table_name, date_column, sample_date, column, top_n)
+        redshift_query = top_frequent_query_redshift(table_name, date_column, sample_date, column, top_n)
+        factories.append(lambda runner, q=snowflake_query: runner.snowflake(q, query_class='top_frequent', dataset=table_name, cache_params=cache_params))
+        factories.append(lambda runner, q=redshift_query: runner.redshift(q, query_class='top_frequent', dataset=table_name, cache_params=cache_params))
+    results = run_async_queries(factories, on_progress)
+    return {column: results[2 * i:2 * i + 2] for i, column in enumerate(columns)}
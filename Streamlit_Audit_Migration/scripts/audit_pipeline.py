@@ -0,0 +1,453 @@
+# scripts/audit_pipeline.py
+
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from scripts.snowflake_connection import get_table_profile_snowflake, get_approx_record_count_by_date_snowflake
+from scripts.redshift_connection import get_table_profile_redshift, get_approx_record_count_by_date_redshift
+from scripts.date_counts import compare_counts_by_period
+from scripts.catalog_snapshot import compare_column_catalogs
+from scripts.column_fingerprint import COLUMN_FINGERPRINT_TOLERANCE, compare_fingerprints, mismatched_columns
+from scripts.fingerprint_audit import get_column_fingerprints
+from scripts.record_counts import RecordCounts, get_total_record_counts, get_record_counts_by_date
+from scripts.row_diff import RowDiffResult, reconcile_rows
+from scripts.top_frequent import get_frequent_data_for_report
+from scripts.session_results import (
+    EXISTS, TOTAL_COUNTS, COLUMNS, records_by_date_check, top_frequent_check, column_fingerprint_check,
+    row_diff_check
+)
+from scripts.report_generation import generate_audit_report
+from scripts.task_executor import task_executor
+from scripts.stage_graph import Stage, run_stages, stage_timings
+
+# Auditoría completa de una tabla sin interfaz: existencia, totales, conteos por fecha, columnas,
+# datos más frecuentes, huella estadística de las columnas y conciliación de filas. La usan el botón "Generar Informe" de la app y
+# la línea de comandos (audit_cli.py); no importa Streamlit. El resultado se puede escribir como
+# informe PDF y como JSON, y enumera las discrepancias encontradas. Con los resultados de la
+# sesión (scripts/session_results.py) sólo se consultan las comprobaciones que faltan. Las
+# comprobaciones son etapas de un grafo (scripts/stage_graph.py): las independientes se ejecutan
+# en paralelo y, si la tabla no existe en ambos almacenes, no se lanzan las costosas.
+
+# Días de la ventana de auditoría por defecto (hasta la fecha de muestreo, incluida), en la app y
+# en la línea de comandos
+AUDIT_WINDOW_DAYS = int(os.getenv('AUDIT_WINDOW_DAYS', 5))
+
+
+@dataclass
+class AuditResult:
+    """
+    Resultado de la auditoría de una tabla.
+
+    Attributes:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Columna de fecha.
+        start_date (datetime.date): Primera fecha del rango auditado.
+        end_date (datetime.date): Última fecha del rango (fecha de muestreo de los datos más frecuentes).
+        key_columns (list): Columnas clave de la conciliación de filas.
+        approximate (ApproximateSettings): Modo aproximado; None en el modo exacto.
+        snowflake_exists (bool): Si la tabla existe en Snowflake.
+        redshift_exists (bool): Si la tabla existe en Redshift.
+        total_counts (RecordCounts): Totales de registros.
+        snowflake_dates_df (pd.DataFrame): Conteo por fecha en Snowflake.
+        redshift_dates_df (pd.DataFrame): Conteo por fecha en Redshift.
+        date_granularity (str): Agrupación de la comparación por fecha: 'day', 'week' o 'month'.
+        dates_comparison_df (pd.DataFrame): Comparación de los conteos por periodo.
+        cached_days (int): Días cuyo conteo se tomó de la caché de días cerrados (ambos almacenes).
+        columns_snowflake_df (pd.DataFrame): Catálogo de columnas en Snowflake.
+        columns_redshift_df (pd.DataFrame): Catálogo de columnas en Redshift.
+        column_differences (dict): Resultado de compare_column_catalogs.
+        frequent_data (dict): Datos más frecuentes por columna.
+        column_fingerprint_df (pd.DataFrame): Comparación de la huella estadística de las columnas.
+        row_diff (RowDiffResult): Conciliación de filas.
+        errors (list): Errores de ejecución (consultas fallidas), no discrepancias.
+        reused (list): Comprobaciones tomadas de los resultados de la sesión en lugar de consultarse.
+        stage_timings (pd.DataFrame): Estado y tiempos de cada etapa de la auditoría.
+        report_path (str): Ruta del informe PDF, si se generó.
+    """
+    table_name: str
+    date_column: str
+    start_date: date
+    end_date: date
+    key_columns: List[str] = field(default_factory=list)
+    approximate: Optional[object] = None
+    snowflake_exists: bool = False
+    redshift_exists: bool = False
+    total_counts: RecordCounts = field(default_factory=RecordCounts)
+    snowflake_dates_df: Optional[pd.DataFrame] = None
+    redshift_dates_df: Optional[pd.DataFrame] = None
+    date_granularity: str = 'day'
+    dates_comparison_df: Optional[pd.DataFrame] = None
+    cached_days: int = 0
+    columns_snowflake_df: Optional[pd.DataFrame] = None
+    columns_redshift_df: Optional[pd.DataFrame] = None
+    column_differences: Optional[Dict] = None
+    frequent_data: Optional[Dict] = None
+    column_fingerprint_df: Optional[pd.DataFrame] = None
+    row_diff: Optional[RowDiffResult] = None
+    errors: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)
+    stage_timings: Optional[pd.DataFrame] = None
+    report_path: Optional[str] = None
+
+    @property
+    def discrepancies(self):
+        """Lista legible de las diferencias encontradas entre Snowflake y Redshift."""
+        found = []
+        if not (self.snowflake_exists and self.redshift_exists):
+            found.append(
+                f"La tabla existe en Snowflake: {self.snowflake_exists}; en Redshift: {self.redshift_exists}"
+            )
+        if self.total_counts.match is False:
+            found.append(
+                f"Totales distintos ({self.total_counts.source}): "
+                f"Snowflake {self.total_counts.snowflake}, Redshift {self.total_counts.redshift}"
+            )
+        if self.dates_comparison_df is not None and not self.dates_comparison_df['match'].all():
+            periods = self.dates_comparison_df.loc[~self.dates_comparison_df['match'], 'period']
+            found.append(f"Conteos por fecha distintos: {', '.join(str(p) for p in periods)}")
+        if self.column_differences:
+            if self.column_differences['only_in_snowflake']:
+                found.append(f"Columnas sólo en Snowflake: {', '.join(self.column_differences['only_in_snowflake'])}")
+            if self.column_differences['only_in_redshift']:
+                found.append(f"Columnas sólo en Redshift: {', '.join(self.column_differences['only_in_redshift'])}")
+            if not self.column_differences['type_mismatches'].empty:
+                found.append(
+                    "Columnas con tipos distintos: "
+                    f"{', '.join(self.column_differences['type_mismatches']['Columna'])}"
+                )
+        if self.frequent_data:
+            discrepant = [column for column, data in self.frequent_data.items() if data['discrepancy']]
+            if discrepant:
+                found.append(f"Datos más frecuentes distintos en: {', '.join(discrepant)}")
+        if self.column_fingerprint_df is not None:
+            discrepant = mismatched_columns(self.column_fingerprint_df)
+            if discrepant:
+                found.append(f"Huella estadística distinta en: {', '.join(discrepant)}")
+        if self.row_diff is not None and self.row_diff.mismatched_partitions:
+            found.append(f"Filas distintas en las fechas: {', '.join(self.row_diff.mismatched_partitions)}")
+        return found
+
+    def to_dict(self):
+        """Resultado serializable a JSON (DataFrames como listas de registros)."""
+        def records(df):
+            if df is None:
+                return None
+            if df.empty:
+                return []
+            # Las fechas se escriben como 'YYYY-MM-DD' (to_json las convertiría en marcas de tiempo)
+            df = df.apply(lambda column: column.map(lambda v: v.isoformat() if isinstance(v, date) else v))
+            return json.loads(df.to_json(orient='records'))
+
+        frequent_data = None
+        if self.frequent_data is not None:
+            frequent_data = {
+                column: {key: records(value) if isinstance(value, pd.DataFrame) else bool(value)
+                         for key, value in data.items()}
+                for column, data in self.frequent_data.items()
+            }
+        row_diff = None
+        if self.row_diff is not None:
+            row_diff = {
+                'partitions': records(self.row_diff.partitions_df),
+                'mismatched_partitions': self.row_diff.mismatched_partitions,
+                'differences': records(self.row_diff.diff_df),
+                'complete': self.row_diff.complete,
+                'error': self.row_diff.error,
+            }
+        column_differences = None
+        if self.column_differences is not None:
+            column_differences = {
+                'only_in_snowflake': self.column_differences['only_in_snowflake'],
+                'only_in_redshift': self.column_differences['only_in_redshift'],
+                'type_mismatches': records(self.column_differences['type_mismatches']),
+            }
+        return {
+            'table_name': self.table_name,
+            'date_column': self.date_column,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'key_columns': self.key_columns,
+            'mode': self.approximate.describe() if self.approximate is not None else 'exacto',
+            'snowflake_exists': self.snowflake_exists,
+            'redshift_exists': self.redshift_exists,
+            'total_records': {
+                'snowflake': self.total_counts.snowflake,
+                'redshift': self.total_counts.redshift,
+                'exact': self.total_counts.exact,
+            },
+            'date_granularity': self.date_granularity,
+            'records_by_date': records(self.dates_comparison_df),
+            'cached_days': self.cached_days,
+            'columns': column_differences,
+            'frequent_data': frequent_data,
+            'column_fingerprint': records(self.column_fingerprint_df),
+            'row_diff': row_diff,
+            'discrepancies': self.discrepancies,
+            'errors': self.errors,
+            'stages': records(self.stage_timings),
+            'report_path': self.report_path,
+        }
+
+
+def run_audit(
+    table_name,
+    date_column,
+    start_date,
+    end_date,
+    key_columns=None,
+    top_n=3,
+    approximate=None,
+    exact_counts=False,
+    on_wait=None,
+    session_results=None,
+    fingerprint_tolerance=COLUMN_FINGERPRINT_TOLERANCE,
+    date_granularity='day'
+):
+    """
+    Ejecuta todas las comprobaciones de la auditoría de una tabla.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Columna de fecha.
+        start_date (datetime.date): Primera fecha del rango.
+        end_date (datetime.date): Última fecha del rango.
+        key_columns (list): Columnas clave de la conciliación de filas.
+        top_n (int): Número de datos más frecuentes por columna.
+        approximate (ApproximateSettings): Modo aproximado; None para el modo exacto.
+        exact_counts (bool): Si los totales se cuentan siempre con COUNT(*).
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+        session_results (SessionResults): Resultados de la sesión de la app; las comprobaciones
+            ya guardadas para (tabla, columna de fecha, end_date) no se vuelven a consultar y
+            las nuevas se guardan.
+        fingerprint_tolerance (float): Tolerancia relativa de mínimos, máximos y sumas en la
+            comparación de la huella de las columnas.
+        date_granularity (str): Agrupación de la comparación por fecha: 'day', 'week' o 'month'.
+
+    Returns:
+        AuditResult: Resultados, discrepancias y errores de ejecución.
+    """
+    result = AuditResult(
+        table_name=table_name, date_column=date_column, start_date=start_date, end_date=end_date,
+        key_columns=list(key_columns or []), approximate=approximate, date_granularity=date_granularity
+    )
+    days = (end_date - start_date).days + 1
+    sampled_dates = approximate is not None and approximate.sampled
+    # Sin muestreo los conteos por fecha son exactos en ambos modos
+    dates_check = records_by_date_check(days, approximate if sampled_dates else None)
+    # Errores de ejecución por etapa; se añaden al resultado en el orden de las etapas
+    stage_errors = {}
+
+    def stored(check):
+        if session_results is None:
+            return None
+        value = session_results.get(table_name, date_column, end_date, check)
+        if value is not None:
+            result.reused.append(check)
+        return value
+
+    def store(check, value):
+        if session_results is not None:
+            session_results.put(table_name, date_column, end_date, check, value)
+
+    def profile_stage():
+        # Existencia y columnas con un solo lote de consultas por almacén, salvo que la sesión ya
+        # tenga las columnas. Los conteos por fecha son una etapa aparte con la caché de días cerrados
+        errors = stage_errors.setdefault('profile', [])
+        stored_columns = stored(COLUMNS)
+        if stored_columns is None:
+            profiles = task_executor.run({
+                'snowflake': lambda: get_table_profile_snowflake(
+                    table_name, date_column, start_date, end_date, include_total=False, include_dates=False
+                ),
+                'redshift': lambda: get_table_profile_redshift(
+                    table_name, date_column, start_date, end_date, include_total=False, include_dates=False
+                ),
+            }, on_wait=on_wait)
+            snowflake_profile, snowflake_error = profiles['snowflake']
+            redshift_profile, redshift_error = profiles['redshift']
+            for warehouse, error in (('Snowflake', snowflake_error), ('Redshift', redshift_error)):
+                if error:
+                    errors.append(f"Perfil en {warehouse}: {error}")
+            result.snowflake_exists = bool(snowflake_profile and snowflake_profile.exists)
+            result.redshift_exists = bool(redshift_profile and redshift_profile.exists)
+            result.columns_snowflake_df = snowflake_profile.columns_df if snowflake_profile else None
+            result.columns_redshift_df = redshift_profile.columns_df if redshift_profile else None
+            if snowflake_profile is not None and redshift_profile is not None:
+                store(EXISTS, (result.snowflake_exists, result.redshift_exists))
+                store(COLUMNS, (result.columns_snowflake_df, result.columns_redshift_df))
+        else:
+            # Sin "Verificar Tabla" previo, la tabla existe si su catálogo tiene columnas
+            result.columns_snowflake_df, result.columns_redshift_df = stored_columns
+            result.snowflake_exists, result.redshift_exists = stored(EXISTS) or (
+                not result.columns_snowflake_df.empty, not result.columns_redshift_df.empty
+            )
+
+        # Las demás etapas sólo tienen sentido si la tabla existe en ambos almacenes
+        if errors:
+            return None, '; '.join(errors)
+        if not (result.snowflake_exists and result.redshift_exists):
+            return None, "La tabla no existe en ambos almacenes"
+        return True, None
+
+    def totals_stage():
+        # Totales: metadatos del catálogo o COUNT(*); unos totales exactos guardados valen siempre
+        stored_counts = stored(TOTAL_COUNTS)
+        if stored_counts is not None and (stored_counts.exact or not exact_counts):
+            result.total_counts = stored_counts
+        else:
+            if stored_counts is not None:
+                result.reused.remove(TOTAL_COUNTS)
+            result.total_counts = get_total_record_counts(table_name, exact=exact_counts, on_wait=on_wait)
+            if result.total_counts.match is not None:
+                store(TOTAL_COUNTS, result.total_counts)
+        errors = stage_errors.setdefault('total_counts', [])
+        for warehouse, error in (('Snowflake', result.total_counts.snowflake_error), ('Redshift', result.total_counts.redshift_error)):
+            if error:
+                errors.append(f"Total en {warehouse}: {error}")
+        return result.total_counts, '; '.join(errors) or None
+
+    def records_by_date_stage():
+        stored_dates = stored(dates_check)
+        if stored_dates is not None:
+            result.snowflake_dates_df, result.redshift_dates_df = stored_dates
+            return True, None
+        errors = stage_errors.setdefault('records_by_date', [])
+        if not sampled_dates:
+            # Conteo exacto con una consulta agrupada por almacén; los días cerrados salen de la caché
+            counts = get_record_counts_by_date(table_name, date_column, start_date, end_date, on_wait=on_wait)
+            result.snowflake_dates_df, result.redshift_dates_df = counts.snowflake_df, counts.redshift_df
+            result.cached_days = counts.cached_days
+            for warehouse, error in (('Snowflake', counts.snowflake_error), ('Redshift', counts.redshift_error)):
+                if error:
+                    errors.append(f"Conteo por fecha en {warehouse}: {error}")
+            if not errors:
+                store(dates_check, (result.snowflake_dates_df, result.redshift_dates_df))
+            return True, '; '.join(errors) or None
+
+        # En el modo aproximado con muestreo los conteos por fecha se estiman con su cota de error
+        estimates = task_executor.run({
+            'snowflake': lambda: get_approx_record_count_by_date_snowflake(
+                table_name, date_column, start_date, end_date, approximate.sample_percent
+            ),
+            'redshift': lambda: get_approx_record_count_by_date_redshift(
+                table_name, date_column, start_date, end_date, approximate.sample_percent
+            ),
+        }, on_wait=on_wait)
+        (result.snowflake_dates_df, snowflake_error), (result.redshift_dates_df, redshift_error) = (
+            estimates['snowflake'], estimates['redshift']
+        )
+        for warehouse, error in (('Snowflake', snowflake_error), ('Redshift', redshift_error)):
+            if error:
+                errors.append(f"Conteo por fecha en {warehouse}: {error}")
+        if not errors:
+            store(dates_check, (result.snowflake_dates_df, result.redshift_dates_df))
+        return True, '; '.join(errors) or None
+
+    def frequent_data_stage():
+        # Datos más frecuentes de la última fecha del rango
+        result.frequent_data = stored(top_frequent_check(top_n, approximate))
+        if result.frequent_data is not None:
+            return True, None
+        result.frequent_data, error = get_frequent_data_for_report(
+            table_name, date_column, end_date, top_n=top_n, approximate=approximate, on_wait=on_wait
+        )
+        if error:
+            stage_errors['frequent_data'] = [f"Datos más frecuentes: {error}"]
+            return None, error
+        if all(data['comparison'] is not None for data in result.frequent_data.values()):
+            store(top_frequent_check(top_n, approximate), result.frequent_data)
+        return True, None
+
+    def column_fingerprint_stage():
+        # Huella estadística de las columnas del rango: una lectura de la tabla por almacén. Se
+        # guardan las huellas (no la comparación) para poder compararlas con otra tolerancia
+        fingerprints = stored(column_fingerprint_check(days))
+        if fingerprints is None:
+            fingerprint_snowflake, fingerprint_redshift, error = get_column_fingerprints(
+                table_name, date_column, start_date, end_date, on_wait=on_wait
+            )
+            if error:
+                stage_errors['column_fingerprint'] = [f"Huella de columnas: {error}"]
+                return None, error
+            fingerprints = (fingerprint_snowflake, fingerprint_redshift)
+            store(column_fingerprint_check(days), fingerprints)
+        result.column_fingerprint_df = compare_fingerprints(*fingerprints, tolerance=fingerprint_tolerance)
+        return True, None
+
+    def row_diff_stage():
+        # Conciliación de filas del rango
+        result.row_diff = stored(row_diff_check(days, key_columns))
+        if result.row_diff is None:
+            result.row_diff = reconcile_rows(table_name, date_column, start_date, end_date, key_columns, on_wait=on_wait)
+            if result.row_diff.error is None:
+                store(row_diff_check(days, key_columns), result.row_diff)
+        if result.row_diff.error:
+            stage_errors['row_diff'] = [f"Conciliación de filas: {result.row_diff.error}"]
+        return True, result.row_diff.error
+
+    # El perfil (existencia y catálogo) va primero: si la tabla falta en un almacén no se lanzan
+    # las etapas costosas. El resto es independiente entre sí y se ejecuta en paralelo
+    stages = [
+        Stage('profile', profile_stage),
+        Stage('total_counts', totals_stage, requires=('profile',)),
+        Stage('frequent_data', frequent_data_stage, requires=('profile',)),
+        Stage('row_diff', row_diff_stage, requires=('profile',)),
+        Stage('records_by_date', records_by_date_stage, requires=('profile',)),
+    ]
+    if not sampled_dates:
+        # La huella recorre todas las filas del rango: no se calcula en el modo con muestreo
+        stages.append(Stage('column_fingerprint', column_fingerprint_stage, requires=('profile',)))
+    outcomes = run_stages(stages, on_wait=on_wait)
+    result.stage_timings = stage_timings(outcomes)
+    for name, outcome in outcomes.items():
+        if name in stage_errors:
+            result.errors.extend(stage_errors[name])
+        elif outcome.status == 'error':
+            # Excepción no controlada dentro de la etapa
+            result.errors.append(f"Etapa {name}: {outcome.error}")
+
+    if result.snowflake_dates_df is not None and result.redshift_dates_df is not None:
+        result.dates_comparison_df = compare_counts_by_period(
+            result.snowflake_dates_df, result.redshift_dates_df, date_granularity
+        )
+        if approximate is None:
+            result.dates_comparison_df = result.dates_comparison_df.drop(columns='error_bound')
+
+    if result.columns_snowflake_df is not None and result.columns_redshift_df is not None:
+        result.column_differences = compare_column_catalogs(result.columns_snowflake_df, result.columns_redshift_df)
+    return result
+
+def write_report(result):
+    """Genera el informe PDF de una auditoría y guarda su ruta en el resultado."""
+    result.report_path = generate_audit_report(
+        table_name=result.table_name,
+        analysis_date=result.end_date.strftime("%Y-%m-%d"),
+        snowflake_exists=result.snowflake_exists,
+        redshift_exists=result.redshift_exists,
+        snowflake_total=result.total_counts.snowflake,
+        redshift_total=result.total_counts.redshift,
+        snowflake_dates_df=result.snowflake_dates_df,
+        redshift_dates_df=result.redshift_dates_df,
+        columns_snowflake_df=result.columns_snowflake_df,
+        columns_redshift_df=result.columns_redshift_df,
+        frequent_data=result.frequent_data,
+        row_diff=result.row_diff,
+        approximate=result.approximate,
+        totals_exact=result.total_counts.exact,
+        column_fingerprint=result.column_fingerprint_df,
+        start_date=result.start_date.strftime("%Y-%m-%d"),
+        date_granularity=result.date_granularity
+    )
+    return result.report_path
+
+
+def write_results_json(result, path):
+    """Escribe el resultado de la auditoría como JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+    return path
@@ -0,0 +1,167 @@
+# scripts/audit_store.py
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# Resultados de auditoría persistidos por (tabla, partición, comprobación) junto con la firma
+# de la partición en ambos almacenes (conteo de filas y máximo de la columna de fecha). Al
+# repetir una auditoría sólo se consultan las particiones cuya firma cambió o que nunca se
+# auditaron; el resto se toma de aquí.
+
+DEFAULT_STORE_PATH = os.getenv('AUDIT_STORE_PATH', os.path.join('audit_reports', 'audit_store.sqlite3'))
+# Particiones por consulta de get()
+MAX_QUERY_PARTITIONS = 500
+
+
+def partition_signatures(df_snowflake, df_redshift):
+    """
+    Combina las firmas por fecha de ambos almacenes.
+
+    Args:
+        df_snowflake (pd.DataFrame): partition_date, row_count y max_extracted de Snowflake.
+        df_redshift (pd.DataFrame): partition_date, row_count y max_extracted de Redshift.
+
+    Returns:
+        dict: Firma por fecha ('YYYY-MM-DD'); una fecha que falta en un almacén se marca con '-'.
+    """
+    def by_date(df):
+        df = df.rename(columns=lambda x: x.lower())
+        return {
+            str(row.partition_date): f"{int(row.row_count)}@{pd.Timestamp(row.max_extracted).isoformat()}"
+            for row in df.itertuples(index=False)
+        }
+
+    snowflake, redshift = by_date(df_snowflake), by_date(df_redshift)
+    return {
+        partition_date: f"{snowflake.get(partition_date, '-')}|{redshift.get(partition_date, '-')}"
+        for partition_date in sorted(set(snowflake) | set(redshift))
+    }
+
+
+class AuditStore:
+    """
+    Almacén SQLite de resultados de auditoría por partición.
+
+    Args:
+        path (str): Archivo SQLite; la carpeta se crea si no existe.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS audit_results (
+                    table_name TEXT NOT NULL,
+                    partition_date TEXT NOT NULL,
+                    check_name TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    audited_at TEXT NOT NULL,
+                    PRIMARY KEY (table_name, partition_date, check_name)
+                )
+            """)
+            self._initialized = True
+        return conn
+
+    def get(self, table_name, check_name, partition_dates):
+        """
+        Devuelve los resultados guardados de las particiones indicadas.
+
+        Returns:
+            dict: {partition_date: (firma, resultado)} de las particiones que tienen resultado.
+        """
+        partition_dates = list(partition_dates)
+        if not partition_dates:
+            return {}
+        rows = []
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = self._connect()
+            try:
+                # Por tramos: SQLite limita los parámetros por sentencia (ventanas de años de fechas)
+                for i in range(0, len(partition_dates), MAX_QUERY_PARTITIONS):
+                    chunk = partition_dates[i:i + MAX_QUERY_PARTITIONS]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    rows += conn.execute(
+                        f"""
+                        SELECT partition_date, signature, result FROM audit_results
+                        WHERE table_name = ? AND check_name = ? AND partition_date IN ({placeholders})
+                        """,
+                        [table_name.lower(), check_name, *chunk]
+                    ).fetchall()
+            finally:
+                conn.close()
+        return {partition_date: (signature, json.loads(result)) for partition_date, signature, result in rows}
+
+    def put(self, table_name, check_name, results):
+        """
+        Guarda o reemplaza resultados por partición.
+
+        Args:
+            results (dict): {partition_date: (firma, resultado)}; el resultado debe ser serializable a JSON.
+        """
+        if not results:
+            return
+        audited_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (table_name.lower(), partition_date, check_name, signature, json.dumps(result, default=str), audited_at)
+            for partition_date, (signature, result) in results.items()
+        ]
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO audit_results VALUES (?, ?, ?, ?, ?, ?)", rows)
+            finally:
+                conn.close()
+
+    def plan(self, table_name, check_name, signatures):
+        """
+        Separa las particiones que hay que volver a auditar de las que tienen un resultado vigente.
+
+        Args:
+            signatures (dict): Firma actual por partición (partition_signatures).
+
+        Returns:
+            tuple: (particiones a auditar, {partition_date: resultado guardado vigente}).
+        """
+        stored = self.get(table_name, check_name, signatures)
+        stale = [d for d, signature in signatures.items() if stored.get(d, (None, None))[0] != signature]
+        current = {d: result for d, (signature, result) in stored.items() if signatures.get(d) == signature}
+        return stale, current
+
+    def invalidate(self, table_name=None):
+        """
+        Elimina los resultados de una tabla (todos si no se indica).
+
+        Returns:
+            int: Número de resultados eliminados.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return 0
+            conn = self._connect()
+            try:
+                with conn:
+                    if table_name is None:
+                        cursor = conn.execute("DELETE FROM audit_results")
+                    else:
+                        cursor = conn.execute("DELETE FROM audit_results WHERE table_name = ?", [table_name.lower()])
+                return cursor.rowcount
+            finally:
+                conn.close()
+
+
+# Almacén compartido por todo el proceso
+audit_store = AuditStore()
@@ -0,0 +1,297 @@
+# scripts/campaign.py
+
+import concurrent.futures
+import contextvars
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from scripts.connection_pool import CheckoutLimit, limit_checkouts, pool_settings_from_env
+from scripts.snowflake_connection import snowflake_pool, get_schema_tables_snowflake
+from scripts.redshift_connection import redshift_pool, get_schema_tables_redshift
+from scripts.audit_pipeline import AuditResult, run_audit, write_report, write_results_json
+from scripts.column_fingerprint import COLUMN_FINGERPRINT_TOLERANCE
+from scripts.task_executor import task_executor
+
+# Campañas de auditoría: muchas tablas (una lista o un esquema completo) auditadas en paralelo por
+# un pool de trabajadores propio. No se usa el ejecutor compartido (scripts/task_executor.py):
+# cada trabajador pasa casi todo el tiempo esperando las consultas que su auditoría lanza en ese
+# ejecutor, y con tantas tablas como hilos lo dejaría ocupado esperando a sus propias tareas. Las
+# tablas más grandes empiezan primero para que no queden al final alargando la campaña. Los
+# límites de consultas simultáneas por almacén son propios de la campaña: cada campaña reparte
+# entre sus tablas unas plazas de los pools de conexiones de Snowflake y Redshift (CheckoutLimit),
+# con una espera larga para que las tablas esperen su turno en lugar de fallar. Los pools
+# compartidos no cambian, así que las demás sesiones y campañas siguen con sus propios límites.
+# Cada tabla produce su informe PDF y su JSON, y la campaña un resumen consolidado.
+
+CAMPAIGN_WORKERS = int(os.getenv('CAMPAIGN_WORKERS', 4))
+SNOWFLAKE_CAMPAIGN_CONCURRENCY = int(os.getenv(
+    'SNOWFLAKE_CAMPAIGN_CONCURRENCY', pool_settings_from_env('SNOWFLAKE')['max_size']
+))
+REDSHIFT_CAMPAIGN_CONCURRENCY = int(os.getenv(
+    'REDSHIFT_CAMPAIGN_CONCURRENCY', pool_settings_from_env('REDSHIFT')['max_size']
+))
+CAMPAIGN_POOL_TIMEOUT = float(os.getenv('CAMPAIGN_POOL_TIMEOUT', 3600))
+WAIT_INTERVAL = 0.5
+
+SUMMARY_COLUMNS = [
+    'table_name', 'date_column', 'size_rows', 'status', 'discrepancies', 'errors',
+    'snowflake_total', 'redshift_total', 'duration_s', 'report_path', 'json_path'
+]
+
+
+@dataclass
+class CampaignTable:
+    """
+    Tabla de una campaña.
+
+    Attributes:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Columna de fecha de la tabla.
+        size_rows (int): Filas según los metadatos (la mayor de ambos almacenes); None si se desconoce.
+    """
+    table_name: str
+    date_column: str
+    size_rows: Optional[int] = None
+
+
+@dataclass
+class CampaignEntry:
+    """Resultado de una tabla de la campaña."""
+    table: CampaignTable
+    result: Optional[AuditResult] = None
+    json_path: Optional[str] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def status(self):
+        """'error' si la auditoría no se completó, 'discrepancias' o 'ok'."""
+        if self.error or self.result is None or self.result.errors:
+            return 'error'
+        return 'discrepancias' if self.result.discrepancies else 'ok'
+
+
+def parse_campaign_tables(specs, default_date_column):
+    """
+    Convierte especificaciones 'schema.table' o 'schema.table:date_column' en CampaignTable.
+    Se ignoran las líneas vacías y las que empiezan por '#'.
+    """
+    tables = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec or spec.startswith('#'):
+            continue
+        table_name, _, date_column = spec.partition(':')
+        tables.append(CampaignTable(table_name.strip(), date_column.strip() or default_date_column))
+    return tables
+
+
+def _schema_sizes(schema_name, on_wait=None):
+    # Filas por tabla del esquema en ambos almacenes: {tabla en minúsculas: filas}
+    results = task_executor.run({
+        'snowflake': lambda: get_schema_tables_snowflake(schema_name),
+        'redshift': lambda: get_schema_tables_redshift(schema_name),
+    }, on_wait=on_wait)
+    sizes, errors = {}, []
+    for warehouse, (df, error) in results.items():
+        if df is None:
+            errors.append(f"{warehouse}: {error}")
+            continue
+        for row in df.itertuples(index=False):
+            rows = int(row.row_count) if pd.notna(row.row_count) else 0
+            sizes[row.table_name.lower()] = max(sizes.get(row.table_name.lower(), 0), rows)
+    return sizes, '; '.join(errors) or None
+
+
+def schema_tables(schema_name, date_column, on_wait=None):
+    """
+    Lista las tablas de un esquema presentes en cualquiera de los dos almacenes, con su tamaño.
+
+    Returns:
+        tuple: (lista de CampaignTable, error)
+    """
+    sizes, error = _schema_sizes(schema_name, on_wait)
+    if not sizes and error:
+        return [], error
+    tables = [CampaignTable(f"{schema_name}.{table}", date_column, rows) for table, rows in sorted(sizes.items())]
+    return tables, error
+
+
+def attach_sizes(tables, on_wait=None):
+    """Completa size_rows de las tablas que no lo tienen, con una consulta por esquema y almacén."""
+    by_schema = {}
+    for table in tables:
+        if table.size_rows is None and '.' in table.table_name:
+            schema_name, _, table_only = table.table_name.rpartition('.')
+            by_schema.setdefault(schema_name, []).append((table, table_only.lower()))
+    for schema_name, schema_members in by_schema.items():
+        sizes, _ = _schema_sizes(schema_name, on_wait)
+        for table, table_only in schema_members:
+            table.size_rows = sizes.get(table_only)
+    return tables
+
+
+def order_by_size(tables):
+    """Ordena las tablas de mayor a menor; las de tamaño desconocido van al final."""
+    return sorted(tables, key=lambda table: (table.size_rows is None, -(table.size_rows or 0)))
+
+
+def _audit_table(
+    limits, table, start_date, end_date, key_columns, top_n, approximate, exact_counts, fingerprint_tolerance,
+    date_granularity, output_dir, write_pdf
+):
+    entry = CampaignEntry(table=table)
+    started = time.monotonic()
+    try:
+        with limit_checkouts(limits):
+            entry.result = run_audit(
+                table.table_name, table.date_column, start_date, end_date, key_columns,
+                top_n=top_n, approximate=approximate, exact_counts=exact_counts,
+                fingerprint_tolerance=fingerprint_tolerance, date_granularity=date_granularity
+            )
+        if write_pdf:
+            try:
+                write_report(entry.result)
+            except Exception as e:
+                entry.result.errors.append(f"Informe PDF: {e}")
+        entry.json_path = write_results_json(entry.result, results_json_path(output_dir, table.table_name, end_date))
+    except Exception as e:
+        entry.error = str(e)
+    entry.duration = time.monotonic() - started
+    return entry
+
+
+def results_json_path(output_dir, table_name, end_date):
+    """Ruta del JSON de resultados de una tabla."""
+    os.makedirs(output_dir, exist_ok=True)
+    safe_table_name = table_name.replace('.', '_').replace(' ', '_')
+    creation_datetime = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(
+        output_dir, f"audit_result_{safe_table_name}_{end_date.strftime('%Y-%m-%d')}_{creation_datetime}.json"
+    )
+
+
+def run_campaign(
+    tables,
+    start_date,
+    end_date,
+    key_columns=None,
+    top_n=3,
+    approximate=None,
+    exact_counts=False,
+    fingerprint_tolerance=COLUMN_FINGERPRINT_TOLERANCE,
+    date_granularity='day',
+    workers=CAMPAIGN_WORKERS,
+    snowflake_concurrency=SNOWFLAKE_CAMPAIGN_CONCURRENCY,
+    redshift_concurrency=REDSHIFT_CAMPAIGN_CONCURRENCY,
+    output_dir='audit_reports',
+    write_pdf=True,
+    on_wait=None
+):
+    """
+    Audita las tablas en paralelo, de mayor a menor tamaño.
+
+    Args:
+        tables (list): CampaignTable a auditar.
+        start_date (datetime.date): Primera fecha del rango.
+        end_date (datetime.date): Última fecha del rango.
+        key_columns (list): Columnas clave comunes a todas las tablas (normalmente None).
+        top_n (int): Datos más frecuentes por columna.
+        approximate (ApproximateSettings): Modo aproximado; None para el modo exacto.
+        exact_counts (bool): Si los totales se cuentan siempre con COUNT(*).
+        fingerprint_tolerance (float): Tolerancia relativa de la huella de las columnas.
+        date_granularity (str): Agrupación de la comparación por fecha: 'day', 'week' o 'month'.
+        workers (int): Tablas que se auditan a la vez.
+        snowflake_concurrency (int): Consultas simultáneas máximas de la campaña en Snowflake.
+        redshift_concurrency (int): Consultas simultáneas máximas de la campaña en Redshift.
+        output_dir (str): Carpeta de los JSON de resultados.
+        write_pdf (bool): Si se genera el informe PDF de cada tabla.
+        on_wait (callable): Se llama periódicamente mientras se espera.
+
+    Yields:
+        CampaignEntry: Resultado de cada tabla a medida que termina.
+    """
+    tables = order_by_size(tables)
+    # Plazas propias de la campaña en los pools compartidos; el pool sigue limitando el total
+    limits = {
+        snowflake_pool: CheckoutLimit(max(1, snowflake_concurrency), CAMPAIGN_POOL_TIMEOUT),
+        redshift_pool: CheckoutLimit(max(1, redshift_concurrency), CAMPAIGN_POOL_TIMEOUT),
+    }
+    # Pool propio de trabajadores (ver arriba): sus hilos sólo esperan; las consultas van por el
+    # ejecutor compartido con las plazas de la campaña
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='audit-campaign')
+    try:
+        # Cada hilo recibe una copia del contexto para heredar la sesión de las consultas
+        pending = {
+            executor.submit(
+                contextvars.copy_context().run, _audit_table, limits, table, start_date, end_date, key_columns,
+                top_n, approximate, exact_counts, fingerprint_tolerance, date_granularity, output_dir, write_pdf
+            )
+            for table in tables
+        }
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=WAIT_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+            if pending and on_wait is not None:
+                on_wait()
+    finally:
+        # Las auditorías en curso terminan con sus plazas; no hay nada que restaurar
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summary_frame(entries):
+    """Resumen consolidado de la campaña: una fila por tabla."""
+    rows = []
+    for entry in entries:
+        result = entry.result
+        rows.append({
+            'table_name': entry.table.table_name,
+            'date_column': entry.table.date_column,
+            'size_rows': entry.table.size_rows,
+            'status': entry.status,
+            'discrepancies': len(result.discrepancies) if result else None,
+            'errors': len(result.errors) if result else 1,
+            'snowflake_total': result.total_counts.snowflake if result else None,
+            'redshift_total': result.total_counts.redshift if result else None,
+            'duration_s': round(entry.duration, 1),
+            'report_path': result.report_path if result else None,
+            'json_path': entry.json_path,
+        })
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def write_campaign_summary(entries, output_dir='audit_reports'):
+    """
+    Escribe el resumen de la campaña en CSV y JSON (este último con las discrepancias y errores
+    de cada tabla).
+
+    Returns:
+        tuple: (ruta del CSV, ruta del JSON)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    creation_datetime = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path = os.path.join(output_dir, f"campaign_summary_{creation_datetime}.csv")
+    json_path = os.path.join(output_dir, f"campaign_summary_{creation_datetime}.json")
+    summary_frame(entries).to_csv(csv_path, index=False)
+    details = [
+        {
+            'table_name': entry.table.table_name,
+            'status': entry.status,
+            'discrepancies': entry.result.discrepancies if entry.result else [],
+            'errors': entry.result.errors if entry.result else [entry.error],
+            'json_path': entry.json_path,
+        }
+        for entry in entries
+    ]
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(details, f, ensure_ascii=False, indent=2, default=str)
+    return csv_path, json_path
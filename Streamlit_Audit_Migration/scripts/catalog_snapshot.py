@@ -0,0 +1,144 @@
+# scripts/catalog_snapshot.py
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Instantánea del catálogo de columnas de un esquema completo por almacén: una sola consulta
+# carga las columnas de todas sus tablas y se indexan en memoria por nombre de tabla normalizado.
+# Cada CATALOG_CHECK_INTERVAL segundos se consulta una firma barata del catálogo (LAST_ALTERED de
+# las tablas en Snowflake, pg_class/pg_attribute en Redshift) y el esquema sólo se vuelve a cargar
+# si la firma cambió. Las funciones de consulta se inyectan desde los módulos de conexión.
+
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 60))
+
+CATALOG_COLUMNS = ['column_name', 'data_type']
+MISMATCH_COLUMNS = ['Columna', 'Tipo en Snowflake', 'Tipo en Redshift']
+
+
+def compare_column_catalogs(columns_snowflake_df, columns_redshift_df):
+    """
+    Compara los catálogos de columnas de ambos almacenes sin distinguir mayúsculas, con un
+    único merge de ambos catálogos.
+
+    Returns:
+        dict: only_in_snowflake y only_in_redshift (listas ordenadas) y type_mismatches
+        (DataFrame con Columna, Tipo en Snowflake y Tipo en Redshift).
+    """
+    def normalize(df, warehouse):
+        return pd.DataFrame({
+            'Columna': df['column_name'].astype(str).str.upper(),
+            f'Tipo en {warehouse}': df['data_type'].astype(str).str.lower(),
+        }).drop_duplicates('Columna')
+
+    merged = pd.merge(
+        normalize(columns_snowflake_df, 'Snowflake'), normalize(columns_redshift_df, 'Redshift'),
+        on='Columna', how='outer', indicator=True
+    ).sort_values('Columna')
+    both = merged[merged['_merge'] == 'both']
+    return {
+        'only_in_snowflake': merged.loc[merged['_merge'] == 'left_only', 'Columna'].tolist(),
+        'only_in_redshift': merged.loc[merged['_merge'] == 'right_only', 'Columna'].tolist(),
+        'type_mismatches': both.loc[
+            both['Tipo en Snowflake'] != both['Tipo en Redshift'], MISMATCH_COLUMNS
+        ].reset_index(drop=True),
+    }
+
+
+class _Snapshot:
+    def __init__(self, signature, tables):
+        self.signature = signature
+        self.tables = tables
+        self.checked_at = time.monotonic()
+
+
+class CatalogSnapshots:
+    """
+    Instantáneas del catálogo de columnas por esquema de un almacén.
+
+    Args:
+        load_columns (callable): load_columns(schema) -> (DataFrame con table_name, column_name y data_type, error).
+        load_signature (callable): load_signature(schema) -> (firma del catálogo, error).
+        parse_table_name (callable): Separa un nombre completo en (esquema, tabla).
+        check_interval (float): Segundos durante los que una instantánea se usa sin comprobar su firma.
+    """
+
+    def __init__(self, load_columns, load_signature, parse_table_name, check_interval=CATALOG_CHECK_INTERVAL):
+        self.load_columns = load_columns
+        self.load_signature = load_signature
+        self.parse_table_name = parse_table_name
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._schema_locks = {}
+        self._snapshots = {}
+
+    def columns(self, table_name):
+        """
+        Columnas de una tabla según la instantánea de su esquema.
+
+        Returns:
+            tuple: (DataFrame con column_name y data_type, vacío si la tabla no existe; error)
+        """
+        try:
+            schema_name, table_name_only = self.parse_table_name(table_name)
+        except ValueError as e:
+            return None, str(e)
+        if not schema_name:
+            return None, "No se indicó el esquema de la tabla"
+        snapshot, error = self._snapshot(schema_name)
+        if snapshot is None:
+            return None, error
+        df = snapshot.tables.get(table_name_only.lower())
+        if df is None:
+            return pd.DataFrame(columns=CATALOG_COLUMNS), None
+        # Las páginas modifican los DataFrame que reciben; se entregan copias
+        return df.copy(), None
+
+    def _schema_lock(self, key):
+        with self._lock:
+            return self._schema_locks.setdefault(key, threading.Lock())
+
+    def _snapshot(self, schema_name):
+        key = schema_name.lower()
+        # Un solo hilo por esquema consulta el almacén; los demás esperan su resultado
+        with self._schema_lock(key):
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and time.monotonic() - snapshot.checked_at < self.check_interval:
+                return snapshot, None
+
+            signature, error = self.load_signature(schema_name)
+            if error:
+                # Sin firma se sigue usando la instantánea que haya; se comprobará en la próxima llamada
+                return (snapshot, None) if snapshot is not None else (None, error)
+            if snapshot is not None and snapshot.signature == signature:
+                snapshot.checked_at = time.monotonic()
+                return snapshot, None
+
+            df, error = self.load_columns(schema_name)
+            if df is None:
+                return None, error
+            tables = {
+                table: group[CATALOG_COLUMNS].reset_index(drop=True)
+                for table, group in df.groupby(df['table_name'].str.lower(), sort=False)
+            }
+            snapshot = _Snapshot(signature, tables)
+            self._snapshots[key] = snapshot
+            return snapshot, None
+
+    def invalidate(self, table_name=None):
+        """Descarta la instantánea del esquema de la tabla (o todas); devuelve cuántas se descartaron."""
+        with self._lock:
+            if table_name is None:
+                removed = len(self._snapshots)
+                self._snapshots.clear()
+                return removed
+        try:
+            schema_name, _ = self.parse_table_name(table_name)
+        except ValueError:
+            return 0
+        if not schema_name:
+            return 0
+        with self._lock:
+            return 1 if self._snapshots.pop(schema_name.lower(), None) is not None else 0
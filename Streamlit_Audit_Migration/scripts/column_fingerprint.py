@@ -0,0 +1,157 @@
+# scripts/column_fingerprint.py
+
+import math
+import os
+
+import pandas as pd
+
+from scripts.approximate_profile import CONFIDENCE_Z, DISTINCT_RELATIVE_ERROR, is_numeric_type
+
+# Huella estadística de las columnas: en una sola lectura de la tabla por almacén (restringida a
+# la fecha de muestreo o a un rango de fechas) se calculan para cada columna los nulos, mínimo y
+# máximo, la suma de las numéricas, la longitud total de los textos, los verdaderos de las
+# booleanas y los valores distintos aproximados (HyperLogLog). Si las huellas coinciden hay una
+# evidencia sólida de que el contenido es el mismo, por el coste de un recorrido de la tabla.
+
+COLUMN_FINGERPRINT_TOLERANCE = float(os.getenv('COLUMN_FINGERPRINT_TOLERANCE', 1e-6))
+
+FINGERPRINT_COLUMNS = ['column_name', 'statistic', 'value']
+COMPARISON_COLUMNS = ['column_name', 'statistic', 'value_snowflake', 'value_redshift', 'tolerance', 'match']
+
+# Estadísticas que son conteos exactos: deben coincidir sin tolerancia
+EXACT_STATISTICS = ('row_count', 'nulls', 'total_length', 'true_count')
+# Estadísticas numéricas que se comparan con la tolerancia relativa (sumas en coma flotante)
+TOLERANT_STATISTICS = ('sum', 'min', 'max')
+
+
+def column_kind(data_type):
+    """Clasifica un tipo de datos: 'boolean', 'temporal', 'numeric', 'string' u 'other'."""
+    data_type = (data_type or '').lower()
+    if 'bool' in data_type:
+        return 'boolean'
+    if 'date' in data_type or 'time' in data_type:
+        return 'temporal'
+    if is_numeric_type(data_type):
+        return 'numeric'
+    if any(name in data_type for name in ('char', 'text', 'string')):
+        return 'string'
+    return 'other'
+
+
+def fingerprint_query(table_name, date_column, start_date, end_date, columns, data_types, warehouse):
+    """
+    Construye la consulta de la huella de las columnas: una única fila con todos los agregados.
+
+    Args:
+        columns (list): Columnas a analizar.
+        data_types (dict): Tipo de datos por nombre de columna en minúsculas.
+        warehouse (str): 'snowflake' o 'redshift'.
+
+    Returns:
+        tuple: (consulta, lista de (columna, estadística) en el orden de la fila resultante;
+        la primera es (None, 'row_count')).
+    """
+    specs = [(None, 'row_count')]
+    expressions = ["COUNT(*)"]
+    for column in columns:
+        kind = column_kind(data_types.get(column.lower()))
+        column_expressions = [('nulls', f"COUNT(*) - COUNT({column})")]
+        if kind in ('numeric', 'string', 'temporal'):
+            column_expressions += [('min', f"MIN({column})"), ('max', f"MAX({column})")]
+        if kind == 'numeric':
+            column_expressions.append(('sum', f"SUM(CAST({column} AS DOUBLE PRECISION))"))
+        elif kind == 'string':
+            column_expressions.append(('total_length', f"SUM(LENGTH({column}))"))
+        elif kind == 'boolean':
+            column_expressions.append(('true_count', f"SUM(CASE WHEN {column} THEN 1 ELSE 0 END)"))
+        if kind != 'other':
+            distinct = (
+                f"APPROXIMATE COUNT(DISTINCT {column})" if warehouse == 'redshift'
+                else f"APPROX_COUNT_DISTINCT({column})"
+            )
+            column_expressions.append(('distinct', distinct))
+        for statistic, expression in column_expressions:
+            specs.append((column, statistic))
+            expressions.append(expression)
+
+    select_list = ",\n            ".join(f"{expression} AS s{i}" for i, expression in enumerate(expressions))
+    query = f"""
+        SELECT
+            {select_list}
+        FROM {table_name}
+        WHERE DATE({date_column}) BETWEEN '{start_date.strftime('%Y-%m-%d')}' AND '{end_date.strftime('%Y-%m-%d')}'
+    """
+    return query, specs
+
+
+def parse_fingerprint(row, specs):
+    """
+    Convierte la fila de fingerprint_query en un DataFrame largo (column_name, statistic, value).
+    Los valores se guardan como texto para comparar tipos distintos entre almacenes.
+    """
+    records = []
+    for (column, statistic), value in zip(specs, row):
+        records.append({
+            'column_name': column.lower() if column else '*',
+            'statistic': statistic,
+            'value': None if value is None else str(value),
+        })
+    return pd.DataFrame(records, columns=FINGERPRINT_COLUMNS)
+
+
+def _values_match(statistic, snowflake_value, redshift_value, tolerance):
+    if snowflake_value is None or redshift_value is None:
+        return snowflake_value is None and redshift_value is None
+    try:
+        a, b = float(snowflake_value), float(redshift_value)
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+    except ValueError:
+        # Fechas y textos: se comparan como marcas de tiempo si se puede y, si no, como texto
+        try:
+            return pd.Timestamp(snowflake_value) == pd.Timestamp(redshift_value)
+        except (ValueError, TypeError):
+            return snowflake_value.strip() == redshift_value.strip()
+    if statistic == 'distinct':
+        bound = CONFIDENCE_Z * (DISTINCT_RELATIVE_ERROR['snowflake'] * a + DISTINCT_RELATIVE_ERROR['redshift'] * b)
+        return abs(a - b) <= math.ceil(bound)
+    if statistic in EXACT_STATISTICS:
+        return a == b
+    return abs(a - b) <= tolerance * max(abs(a), abs(b))
+
+
+def compare_fingerprints(fingerprint_snowflake, fingerprint_redshift, tolerance=COLUMN_FINGERPRINT_TOLERANCE):
+    """
+    Compara las huellas de ambos almacenes estadística por estadística.
+
+    Los conteos (filas, nulos, longitud total, verdaderos) deben ser idénticos; mínimos, máximos
+    y sumas numéricos coinciden si su diferencia relativa no supera `tolerance`, y los valores
+    distintos aproximados, si la diferencia no supera la cota de error de HyperLogLog.
+
+    Returns:
+        pd.DataFrame: column_name, statistic, value_snowflake, value_redshift, tolerance y match.
+    """
+    comparison_df = pd.merge(
+        fingerprint_snowflake, fingerprint_redshift, on=['column_name', 'statistic'],
+        how='outer', suffixes=('_snowflake', '_redshift'), sort=False, indicator=True
+    )
+    comparison_df = comparison_df.astype({'value_snowflake': object, 'value_redshift': object})
+    comparison_df = comparison_df.where(comparison_df.notna(), None)
+    comparison_df['tolerance'] = comparison_df['statistic'].map(
+        lambda statistic: 'HyperLogLog' if statistic == 'distinct'
+        else (f"{tolerance:g}" if statistic in TOLERANT_STATISTICS else 'exacta')
+    )
+    # Una estadística que sólo calcula un almacén (tipos de datos distintos) no coincide
+    comparison_df['match'] = [
+        present == 'both' and _values_match(statistic, snowflake_value, redshift_value, tolerance)
+        for statistic, snowflake_value, redshift_value, present in zip(
+            comparison_df['statistic'], comparison_df['value_snowflake'], comparison_df['value_redshift'],
+            comparison_df['_merge']
+        )
+    ]
+    return comparison_df[COMPARISON_COLUMNS]
+
+
+def mismatched_columns(comparison_df):
+    """Columnas con alguna estadística distinta, en el orden del resultado."""
+    return list(dict.fromkeys(comparison_df.loc[~comparison_df['match'], 'column_name']))
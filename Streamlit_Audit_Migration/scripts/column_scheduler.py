@@ -0,0 +1,212 @@
+# scripts/column_scheduler.py
+
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+
+from scripts.connection_pool import pool_settings_from_env
+from scripts.query_control import CancelScope
+from scripts.task_executor import task_executor
+
+# Planificador de consultas por columna: las consultas de todas las columnas se lanzan a la vez,
+# con un límite de consultas simultáneas independiente para cada almacén (por defecto, el tamaño
+# máximo de su pool de conexiones) y un tiempo límite por columna. Las consultas se ejecutan en el
+# ejecutor compartido (scripts/task_executor.py): cada almacén sólo envía una consulta nueva cuando
+# termina una de las suyas, de modo que las que esperan turno no ocupan hilos del pool. Los
+# resultados se entregan en el orden de las columnas a medida que cada par Snowflake/Redshift está listo.
+
+SNOWFLAKE_COLUMN_CONCURRENCY = int(os.getenv(
+    'SNOWFLAKE_COLUMN_CONCURRENCY', pool_settings_from_env('SNOWFLAKE')['max_size']
+))
+REDSHIFT_COLUMN_CONCURRENCY = int(os.getenv(
+    'REDSHIFT_COLUMN_CONCURRENCY', pool_settings_from_env('REDSHIFT')['max_size']
+))
+COLUMN_TIMEOUT = float(os.getenv('COLUMN_TIMEOUT', 300))
+WAIT_INTERVAL = 0.5
+
+
+class _ColumnTask:
+    """Consultas de una columna: una por almacén, cada una con su ámbito de cancelación."""
+
+    def __init__(self, column):
+        self.column = column
+        self.scopes = [CancelScope(), CancelScope()]
+        # Un futuro por almacén desde el principio; se resuelve cuando la consulta se ejecuta
+        self.futures = [concurrent.futures.Future(), concurrent.futures.Future()]
+        self.started_at = None
+        self.timed_out = False
+
+    def cancel(self):
+        for scope in self.scopes:
+            scope.cancel()
+
+
+class ColumnScheduler:
+    """
+    Ejecuta las consultas por columna de ambos almacenes con concurrencia limitada.
+
+    Args:
+        snowflake_concurrency (int): Consultas simultáneas máximas en Snowflake.
+        redshift_concurrency (int): Consultas simultáneas máximas en Redshift.
+        column_timeout (float): Segundos que puede tardar una columna desde que empieza
+            su primera consulta; 0 o None para no limitarlo.
+    """
+
+    def __init__(
+        self,
+        snowflake_concurrency=SNOWFLAKE_COLUMN_CONCURRENCY,
+        redshift_concurrency=REDSHIFT_COLUMN_CONCURRENCY,
+        column_timeout=COLUMN_TIMEOUT
+    ):
+        self.snowflake_concurrency = max(1, snowflake_concurrency)
+        self.redshift_concurrency = max(1, redshift_concurrency)
+        self.column_timeout = column_timeout or None
+        self._lock = threading.Lock()
+
+    def run(self, columns, snowflake_task, redshift_task, on_wait=None):
+        """
+        Lanza las consultas de todas las columnas y entrega sus resultados en orden.
+
+        Args:
+            columns (list): Columnas a analizar.
+            snowflake_task (callable): Recibe la columna y devuelve (resultado, error) de Snowflake.
+            redshift_task (callable): Recibe la columna y devuelve (resultado, error) de Redshift.
+            on_wait (callable): Se llama periódicamente mientras se espera, p. ej. para que
+                Streamlit pueda interrumpir la ejecución.
+
+        Yields:
+            tuple: (columna, [(resultado_snowflake, error), (resultado_redshift, error)]).
+        """
+        tasks = [_ColumnTask(column) for column in columns]
+        dispatcher = _Dispatcher(
+            tasks, (snowflake_task, redshift_task), (self.snowflake_concurrency, self.redshift_concurrency), self._run
+        )
+        try:
+            dispatcher.start()
+            for task in tasks:
+                while not self._wait(task):
+                    self._expire(tasks)
+                    if on_wait is not None:
+                        on_wait()
+                yield task.column, self._results(task)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            dispatcher.stop()
+
+    def _run(self, task, index, func):
+        with self._lock:
+            if task.started_at is None:
+                task.started_at = time.monotonic()
+            timed_out = task.timed_out
+        if timed_out:
+            return None, self._timeout_message(task)
+        with task.scopes[index]:
+            return func(task.column)
+
+    def _wait(self, task):
+        # True cuando la columna terminó o superó su tiempo límite
+        if task.timed_out:
+            return True
+        _, pending = concurrent.futures.wait(task.futures, timeout=WAIT_INTERVAL)
+        return not pending or task.timed_out
+
+    def _expire(self, tasks):
+        # Cancelar las columnas en curso que superaron su tiempo límite
+        if self.column_timeout is None:
+            return
+        now = time.monotonic()
+        for task in tasks:
+            with self._lock:
+                expired = (
+                    not task.timed_out
+                    and task.started_at is not None
+                    and now - task.started_at > self.column_timeout
+                    and not all(future.done() for future in task.futures)
+                )
+                if expired:
+                    task.timed_out = True
+            if expired:
+                task.cancel()
+
+    def _results(self, task):
+        results = []
+        for future in task.futures:
+            if future.done() and not future.cancelled():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = (None, str(e))
+                if task.timed_out and result[1]:
+                    result = (None, self._timeout_message(task))
+            else:
+                result = (None, self._timeout_message(task))
+            results.append(result)
+        return results
+
+    def _timeout_message(self, task):
+        return f"La columna {task.column} superó el tiempo límite de {self.column_timeout:.0f} s"
+
+
+class _Dispatcher:
+    """
+    Envía al ejecutor compartido las consultas de cada almacén sin superar su límite de
+    consultas simultáneas: al terminar una consulta se envía la siguiente de ese almacén.
+    """
+
+    def __init__(self, tasks, funcs, limits, run):
+        self._queues = [deque(tasks) for _ in funcs]
+        self._funcs = funcs
+        self._limits = limits
+        self._running = [0] * len(funcs)
+        self._run = run
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        for index in range(len(self._funcs)):
+            for _ in range(self._limits[index]):
+                self._dispatch(index)
+
+    def stop(self):
+        """No envía más consultas y cancela las que aún esperaban turno."""
+        with self._lock:
+            self._stopped = True
+            queued = [(task, index) for index, queue in enumerate(self._queues) for task in queue]
+            for queue in self._queues:
+                queue.clear()
+        for task, index in queued:
+            task.futures[index].cancel()
+
+    def _dispatch(self, index):
+        with self._lock:
+            if self._stopped or not self._queues[index] or self._running[index] >= self._limits[index]:
+                return
+            task = self._queues[index].popleft()
+            self._running[index] += 1
+        # El ejecutor compartido pasa a cada hilo una copia del contexto (sesión y sección)
+        name = f"{getattr(self._funcs[index], '__name__', 'task')}({task.column})"
+        task_executor.submit(self._execute, task, index, name=name)
+
+    def _execute(self, task, index):
+        future = task.futures[index]
+        try:
+            if self._stopped:
+                future.cancel()
+            if future.set_running_or_notify_cancel():
+                # El resultado se devuelve también para el estado de la medición de la tarea
+                try:
+                    result = self._run(task, index, self._funcs[index])
+                except BaseException as e:
+                    future.set_exception(e)
+                    return None, str(e)
+                future.set_result(result)
+                return result
+        finally:
+            with self._lock:
+                self._running[index] -= 1
+            self._dispatch(index)
@@ -0,0 +1,352 @@
+# scripts/connection_pool.py
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Se lanza cuando no se obtiene una conexión del pool dentro del tiempo de espera."""
+
+
+class CheckoutLimit:
+    """
+    Límite propio de un grupo de consultas (por ejemplo, una campaña) sobre un pool compartido:
+    conexiones que el grupo puede tener en uso a la vez y espera máxima de sus peticiones. No
+    cambia el pool, así que el resto de consultas del proceso siguen con sus límites normales.
+    Se activa para el contexto actual con limit_checkouts().
+    """
+
+    def __init__(self, max_size, timeout=None):
+        if max_size < 1:
+            raise ValueError("max_size debe ser mayor o igual a 1")
+        self.max_size = max_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self, pool_name, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeoutError(
+                f"No hay conexiones disponibles en el pool {pool_name} para este grupo tras {timeout} s"
+            )
+
+    def release(self):
+        self._slots.release()
+
+
+# Límites activos en el contexto: {pool: CheckoutLimit}. Los hilos del ejecutor de tareas y las
+# corrutinas reciben una copia del contexto, así que el límite sigue a todas las consultas del grupo
+_checkout_limits = contextvars.ContextVar('checkout_limits', default={})
+
+
+@contextmanager
+def limit_checkouts(limits):
+    """
+    Aplica límites propios a las conexiones obtenidas en el contexto actual.
+
+    Args:
+        limits (dict): CheckoutLimit por pool.
+    """
+    token = _checkout_limits.set({**_checkout_limits.get(), **limits})
+    try:
+        yield
+    finally:
+        _checkout_limits.reset(token)
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión obtenida del pool.
+
+    Delega todos los atributos en la conexión real, pero close() devuelve la
+    conexión al pool en lugar de cerrarla. Así las funciones existentes que
+    hacen conn.close() en su bloque finally siguen funcionando sin cambios.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def raw_connection(self):
+        """Conexión real del driver (snowflake.connector o psycopg2)."""
+        return self._conn
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones reutilizables para un almacén de datos, compartido por todo el proceso.
+
+    - min_size: conexiones ociosas que se conservan aunque superen max_idle.
+    - max_size: número máximo de conexiones abiertas (ociosas + en uso).
+    - max_idle: segundos que una conexión puede estar ociosa antes de cerrarse.
+    - health_check_interval: si la conexión estuvo ociosa más de estos segundos
+      se valida con `ping` antes de entregarla.
+    - timeout: segundos máximos de espera cuando el pool está lleno.
+
+    La entrega es por hilo: si un hilo ya tiene una conexión del pool, las
+    llamadas anidadas a acquire() reciben la misma conexión, y sólo vuelve al
+    pool cuando se liberan todas. Los titulares se registran por conexión bajo
+    el cerrojo del pool, de modo que liberar desde otro hilo también deja de
+    asociar la conexión al hilo que la obtuvo.
+
+    Si el contexto tiene un CheckoutLimit para el pool (limit_checkouts()), cada conexión
+    entregada ocupa además una plaza de ese límite hasta que se devuelve.
+    """
+
+    def __init__(self, factory, name="pool", min_size=0, max_size=8, max_idle=300,
+                 health_check_interval=30, timeout=60, is_closed=None, ping=None, reset=None):
+        if max_size < 1:
+            raise ValueError("max_size debe ser mayor o igual a 1")
+        self.name = name
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._factory = factory
+        self._is_closed = is_closed or (lambda conn: False)
+        self._ping = ping
+        self._reset = reset
+        self._idle = deque()  # (conexión, instante de la última liberación)
+        self._size = 0
+        self._cond = threading.Condition()
+        self._holders = {}  # id(conexión) -> [hilo titular, nivel de anidamiento, CheckoutLimit]
+        self._held_by = {}  # hilo -> conexión que tiene en uso
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'evicted': 0,
+            'failed_health_checks': 0,
+        }
+
+    def acquire(self, timeout=None):
+        """
+        Obtiene una conexión del pool.
+
+        Returns:
+            PooledConnection: Conexión envuelta; close() la devuelve al pool.
+        """
+        owner = threading.get_ident()
+        with self._cond:
+            conn = self._held_by.get(owner)
+            if conn is not None:
+                self._holders[id(conn)][1] += 1
+                self._stats['hits'] += 1
+                return PooledConnection(self, conn)
+
+        limit = _checkout_limits.get().get(self)
+        if timeout is None:
+            timeout = limit.timeout if limit is not None and limit.timeout is not None else self.timeout
+        start = time.monotonic()
+        if limit is not None:
+            limit.acquire(self.name, timeout)
+        try:
+            conn = self._checkout(start, timeout)
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+
+        with self._cond:
+            self._holders[id(conn)] = [owner, 1, limit]
+            self._held_by[owner] = conn
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (la llama PooledConnection.close()), desde cualquier hilo."""
+        limit = None
+        with self._cond:
+            holder = self._holders.get(id(conn))
+            if holder is not None:
+                holder[1] -= 1
+                if holder[1] > 0:
+                    return
+                del self._holders[id(conn)]
+                if self._held_by.get(holder[0]) is conn:
+                    del self._held_by[holder[0]]
+                limit = holder[2]
+
+        try:
+            try:
+                if self._is_closed(conn):
+                    raise ConnectionError("conexión cerrada")
+                if self._reset is not None:
+                    self._reset(conn)
+            except Exception:
+                self._discard(conn)
+                return
+
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        finally:
+            if limit is not None:
+                limit.release()
+
+    def warm_up(self):
+        """Abre conexiones hasta alcanzar min_size."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas del pool."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """
+        Devuelve una copia de los contadores del pool.
+
+        Returns:
+            dict: hits, misses, waits, wait_time_total, wait_time_max, evicted,
+            failed_health_checks, size, idle e in_use.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+        return stats
+
+    def _checkout(self, start, timeout):
+        waited = False
+        while True:
+            conn, last_used = None, None
+            evicted = []
+            try:
+                with self._cond:
+                    while True:
+                        evicted.extend(self._evict_idle_locked())
+                        if self._idle:
+                            conn, last_used = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            break
+                        remaining = timeout - (time.monotonic() - start)
+                        if remaining <= 0:
+                            raise PoolTimeoutError(
+                                f"No hay conexiones disponibles en el pool {self.name} tras {timeout} s"
+                            )
+                        waited = True
+                        self._cond.wait(remaining)
+            finally:
+                # Las conexiones caducadas se cierran fuera del cerrojo
+                for evicted_conn in evicted:
+                    self._close_quietly(evicted_conn)
+
+            if conn is None:
+                try:
+                    conn = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                self._record_checkout(hit=False, waited=waited, start=start)
+                break
+
+            if self._is_healthy(conn, last_used):
+                self._record_checkout(hit=True, waited=waited, start=start)
+                break
+            self._discard(conn)
+            with self._cond:
+                self._stats['failed_health_checks'] += 1
+        return conn
+
+    def _record_checkout(self, hit, waited, start):
+        wait_time = time.monotonic() - start if waited else 0.0
+        with self._cond:
+            self._stats['hits' if hit else 'misses'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+    def _is_healthy(self, conn, last_used):
+        try:
+            if self._is_closed(conn):
+                return False
+            if self._ping is not None and time.monotonic() - last_used > self.health_check_interval:
+                self._ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self):
+        # Las conexiones más antiguas están al principio de la cola; se devuelven para
+        # cerrarlas después de soltar el cerrojo
+        now = time.monotonic()
+        evicted = []
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            evicted.append(conn)
+        return evicted
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def pool_settings_from_env(prefix):
+    """
+    Lee la configuración de un pool desde variables de entorno con el prefijo dado,
+    por ejemplo SNOWFLAKE_POOL_MAX_SIZE o REDSHIFT_POOL_MAX_IDLE.
+    """
+    return {
+        'min_size': int(os.getenv(f'{prefix}_POOL_MIN_SIZE', 0)),
+        'max_size': int(os.getenv(f'{prefix}_POOL_MAX_SIZE', 8)),
+        'max_idle': float(os.getenv(f'{prefix}_POOL_MAX_IDLE', 300)),
+        'health_check_interval': float(os.getenv(f'{prefix}_POOL_HEALTH_CHECK_INTERVAL', 30)),
+        'timeout': float(os.getenv(f'{prefix}_POOL_TIMEOUT', 60)),
+    }
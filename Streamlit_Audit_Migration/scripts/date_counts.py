@@ -0,0 +1,112 @@
+# scripts/date_counts.py
+
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+from scripts.audit_store import audit_store
+from scripts.approximate_profile import compare_with_bounds
+
+# Conteo de registros por fecha de una ventana arbitraria (hasta años de historia) con una única
+# consulta agrupada por día en cada almacén. Los días anteriores al periodo de asentamiento
+# (DATE_COUNT_SETTLE_DAYS días antes de hoy) se consideran cerrados: su conteo se guarda en el
+# almacén de auditorías y no se vuelve a consultar. Sólo se consulta el tramo de días que falta,
+# de modo que una ventana de años cuesta, tras la primera vez, lo mismo que los últimos días.
+# La agrupación por semana o mes se hace aquí sumando los días. Las consultas se inyectan desde
+# scripts/record_counts.py.
+
+DATE_COUNT_SETTLE_DAYS = int(os.getenv('DATE_COUNT_SETTLE_DAYS', 3))
+
+# Agrupaciones disponibles y su nombre para mostrar
+GRANULARITIES = {'day': 'Día', 'week': 'Semana', 'month': 'Mes'}
+
+def closed_until(today=None, settle_days=DATE_COUNT_SETTLE_DAYS):
+    """Último día cerrado: sus filas ya no cambian y su conteo se puede guardar."""
+    return (today or date.today()) - timedelta(days=settle_days + 1)
+
+
+def period_start(day, granularity):
+    """Primer día del periodo (día, semana ISO que empieza en lunes o mes) que contiene `day`."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _check_name(date_column, warehouse):
+    return f"closed_day_count:{date_column.lower()}:{warehouse}"
+
+
+def daily_counts(table_name, date_column, start_date, end_date, warehouse, load, store=audit_store, today=None,
+                 settle_days=DATE_COUNT_SETTLE_DAYS):
+    """
+    Conteo por día de un almacén entre start_date y end_date, con los días cerrados de la caché.
+
+    Args:
+        warehouse (str): 'snowflake' o 'redshift' (parte de la clave de la caché).
+        load (callable): load(table_name, date_column, start_date, end_date) -> (DataFrame con
+            extraction_date y count de los días con filas, error).
+
+    Returns:
+        tuple: ((DataFrame con extraction_date y count de todos los días del rango, incluidos los
+        días sin filas; número de días tomados de la caché), error)
+    """
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    check_name = _check_name(date_column, warehouse)
+    cached = {
+        date.fromisoformat(day): int(count)
+        for day, (_, count) in store.get(table_name, check_name, [d.isoformat() for d in days]).items()
+    }
+    missing = [day for day in days if day not in cached]
+    counts = dict(cached)
+    if missing:
+        # Un solo tramo por almacén: del primer al último día que falta
+        df, error = load(table_name, date_column, missing[0], missing[-1])
+        if df is None:
+            return None, error
+        queried = {pd.Timestamp(day).date(): int(count) for day, count in zip(df['extraction_date'], df['count'])}
+        last_closed = closed_until(today, settle_days)
+        store.put(table_name, check_name, {
+            day.isoformat(): ('closed', queried.get(day, 0))
+            for day in missing if day <= last_closed
+        })
+        counts.update({day: queried.get(day, 0) for day in missing})
+
+    df = pd.DataFrame({'extraction_date': days, 'count': [counts[day] for day in days]})
+    return (df, len(cached)), None
+
+
+def rollup(df, granularity):
+    """Suma count (y error_bound, si lo hay) de un conteo por día por periodo ('period')."""
+    value_columns = [column for column in ('count', 'error_bound') if column in df.columns]
+    df = df[value_columns].apply(pd.to_numeric).assign(
+        period=df['extraction_date'].map(lambda day: period_start(pd.Timestamp(day).date(), granularity))
+    )
+    return df.groupby('period', as_index=False)[value_columns].sum()
+
+
+def compare_counts_by_period(df_snowflake, df_redshift, granularity='day'):
+    """
+    Compara los conteos por día de ambos almacenes agrupados por día, semana o mes. Los conteos
+    estimados (con error_bound) coinciden si la diferencia no supera la suma de sus cotas, que
+    también se suman por periodo.
+
+    Returns:
+        pd.DataFrame: period, count_snowflake, count_redshift, difference, error_bound y match,
+        por periodo ascendente.
+    """
+    comparison_df = compare_with_bounds(
+        rollup(df_snowflake, granularity), rollup(df_redshift, granularity), ['period']
+    ).sort_values('period').reset_index(drop=True)
+    comparison_df.insert(
+        3, 'difference', comparison_df['count_snowflake'] - comparison_df['count_redshift']
+    )
+    return comparison_df
+
+
+def first_divergence(comparison_df):
+    """Primer periodo con conteos distintos, o None si todos coinciden."""
+    mismatches = comparison_df.loc[~comparison_df['match'], 'period']
+    return None if mismatches.empty else mismatches.iloc[0]
@@ -0,0 +1,73 @@
+# scripts/fingerprint_audit.py
+
+import os
+
+import pandas as pd
+
+from scripts.snowflake_connection import get_columns_snowflake, get_column_fingerprint_snowflake
+from scripts.redshift_connection import get_columns_redshift, get_column_fingerprint_redshift
+from scripts.column_fingerprint import FINGERPRINT_COLUMNS
+from scripts.task_executor import task_executor
+
+# Obtención de la huella estadística de las columnas comunes a ambos almacenes (ver
+# scripts/column_fingerprint.py). Las tablas muy anchas se dividen en grupos de columnas para no
+# superar el límite de expresiones por consulta de Redshift; al ser almacenes columnares cada
+# grupo sólo lee sus columnas. No importa Streamlit.
+
+FINGERPRINT_COLUMNS_PER_QUERY = int(os.getenv('FINGERPRINT_COLUMNS_PER_QUERY', 200))
+
+
+def _catalog(columns_df):
+    return dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+
+def get_column_fingerprints(table_name, date_column, start_date, end_date, on_wait=None):
+    """
+    Calcula la huella de las columnas comunes en ambos almacenes entre start_date y end_date
+    (ambas incluidas; la misma fecha para sólo la fecha de muestreo).
+
+    Returns:
+        tuple: (huella de Snowflake, huella de Redshift, error); cada huella es un DataFrame con
+        column_name, statistic y value.
+    """
+    catalogs = task_executor.run({
+        'snowflake': lambda: get_columns_snowflake(table_name),
+        'redshift': lambda: get_columns_redshift(table_name),
+    }, on_wait=on_wait)
+    (snowflake_columns, snowflake_error), (redshift_columns, redshift_error) = catalogs['snowflake'], catalogs['redshift']
+    if snowflake_columns is None or redshift_columns is None:
+        return None, None, f"Catálogo de columnas: {snowflake_error or redshift_error}"
+
+    snowflake_types, redshift_types = _catalog(snowflake_columns), _catalog(redshift_columns)
+    columns = [column for column in snowflake_types if column in redshift_types]
+    if not columns:
+        return None, None, "No hay columnas comunes en ambos almacenes"
+
+    groups = [
+        columns[i:i + FINGERPRINT_COLUMNS_PER_QUERY] for i in range(0, len(columns), FINGERPRINT_COLUMNS_PER_QUERY)
+    ]
+    tasks = {}
+    for i, group in enumerate(groups):
+        tasks[('snowflake', i)] = lambda group=group: get_column_fingerprint_snowflake(
+            table_name, date_column, start_date, end_date, group, snowflake_types
+        )
+        tasks[('redshift', i)] = lambda group=group: get_column_fingerprint_redshift(
+            table_name, date_column, start_date, end_date, group, redshift_types
+        )
+    results = task_executor.run(tasks, on_wait=on_wait)
+
+    fingerprints, errors = {'snowflake': [], 'redshift': []}, []
+    for (warehouse, _), (df, error) in results.items():
+        if df is None:
+            errors.append(f"{warehouse}: {error}")
+        else:
+            fingerprints[warehouse].append(df)
+    if errors:
+        return None, None, '; '.join(dict.fromkeys(errors))
+
+    def combine(frames):
+        # Cada grupo repite el conteo de filas ('*', 'row_count')
+        combined = pd.concat(frames, ignore_index=True).drop_duplicates(['column_name', 'statistic'])
+        return combined[FINGERPRINT_COLUMNS].reset_index(drop=True)
+
+    return combine(fingerprints['snowflake']), combine(fingerprints['redshift']), None
@@ -0,0 +1,156 @@
+# scripts/frequency_profile.py
+
+import pandas as pd
+
+# Perfil de frecuencias por lotes: los top_n valores de todas las columnas se obtienen con una
+# sola consulta por almacén. La tabla se lee una vez (filtrada por la fecha de muestreo), los
+# valores de cada columna se agrupan con GROUPING SETS y una ventana ROW_NUMBER() se queda con
+# los top_n de cada columna. El resultado es un DataFrame "largo" con una fila por
+# (column_name, value) que se compara con el del otro almacén en un único merge.
+
+LONG_COLUMNS = ['column_name', 'value', 'count']
+
+
+def value_expression(column, data_type, warehouse):
+    """
+    Expresión que convierte la columna a texto con el mismo formato en ambos almacenes,
+    para que los valores de distinto tipo compartan la columna 'value' y se puedan comparar.
+    """
+    data_type = (data_type or '').lower()
+    if 'timestamp' in data_type:
+        return f"TO_CHAR({column}, 'YYYY-MM-DD HH24:MI:SS')"
+    if data_type == 'date':
+        return f"TO_CHAR({column}, 'YYYY-MM-DD')"
+    if data_type in ('boolean', 'bool'):
+        return f"CASE WHEN {column} THEN 'true' WHEN NOT {column} THEN 'false' END"
+    if warehouse == 'redshift':
+        # En Redshift VARCHAR sin longitud equivale a VARCHAR(256) y truncaría los textos largos
+        return f"CAST({column} AS VARCHAR(65535))"
+    return f"CAST({column} AS VARCHAR)"
+
+
+def sample_clauses(warehouse, sample_percent=None):
+    """
+    Fragmentos SQL para leer una muestra de Bernoulli (por filas) del sample_percent % de la tabla.
+
+    Returns:
+        tuple: (sufijo de la tabla en el FROM, condición adicional del WHERE); vacíos sin muestreo.
+    """
+    if sample_percent is None or sample_percent >= 100:
+        return "", ""
+    if warehouse == 'redshift':
+        # Redshift no tiene TABLESAMPLE: cada fila se conserva con probabilidad sample_percent / 100
+        return "", f" AND RANDOM() < {sample_percent / 100}"
+    return f" SAMPLE BERNOULLI ({sample_percent})", ""
+
+
+def top_frequent_batch_query(table_name, date_column, sample_date, columns, top_n, warehouse, data_types=None,
+                             sample_percent=None):
+    """
+    Construye la consulta de los top_n datos más frecuentes de varias columnas para una fecha.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        warehouse (str): 'snowflake' o 'redshift'.
+        data_types (dict): Tipo de dato por nombre de columna en minúsculas.
+        sample_percent (float): Porcentaje de filas a muestrear; None para leer todas.
+
+    Returns:
+        str: Consulta que devuelve column_name, value, count y value_rank.
+    """
+    data_types = data_types or {}
+    table_sample, sample_filter = sample_clauses(warehouse, sample_percent)
+    aliases = [f"v{i}" for i in range(len(columns))]
+    select_values = ",\n            ".join(
+        f"{value_expression(column, data_types.get(column.lower()), warehouse)} AS {alias}"
+        for column, alias in zip(columns, aliases)
+    )
+    column_name_case = " ".join(
+        f"WHEN GROUPING({alias}) = 0 THEN '{column}'" for column, alias in zip(columns, aliases)
+    )
+    value_case = " ".join(
+        f"WHEN GROUPING({alias}) = 0 THEN {alias}" for alias in aliases
+    )
+    grouping_sets = ", ".join(f"({alias})" for alias in aliases)
+    return f"""
+    WITH base AS (
+        SELECT
+            {select_values}
+        FROM {table_name}{table_sample}
+        WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'{sample_filter}
+    ),
+    grouped AS (
+        SELECT
+            CASE {column_name_case} END AS column_name,
+            CASE {value_case} END AS value,
+            COUNT(*) AS count
+        FROM base
+        GROUP BY GROUPING SETS ({grouping_sets})
+    ),
+    ranked AS (
+        SELECT
+            column_name,
+            value,
+            count,
+            ROW_NUMBER() OVER (PARTITION BY column_name ORDER BY count DESC, value ASC) AS value_rank
+        FROM grouped
+    )
+    SELECT column_name, value, count, value_rank
+    FROM ranked
+    WHERE value_rank <= {top_n}
+    ORDER BY column_name, value_rank;
+    """
+
+
+def normalize_frequency_frame(df, column=None):
+    """
+    Lleva un resultado de frecuencias al formato largo (column_name, value, count).
+    Si se indica `column`, el resultado es el de una consulta por columna (value, count).
+    """
+    df = df.rename(columns=lambda x: x.lower())
+    if column is not None:
+        df = df.assign(column_name=column)
+    df = df[LONG_COLUMNS].copy()
+    # Los nulos se muestran como 'None' en ambos almacenes para que coincidan en el merge
+    df['value'] = df['value'].astype(object).where(df['value'].notna(), 'None').astype(str)
+    df['count'] = pd.to_numeric(df['count'])
+    return df
+
+
+def compare_top_frequent_batch(df_snowflake, df_redshift, top_n):
+    """
+    Compara los top_n datos más frecuentes de todas las columnas con un único merge.
+
+    Args:
+        df_snowflake (pd.DataFrame): Frecuencias de Snowflake en formato largo.
+        df_redshift (pd.DataFrame): Frecuencias de Redshift en formato largo.
+        top_n (int): Número de datos más frecuentes por columna.
+
+    Returns:
+        pd.DataFrame: column_name, value, count_snowflake, count_redshift y match, con como
+        máximo top_n filas por columna ordenadas por el conteo de Snowflake.
+    """
+    comparison_df = pd.merge(
+        df_snowflake.rename(columns={'count': 'count_snowflake'}),
+        df_redshift.rename(columns={'count': 'count_redshift'}),
+        on=['column_name', 'value'],
+        how='outer'
+    )
+    comparison_df[['count_snowflake', 'count_redshift']] = comparison_df[['count_snowflake', 'count_redshift']].fillna(0)
+    comparison_df['match'] = comparison_df['count_snowflake'] == comparison_df['count_redshift']
+    comparison_df = comparison_df.sort_values(
+        ['column_name', 'count_snowflake', 'count_redshift', 'value'],
+        ascending=[True, False, False, True],
+        kind='stable'
+    )
+    return comparison_df.groupby('column_name', sort=False).head(top_n).reset_index(drop=True)
+
+
+def discrepant_columns(comparison_df):
+    """Devuelve las columnas con alguna diferencia en la comparación por lotes."""
+    matches = comparison_df.groupby('column_name', sort=False)['match'].all()
+    return matches[~matches].index.tolist()
@@ -0,0 +1,221 @@
+# scripts/key_sample.py
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+
+from scripts.frequency_profile import value_expression
+from scripts.record_counts import get_record_counts_by_date
+from scripts.row_diff import common_columns, key_hash_expression
+from scripts.snowflake_connection import get_row_diff_data_snowflake
+from scripts.redshift_connection import get_row_diff_data_redshift
+from scripts.task_executor import task_executor
+
+# Muestreo alineado por clave: en lugar de LIMIT sobre filas arbitrarias, cada almacén elige las
+# filas de la fecha cuyo MD5 de la clave normalizada (el mismo que usa scripts/row_diff.py) es
+# menor, de modo que ambos devuelven el mismo conjunto de claves sin leer la tabla completa. Un
+# umbral sobre el prefijo del hash, calculado a partir del conteo de la fecha, descarta casi todas
+# las filas antes de ordenar; el ORDER BY ... LIMIT fija el tamaño exacto. Las muestras se unen
+# aquí por la clave y se comparan celda a celda.
+
+KEY_SAMPLE_ROWS = int(os.getenv('KEY_SAMPLE_ROWS', 1000))
+# Margen sobre la fracción esperada para que el umbral no deje la muestra corta
+KEY_SAMPLE_OVERSAMPLING = float(os.getenv('KEY_SAMPLE_OVERSAMPLING', 2.0))
+
+HASH_COLUMN = 'sample_hash'
+PREFIX_DIGITS = 8
+KEY_STATUS = {'both': 'coincide', 'left_only': 'solo_snowflake', 'right_only': 'solo_redshift'}
+
+
+@dataclass
+class KeySampleResult:
+    """
+    Resultado del muestreo alineado por clave de una fecha.
+
+    Attributes:
+        table_name (str): Nombre completo de la tabla.
+        key_columns (list): Columnas clave (en minúsculas).
+        columns (list): Columnas comunes leídas en ambos almacenes.
+        threshold (str): Prefijo máximo del hash de la clave; None si no se filtró por umbral.
+        rows_snowflake (pd.DataFrame): Filas normalizadas de la muestra de Snowflake.
+        rows_redshift (pd.DataFrame): Filas normalizadas de la muestra de Redshift.
+        keys_df (pd.DataFrame): Claves de la muestra y su estado ('coincide', 'diferente',
+            'solo_snowflake' o 'solo_redshift').
+        cell_diff_df (pd.DataFrame): Celdas distintas de las claves presentes en ambos almacenes:
+            columnas clave, column_name, value_snowflake y value_redshift.
+        error (str): Mensaje de error, si lo hubo.
+    """
+    table_name: str
+    key_columns: List[str] = field(default_factory=list)
+    columns: List[str] = field(default_factory=list)
+    threshold: Optional[str] = None
+    rows_snowflake: Optional[pd.DataFrame] = None
+    rows_redshift: Optional[pd.DataFrame] = None
+    keys_df: Optional[pd.DataFrame] = None
+    cell_diff_df: Optional[pd.DataFrame] = None
+    error: Optional[str] = None
+
+    @property
+    def status_counts(self):
+        """Número de claves por estado."""
+        if self.keys_df is None:
+            return {}
+        return self.keys_df['status'].value_counts().to_dict()
+
+
+def hash_threshold(partition_rows, sample_rows, oversampling=KEY_SAMPLE_OVERSAMPLING):
+    """
+    Prefijo hexadecimal máximo del hash para conservar unas `oversampling` veces sample_rows de
+    las partition_rows filas; None si hay que leer todas (partición pequeña o conteo desconocido).
+    """
+    if not partition_rows:
+        return None
+    fraction = oversampling * sample_rows / partition_rows
+    if fraction >= 1:
+        return None
+    return format(min(16 ** PREFIX_DIGITS - 1, int(fraction * 16 ** PREFIX_DIGITS)), f'0{PREFIX_DIGITS}x')
+
+
+def key_sample_query(table_name, date_column, sample_date, columns, key_columns, data_types, warehouse, rows, threshold):
+    """Consulta de las `rows` filas de la fecha con menor hash de la clave, con sus valores normalizados."""
+    key_hash = key_hash_expression(key_columns, data_types, warehouse)
+    values = ",\n        ".join(
+        f"{value_expression(column, data_types.get(column.lower()), warehouse)} AS {column}"
+        for column in columns
+    )
+    threshold_filter = f"\n      AND SUBSTRING({key_hash}, 1, {PREFIX_DIGITS}) <= '{threshold}'" if threshold else ""
+    return f"""
+    SELECT
+        {values},
+        {key_hash} AS {HASH_COLUMN}
+    FROM {table_name}
+    WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'{threshold_filter}
+    ORDER BY {HASH_COLUMN}
+    LIMIT {int(rows)};
+    """
+
+
+def align_samples(rows_snowflake, rows_redshift, rows):
+    """
+    Recorta ambas muestras al mismo tramo de hashes. Si un almacén llegó al LIMIT, las claves con
+    un hash mayor que su último hash pueden faltarle sólo por el corte, no por una diferencia.
+    """
+    cut = None
+    for df in (rows_snowflake, rows_redshift):
+        if len(df) >= rows:
+            last = df[HASH_COLUMN].max()
+            cut = last if cut is None else min(cut, last)
+    if cut is None:
+        return rows_snowflake, rows_redshift
+    return rows_snowflake[rows_snowflake[HASH_COLUMN] <= cut], rows_redshift[rows_redshift[HASH_COLUMN] <= cut]
+
+
+def compare_samples(rows_snowflake, rows_redshift, key_columns, columns):
+    """
+    Une las muestras por la clave y compara celda a celda.
+
+    Returns:
+        tuple: (DataFrame de claves con su estado, DataFrame de celdas distintas)
+    """
+    value_columns = [column for column in columns if column not in key_columns]
+    merged = pd.merge(
+        rows_snowflake[key_columns + value_columns],
+        rows_redshift[key_columns + value_columns],
+        on=key_columns, how='outer', suffixes=('_snowflake', '_redshift'), indicator=True
+    )
+    cells = []
+    differs = pd.Series(False, index=merged.index)
+    both = merged['_merge'] == 'both'
+    for column in value_columns:
+        snowflake_values, redshift_values = merged[f'{column}_snowflake'], merged[f'{column}_redshift']
+        mismatch = both & ~((snowflake_values == redshift_values) | (snowflake_values.isna() & redshift_values.isna()))
+        if mismatch.any():
+            differs |= mismatch
+            cells.append(pd.DataFrame({
+                **{key: merged.loc[mismatch, key] for key in key_columns},
+                'column_name': column,
+                'value_snowflake': snowflake_values[mismatch],
+                'value_redshift': redshift_values[mismatch],
+            }))
+
+    keys_df = merged[key_columns].copy()
+    keys_df['status'] = merged['_merge'].astype(str).map(KEY_STATUS)
+    keys_df.loc[differs, 'status'] = 'diferente'
+    cell_columns = key_columns + ['column_name', 'value_snowflake', 'value_redshift']
+    cell_diff_df = (
+        pd.concat(cells).sort_values(key_columns, kind='stable').reset_index(drop=True) if cells
+        else pd.DataFrame(columns=cell_columns)
+    )
+    return keys_df.sort_values(key_columns).reset_index(drop=True), cell_diff_df[cell_columns]
+
+
+def _normalize(df, columns):
+    df = df.rename(columns=lambda x: x.lower()).reindex(columns=columns + [HASH_COLUMN])
+    df[HASH_COLUMN] = df[HASH_COLUMN].astype(str)
+    return df
+
+
+def sample_by_key(table_name, date_column, sample_date, key_columns, rows=KEY_SAMPLE_ROWS, on_wait=None):
+    """
+    Obtiene de ambos almacenes la misma muestra de claves de una fecha y la compara celda a celda.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Columna de fecha.
+        sample_date (datetime.date): Fecha muestreada.
+        key_columns (list): Columnas que identifican una fila.
+        rows (int): Filas de la muestra por almacén.
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+
+    Returns:
+        KeySampleResult: Muestras, estado de cada clave y celdas distintas (con `error` si algo falló).
+    """
+    key_columns = [c.strip().lower() for c in (key_columns or []) if c.strip()]
+    result = KeySampleResult(table_name=table_name, key_columns=key_columns)
+    if not key_columns:
+        result.error = "Indica las columnas clave para muestrear filas alineadas."
+        return result
+    try:
+        columns, data_types = common_columns(table_name, on_wait)
+        missing = [c for c in key_columns if c not in columns]
+        if missing:
+            result.error = f"Columnas clave inexistentes en alguno de los almacenes: {', '.join(missing)}"
+            return result
+        result.columns = columns
+
+        # El umbral sale del conteo de la fecha (la caché de días cerrados lo suele tener)
+        counts = get_record_counts_by_date(table_name, date_column, sample_date, sample_date, on_wait=on_wait)
+        partition_rows = max(
+            (int(df['count'].sum()) for df in (counts.snowflake_df, counts.redshift_df) if df is not None), default=0
+        )
+        result.threshold = hash_threshold(partition_rows, rows)
+
+        queries = {
+            warehouse: key_sample_query(
+                table_name, date_column, sample_date, columns, key_columns, data_types[warehouse], warehouse,
+                rows, result.threshold
+            )
+            for warehouse in ('snowflake', 'redshift')
+        }
+        results = task_executor.run({
+            'snowflake': lambda: get_row_diff_data_snowflake(table_name, queries['snowflake']),
+            'redshift': lambda: get_row_diff_data_redshift(table_name, queries['redshift']),
+        }, cancel_on_failure=True, on_wait=on_wait)
+        (df_snowflake, error_snowflake), (df_redshift, error_redshift) = results['snowflake'], results['redshift']
+        if df_snowflake is None or df_redshift is None:
+            result.error = f"Snowflake: {error_snowflake}" if df_snowflake is None else f"Redshift: {error_redshift}"
+            return result
+
+        rows_snowflake, rows_redshift = align_samples(
+            _normalize(df_snowflake, columns), _normalize(df_redshift, columns), rows
+        )
+        result.rows_snowflake = rows_snowflake.drop(columns=HASH_COLUMN).reset_index(drop=True)
+        result.rows_redshift = rows_redshift.drop(columns=HASH_COLUMN).reset_index(drop=True)
+        result.keys_df, result.cell_diff_df = compare_samples(
+            result.rows_snowflake, result.rows_redshift, key_columns, columns
+        )
+    except Exception as e:
+        result.error = str(e)
+    return result
@@ -0,0 +1,188 @@
+# scripts/query_control.py
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seguimiento de las consultas en curso en los almacenes para poder cancelarlas cuando
+# su resultado ya no se va a mostrar (el usuario cambió un widget o pulsó otro botón),
+# y tiempos límite de ejecución por clase de consulta.
+
+# Tiempo límite en segundos por clase de consulta; se sobrescribe con QUERY_TIMEOUT_<CLASE>
+# (p. ej. QUERY_TIMEOUT_TOP_FREQUENT=120). Un valor 0 desactiva el límite.
+QUERY_TIMEOUTS = {
+    'metadata': 60,
+    'sample': 120,
+    'count': 600,
+    'profile': 600,
+    'top_frequent': 300,
+    'row_diff': 900,
+    'stream_diff': 3600,
+}
+DEFAULT_QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT_DEFAULT', 600))
+
+
+class QueryCancelledError(Exception):
+    """Se lanza cuando una consulta en curso fue cancelada porque su resultado ya no se necesita."""
+
+
+class QueryTimeoutError(Exception):
+    """Se lanza cuando una consulta supera el tiempo límite de su clase."""
+
+
+def statement_timeout(query_class=None):
+    """
+    Devuelve el tiempo límite en segundos para una clase de consulta, o None si no tiene límite.
+    """
+    timeout = DEFAULT_QUERY_TIMEOUT
+    if query_class:
+        timeout = float(os.getenv(f'QUERY_TIMEOUT_{query_class.upper()}', QUERY_TIMEOUTS.get(query_class, timeout)))
+    return timeout if timeout > 0 else None
+
+
+def timeout_message(query_class, timeout):
+    return f"La consulta ({query_class or 'default'}) superó el tiempo límite de {timeout:.0f} s"
+
+
+# Propietario de las consultas (la sesión de Streamlit) y ámbito de cancelación actual.
+# Son variables de contexto para que se propaguen a los hilos que reciben una copia del contexto.
+_current_owner = contextvars.ContextVar('query_owner', default=None)
+_current_scope = contextvars.ContextVar('query_scope', default=None)
+
+
+def set_query_owner(owner):
+    """Asocia las consultas que se lancen desde el contexto actual a `owner`."""
+    _current_owner.set(owner)
+
+
+class InFlightQuery:
+    """
+    Consulta en ejecución en un almacén.
+
+    Attributes:
+        warehouse (str): "Snowflake" o "Redshift".
+        query_id: Query ID o ID de sesión de Snowflake, o PID del backend de Redshift.
+        query_class (str): Clase de la consulta.
+        owner: Sesión que lanzó la consulta.
+        started_at (float): Instante de inicio (time.monotonic()).
+        cancelled (bool): Si se solicitó su cancelación.
+    """
+
+    def __init__(self, warehouse, query_id, cancel, query_class=None, owner=None):
+        self.warehouse = warehouse
+        self.query_id = query_id
+        self.query_class = query_class
+        self.owner = owner
+        self.started_at = time.monotonic()
+        self.cancelled = False
+        self._cancel = cancel
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Cancela la consulta en el servidor. Las llamadas repetidas no tienen efecto."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+        try:
+            self._cancel(self.query_id)
+        except Exception as e:
+            print(f"Error al cancelar la consulta {self.query_id} en {self.warehouse}: {e}")
+
+
+class CancelScope:
+    """
+    Conjunto de consultas lanzadas dentro de un bloque `with`, incluidas las de los hilos
+    que ejecutan una copia del contexto. cancel() cancela las que sigan en curso.
+    """
+
+    def __init__(self):
+        self._queries = set()
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_scope.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_scope.reset(self._token)
+
+    def _add(self, query):
+        with self._lock:
+            self._queries.add(query)
+            cancelled = self._cancelled
+        if cancelled:
+            query.cancel()
+
+    def _discard(self, query):
+        with self._lock:
+            self._queries.discard(query)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            queries = list(self._queries)
+        for query in queries:
+            query.cancel()
+
+
+class QueryTracker:
+    """Registro de las consultas en curso de todo el proceso."""
+
+    def __init__(self):
+        self._queries = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, warehouse, query_id, cancel, query_class=None):
+        """
+        Registra una consulta mientras dura el bloque `with`.
+
+        Args:
+            warehouse (str): "Snowflake" o "Redshift".
+            query_id: Identificador que recibe `cancel`.
+            cancel (callable): Función que cancela la consulta en el servidor.
+            query_class (str): Clase de la consulta.
+
+        Yields:
+            InFlightQuery: La consulta registrada.
+        """
+        query = InFlightQuery(warehouse, query_id, cancel, query_class, _current_owner.get())
+        scope = _current_scope.get()
+        with self._lock:
+            self._queries.add(query)
+        if scope is not None:
+            scope._add(query)
+        try:
+            yield query
+        finally:
+            with self._lock:
+                self._queries.discard(query)
+            if scope is not None:
+                scope._discard(query)
+
+    def cancel(self, owner=None):
+        """
+        Cancela las consultas en curso de `owner` (todas si no se indica).
+
+        Returns:
+            int: Número de consultas canceladas.
+        """
+        with self._lock:
+            queries = [q for q in self._queries if owner is None or q.owner == owner]
+        for query in queries:
+            query.cancel()
+        return len(queries)
+
+    def in_flight(self):
+        """Devuelve las consultas en curso."""
+        with self._lock:
+            return list(self._queries)
+
+
+# Registro compartido por todo el proceso
+query_tracker = QueryTracker()
@@ -0,0 +1,139 @@
+# scripts/record_counts.py
+
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from scripts.snowflake_connection import (
+    get_metadata_record_count_snowflake, get_total_record_count_snowflake, get_record_count_by_date_snowflake
+)
+from scripts.redshift_connection import (
+    get_metadata_record_count_redshift, get_total_record_count_redshift, get_record_count_by_date_redshift
+)
+from scripts.date_counts import daily_counts
+from scripts.task_executor import task_executor
+
+# Conteo total de registros con ruta rápida por metadatos: primero se leen los conteos que
+# mantiene el catálogo de cada almacén (INFORMATION_SCHEMA.TABLES.ROW_COUNT en Snowflake,
+# SVV_TABLE_INFO.tbl_rows en Redshift), que no leen la tabla. Sólo si no coinciden, si alguno
+# no está disponible o si se pide expresamente, se cuenta con COUNT(*) en ambos almacenes.
+# También el conteo por día de una ventana arbitraria con la caché de días cerrados
+# (ver scripts/date_counts.py).
+
+
+@dataclass
+class RecordCounts:
+    """
+    Conteo total de registros en ambos almacenes.
+
+    Attributes:
+        snowflake (int): Total en Snowflake.
+        redshift (int): Total en Redshift.
+        exact (bool): True si los totales son de COUNT(*); False si son estimados de los metadatos.
+        metadata_snowflake (int): Conteo de los metadatos de Snowflake, si se consultó.
+        metadata_redshift (int): Conteo de los metadatos de Redshift, si se consultó.
+        snowflake_error (str): Error del conteo en Snowflake.
+        redshift_error (str): Error del conteo en Redshift.
+    """
+    snowflake: Optional[int] = None
+    redshift: Optional[int] = None
+    exact: bool = False
+    metadata_snowflake: Optional[int] = None
+    metadata_redshift: Optional[int] = None
+    snowflake_error: Optional[str] = None
+    redshift_error: Optional[str] = None
+
+    @property
+    def source(self):
+        """Origen de los totales para mostrar junto a ellos."""
+        return "exacto (COUNT(*))" if self.exact else "estimado (metadatos del catálogo)"
+
+    @property
+    def match(self):
+        """True/False si ambos totales están disponibles; None en otro caso."""
+        if self.snowflake is None or self.redshift is None:
+            return None
+        return self.snowflake == self.redshift
+
+
+def get_total_record_counts(table_name, exact=False, on_wait=None):
+    """
+    Obtiene el total de registros de la tabla en ambos almacenes, en paralelo.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        exact (bool): Si se cuenta siempre con COUNT(*), sin consultar los metadatos.
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+
+    Returns:
+        RecordCounts: Totales con la marca de exacto o estimado.
+    """
+    counts = RecordCounts()
+    if not exact:
+        results = task_executor.run({
+            'snowflake': lambda: get_metadata_record_count_snowflake(table_name),
+            'redshift': lambda: get_metadata_record_count_redshift(table_name),
+        }, on_wait=on_wait)
+        counts.metadata_snowflake = results['snowflake'][0]
+        counts.metadata_redshift = results['redshift'][0]
+        if counts.metadata_snowflake is not None and counts.metadata_snowflake == counts.metadata_redshift:
+            counts.snowflake = counts.metadata_snowflake
+            counts.redshift = counts.metadata_redshift
+            return counts
+
+    # Los metadatos no coinciden o no están disponibles: conteo exacto
+    results = task_executor.run({
+        'snowflake': lambda: get_total_record_count_snowflake(table_name),
+        'redshift': lambda: get_total_record_count_redshift(table_name),
+    }, on_wait=on_wait)
+    counts.snowflake, counts.snowflake_error = results['snowflake']
+    counts.redshift, counts.redshift_error = results['redshift']
+    counts.exact = True
+    return counts
+
+
+@dataclass
+class DateCounts:
+    """
+    Conteo de registros por día en ambos almacenes.
+
+    Attributes:
+        snowflake_df (pd.DataFrame): extraction_date y count en Snowflake (todos los días del rango).
+        redshift_df (pd.DataFrame): extraction_date y count en Redshift (todos los días del rango).
+        cached_days (int): Días tomados de la caché de días cerrados, sumando ambos almacenes.
+        snowflake_error (str): Error del conteo en Snowflake.
+        redshift_error (str): Error del conteo en Redshift.
+    """
+    snowflake_df: Optional[pd.DataFrame] = None
+    redshift_df: Optional[pd.DataFrame] = None
+    cached_days: int = 0
+    snowflake_error: Optional[str] = None
+    redshift_error: Optional[str] = None
+
+
+def get_record_counts_by_date(table_name, date_column, start_date, end_date, on_wait=None):
+    """
+    Obtiene el conteo por día entre start_date y end_date en ambos almacenes, en paralelo, con
+    como máximo una consulta agrupada por almacén (los días cerrados se toman de la caché).
+
+    Returns:
+        DateCounts: Conteos por día y días reutilizados de la caché.
+    """
+    results = task_executor.run({
+        'snowflake': lambda: daily_counts(
+            table_name, date_column, start_date, end_date, 'snowflake', get_record_count_by_date_snowflake
+        ),
+        'redshift': lambda: daily_counts(
+            table_name, date_column, start_date, end_date, 'redshift', get_record_count_by_date_redshift
+        ),
+    }, on_wait=on_wait)
+    counts = DateCounts()
+    (snowflake, counts.snowflake_error), (redshift, counts.redshift_error) = results['snowflake'], results['redshift']
+    if snowflake is not None:
+        counts.snowflake_df, cached_days = snowflake
+        counts.cached_days += cached_days
+    if redshift is not None:
+        counts.redshift_df, cached_days = redshift
+        counts.cached_days += cached_days
+    return counts
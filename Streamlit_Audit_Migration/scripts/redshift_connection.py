@@ -1,28 +1,133 @@
 # scripts/redshift_connection.py
 
 import psycopg2
-from psycopg2 import sql
+from psycopg2 import sql, extensions
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import pandas as pd
+from scripts.connection_pool import ConnectionPool, pool_settings_from_env
+from scripts.table_profile import TableProfile
+from scripts.redshift_fetch import fetch_dataframe, iter_record_batches, DEFAULT_ITERSIZE
+from scripts.query_cache import query_cache
+from scripts.catalog_snapshot import CatalogSnapshots
+from scripts.column_fingerprint import fingerprint_query, parse_fingerprint
+from scripts.frequency_profile import top_frequent_batch_query, normalize_frequency_frame
+from scripts.approximate_profile import (
+    approx_column_stats_query, approx_count_by_date_query, scale_sampled_counts
+)
+from scripts.query_timing import traced, phase, add_query_id
+from scripts.query_control import (
+    query_tracker, statement_timeout, timeout_message, QueryCancelledError, QueryTimeoutError
+)
 
 # Cargar variables de entorno
 load_dotenv()
 
+def redshift_connection_params():
+    return dict(
+        dbname=os.getenv('DBNAME'),
+        user=os.getenv('USERNAMERS'),
+        password=os.getenv('PASSWORD'),
+        host=os.getenv('HOST'),
+        port=os.getenv('PORT')
+    )
+
+def _connect_redshift():
+    return psycopg2.connect(**redshift_connection_params())
+
+def _ping_redshift(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1")
+    finally:
+        cur.close()
+    conn.rollback()
+
+def _reset_redshift(conn):
+    # No devolver al pool conexiones con una transacción abierta o abortada
+    if conn.status != extensions.STATUS_READY:
+        conn.rollback()
+
+# Pool de conexiones compartido por todo el proceso
+redshift_pool = ConnectionPool(
+    _connect_redshift,
+    name="Redshift",
+    is_closed=lambda conn: conn.closed != 0,
+    ping=_ping_redshift,
+    reset=_reset_redshift,
+    **pool_settings_from_env('REDSHIFT')
+)
+
 def get_redshift_connection():
+    """
+    Obtiene una conexión del pool de Redshift.
+    Al llamar a conn.close() la conexión se devuelve al pool en lugar de cerrarse.
+    """
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv('DBNAME'),
-            user=os.getenv('USERNAMERS'),
-            password=os.getenv('PASSWORD'),
-            host=os.getenv('HOST'),
-            port=os.getenv('PORT')
-        )
+        with phase('connect'):
+            conn = redshift_pool.acquire()
         return conn, None
     except Exception as e:
         print(f"Error al conectar con Redshift: {e}")
         return None, str(e)
 
+def _cancel_redshift_backend(pid):
+    # Conexión nueva y no del pool: el hilo que cancela puede tener prestada la conexión ocupada
+    conn = _connect_redshift()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_cancel_backend(%s)", (pid,))
+        cur.close()
+    finally:
+        conn.close()
+
+@contextmanager
+def redshift_query(conn, query_class=None):
+    """
+    Bloque en el que se ejecutan las consultas de una clase sobre una conexión de Redshift.
+    Aplica el statement_timeout de la clase y registra el PID del backend para poder
+    cancelar la consulta en curso con pg_cancel_backend.
+
+    Raises:
+        QueryCancelledError: Si la consulta se canceló porque su resultado ya no se necesita.
+        QueryTimeoutError: Si la consulta superó el tiempo límite.
+    """
+    timeout = statement_timeout(query_class)
+    cur = conn.cursor()
+    try:
+        cur.execute("SET statement_timeout TO %s", (int(timeout * 1000) if timeout else 0,))
+    finally:
+        cur.close()
+    pid = conn.get_backend_pid()
+    add_query_id(f"pid:{pid}")
+    with query_tracker.track("Redshift", pid, _cancel_redshift_backend, query_class) as handle:
+        if handle.cancelled:
+            raise QueryCancelledError(f"Consulta del backend {pid} cancelada")
+        try:
+            yield handle
+        except extensions.QueryCanceledError as e:
+            if handle.cancelled:
+                raise QueryCancelledError(f"Consulta del backend {pid} cancelada") from e
+            raise QueryTimeoutError(timeout_message(query_class, timeout)) from e
+
+def parse_table_name_redshift(full_table_name):
+    """
+    Separa full_table_name en (esquema, tabla) en minúsculas. Si se incluye la base de datos
+    se ignora, y si no se indica esquema se usa 'public'. Lanza ValueError si el formato es inválido.
+    """
+    parts = full_table_name.split('.')
+    if len(parts) == 1:
+        schema_name, table_name = 'public', parts[0]  # Esquema por defecto en Redshift
+    elif len(parts) == 2:
+        schema_name, table_name = parts
+    elif len(parts) == 3:
+        _, schema_name, table_name = parts
+    else:
+        raise ValueError("Formato de nombre de tabla inválido")
+    return schema_name.lower(), table_name.lower()
+
+@traced("Redshift")
 def check_table_exists_redshift(full_table_name):
     """
     Verifica si una tabla existe en Redshift.
@@ -40,24 +145,10 @@ def check_table_exists_redshift(full_table_name):
         cur = conn.cursor()
         
         # Construir la consulta para obtener la información de la tabla
-        parts = full_table_name.split('.')
-        if len(parts) == 1:
-            # Solo nombre de la tabla
-            table_name = parts[0].lower()
-            schema_name = 'public'  # Esquema por defecto en Redshift
-        elif len(parts) == 2:
-            # Esquema y tabla
-            schema_name, table_name = parts
-            schema_name = schema_name.lower()
-            table_name = table_name.lower()
-        elif len(parts) == 3:
-            # Redshift generalmente no utiliza la base de datos en el nombre de la tabla
-            # Se asume que la primera parte es la base de datos y se ignora
-            _, schema_name, table_name = parts
-            schema_name = schema_name.lower()
-            table_name = table_name.lower()
-        else:
-            return False, "Formato de nombre de tabla inválido"
+        try:
+            schema_name, table_name = parse_table_name_redshift(full_table_name)
+        except ValueError as e:
+            return False, str(e)
         
         query = """
             SELECT COUNT(*) 
@@ -65,8 +156,16 @@ def check_table_exists_redshift(full_table_name):
             WHERE table_schema = %s 
               AND table_name = %s
         """
-        cur.execute(query, (schema_name, table_name))
-        count = cur.fetchone()[0]
+        params = (schema_name, table_name)
+
+        def load():
+            with redshift_query(conn, 'metadata'):
+                with phase('execute'):
+                    cur.execute(query, params)
+                with phase('fetch'):
+                    return cur.fetchone()[0]
+
+        count = query_cache.get_or_load('redshift', query, load, params=params, dataset=full_table_name)
         exists = count > 0
         return exists, None
     except Exception as e:
@@ -75,6 +174,7 @@ def check_table_exists_redshift(full_table_name):
         cur.close()
         conn.close()
 
+@traced("Redshift")
 def query_redshift_sample(table_name, date_value, date_column='time_extracted', limit=10):
     """
     Realiza un SELECT * con filtro de fecha y límite en Redshift.
@@ -84,7 +184,6 @@ def query_redshift_sample(table_name, date_value, date_column='time_extracted',
         return None, error
     
     try:
-        cur = conn.cursor()
         # Construir la consulta de manera segura
         query = sql.SQL("""
             SELECT * 
@@ -95,17 +194,19 @@ def query_redshift_sample(table_name, date_value, date_column='time_extracted',
             sql.Identifier(*table_name.split('.')),
             sql.Identifier(date_column)
         )
-        cur.execute(query, (date_value, limit))
-        columns = [desc[0] for desc in cur.description]
-        results = cur.fetchall()
-        df = pd.DataFrame(results, columns=columns)
+        params = (date_value, limit)
+        def load():
+            with redshift_query(conn, 'sample'):
+                return fetch_dataframe(conn, query, params)
+
+        df = query_cache.get_or_load('redshift', query, load, params=params, dataset=table_name)
         return df, None
     except Exception as e:
         return None, str(e)
     finally:
-        cur.close()
         conn.close()
 
+@traced("Redshift")
 def get_total_record_count_redshift(table_name):
     """
     Obtiene el conteo total de registros en la tabla especificada en Redshift.
@@ -119,8 +220,15 @@ def get_total_record_count_redshift(table_name):
         query = sql.SQL("SELECT COUNT(*) AS total_records FROM {}").format(
             sql.Identifier(*table_name.split('.'))
         )
-        cur.execute(query)
-        count = cur.fetchone()[0]
+
+        def load():
+            with redshift_query(conn, 'count'):
+                with phase('execute'):
+                    cur.execute(query)
+                with phase('fetch'):
+                    return cur.fetchone()[0]
+
+        count = query_cache.get_or_load('redshift', query, load, dataset=table_name)
         return count, None
     except Exception as e:
         return None, str(e)
@@ -128,33 +236,88 @@ def get_total_record_count_redshift(table_name):
         cur.close()
         conn.close()
 
-def get_record_count_by_date_redshift(table_name, date_column='time_extracted', sample_date=None, days=5):
+@traced("Redshift")
+def get_metadata_record_count_redshift(table_name):
     """
-    Obtiene el conteo de registros agrupados por fecha para los últimos 'days' días a partir de 'sample_date' en Redshift.
+    Obtiene el conteo de registros de la tabla desde SVV_TABLE_INFO.tbl_rows en Redshift, sin
+    leer la tabla. tbl_rows incluye las filas borradas que aún no se eliminaron con VACUUM, por
+    lo que es una estimación por exceso.
+    
+    Returns:
+        tuple: (conteo, error); el conteo es None si la tabla no aparece en SVV_TABLE_INFO
+        (p. ej. está vacía o el usuario no tiene permisos sobre ella).
     """
+    try:
+        schema_name, table_name_only = parse_table_name_redshift(table_name)
+    except ValueError as e:
+        return None, str(e)
+
     conn, error = get_redshift_connection()
     if not conn:
         return None, error
 
-    if sample_date is None:
-        return None, "El parámetro 'sample_date' es requerido."
-
     try:
         cur = conn.cursor()
-        sample_date_str = sample_date.strftime('%Y-%m-%d')
+        query = """
+            SELECT tbl_rows
+            FROM svv_table_info
+            WHERE "schema" = %s
+              AND "table" = %s
+        """
+        params = (schema_name, table_name_only)
+
+        def load():
+            with redshift_query(conn, 'metadata'):
+                with phase('execute'):
+                    cur.execute(query, params)
+                with phase('fetch'):
+                    row = cur.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+
+        count = query_cache.get_or_load('redshift', query, load, params=params, dataset=table_name)
+        if count is None:
+            return None, "La tabla no aparece en SVV_TABLE_INFO."
+        return count, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
 
+@traced("Redshift")
+def get_record_count_by_date_redshift(table_name, date_column='time_extracted', start_date=None, end_date=None):
+    """
+    Obtiene el conteo de registros agrupados por fecha entre 'start_date' y 'end_date' (ambas
+    incluidas) en Redshift, con una única consulta agrupada para todo el rango.
+    """
+    if start_date is None or end_date is None:
+        return None, "Los parámetros 'start_date' y 'end_date' son requeridos."
+
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cur = conn.cursor()
         # Construir la consulta con parámetros
         query = f"""
             SELECT DATE({date_column}) AS extraction_date, COUNT(*) AS count
             FROM {table_name}
-            WHERE DATE({date_column}) BETWEEN DATEADD(day, -%s, %s::DATE) AND %s::DATE
+            WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
             GROUP BY DATE({date_column})
             ORDER BY extraction_date DESC
         """
         # Ejecutar la consulta con parámetros
-        cur.execute(query, (days-1, sample_date_str, sample_date_str))
-        results = cur.fetchall()
-        df = pd.DataFrame(results, columns=['extraction_date', 'count'])
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+
+        def load():
+            with redshift_query(conn, 'count'):
+                with phase('execute'):
+                    cur.execute(query, params)
+                with phase('fetch'):
+                    return pd.DataFrame(cur.fetchall(), columns=['extraction_date', 'count'])
+
+        df = query_cache.get_or_load('redshift', query, load, params=params, dataset=table_name)
         return df, None
     except Exception as e:
         return None, str(e)
@@ -162,9 +325,90 @@ def get_record_count_by_date_redshift(table_name, date_column='time_extracted',
         cur.close()
         conn.close()
 
-def get_columns_redshift(table_name):
+@traced("Redshift")
+def get_partition_signatures_redshift(table_name, date_column, start_date, end_date):
+    """
+    Obtiene por fecha el conteo de registros y el máximo de la columna de fecha en Redshift,
+    que sirven de firma para saber si una partición cambió desde la última auditoría.
+    No se usa la caché: la firma debe reflejar el estado actual de la tabla.
+    
+    Returns:
+        tuple: (DataFrame con partition_date, row_count y max_extracted, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cur = conn.cursor()
+        query = f"""
+            SELECT DATE({date_column}) AS partition_date, COUNT(*) AS row_count, MAX({date_column}) AS max_extracted
+            FROM {table_name}
+            WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
+            GROUP BY DATE({date_column})
+            ORDER BY partition_date DESC
+        """
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        with redshift_query(conn, 'count'):
+            with phase('execute'):
+                cur.execute(query, params)
+            with phase('fetch'):
+                df = pd.DataFrame(cur.fetchall(), columns=['partition_date', 'row_count', 'max_extracted'])
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+@traced("Redshift")
+def get_schema_tables_redshift(schema_name):
+    """
+    Lista las tablas de un esquema de Redshift con su tamaño según SVV_TABLE_INFO
+    (las tablas vacías no aparecen en esa vista).
+    
+    Args:
+        schema_name (str): Esquema (schema o database.schema).
+    
+    Returns:
+        tuple: (DataFrame con table_name, row_count y size_mb, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cur = conn.cursor()
+        query = """
+            SELECT "table", tbl_rows, size
+            FROM svv_table_info
+            WHERE "schema" = %s
+            ORDER BY "table"
+        """
+        params = (schema_name.split('.')[-1].lower(),)
+
+        def load():
+            with redshift_query(conn, 'metadata'):
+                with phase('execute'):
+                    cur.execute(query, params)
+                with phase('fetch'):
+                    return pd.DataFrame(cur.fetchall(), columns=['table_name', 'row_count', 'size_mb'])
+
+        df = query_cache.get_or_load('redshift', query, load, params=params, dataset=schema_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+@traced("Redshift")
+def get_schema_columns_redshift(schema_name):
     """
-    Obtiene la estructura de las columnas de una tabla en Redshift.
+    Obtiene el catálogo de columnas de todas las tablas de un esquema en Redshift.
+
+    Returns:
+        tuple: (DataFrame con table_name, column_name y data_type, error)
     """
     conn, error = get_redshift_connection()
     if not conn:
@@ -173,34 +417,84 @@ def get_columns_redshift(table_name):
     try:
         cur = conn.cursor()
         query = sql.SQL("""
-            SELECT column_name, data_type
+            SELECT table_name, column_name, data_type
             FROM information_schema.columns
-            WHERE table_name = %s AND table_schema = %s
-            ORDER BY ordinal_position
+            WHERE table_schema = %s
+            ORDER BY table_name, ordinal_position
         """)
-        # Extraer esquema y tabla
-        parts = table_name.split('.')
-        if len(parts) == 3:
-            _, schema_name, table_name_only = parts
-        elif len(parts) == 2:
-            schema_name, table_name_only = parts
-        elif len(parts) == 1:
-            schema_name = 'public'  # Esquema por defecto en Redshift
-            table_name_only = parts[0]
-        else:
-            return None, "Formato de nombre de tabla inválido"
-        
-        cur.execute(query, (table_name_only.lower(), schema_name.lower()))
-        results = cur.fetchall()
-        df = pd.DataFrame(results, columns=['column_name', 'data_type'])
-        return df, None
+        with redshift_query(conn, 'metadata'):
+            with phase('execute'):
+                cur.execute(query, (schema_name.split('.')[-1].lower(),))
+            with phase('fetch'):
+                return pd.DataFrame(cur.fetchall(), columns=['table_name', 'column_name', 'data_type']), None
     except Exception as e:
         return None, str(e)
     finally:
         cur.close()
         conn.close()
 
-def get_top_frequent_data_redshift(table_name, date_column, sample_date, column, top_n=5):
+@traced("Redshift")
+def get_catalog_signature_redshift(schema_name):
+    """
+    Firma del catálogo de un esquema en Redshift a partir de pg_class y pg_attribute: número de
+    columnas, OID más alto y una suma de tipos y nombres. Cambia al crear, borrar o renombrar
+    tablas o columnas y al modificar un tipo.
+
+    Returns:
+        tuple: (firma, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cur = conn.cursor()
+        query = sql.SQL("""
+            SELECT COUNT(*),
+                   MAX(c.oid::BIGINT),
+                   SUM(a.atttypid::BIGINT + a.atttypmod + LENGTH(a.attname) + LENGTH(c.relname))
+            FROM pg_catalog.pg_attribute a
+            JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+            JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'v') AND a.attnum > 0 AND NOT a.attisdropped
+        """)
+        with redshift_query(conn, 'metadata'):
+            with phase('execute'):
+                cur.execute(query, (schema_name.split('.')[-1].lower(),))
+            with phase('fetch'):
+                column_count, max_oid, checksum = cur.fetchone()
+        return f"{column_count}@{max_oid}@{checksum}", None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+# Catálogo de columnas por esquema, compartido por todo el proceso
+redshift_catalog = CatalogSnapshots(get_schema_columns_redshift, get_catalog_signature_redshift, parse_table_name_redshift)
+
+def get_columns_redshift(table_name):
+    """
+    Obtiene la estructura de las columnas de una tabla en Redshift (de la instantánea del
+    catálogo de su esquema).
+    """
+    return redshift_catalog.columns(table_name)
+
+def top_frequent_query_redshift(table_name, date_column, sample_date, column, top_n=5):
+    """
+    Construye la consulta de los top_n datos más frecuentes de una columna para una fecha.
+    """
+    return f"""
+    SELECT {column} AS value, COUNT(*) AS count
+    FROM {table_name}
+    WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'
+    GROUP BY {column}
+    ORDER BY count DESC
+    LIMIT {top_n};
+    """
+
+@traced("Redshift")
+def get_top_frequent_data_redshift(table_name, date_column, sample_date, column, top_n=5, cache_params=None):
     """
     Obtiene los top_n datos más frecuentes para una columna específica en Redshift para una fecha dada.
     
@@ -210,6 +504,8 @@ def get_top_frequent_data_redshift(table_name, date_column, sample_date, column,
         sample_date (datetime.date): Fecha de muestreo.
         column (str): Nombre de la columna a analizar.
         top_n (int): Número de datos más frecuentes a obtener.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
     
     Returns:
         tuple: (DataFrame, error)
@@ -218,19 +514,368 @@ def get_top_frequent_data_redshift(table_name, date_column, sample_date, column,
     if not conn:
         return None, error
     
-    query = f"""
-    SELECT {column} AS value, COUNT(*) AS count
-    FROM {table_name}
-    WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'
-    GROUP BY {column}
-    ORDER BY count DESC
-    LIMIT {top_n};
+    query = top_frequent_query_redshift(table_name, date_column, sample_date, column, top_n)
+    
+    try:
+        def load():
+            with redshift_query(conn, 'top_frequent'):
+                with phase('execute'):
+                    return pd.read_sql(query, conn)
+
+        df = query_cache.get_or_load('redshift', query, load, params=cache_params, dataset=table_name)
+        conn.close()
+        return df, None
+    except Exception as e:
+        conn.close()
+        return None, str(e)
+
+@traced("Redshift")
+def get_top_frequent_batch_redshift(table_name, date_column, sample_date, columns, top_n=5, cache_params=None):
     """
+    Obtiene los top_n datos más frecuentes de varias columnas en Redshift con una sola consulta.
     
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
+    
+    Returns:
+        tuple: (DataFrame con column_name, value y count, error)
+    """
+    columns_df, error = get_columns_redshift(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    query = top_frequent_batch_query(table_name, date_column, sample_date, columns, top_n, 'redshift', data_types)
+
+    try:
+        def load():
+            with redshift_query(conn, 'top_frequent'):
+                with phase('execute'):
+                    df = pd.read_sql(query, conn)
+            return normalize_frequency_frame(df)
+
+        df = query_cache.get_or_load('redshift', query, load, params=cache_params, dataset=table_name)
+        conn.close()
+        return df, None
+    except Exception as e:
+        conn.close()
+        return None, str(e)
+
+@traced("Redshift")
+def get_approx_top_frequent_redshift(table_name, date_column, sample_date, columns, top_n, settings):
+    """
+    Estima en Redshift los top_n datos más frecuentes de varias columnas. Redshift no tiene un
+    equivalente de APPROX_TOP_K, así que se agrupa una muestra de las filas y se escalan los conteos.
+    
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        settings (ApproximateSettings): Porcentaje de muestreo.
+    
+    Returns:
+        tuple: (DataFrame con column_name, value, count y error_bound, error)
+    """
+    columns_df, error = get_columns_redshift(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    query = top_frequent_batch_query(
+        table_name, date_column, sample_date, columns, top_n, 'redshift', data_types,
+        sample_percent=settings.sample_percent
+    )
+
+    try:
+        def load():
+            with redshift_query(conn, 'top_frequent'):
+                with phase('execute'):
+                    df = pd.read_sql(query, conn)
+            return scale_sampled_counts(normalize_frequency_frame(df), settings.fraction)
+
+        df = query_cache.get_or_load('redshift', query, load, dataset=table_name)
+        conn.close()
+        return df, None
+    except Exception as e:
+        conn.close()
+        return None, str(e)
+
+@traced("Redshift")
+def get_approx_column_stats_redshift(table_name, date_column, sample_date, columns):
+    """
+    Obtiene en Redshift los valores distintos (APPROXIMATE COUNT(DISTINCT)) y la mediana
+    aproximada (APPROXIMATE PERCENTILE_DISC) de las columnas para la fecha de muestreo.
+    
+    Returns:
+        tuple: (DataFrame con column_name, statistic y value, error)
+    """
+    columns_df, error = get_columns_redshift(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    query = approx_column_stats_query(table_name, date_column, sample_date, columns, data_types, 'redshift')
+
+    try:
+        def load():
+            with redshift_query(conn, 'top_frequent'):
+                with phase('execute'):
+                    return pd.read_sql(query, conn)
+
+        df = query_cache.get_or_load('redshift', query, load, dataset=table_name)
+        conn.close()
+        return df, None
+    except Exception as e:
+        conn.close()
+        return None, str(e)
+
+@traced("Redshift")
+def get_column_fingerprint_redshift(table_name, date_column, start_date, end_date, columns, data_types):
+    """
+    Obtiene en Redshift la huella estadística de las columnas (nulos, mínimo, máximo, suma,
+    longitud total y valores distintos aproximados) entre start_date y end_date en una sola lectura.
+    
+    Returns:
+        tuple: (DataFrame con column_name, statistic y value, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    query, specs = fingerprint_query(table_name, date_column, start_date, end_date, columns, data_types, 'redshift')
+
+    try:
+        cur = conn.cursor()
+
+        def load():
+            with redshift_query(conn, 'profile'):
+                with phase('execute'):
+                    cur.execute(query)
+                with phase('fetch'):
+                    return parse_fingerprint(cur.fetchone(), specs)
+
+        df = query_cache.get_or_load('redshift', query, load, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+@traced("Redshift")
+def get_approx_record_count_by_date_redshift(table_name, date_column, start_date, end_date, sample_percent):
+    """
+    Estima en Redshift el conteo de registros por fecha entre start_date y end_date a partir
+    de una muestra de Bernoulli del sample_percent % de las filas.
+    
+    Returns:
+        tuple: (DataFrame con extraction_date, count y error_bound, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    query = approx_count_by_date_query(table_name, date_column, start_date, end_date, 'redshift', sample_percent)
+
+    try:
+        cur = conn.cursor()
+
+        def load():
+            with redshift_query(conn, 'count'):
+                with phase('execute'):
+                    cur.execute(query)
+                with phase('fetch'):
+                    df = pd.DataFrame(cur.fetchall(), columns=['extraction_date', 'count'])
+            return scale_sampled_counts(df, min(sample_percent, 100) / 100)
+
+        df = query_cache.get_or_load('redshift', query, load, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+@traced("Redshift")
+def get_row_diff_data_redshift(table_name, query, cache_params=None):
+    """
+    Ejecuta en Redshift una consulta de la conciliación de filas (scripts/row_diff.py) o del
+    muestreo alineado por clave (scripts/key_sample.py).
+    
+    Args:
+        table_name (str): Nombre completo de la tabla (dataset de la caché).
+        query (str): Consulta de hashes por partición o cubeta, o de filas.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
+    
+    Returns:
+        tuple: (DataFrame, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
     try:
-        df = pd.read_sql(query, conn)
+        def load():
+            with redshift_query(conn, 'row_diff'):
+                with phase('execute'):
+                    return pd.read_sql(query, conn)
+
+        df = query_cache.get_or_load('redshift', query, load, params=cache_params, dataset=table_name)
         conn.close()
         return df, None
     except Exception as e:
         conn.close()
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
+
+@traced("Redshift")
+def stream_query_redshift(query, consume, query_class='stream_diff', itersize=DEFAULT_ITERSIZE):
+    """
+    Ejecuta una consulta en Redshift con un cursor del lado del servidor y entrega su
+    resultado en bloques de hasta `itersize` filas, sin cargarlo completo en memoria ni
+    guardarlo en la caché.
+
+    Args:
+        query (str): Consulta a ejecutar.
+        consume (callable): Recibe cada bloque como pyarrow.RecordBatch; si lanza una excepción
+            la lectura se interrumpe.
+        query_class (str): Clase de la consulta (ver scripts.query_control.QUERY_TIMEOUTS).
+        itersize (int): Filas por viaje al servidor.
+
+    Returns:
+        tuple: (filas leídas, error)
+    """
+    conn, error = get_redshift_connection()
+    if not conn:
+        return None, error
+
+    try:
+        rows = 0
+        with redshift_query(conn, query_class):
+            for batch in iter_record_batches(conn, query, itersize=itersize):
+                rows += batch.num_rows
+                consume(batch)
+        return rows, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        conn.close()
+
+@traced("Redshift")
+def get_table_profile_redshift(
+    table_name, date_column='time_extracted', start_date=None, end_date=None, include_total=True, include_dates=True
+):
+    """
+    Obtiene existencia, conteo total, conteo por fecha y catálogo de columnas de una tabla
+    en Redshift sobre una única conexión.
+
+    Redshift no permite mezclar tablas del catálogo (nodo líder) con tablas de usuario en
+    una misma consulta, así que se envían dos sentencias: el catálogo de columnas (que también
+    indica si la tabla existe) y una sentencia combinada con el total y los conteos por fecha.
+    Si la tabla no existe no se envía la segunda.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        start_date (datetime.date): Primera fecha de la ventana de conteo por fecha.
+        end_date (datetime.date): Última fecha de la ventana de conteo por fecha (incluida).
+        include_total (bool): Si se cuenta el total con COUNT(*); si no, total_records queda
+            en None (p. ej. porque se toma de los metadatos, ver scripts/record_counts.py).
+        include_dates (bool): Si se cuenta por fecha; si no, dates_df queda en None (p. ej. porque
+            se cuenta con la caché de días cerrados, ver scripts/date_counts.py).
+
+    Returns:
+        tuple: (TableProfile, error)
+    """
+    profile = TableProfile(warehouse="Redshift", table_name=table_name)
+    if start_date is None or end_date is None:
+        profile.error = "Los parámetros 'start_date' y 'end_date' son requeridos."
+        return profile, profile.error
+
+    try:
+        schema_name, table_name_only = parse_table_name_redshift(table_name)
+    except ValueError as e:
+        profile.error = str(e)
+        return profile, profile.error
+
+    conn, error = get_redshift_connection()
+    if not conn:
+        profile.error = error
+        return profile, error
+
+    catalog_query = """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = %s
+        ORDER BY ordinal_position
+    """
+    counts_parts = []
+    if include_total:
+        counts_parts.append(f"""
+        SELECT 'total' AS kind, NULL::DATE AS extraction_date, COUNT(*) AS count
+        FROM {table_name}""")
+    if include_dates:
+        counts_parts.append(f"""
+        SELECT 'date' AS kind, DATE({date_column}) AS extraction_date, COUNT(*) AS count
+        FROM {table_name}
+        WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
+        GROUP BY DATE({date_column})""")
+    counts_query = "\n        UNION ALL".join(counts_parts)
+    catalog_params = (table_name_only, schema_name)
+    counts_params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) if include_dates else ()
+    cache_query = catalog_query + counts_query
+    cache_params = catalog_params + counts_params
+    cached = query_cache.get('redshift', cache_query, cache_params)
+    if cached is not None:
+        conn.close()
+        return cached, None
+
+    cur = conn.cursor()
+    try:
+        with redshift_query(conn, 'metadata'):
+            with phase('execute'):
+                cur.execute(catalog_query, catalog_params)
+            with phase('fetch'):
+                profile.columns_df = pd.DataFrame(cur.fetchall(), columns=['column_name', 'data_type'])
+        profile.exists = not profile.columns_df.empty
+        if profile.exists and counts_parts:
+            with redshift_query(conn, 'profile'):
+                with phase('execute'):
+                    cur.execute(counts_query, counts_params)
+                with phase('fetch'):
+                    counts_df = pd.DataFrame(cur.fetchall(), columns=['kind', 'extraction_date', 'count'])
+            if include_total:
+                profile.total_records = int(counts_df.loc[counts_df['kind'] == 'total', 'count'].iloc[0])
+            if include_dates:
+                profile.dates_df = (
+                    counts_df[counts_df['kind'] == 'date'][['extraction_date', 'count']]
+                    .sort_values('extraction_date', ascending=False)
+                    .reset_index(drop=True)
+                )
+        query_cache.put('redshift', cache_query, profile, params=cache_params, dataset=table_name)
+    except Exception as e:
+        profile.error = str(e)
+    finally:
+        cur.close()
+        conn.close()
+    return profile, profile.error
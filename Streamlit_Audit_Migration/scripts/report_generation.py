@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from fpdf import FPDF
 import pandas as pd
+from scripts.date_counts import GRANULARITIES, compare_counts_by_period, first_divergence
+from scripts.catalog_snapshot import compare_column_catalogs
 
 class PDFReport(FPDF):
     def __init__(self, analysis_date, *args, **kwargs):
@@ -150,6 +152,8 @@ class PDFReport(FPDF):
                 )
             else:
                 self.add_text("No se encontraron datos para esta columna.")
+            if data.get('stats') is not None:
+                self.add_table(data['stats'], f"Valores Distintos y Mediana Aproximados de la Columna {column}")
         # Agregar resumen de discrepancias
         discrepant_columns = [col for col, data in frequent_data.items() if data['discrepancy']]
         if discrepant_columns:
@@ -159,6 +163,64 @@ class PDFReport(FPDF):
             self.add_section_title("Resumen de Discrepancias en Datos Más Frecuentes")
             self.add_text("No se encontraron discrepancias en los datos más frecuentes de las columnas analizadas.")
 
+    def add_row_diff_section(self, row_diff, max_rows=50):
+        """
+        Agrega la conciliación de filas al PDF.
+
+        Args:
+            row_diff (RowDiffResult): Resultado de scripts/row_diff.reconcile_rows.
+            max_rows (int, optional): Claves con diferencias que se muestran como máximo.
+        """
+        self.chapter_title("Conciliación de Filas")
+        if row_diff.partitions_df is None:
+            self.add_text(f"No se pudo realizar la conciliación de filas: {row_diff.error}")
+            return
+        self.add_table(
+            row_diff.partitions_df[['partition_date', 'row_count_snowflake', 'row_count_redshift', 'match']],
+            "Conteo y Hash de las Filas por Fecha"
+        )
+        mismatched = row_diff.mismatched_partitions
+        if not mismatched:
+            self.add_text("Las filas de todas las fechas coinciden en ambas bases de datos.")
+            return
+        self.add_text(f"Fechas con filas distintas: {', '.join(mismatched)}.")
+        if row_diff.error:
+            self.add_text(f"Error en la conciliación de filas: {row_diff.error}")
+        if not row_diff.key_columns:
+            self.add_text("No se indicaron columnas clave, por lo que no se localizaron las filas distintas.")
+        elif not row_diff.complete:
+            self.add_text("Las cubetas distintas contienen demasiadas filas para leerlas; no se listan las claves.")
+        if row_diff.diff_df is not None:
+            self.add_table(
+                row_diff.diff_df.head(max_rows),
+                f"Claves con Diferencias ({len(row_diff.diff_df)} en total)"
+            )
+
+    def add_column_fingerprint_section(self, column_fingerprint, max_rows=100):
+        """
+        Agrega la comparación de la huella estadística de las columnas al PDF.
+
+        Args:
+            column_fingerprint (pd.DataFrame): Resultado de scripts/column_fingerprint.compare_fingerprints.
+            max_rows (int, optional): Estadísticas distintas que se muestran como máximo.
+        """
+        self.chapter_title("Huella Estadística de las Columnas")
+        columns = column_fingerprint.loc[column_fingerprint['column_name'] != '*', 'column_name'].nunique()
+        self.add_text(
+            f"Se compararon {len(column_fingerprint)} estadísticas de {columns} columnas (nulos, mínimo, máximo, "
+            "suma, longitud total y valores distintos aproximados) calculadas en una sola lectura por almacén."
+        )
+        mismatches = column_fingerprint[~column_fingerprint['match']]
+        if mismatches.empty:
+            self.add_text("Las huellas de todas las columnas coinciden en ambas bases de datos.")
+            return
+        discrepant = list(dict.fromkeys(mismatches['column_name']))
+        self.add_text(f"Columnas con estadísticas distintas: {', '.join(discrepant)}.")
+        self.add_table(
+            mismatches.head(max_rows).drop(columns='match'),
+            f"Estadísticas Distintas ({len(mismatches)} en total)"
+        )
+
 def generate_audit_report(
     table_name,
     analysis_date,
@@ -170,7 +232,13 @@ def generate_audit_report(
     redshift_dates_df,
     columns_snowflake_df,
     columns_redshift_df,
-    frequent_data=None  # Añadir parámetro para datos frecuentes
+    frequent_data=None,  # Añadir parámetro para datos frecuentes
+    row_diff=None,
+    approximate=None,
+    totals_exact=True,
+    column_fingerprint=None,
+    start_date=None,
+    date_granularity='day'
 ):
     """
     Genera un informe de auditoría en PDF con los datos proporcionados.
@@ -187,6 +255,13 @@ def generate_audit_report(
         columns_snowflake_df (pd.DataFrame): Estructura de columnas en Snowflake.
         columns_redshift_df (pd.DataFrame): Estructura de columnas en Redshift.
         frequent_data (dict): Datos más frecuentes por columna.
+        row_diff (RowDiffResult): Conciliación de filas por hashes.
+        totals_exact (bool): False si los totales son estimados de los metadatos del catálogo.
+        approximate (ApproximateSettings): Modo aproximado; los conteos estimados incluyen su
+            cota de error (error_bound) y se comparan con tolerancia.
+        column_fingerprint (pd.DataFrame): Comparación de la huella estadística de las columnas.
+        start_date (str): Primera fecha de la comparación por fecha ('YYYY-MM-DD'); la última es analysis_date.
+        date_granularity (str): Agrupación de la comparación por fecha: 'day', 'week' o 'month'.
 
     Returns:
         str: Ruta al archivo PDF generado.
@@ -208,6 +283,11 @@ Fecha y Hora de Creación del Informe: **{datetime.now().strftime('%Y-%m-%d %H:%
 A continuación se detallan los resultados de las verificaciones realizadas:
 """
     pdf.chapter_body(summary)
+    if approximate is not None:
+        pdf.add_text(
+            f"{approximate.describe()}. Dos estimaciones coinciden si su diferencia no supera la columna "
+            "error_bound. Este informe no sustituye a una auditoría en modo exacto para la aprobación final."
+        )
 
     # Verificación de Existencia de la Tabla
     pdf.chapter_title("Verificación de Existencia de la Tabla")
@@ -227,67 +307,71 @@ A continuación se detallan los resultados de las verificaciones realizadas:
     if snowflake_total is not None and redshift_total is not None:
         comparison = "idéntica" if snowflake_total == redshift_total else "diferente"
         pdf.add_text(f"La cantidad total de registros en ambas bases de datos es **{comparison}**.")
+        if not totals_exact:
+            pdf.add_text(
+                "Totales estimados: se tomaron de los metadatos del catálogo (ROW_COUNT en Snowflake, "
+                "tbl_rows en Redshift), que coinciden, por lo que no se ejecutó COUNT(*)."
+            )
     else:
         pdf.add_text("No se pudo realizar la comparación de la cantidad total de registros debido a errores en los conteos.")
 
     # Comparación de Registros por Fecha
-    pdf.chapter_title("Comparación de Registros por Fecha (Últimos 5 Días)")
+    period = f" ({start_date} a {analysis_date}, por {GRANULARITIES[date_granularity].lower()})" if start_date else ""
+    pdf.chapter_title(f"Comparación de Registros por Fecha{period}")
     if snowflake_dates_df is not None and redshift_dates_df is not None:
-        # Renombrar columnas para evitar conflictos y facilitar la comparación
-        comparison_dates = pd.merge(
-            snowflake_dates_df.rename(columns={'count': 'count_snowflake'}),
-            redshift_dates_df.rename(columns={'count': 'count_redshift'}),
-            on='extraction_date',
-            how='outer'
-        ).fillna(0)
-        comparison_dates['match'] = comparison_dates['count_snowflake'] == comparison_dates['count_redshift']
+        # Conteos por periodo; los estimados se comparan con su cota de error
+        comparison_dates = compare_counts_by_period(snowflake_dates_df, redshift_dates_df, date_granularity)
+        if approximate is None:
+            comparison_dates = comparison_dates.drop(columns='error_bound')
         pdf.add_table(comparison_dates, "Comparación de Registros por Fecha")
-        if comparison_dates['match'].all():
+        divergence = first_divergence(comparison_dates)
+        if divergence is None:
             pdf.add_text("Los conteos de registros por fecha coinciden en ambas bases de datos.")
         else:
-            pdf.add_text("Existen discrepancias en los conteos de registros por fecha entre Snowflake y Redshift.")
+            pdf.add_text(
+                "Existen discrepancias en los conteos de registros por fecha entre Snowflake y Redshift; "
+                f"el primer periodo distinto empieza el {divergence}."
+            )
     else:
         pdf.add_text("No se pudieron comparar los registros por fecha debido a errores anteriores.")
 
     # Comparación de Columnas
     pdf.chapter_title("Comparación de Columnas entre Snowflake y Redshift")
-    # Columnas Exclusivas en Snowflake
-    columns_only_in_snowflake = set(columns_snowflake_df['column_name'].str.upper()) - set(columns_redshift_df['column_name'].str.upper())
-    columns_only_in_redshift = set(columns_redshift_df['column_name'].str.upper()) - set(columns_snowflake_df['column_name'].str.upper())
-
-    # Columnas en ambas pero con tipos de datos diferentes
-    common_columns = set(columns_snowflake_df['column_name'].str.upper()) & set(columns_redshift_df['column_name'].str.upper())
-    type_mismatches = []
-    for col in common_columns:
-        snowflake_type = columns_snowflake_df[columns_snowflake_df['column_name'].str.upper() == col]['data_type'].values[0].lower()
-        redshift_type = columns_redshift_df[columns_redshift_df['column_name'].str.upper() == col]['data_type'].values[0].lower()
-        if snowflake_type != redshift_type:
-            type_mismatches.append((col, snowflake_type, redshift_type))
-
-    # Crear DataFrame de Mismatches
-    if type_mismatches:
-        mismatch_df = pd.DataFrame(type_mismatches, columns=['Columna', 'Tipo en Snowflake', 'Tipo en Redshift'])
-    else:
-        mismatch_df = pd.DataFrame(columns=['Columna', 'Tipo en Snowflake', 'Tipo en Redshift'])
-
-    # Resumen de Comparaciones
-    summary_comparisons = f"""
+    if columns_snowflake_df is not None and columns_redshift_df is not None:
+        # Columnas exclusivas de cada almacén y columnas comunes con tipos de datos diferentes
+        differences = compare_column_catalogs(columns_snowflake_df, columns_redshift_df)
+        columns_only_in_snowflake = differences['only_in_snowflake']
+        columns_only_in_redshift = differences['only_in_redshift']
+        mismatch_df = differences['type_mismatches']
+
+        # Resumen de Comparaciones
+        summary_comparisons = f"""
 - **Columnas exclusivas en Snowflake:** {', '.join(columns_only_in_snowflake) if columns_only_in_snowflake else 'Ninguna'}.
 - **Columnas exclusivas en Redshift:** {', '.join(columns_only_in_redshift) if columns_only_in_redshift else 'Ninguna'}.
 """
-    pdf.chapter_body(summary_comparisons)
+        pdf.chapter_body(summary_comparisons)
 
-    # Añadir Tabla de Mismatches
-    if not mismatch_df.empty:
-        pdf.add_table(mismatch_df, "Columnas con Tipos de Datos Diferentes")
-        pdf.add_text("Se han encontrado discrepancias en los tipos de datos de las columnas comunes.")
+        # Añadir Tabla de Mismatches
+        if not mismatch_df.empty:
+            pdf.add_table(mismatch_df, "Columnas con Tipos de Datos Diferentes")
+            pdf.add_text("Se han encontrado discrepancias en los tipos de datos de las columnas comunes.")
+        else:
+            pdf.add_text("No se encontraron discrepancias en los tipos de datos de las columnas comunes.")
     else:
-        pdf.add_text("No se encontraron discrepancias en los tipos de datos de las columnas comunes.")
+        pdf.add_text("No se pudieron comparar las columnas debido a errores anteriores.")
 
     # Análisis de Datos Más Frecuentes
     if frequent_data:
         pdf.add_frequent_data_section(frequent_data, top_n=3)
 
+    # Huella Estadística de las Columnas
+    if column_fingerprint is not None:
+        pdf.add_column_fingerprint_section(column_fingerprint)
+
+    # Conciliación de Filas
+    if row_diff is not None:
+        pdf.add_row_diff_section(row_diff)
+
     # Crear la carpeta "audit_reports" si no existe
     os.makedirs("audit_reports", exist_ok=True)
 
@@ -0,0 +1,410 @@
+# scripts/row_diff.py
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+
+from scripts.audit_store import audit_store, partition_signatures
+from scripts.frequency_profile import value_expression
+from scripts.snowflake_connection import (
+    get_columns_snowflake, get_row_diff_data_snowflake, get_partition_signatures_snowflake
+)
+from scripts.redshift_connection import (
+    get_columns_redshift, get_row_diff_data_redshift, get_partition_signatures_redshift
+)
+from scripts.task_executor import task_executor
+
+# Conciliación de filas entre Snowflake y Redshift por hashes jerárquicos. Cada fila se
+# normaliza a texto con el mismo formato en ambos almacenes y se resume con MD5; la suma de
+# los hashes de una partición no depende del orden de las filas. Primero se compara la suma
+# por fecha; las fechas que no coinciden se dividen por el prefijo del MD5 de la clave (16
+# cubetas por nivel) hasta que las cubetas distintas contienen pocas filas, y sólo esas
+# filas se leen para identificar las claves que difieren. Los hashes por fecha se guardan en
+# scripts/audit_store.py y sólo se recalculan para las fechas cuya firma cambió.
+
+ROW_DIFF_MAX_ROWS = int(os.getenv('ROW_DIFF_MAX_ROWS', 1000))
+ROW_DIFF_MAX_DEPTH = int(os.getenv('ROW_DIFF_MAX_DEPTH', 6))
+ROW_DIFF_MAX_BUCKETS = int(os.getenv('ROW_DIFF_MAX_BUCKETS', 4096))
+NULL_MARKER = '#NULL#'
+HASH_FIELDS = ['row_count', 'row_hash']
+
+
+@dataclass
+class RowDiffResult:
+    """
+    Resultado de la conciliación de filas de una tabla.
+
+    Attributes:
+        table_name (str): Nombre completo de la tabla.
+        key_columns (list): Columnas clave usadas para dividir las particiones.
+        columns (list): Columnas comunes incluidas en el hash de cada fila.
+        partitions_df (pd.DataFrame): Conteo y hash por fecha en ambos almacenes y si coinciden.
+        reused_partitions (list): Fechas cuyo hash se tomó de una auditoría anterior.
+        levels_df (pd.DataFrame): Particiones o cubetas comparadas y distintas en cada nivel.
+        diff_df (pd.DataFrame): Claves que difieren y su estado ('solo_snowflake',
+            'solo_redshift' o 'diferente').
+        rows_snowflake (pd.DataFrame): Filas normalizadas de Snowflake de las claves que difieren.
+        rows_redshift (pd.DataFrame): Filas normalizadas de Redshift de las claves que difieren.
+        complete (bool): False si las cubetas distintas tenían demasiadas filas para leerlas.
+        error (str): Mensaje de error, si lo hubo.
+    """
+    table_name: str
+    key_columns: List[str] = field(default_factory=list)
+    columns: List[str] = field(default_factory=list)
+    partitions_df: Optional[pd.DataFrame] = None
+    reused_partitions: List[str] = field(default_factory=list)
+    levels_df: Optional[pd.DataFrame] = None
+    diff_df: Optional[pd.DataFrame] = None
+    rows_snowflake: Optional[pd.DataFrame] = None
+    rows_redshift: Optional[pd.DataFrame] = None
+    complete: bool = True
+    error: Optional[str] = None
+
+    @property
+    def mismatched_partitions(self):
+        """Fechas cuyo conteo o hash no coincide."""
+        if self.partitions_df is None:
+            return []
+        return self.partitions_df.loc[~self.partitions_df['match'], 'partition_date'].tolist()
+
+
+def _row_expression(columns, data_types, warehouse):
+    # Texto normalizado de la fila: valores separados por '|' y nulos como NULL_MARKER
+    return " || '|' || ".join(
+        f"COALESCE({value_expression(column, data_types.get(column.lower()), warehouse)}, '{NULL_MARKER}')"
+        for column in columns
+    )
+
+
+def key_hash_expression(key_columns, data_types, warehouse):
+    """MD5 en hexadecimal de la clave normalizada: el mismo valor en ambos almacenes para la misma clave."""
+    return f"MD5({_row_expression(key_columns, data_types, warehouse)})"
+
+
+def _hash_to_number(expression, warehouse):
+    # Los primeros 15 dígitos hexadecimales del MD5 como número (60 bits), para poder sumarlos
+    if warehouse == 'snowflake':
+        return f"TO_NUMBER(SUBSTRING(MD5({expression}), 1, 15), 'XXXXXXXXXXXXXXX')"
+    return f"CAST(STRTOL(SUBSTRING(MD5({expression}), 1, 15), 16) AS DECIMAL(38, 0))"
+
+
+def _bucket_filter(date_column, key_hash, buckets, depth):
+    # Condición de las cubetas de profundidad `depth` a dividir: {fecha: [prefijos]}
+    conditions = []
+    for partition_date, prefixes in buckets.items():
+        condition = f"DATE({date_column}) = '{partition_date}'"
+        if depth > 0:
+            values = ", ".join(f"'{prefix}'" for prefix in prefixes)
+            condition += f" AND SUBSTRING({key_hash}, 1, {depth}) IN ({values})"
+        conditions.append(f"({condition})")
+    return "\n        OR ".join(conditions)
+
+
+def partition_hash_query(table_name, date_column, partition_dates, columns, data_types, warehouse):
+    """Consulta del conteo y la suma de hashes de las filas de las fechas indicadas ('YYYY-MM-DD')."""
+    row_hash = _hash_to_number(_row_expression(columns, data_types, warehouse), warehouse)
+    dates = ", ".join(f"'{partition_date}'" for partition_date in partition_dates)
+    return f"""
+    SELECT DATE({date_column}) AS partition_date, COUNT(*) AS row_count, SUM({row_hash}) AS row_hash
+    FROM {table_name}
+    WHERE DATE({date_column}) IN ({dates})
+    GROUP BY DATE({date_column})
+    ORDER BY partition_date;
+    """
+
+
+def bucket_hash_query(table_name, date_column, buckets, depth, columns, key_columns, data_types, warehouse):
+    """
+    Consulta del conteo y la suma de hashes por fecha y prefijo de `depth` dígitos del MD5 de la
+    clave, limitada a las cubetas de profundidad depth - 1 indicadas en `buckets`.
+    """
+    row_hash = _hash_to_number(_row_expression(columns, data_types, warehouse), warehouse)
+    key_hash = key_hash_expression(key_columns, data_types, warehouse)
+    return f"""
+    SELECT
+        DATE({date_column}) AS partition_date,
+        SUBSTRING({key_hash}, 1, {depth}) AS bucket,
+        COUNT(*) AS row_count,
+        SUM({row_hash}) AS row_hash
+    FROM {table_name}
+    WHERE {_bucket_filter(date_column, key_hash, buckets, depth - 1)}
+    GROUP BY DATE({date_column}), SUBSTRING({key_hash}, 1, {depth});
+    """
+
+
+def bucket_rows_query(table_name, date_column, buckets, depth, columns, key_columns, data_types, warehouse):
+    """Consulta de las filas normalizadas y su hash en las cubetas indicadas."""
+    values = ",\n        ".join(
+        f"{value_expression(column, data_types.get(column.lower()), warehouse)} AS {column}"
+        for column in columns
+    )
+    key_hash = key_hash_expression(key_columns, data_types, warehouse)
+    return f"""
+    SELECT
+        DATE({date_column}) AS partition_date,
+        {values},
+        MD5({_row_expression(columns, data_types, warehouse)}) AS row_hash
+    FROM {table_name}
+    WHERE {_bucket_filter(date_column, key_hash, buckets, depth)};
+    """
+
+
+def _normalize_hashes(df, keys):
+    df = df.rename(columns=lambda x: x.lower()).reindex(columns=keys + HASH_FIELDS)
+    df['partition_date'] = df['partition_date'].astype(str)
+    df['row_count'] = pd.to_numeric(df['row_count']).astype('int64')
+    # Las sumas superan int64: se comparan como enteros de Python en texto
+    df['row_hash'] = df['row_hash'].map(lambda v: None if pd.isna(v) else str(int(v)))
+    return df[keys + HASH_FIELDS]
+
+
+def compare_hashes(df_snowflake, df_redshift, keys):
+    """
+    Compara conteos y sumas de hashes de ambos almacenes.
+
+    Returns:
+        pd.DataFrame: `keys`, row_count y row_hash de cada almacén y match.
+    """
+    comparison_df = pd.merge(
+        _normalize_hashes(df_snowflake, keys),
+        _normalize_hashes(df_redshift, keys),
+        on=keys,
+        how='outer',
+        suffixes=('_snowflake', '_redshift')
+    )
+    counts = ['row_count_snowflake', 'row_count_redshift']
+    comparison_df[counts] = comparison_df[counts].fillna(0).astype('int64')
+    comparison_df['match'] = (
+        (comparison_df['row_count_snowflake'] == comparison_df['row_count_redshift'])
+        & (comparison_df['row_hash_snowflake'] == comparison_df['row_hash_redshift'])
+    )
+    return comparison_df.sort_values(keys).reset_index(drop=True)
+
+
+def compare_rows(rows_snowflake, rows_redshift, key_columns):
+    """
+    Compara las filas normalizadas de ambos almacenes por fecha y clave.
+
+    Returns:
+        pd.DataFrame: partition_date, columnas clave y estado de las claves que difieren.
+    """
+    keys = ['partition_date'] + key_columns
+    merged = pd.merge(
+        rows_snowflake[keys + ['row_hash']],
+        rows_redshift[keys + ['row_hash']],
+        on=keys,
+        how='outer',
+        suffixes=('_snowflake', '_redshift'),
+        indicator=True
+    )
+    merged['status'] = 'diferente'
+    merged.loc[merged['_merge'] == 'left_only', 'status'] = 'solo_snowflake'
+    merged.loc[merged['_merge'] == 'right_only', 'status'] = 'solo_redshift'
+    differs = (merged['_merge'] != 'both') | (merged['row_hash_snowflake'] != merged['row_hash_redshift'])
+    return merged.loc[differs, keys + ['status']].sort_values(keys).reset_index(drop=True)
+
+
+def _normalize_rows(df, columns):
+    df = df.rename(columns=lambda x: x.lower()).reindex(columns=['partition_date'] + columns + ['row_hash'])
+    df['partition_date'] = df['partition_date'].astype(str)
+    return df
+
+
+def _run_both(snowflake_func, redshift_func, on_wait):
+    results = task_executor.run(
+        {'snowflake': snowflake_func, 'redshift': redshift_func}, cancel_on_failure=True, on_wait=on_wait
+    )
+    (df_snowflake, error_snowflake), (df_redshift, error_redshift) = results['snowflake'], results['redshift']
+    if error_snowflake or error_redshift:
+        raise RuntimeError(f"Snowflake: {error_snowflake}" if error_snowflake else f"Redshift: {error_redshift}")
+    return df_snowflake, df_redshift
+
+
+def _run_pair(table_name, queries, on_wait, cache_params=None):
+    return _run_both(
+        lambda: get_row_diff_data_snowflake(table_name, queries['snowflake'], cache_params),
+        lambda: get_row_diff_data_redshift(table_name, queries['redshift'], cache_params),
+        on_wait
+    )
+
+
+def _check_name(date_column, columns, data_types):
+    # El hash de una fila depende de las columnas y sus tipos: forman parte de la comprobación
+    definition = repr([(column, data_types['snowflake'].get(column), data_types['redshift'].get(column)) for column in columns])
+    return f"row_hash:{date_column.lower()}:{hashlib.md5(definition.encode('utf-8')).hexdigest()}"
+
+
+def _partition_hashes(table_name, date_column, start_date, end_date, columns, data_types, on_wait):
+    # Hashes por fecha: los de fechas con la firma sin cambios se toman del almacén de auditorías
+    df_snowflake, df_redshift = _run_both(
+        lambda: get_partition_signatures_snowflake(table_name, date_column, start_date, end_date),
+        lambda: get_partition_signatures_redshift(table_name, date_column, start_date, end_date),
+        on_wait
+    )
+    signatures = partition_signatures(df_snowflake, df_redshift)
+    check_name = _check_name(date_column, columns, data_types)
+    stale, stored = audit_store.plan(table_name, check_name, signatures)
+
+    frames = [pd.DataFrame(list(stored.values()))] if stored else []
+    if stale:
+        queries = {
+            warehouse: partition_hash_query(table_name, date_column, stale, columns, data_types[warehouse], warehouse)
+            for warehouse in ('snowflake', 'redshift')
+        }
+        # Las firmas forman parte de la clave de caché: los hashes que se guardan con la firma
+        # nueva no pueden salir de la caché de cuando la partición tenía otro contenido
+        cache_params = {partition_date: signatures[partition_date] for partition_date in stale}
+        fresh = compare_hashes(*_run_pair(table_name, queries, on_wait, cache_params), ['partition_date'])
+        audit_store.put(table_name, check_name, {
+            row['partition_date']: (signatures[row['partition_date']], row)
+            for row in json.loads(fresh.to_json(orient='records'))
+            if row['partition_date'] in signatures
+        })
+        frames.append(fresh)
+
+    if not frames:
+        return compare_hashes(pd.DataFrame(), pd.DataFrame(), ['partition_date']), [], signatures
+    partitions_df = pd.concat(frames, ignore_index=True).sort_values('partition_date').reset_index(drop=True)
+    return partitions_df, sorted(stored), signatures
+
+
+def common_columns(table_name, on_wait=None):
+    """
+    Columnas comunes de la tabla en ambos almacenes.
+
+    Returns:
+        tuple: (columnas en minúsculas en el orden del catálogo de Redshift,
+        {'snowflake': tipos por columna, 'redshift': tipos por columna})
+    """
+    results = task_executor.run({
+        'snowflake': lambda: get_columns_snowflake(table_name),
+        'redshift': lambda: get_columns_redshift(table_name),
+    }, on_wait=on_wait)
+    (columns_snowflake, error_snowflake), (columns_redshift, error_redshift) = results['snowflake'], results['redshift']
+    if columns_snowflake is None or columns_redshift is None:
+        raise RuntimeError(f"Snowflake: {error_snowflake}" if columns_snowflake is None else f"Redshift: {error_redshift}")
+    # Columnas comunes en el orden del catálogo de Redshift; los nombres en minúsculas
+    snowflake_names = set(columns_snowflake['column_name'].str.lower())
+    columns = [c.lower() for c in columns_redshift['column_name'] if c.lower() in snowflake_names]
+    data_types = {
+        'snowflake': dict(zip(columns_snowflake['column_name'].str.lower(), columns_snowflake['data_type'])),
+        'redshift': dict(zip(columns_redshift['column_name'].str.lower(), columns_redshift['data_type'])),
+    }
+    return columns, data_types
+
+
+def _bucket_rows(mismatched):
+    return int(mismatched[['row_count_snowflake', 'row_count_redshift']].max(axis=1).sum())
+
+
+def _buckets_of(mismatched, depth):
+    # {fecha: [prefijos]} de las cubetas distintas
+    if depth == 0:
+        return {partition_date: [''] for partition_date in mismatched['partition_date']}
+    return mismatched.groupby('partition_date')['bucket'].apply(list).to_dict()
+
+
+def reconcile_rows(
+    table_name,
+    date_column,
+    start_date,
+    end_date,
+    key_columns=None,
+    max_rows=ROW_DIFF_MAX_ROWS,
+    max_depth=ROW_DIFF_MAX_DEPTH,
+    max_buckets=ROW_DIFF_MAX_BUCKETS,
+    on_wait=None
+):
+    """
+    Concilia las filas de una tabla entre Snowflake y Redshift para un rango de fechas.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha que define las particiones.
+        start_date (datetime.date): Primera fecha del rango.
+        end_date (datetime.date): Última fecha del rango.
+        key_columns (list): Columnas que identifican una fila. Sin clave sólo se comparan las fechas.
+        max_rows (int): Filas distintas a partir de las cuales se sigue dividiendo en cubetas
+            en lugar de leer las filas.
+        max_depth (int): Dígitos máximos del prefijo de las cubetas.
+        max_buckets (int): Cubetas máximas por consulta.
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+
+    Returns:
+        RowDiffResult: Resultado de la conciliación (con `error` si algo falló).
+    """
+    key_columns = [c.strip().lower() for c in (key_columns or []) if c.strip()]
+    result = RowDiffResult(table_name=table_name, key_columns=key_columns)
+    levels = []
+    try:
+        columns, data_types = common_columns(table_name, on_wait)
+        result.columns = columns
+        missing = [c for c in key_columns if c not in columns]
+        if not columns or missing:
+            result.error = (
+                f"Columnas clave inexistentes en alguno de los almacenes: {', '.join(missing)}"
+                if missing else "La tabla no tiene columnas comunes en ambos almacenes."
+            )
+            return result
+
+        result.partitions_df, result.reused_partitions, signatures = _partition_hashes(
+            table_name, date_column, start_date, end_date, columns, data_types, on_wait
+        )
+        mismatched = result.partitions_df[~result.partitions_df['match']]
+        levels.append({'depth': 0, 'compared': len(result.partitions_df), 'mismatched': len(mismatched), 'rows': _bucket_rows(mismatched)})
+
+        if mismatched.empty or not key_columns:
+            result.complete = mismatched.empty
+            return result
+
+        # Dividir las cubetas distintas hasta que contengan pocas filas
+        depth = 0
+        while (
+            _bucket_rows(mismatched) > max_rows
+            and depth < max_depth
+            and len(mismatched) * 16 <= max_buckets
+        ):
+            buckets = _buckets_of(mismatched, depth)
+            depth += 1
+            queries = {
+                warehouse: bucket_hash_query(table_name, date_column, buckets, depth, columns, key_columns, data_types[warehouse], warehouse)
+                for warehouse in ('snowflake', 'redshift')
+            }
+            df_snowflake, df_redshift = _run_pair(table_name, queries, on_wait, signatures)
+            level = compare_hashes(df_snowflake, df_redshift, ['partition_date', 'bucket'])
+            previous_rows = _bucket_rows(mismatched)
+            mismatched = level[~level['match']]
+            levels.append({'depth': depth, 'compared': len(level), 'mismatched': len(mismatched), 'rows': _bucket_rows(mismatched)})
+            if mismatched.empty or _bucket_rows(mismatched) >= previous_rows:
+                # Sin cubetas distintas o sin mejora: dividir más no reduce las filas a leer
+                break
+
+        if mismatched.empty:
+            return result
+        if _bucket_rows(mismatched) > max_rows:
+            result.complete = False
+            return result
+
+        # Leer sólo las filas de las cubetas distintas
+        buckets = _buckets_of(mismatched, depth)
+        queries = {
+            warehouse: bucket_rows_query(table_name, date_column, buckets, depth, columns, key_columns, data_types[warehouse], warehouse)
+            for warehouse in ('snowflake', 'redshift')
+        }
+        df_snowflake, df_redshift = _run_pair(table_name, queries, on_wait, signatures)
+        rows_snowflake, rows_redshift = _normalize_rows(df_snowflake, columns), _normalize_rows(df_redshift, columns)
+        result.diff_df = compare_rows(rows_snowflake, rows_redshift, key_columns)
+
+        keys = ['partition_date'] + key_columns
+        differing = result.diff_df[keys]
+        result.rows_snowflake = rows_snowflake.merge(differing, on=keys).drop(columns='row_hash')
+        result.rows_redshift = rows_redshift.merge(differing, on=keys).drop(columns='row_hash')
+    except Exception as e:
+        result.error = str(e)
+    finally:
+        result.levels_df = pd.DataFrame(levels, columns=['depth', 'compared', 'mismatched', 'rows'])
+    return result
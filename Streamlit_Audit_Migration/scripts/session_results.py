@@ -0,0 +1,102 @@
+# scripts/session_results.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Resultados de las comprobaciones de una sesión de la app, por (tabla, columna de fecha, fecha
+# de muestreo). Cada sección guarda aquí lo que consultó y el informe los reutiliza, de modo que
+# "Generar Informe" sólo consulta lo que falta. Los resultados son de la sesión (no del proceso):
+# cada usuario ve los suyos, y caducan tras SESSION_RESULTS_TTL segundos.
+
+SESSION_RESULTS_TTL = float(os.getenv('SESSION_RESULTS_TTL', 1800))
+SESSION_RESULTS_MAX_KEYS = int(os.getenv('SESSION_RESULTS_MAX_KEYS', 20))
+
+# Comprobaciones guardadas
+EXISTS = 'exists'
+TOTAL_COUNTS = 'total_counts'
+COLUMNS = 'columns'
+
+
+def mode_key(approximate):
+    """Identifica el modo de auditoría: los resultados aproximados no sustituyen a los exactos."""
+    if approximate is None:
+        return 'exacto'
+    return f"aproximado:{approximate.sample_percent:g}:{approximate.top_k_counters}"
+
+
+def records_by_date_check(days, approximate=None):
+    return f"records_by_date:{days}:{mode_key(approximate)}"
+
+
+def top_frequent_check(top_n, approximate=None):
+    return f"top_frequent:{top_n}:{mode_key(approximate)}"
+
+
+def column_fingerprint_check(days):
+    return f"column_fingerprint:{days}"
+
+
+def row_diff_check(days, key_columns):
+    return f"row_diff:{days}:{','.join(c.lower() for c in key_columns or [])}"
+
+
+class SessionResults:
+    """
+    Resultados de una sesión por (tabla, columna de fecha, fecha de muestreo) y comprobación.
+
+    Args:
+        ttl (float): Segundos que un resultado se considera vigente.
+        max_keys (int): Combinaciones de tabla y fechas que se conservan (las menos usadas se descartan).
+    """
+
+    def __init__(self, ttl=SESSION_RESULTS_TTL, max_keys=SESSION_RESULTS_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    @staticmethod
+    def _key(table_name, date_column, sample_date):
+        return table_name.lower(), (date_column or '').lower(), sample_date.isoformat()
+
+    def get(self, table_name, date_column, sample_date, check):
+        """Devuelve el resultado guardado de la comprobación, o None si no existe o caducó."""
+        key = self._key(table_name, date_column, sample_date)
+        with self._lock:
+            checks = self._results.get(key)
+            if checks is None or check not in checks:
+                return None
+            stored_at, value = checks[check]
+            if time.monotonic() - stored_at > self.ttl:
+                del checks[check]
+                return None
+            self._results.move_to_end(key)
+            return value
+
+    def put(self, table_name, date_column, sample_date, check, value):
+        """Guarda el resultado de una comprobación."""
+        key = self._key(table_name, date_column, sample_date)
+        with self._lock:
+            self._results.setdefault(key, {})[check] = (time.monotonic(), value)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_keys:
+                self._results.popitem(last=False)
+
+    def checks(self, table_name, date_column, sample_date):
+        """Comprobaciones guardadas y vigentes de la tabla y fechas indicadas."""
+        key = self._key(table_name, date_column, sample_date)
+        with self._lock:
+            now = time.monotonic()
+            return sorted(
+                check for check, (stored_at, _) in self._results.get(key, {}).items()
+                if now - stored_at <= self.ttl
+            )
+
+    def invalidate(self, table_name=None):
+        """Elimina los resultados de una tabla (o todos); devuelve cuántos se eliminaron."""
+        with self._lock:
+            keys = [key for key in self._results if table_name is None or key[0] == table_name.lower()]
+            removed = sum(len(self._results.pop(key)) for key in keys)
+        return removed
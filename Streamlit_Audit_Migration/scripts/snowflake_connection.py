@@ -1,28 +1,183 @@
 # scripts/snowflake_connection.py
 
 import snowflake.connector
+import math
 import os
+import time
 from dotenv import load_dotenv
 import pandas as pd
+from scripts.connection_pool import ConnectionPool, pool_settings_from_env
+from scripts.table_profile import TableProfile
+from scripts.snowflake_fetch import fetch_dataframe, iter_arrow_batches
+from scripts.query_cache import query_cache
+from scripts.catalog_snapshot import CatalogSnapshots
+from scripts.column_fingerprint import fingerprint_query, parse_fingerprint
+from scripts.frequency_profile import top_frequent_batch_query, normalize_frequency_frame
+from scripts.approximate_profile import (
+    approx_top_k_query, parse_approx_top_k, approx_column_stats_query, approx_count_by_date_query,
+    scale_sampled_counts
+)
+from scripts.query_timing import traced, phase, add_query_id
+from scripts.query_control import (
+    query_tracker, statement_timeout, timeout_message, QueryCancelledError, QueryTimeoutError
+)
 
 # Cargar variables de entorno
 load_dotenv()
 
+def _connect_snowflake():
+    return snowflake.connector.connect(
+        user=os.getenv('USER_SNOW'),
+        password=os.getenv('PASSWORD_SNOW'),
+        account=os.getenv('ACCOUNT_SNOW'),
+        warehouse=os.getenv('WAREHOUSE_SNOW'),
+        database=os.getenv('DATABASE_SNOW'),
+        schema=os.getenv('SCHEMA_SNOW'),
+        # Conservar NUMBER con escala como Decimal al leer por Arrow, igual que Redshift
+        arrow_number_to_decimal=True
+    )
+
+def _ping_snowflake(conn):
+    cs = conn.cursor()
+    try:
+        cs.execute("SELECT 1")
+    finally:
+        cs.close()
+
+# Pool de conexiones compartido por todo el proceso
+snowflake_pool = ConnectionPool(
+    _connect_snowflake,
+    name="Snowflake",
+    is_closed=lambda conn: conn.is_closed(),
+    ping=_ping_snowflake,
+    **pool_settings_from_env('SNOWFLAKE')
+)
+
 def get_snowflake_connection():
+    """
+    Obtiene una conexión del pool de Snowflake.
+    Al llamar a conn.close() la conexión se devuelve al pool en lugar de cerrarse.
+    """
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('USER_SNOW'),
-            password=os.getenv('PASSWORD_SNOW'),
-            account=os.getenv('ACCOUNT_SNOW'),
-            warehouse=os.getenv('WAREHOUSE_SNOW'),
-            database=os.getenv('DATABASE_SNOW'),
-            schema=os.getenv('SCHEMA_SNOW')
-        )
+        with phase('connect'):
+            conn = snowflake_pool.acquire()
         return conn, None
     except Exception as e:
         print(f"Error al conectar con Snowflake: {e}")
         return None, str(e)
 
+def _cancel_snowflake_query(query_id):
+    # Conexión nueva y no del pool: con el pool lleno la cancelación no podría esperar su turno,
+    # y el hilo que cancela puede tener prestada la conexión ocupada
+    conn = _connect_snowflake()
+    try:
+        cs = conn.cursor()
+        try:
+            cs.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+        finally:
+            cs.close()
+    finally:
+        conn.close()
+
+def _cancel_snowflake_session(session_id):
+    # Cada conexión del pool la usa un solo hilo a la vez: cancelar las consultas de su
+    # sesión cancela sólo la consulta en curso. La cancelación va por una conexión nueva,
+    # como en _cancel_snowflake_query
+    conn = _connect_snowflake()
+    try:
+        cs = conn.cursor()
+        try:
+            cs.execute("SELECT SYSTEM$CANCEL_ALL_QUERIES(%s)", (session_id,))
+        finally:
+            cs.close()
+    finally:
+        conn.close()
+
+def execute_snowflake(cs, query, params=None, query_class=None, **kwargs):
+    """
+    Ejecuta una consulta en Snowflake con el tiempo límite de su clase (el conector la cancela
+    en el servidor si lo supera). Mientras está en curso se registra con el ID de la sesión,
+    de modo que se puede cancelar sin consultar su estado ni releer el resultado.
+
+    Args:
+        cs (SnowflakeCursor): Cursor sobre el que se ejecuta la consulta.
+        query (str): Consulta a ejecutar.
+        params (tuple, optional): Parámetros de la consulta.
+        query_class (str): Clase de la consulta (ver scripts.query_control.QUERY_TIMEOUTS).
+        **kwargs: Argumentos adicionales de execute (p. ej. num_statements).
+
+    Returns:
+        SnowflakeCursor: El mismo cursor, listo para leer el resultado.
+
+    Raises:
+        QueryCancelledError: Si la consulta se canceló porque su resultado ya no se necesita.
+        QueryTimeoutError: Si la consulta superó el tiempo límite.
+    """
+    timeout = statement_timeout(query_class)
+    timeout = math.ceil(timeout) if timeout else None
+    started = time.monotonic()
+    with phase('execute'):
+        session_id = cs.connection.session_id
+        with query_tracker.track("Snowflake", session_id, _cancel_snowflake_session, query_class) as handle:
+            try:
+                cs.execute(query, params, timeout=timeout, **kwargs)
+            except snowflake.connector.ProgrammingError as e:
+                if handle.cancelled:
+                    raise QueryCancelledError(f"Consulta de la sesión {session_id} cancelada") from e
+                if timeout and time.monotonic() - started >= timeout:
+                    raise QueryTimeoutError(timeout_message(query_class, timeout)) from e
+                raise
+            finally:
+                if cs.sfqid:
+                    add_query_id(cs.sfqid)
+        if handle.cancelled:
+            raise QueryCancelledError(f"Consulta {cs.sfqid} cancelada")
+    return cs
+
+def snowflake_query_finished(conn, handle, deadline=None):
+    """
+    Consulta el estado de una consulta asíncrona registrada en query_tracker.
+
+    Args:
+        conn: Conexión de Snowflake sobre la que se envió la consulta.
+        handle (InFlightQuery): Registro de la consulta.
+        deadline (float): Instante límite (time.monotonic()) o None.
+
+    Returns:
+        bool: True si la consulta terminó.
+
+    Raises:
+        QueryCancelledError: Si se solicitó su cancelación.
+        QueryTimeoutError: Si se superó el instante límite (la consulta se cancela en el servidor).
+    """
+    try:
+        running = conn.is_still_running(conn.get_query_status_throw_if_error(handle.query_id))
+    except snowflake.connector.ProgrammingError as e:
+        if handle.cancelled:
+            raise QueryCancelledError(f"Consulta {handle.query_id} cancelada") from e
+        raise
+    if handle.cancelled:
+        raise QueryCancelledError(f"Consulta {handle.query_id} cancelada")
+    if running and deadline is not None and time.monotonic() > deadline:
+        handle.cancel()
+        raise QueryTimeoutError(timeout_message(handle.query_class, statement_timeout(handle.query_class)))
+    return not running
+
+def parse_table_name_snowflake(full_table_name):
+    """
+    Separa full_table_name en (esquema, tabla) usando el esquema por defecto de la conexión
+    cuando no se indica. Lanza ValueError si el formato es inválido.
+    """
+    parts = full_table_name.split('.')
+    if len(parts) == 1:
+        return os.getenv('SCHEMA_SNOW'), parts[0]
+    elif len(parts) == 2:
+        return parts[0], parts[1]
+    elif len(parts) == 3:
+        return parts[1], parts[2]
+    raise ValueError("Formato de nombre de tabla inválido")
+
+@traced("Snowflake")
 def check_table_exists_snowflake(full_table_name):
     """
     Verifica si una tabla existe en Snowflake.
@@ -39,21 +194,10 @@ def check_table_exists_snowflake(full_table_name):
         cs = conn.cursor()
         
         # Construir la consulta para obtener la información de la tabla
-        parts = full_table_name.split('.')
-        if len(parts) == 1:
-            # Solo nombre de la tabla
-            table_name = parts[0]
-            schema_name = os.getenv('SCHEMA_SNOW')
-            database_name = os.getenv('DATABASE_SNOW')
-        elif len(parts) == 2:
-            # Esquema y tabla
-            schema_name, table_name = parts
-            database_name = os.getenv('DATABASE_SNOW')
-        elif len(parts) == 3:
-            # Base de datos, esquema y tabla
-            database_name, schema_name, table_name = parts
-        else:
-            return False, "Formato de nombre de tabla inválido"
+        try:
+            schema_name, table_name = parse_table_name_snowflake(full_table_name)
+        except ValueError as e:
+            return False, str(e)
         
         query = """
             SELECT COUNT(*) 
@@ -61,8 +205,14 @@ def check_table_exists_snowflake(full_table_name):
             WHERE TABLE_SCHEMA = %s 
               AND TABLE_NAME = %s
         """
-        cs.execute(query, (schema_name.upper(), table_name.upper()))
-        count = cs.fetchone()[0]
+        params = (schema_name.upper(), table_name.upper())
+
+        def load():
+            execute_snowflake(cs, query, params, query_class='metadata')
+            with phase('fetch'):
+                return cs.fetchone()[0]
+
+        count = query_cache.get_or_load('snowflake', query, load, params=params, dataset=full_table_name)
         exists = count > 0
         return exists, None
     except Exception as e:
@@ -71,6 +221,7 @@ def check_table_exists_snowflake(full_table_name):
         cs.close()
         conn.close()
 
+@traced("Snowflake")
 def query_snowflake_sample(table_name, date_value, date_column='time_extracted', limit=10):
     """
     Realiza un SELECT * con filtro de fecha y límite en Snowflake.
@@ -88,8 +239,14 @@ def query_snowflake_sample(table_name, date_value, date_column='time_extracted',
             WHERE DATE({date_column}) = %s 
             LIMIT %s
         """
-        cs.execute(query, (date_value, limit))
-        df = pd.DataFrame.from_records(iter(cs), columns=[desc[0] for desc in cs.description])
+        params = (date_value, limit)
+
+        def load():
+            execute_snowflake(cs, query, params, query_class='sample')
+            with phase('fetch'):
+                return fetch_dataframe(cs)
+
+        df = query_cache.get_or_load('snowflake', query, load, params=params, dataset=table_name)
         return df, None
     except Exception as e:
         return None, str(e)
@@ -97,6 +254,7 @@ def query_snowflake_sample(table_name, date_value, date_column='time_extracted',
         cs.close()
         conn.close()
 
+@traced("Snowflake")
 def get_total_record_count_snowflake(table_name):
     """
     Obtiene el conteo total de registros en la tabla especificada en Snowflake.
@@ -108,8 +266,13 @@ def get_total_record_count_snowflake(table_name):
     try:
         cs = conn.cursor()
         query = f"SELECT COUNT(*) AS total_records FROM {table_name}"
-        cs.execute(query)
-        count = cs.fetchone()[0]
+
+        def load():
+            execute_snowflake(cs, query, query_class='count')
+            with phase('fetch'):
+                return cs.fetchone()[0]
+
+        count = query_cache.get_or_load('snowflake', query, load, dataset=table_name)
         return count, None
     except Exception as e:
         return None, str(e)
@@ -117,34 +280,82 @@ def get_total_record_count_snowflake(table_name):
         cs.close()
         conn.close()
 
-def get_record_count_by_date_snowflake(table_name, date_column='time_extracted', sample_date=None, days=5):
+@traced("Snowflake")
+def get_metadata_record_count_snowflake(table_name):
     """
-    Obtiene el conteo de registros agrupados por fecha para los últimos 'days' días a partir de 'sample_date' en Snowflake.
+    Obtiene el conteo de registros de la tabla desde INFORMATION_SCHEMA.TABLES.ROW_COUNT en
+    Snowflake, sin leer la tabla.
+    
+    Returns:
+        tuple: (conteo, error); el conteo es None si la tabla no aparece en el catálogo.
     """
+    try:
+        schema_name, table_name_only = parse_table_name_snowflake(table_name)
+    except ValueError as e:
+        return None, str(e)
+
     conn, error = get_snowflake_connection()
     if not conn:
         return None, error
 
-    if sample_date is None:
-        return None, "El parámetro 'sample_date' es requerido."
-
     try:
         cs = conn.cursor()
-        # Convertir sample_date a string en formato 'YYYY-MM-DD'
-        sample_date_str = sample_date.strftime('%Y-%m-%d')
+        query = """
+            SELECT ROW_COUNT
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+              AND TABLE_NAME = %s
+        """
+        params = (schema_name.upper(), table_name_only.upper())
+
+        def load():
+            execute_snowflake(cs, query, params, query_class='metadata')
+            with phase('fetch'):
+                row = cs.fetchone()
+            return int(row[0]) if row and row[0] is not None else None
+
+        count = query_cache.get_or_load('snowflake', query, load, params=params, dataset=table_name)
+        if count is None:
+            return None, "La tabla no tiene conteo de filas en INFORMATION_SCHEMA.TABLES."
+        return count, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_record_count_by_date_snowflake(table_name, date_column='time_extracted', start_date=None, end_date=None):
+    """
+    Obtiene el conteo de registros agrupados por fecha entre 'start_date' y 'end_date' (ambas
+    incluidas) en Snowflake, con una única consulta agrupada para todo el rango.
+    """
+    if start_date is None or end_date is None:
+        return None, "Los parámetros 'start_date' y 'end_date' son requeridos."
 
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cs = conn.cursor()
         # Construir la consulta con parámetros
         query = f"""
             SELECT DATE({date_column}) AS extraction_date, COUNT(*) AS count
             FROM {table_name}
-            WHERE DATE({date_column}) BETWEEN DATEADD(day, -%s, %s::DATE) AND %s::DATE
+            WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
             GROUP BY DATE({date_column})
             ORDER BY extraction_date DESC
         """
         # Ejecutar la consulta con parámetros
-        cs.execute(query, (days-1, sample_date_str, sample_date_str))
-        results = cs.fetchall()
-        df = pd.DataFrame(results, columns=['extraction_date', 'count'])
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+
+        def load():
+            execute_snowflake(cs, query, params, query_class='count')
+            with phase('fetch'):
+                return pd.DataFrame(cs.fetchall(), columns=['extraction_date', 'count'])
+
+        df = query_cache.get_or_load('snowflake', query, load, params=params, dataset=table_name)
         return df, None
     except Exception as e:
         return None, str(e)
@@ -152,9 +363,50 @@ def get_record_count_by_date_snowflake(table_name, date_column='time_extracted',
         cs.close()
         conn.close()
 
-def get_columns_snowflake(table_name):
+@traced("Snowflake")
+def get_partition_signatures_snowflake(table_name, date_column, start_date, end_date):
+    """
+    Obtiene por fecha el conteo de registros y el máximo de la columna de fecha en Snowflake,
+    que sirven de firma para saber si una partición cambió desde la última auditoría.
+    No se usa la caché: la firma debe reflejar el estado actual de la tabla.
+    
+    Returns:
+        tuple: (DataFrame con partition_date, row_count y max_extracted, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cs = conn.cursor()
+        query = f"""
+            SELECT DATE({date_column}) AS partition_date, COUNT(*) AS row_count, MAX({date_column}) AS max_extracted
+            FROM {table_name}
+            WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
+            GROUP BY DATE({date_column})
+            ORDER BY partition_date DESC
+        """
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        execute_snowflake(cs, query, params, query_class='count')
+        with phase('fetch'):
+            df = pd.DataFrame(cs.fetchall(), columns=['partition_date', 'row_count', 'max_extracted'])
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_schema_tables_snowflake(schema_name):
     """
-    Obtiene la estructura de las columnas de una tabla en Snowflake.
+    Lista las tablas de un esquema de Snowflake con su tamaño según INFORMATION_SCHEMA.TABLES.
+    
+    Args:
+        schema_name (str): Esquema (schema o database.schema).
+    
+    Returns:
+        tuple: (DataFrame con table_name en minúsculas, row_count y size_mb, error)
     """
     conn, error = get_snowflake_connection()
     if not conn:
@@ -163,26 +415,22 @@ def get_columns_snowflake(table_name):
     try:
         cs = conn.cursor()
         query = """
-            SELECT COLUMN_NAME, DATA_TYPE
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = %s AND TABLE_SCHEMA = %s
-            ORDER BY ORDINAL_POSITION
+            SELECT TABLE_NAME, ROW_COUNT, BYTES / 1048576 AS SIZE_MB
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+              AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
         """
-        # Extraer esquema y tabla
-        parts = table_name.split('.')
-        if len(parts) == 3:
-            _, schema_name, table_name_only = parts
-        elif len(parts) == 2:
-            schema_name, table_name_only = parts
-        elif len(parts) == 1:
-            schema_name = os.getenv('SCHEMA_SNOW')
-            table_name_only = parts[0]
-        else:
-            return None, "Formato de nombre de tabla inválido"
-        
-        cs.execute(query, (table_name_only.upper(), schema_name.upper()))
-        results = cs.fetchall()
-        df = pd.DataFrame(results, columns=['column_name', 'data_type'])
+        params = (schema_name.split('.')[-1].upper(),)
+
+        def load():
+            execute_snowflake(cs, query, params, query_class='metadata')
+            with phase('fetch'):
+                df = pd.DataFrame(cs.fetchall(), columns=['table_name', 'row_count', 'size_mb'])
+            df['table_name'] = df['table_name'].str.lower()
+            return df
+
+        df = query_cache.get_or_load('snowflake', query, load, params=params, dataset=schema_name)
         return df, None
     except Exception as e:
         return None, str(e)
@@ -190,7 +438,90 @@ def get_columns_snowflake(table_name):
         cs.close()
         conn.close()
 
-def get_top_frequent_data_snowflake(table_name, date_column, sample_date, column, top_n=5):
+@traced("Snowflake")
+def get_schema_columns_snowflake(schema_name):
+    """
+    Obtiene el catálogo de columnas de todas las tablas de un esquema en Snowflake.
+
+    Returns:
+        tuple: (DataFrame con table_name, column_name y data_type, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cs = conn.cursor()
+        query = """
+            SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """
+        execute_snowflake(cs, query, (schema_name.split('.')[-1].upper(),), query_class='metadata')
+        with phase('fetch'):
+            return pd.DataFrame(cs.fetchall(), columns=['table_name', 'column_name', 'data_type']), None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_catalog_signature_snowflake(schema_name):
+    """
+    Firma del catálogo de un esquema en Snowflake: número de tablas y último LAST_ALTERED.
+    Cambia al crear, borrar o modificar una tabla del esquema.
+
+    Returns:
+        tuple: (firma, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cs = conn.cursor()
+        query = """
+            SELECT COUNT(*), MAX(LAST_ALTERED)
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+        """
+        execute_snowflake(cs, query, (schema_name.split('.')[-1].upper(),), query_class='metadata')
+        with phase('fetch'):
+            table_count, last_altered = cs.fetchone()
+        return f"{table_count}@{last_altered}", None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+# Catálogo de columnas por esquema, compartido por todo el proceso
+snowflake_catalog = CatalogSnapshots(get_schema_columns_snowflake, get_catalog_signature_snowflake, parse_table_name_snowflake)
+
+def get_columns_snowflake(table_name):
+    """
+    Obtiene la estructura de las columnas de una tabla en Snowflake (de la instantánea del
+    catálogo de su esquema).
+    """
+    return snowflake_catalog.columns(table_name)
+
+def top_frequent_query_snowflake(table_name, date_column, sample_date, column, top_n=5):
+    """
+    Construye la consulta de los top_n datos más frecuentes de una columna para una fecha.
+    """
+    return f"""
+    SELECT {column} AS value, COUNT(*) AS count
+    FROM {table_name}
+    WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'
+    GROUP BY {column}
+    ORDER BY count DESC, value asc
+    LIMIT {top_n};
+    """
+
+@traced("Snowflake")
+def get_top_frequent_data_snowflake(table_name, date_column, sample_date, column, top_n=5, cache_params=None):
     """
     Obtiene los top_n datos más frecuentes para una columna específica en Snowflake para una fecha dada.
     
@@ -200,6 +531,8 @@ def get_top_frequent_data_snowflake(table_name, date_column, sample_date, column
         sample_date (datetime.date): Fecha de muestreo.
         column (str): Nombre de la columna a analizar.
         top_n (int): Número de datos más frecuentes a obtener.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
     
     Returns:
         tuple: (DataFrame, error)
@@ -208,19 +541,371 @@ def get_top_frequent_data_snowflake(table_name, date_column, sample_date, column
     if not conn:
         return None, error
     
-    query = f"""
-    SELECT {column} AS value, COUNT(*) AS count
-    FROM {table_name}
-    WHERE DATE({date_column}) = '{sample_date.strftime('%Y-%m-%d')}'
-    GROUP BY {column}
-    ORDER BY count DESC, value asc
-    LIMIT {top_n};
+    query = top_frequent_query_snowflake(table_name, date_column, sample_date, column, top_n)
+    
+    try:
+        cs = conn.cursor()
+
+        def load():
+            execute_snowflake(cs, query, query_class='top_frequent')
+            with phase('fetch'):
+                return fetch_dataframe(cs)
+
+        df = query_cache.get_or_load('snowflake', query, load, params=cache_params, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_top_frequent_batch_snowflake(table_name, date_column, sample_date, columns, top_n=5, cache_params=None):
     """
+    Obtiene los top_n datos más frecuentes de varias columnas en Snowflake con una sola consulta.
     
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
+    
+    Returns:
+        tuple: (DataFrame con column_name, value y count, error)
+    """
+    columns_df, error = get_columns_snowflake(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    query = top_frequent_batch_query(table_name, date_column, sample_date, columns, top_n, 'snowflake', data_types)
+
+    cs = conn.cursor()
     try:
-        df = pd.read_sql(query, conn)
+
+        def load():
+            execute_snowflake(cs, query, query_class='top_frequent')
+            with phase('fetch'):
+                return normalize_frequency_frame(fetch_dataframe(cs))
+
+        df = query_cache.get_or_load('snowflake', query, load, params=cache_params, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
         conn.close()
+
+@traced("Snowflake")
+def get_approx_top_frequent_snowflake(table_name, date_column, sample_date, columns, top_n, settings):
+    """
+    Estima en Snowflake los top_n datos más frecuentes de varias columnas con APPROX_TOP_K,
+    en una sola consulta y sobre una muestra de las filas si settings lo indica.
+    
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        settings (ApproximateSettings): Porcentaje de muestreo y contadores de APPROX_TOP_K.
+    
+    Returns:
+        tuple: (DataFrame con column_name, value, count y error_bound, error)
+    """
+    columns_df, error = get_columns_snowflake(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    query = approx_top_k_query(table_name, date_column, sample_date, columns, top_n, data_types, settings)
+
+    cs = conn.cursor()
+    try:
+
+        def load():
+            execute_snowflake(cs, query, query_class='top_frequent')
+            with phase('fetch'):
+                return parse_approx_top_k(fetch_dataframe(cs), columns, settings)
+
+        df = query_cache.get_or_load('snowflake', query, load, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_approx_column_stats_snowflake(table_name, date_column, sample_date, columns):
+    """
+    Obtiene en Snowflake los valores distintos (APPROX_COUNT_DISTINCT) y la mediana aproximada
+    (APPROX_PERCENTILE) de las columnas para la fecha de muestreo.
+    
+    Returns:
+        tuple: (DataFrame con column_name, statistic y value, error)
+    """
+    columns_df, error = get_columns_snowflake(table_name)
+    if columns_df is None:
+        return None, error
+    data_types = dict(zip(columns_df['column_name'].str.lower(), columns_df['data_type']))
+
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    query = approx_column_stats_query(table_name, date_column, sample_date, columns, data_types, 'snowflake')
+
+    cs = conn.cursor()
+    try:
+
+        def load():
+            execute_snowflake(cs, query, query_class='top_frequent')
+            with phase('fetch'):
+                return fetch_dataframe(cs)
+
+        df = query_cache.get_or_load('snowflake', query, load, dataset=table_name)
         return df, None
     except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
         conn.close()
+
+@traced("Snowflake")
+def get_column_fingerprint_snowflake(table_name, date_column, start_date, end_date, columns, data_types):
+    """
+    Obtiene en Snowflake la huella estadística de las columnas (nulos, mínimo, máximo, suma,
+    longitud total y valores distintos aproximados) entre start_date y end_date en una sola lectura.
+    
+    Returns:
+        tuple: (DataFrame con column_name, statistic y value, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    query, specs = fingerprint_query(table_name, date_column, start_date, end_date, columns, data_types, 'snowflake')
+
+    cs = conn.cursor()
+    try:
+
+        def load():
+            execute_snowflake(cs, query, query_class='profile')
+            with phase('fetch'):
+                return parse_fingerprint(cs.fetchone(), specs)
+
+        df = query_cache.get_or_load('snowflake', query, load, dataset=table_name)
+        return df, None
+    except Exception as e:
         return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_approx_record_count_by_date_snowflake(table_name, date_column, start_date, end_date, sample_percent):
+    """
+    Estima en Snowflake el conteo de registros por fecha entre start_date y end_date a partir
+    de una muestra de Bernoulli del sample_percent % de las filas.
+    
+    Returns:
+        tuple: (DataFrame con extraction_date, count y error_bound, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    query = approx_count_by_date_query(table_name, date_column, start_date, end_date, 'snowflake', sample_percent)
+
+    try:
+        cs = conn.cursor()
+
+        def load():
+            execute_snowflake(cs, query, query_class='count')
+            with phase('fetch'):
+                df = pd.DataFrame(cs.fetchall(), columns=['extraction_date', 'count'])
+            return scale_sampled_counts(df, min(sample_percent, 100) / 100)
+
+        df = query_cache.get_or_load('snowflake', query, load, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def get_row_diff_data_snowflake(table_name, query, cache_params=None):
+    """
+    Ejecuta en Snowflake una consulta de la conciliación de filas (scripts/row_diff.py) o del
+    muestreo alineado por clave (scripts/key_sample.py).
+    
+    Args:
+        table_name (str): Nombre completo de la tabla (dataset de la caché).
+        query (str): Consulta de hashes por partición o cubeta, o de filas.
+        cache_params: Parámetros adicionales de la clave de caché (p. ej. la firma de la partición
+            cuando el resultado se guarda en el almacén de auditorías).
+    
+    Returns:
+        tuple: (DataFrame, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    cs = conn.cursor()
+    try:
+
+        def load():
+            execute_snowflake(cs, query, query_class='row_diff')
+            with phase('fetch'):
+                return fetch_dataframe(cs)
+
+        df = query_cache.get_or_load('snowflake', query, load, params=cache_params, dataset=table_name)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cs.close()
+        conn.close()
+
+@traced("Snowflake")
+def stream_query_snowflake(query, consume, query_class='stream_diff'):
+    """
+    Ejecuta una consulta en Snowflake y entrega su resultado lote a lote (lotes Arrow del
+    conector), sin cargarlo completo en memoria ni guardarlo en la caché.
+
+    Args:
+        query (str): Consulta a ejecutar.
+        consume (callable): Recibe cada lote como pyarrow.Table; si lanza una excepción la
+            lectura se interrumpe.
+        query_class (str): Clase de la consulta (ver scripts.query_control.QUERY_TIMEOUTS).
+
+    Returns:
+        tuple: (filas leídas, error)
+    """
+    conn, error = get_snowflake_connection()
+    if not conn:
+        return None, error
+
+    try:
+        cs = conn.cursor()
+        try:
+            rows = 0
+            execute_snowflake(cs, query, query_class=query_class)
+            for batch in iter_arrow_batches(cs):
+                rows += batch.num_rows
+                consume(batch)
+            return rows, None
+        finally:
+            cs.close()
+    except Exception as e:
+        return None, str(e)
+    finally:
+        conn.close()
+
+@traced("Snowflake")
+def get_table_profile_snowflake(
+    table_name, date_column='time_extracted', start_date=None, end_date=None, include_total=True, include_dates=True
+):
+    """
+    Obtiene existencia, conteo total, conteo por fecha y catálogo de columnas de una tabla
+    en Snowflake con una sola ejecución multi-sentencia (un único viaje al servidor).
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        start_date (datetime.date): Primera fecha de la ventana de conteo por fecha.
+        end_date (datetime.date): Última fecha de la ventana de conteo por fecha (incluida).
+        include_total (bool): Si se cuenta el total con COUNT(*); si no, total_records queda
+            en None (p. ej. porque se toma de los metadatos, ver scripts/record_counts.py).
+        include_dates (bool): Si se cuenta por fecha; si no, dates_df queda en None (p. ej. porque
+            se cuenta con la caché de días cerrados, ver scripts/date_counts.py).
+
+    Returns:
+        tuple: (TableProfile, error)
+    """
+    profile = TableProfile(warehouse="Snowflake", table_name=table_name)
+    if start_date is None or end_date is None:
+        profile.error = "Los parámetros 'start_date' y 'end_date' son requeridos."
+        return profile, profile.error
+
+    try:
+        schema_name, table_name_only = parse_table_name_snowflake(table_name)
+    except ValueError as e:
+        profile.error = str(e)
+        return profile, profile.error
+
+    conn, error = get_snowflake_connection()
+    if not conn:
+        profile.error = error
+        return profile, error
+
+    catalog_query = """
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_NAME = %s AND TABLE_SCHEMA = %s
+        ORDER BY ORDINAL_POSITION
+    """
+    total_query = f"SELECT COUNT(*) AS total_records FROM {table_name}" if include_total else "SELECT NULL AS total_records"
+    dates_query = f"""
+        SELECT DATE({date_column}) AS extraction_date, COUNT(*) AS count
+        FROM {table_name}
+        WHERE DATE({date_column}) BETWEEN %s::DATE AND %s::DATE
+        GROUP BY DATE({date_column})
+        ORDER BY extraction_date DESC""" if include_dates else "SELECT NULL AS extraction_date, NULL AS count WHERE FALSE"
+    query = f"""
+        {catalog_query};
+        {total_query};
+        {dates_query};
+    """
+    catalog_params = (table_name_only.upper(), schema_name.upper())
+    dates_params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    params = catalog_params + (dates_params if include_dates else ())
+    cached = query_cache.get('snowflake', query, params)
+    if cached is not None:
+        conn.close()
+        return cached, None
+
+    cs = conn.cursor()
+    try:
+        execute_snowflake(cs, query, params, query_class='profile', num_statements=3)
+        with phase('fetch'):
+            profile.columns_df = pd.DataFrame(cs.fetchall(), columns=['column_name', 'data_type'])
+        profile.exists = not profile.columns_df.empty
+        cs.nextset()
+        with phase('fetch'):
+            profile.total_records = cs.fetchone()[0]
+        cs.nextset()
+        with phase('fetch'):
+            dates_df = pd.DataFrame(cs.fetchall(), columns=['extraction_date', 'count'])
+        profile.dates_df = dates_df if include_dates else None
+        query_cache.put('snowflake', query, profile, params=params, dataset=table_name)
+    except Exception as e:
+        profile.error = str(e)
+        # Si falla el lote (p. ej. la tabla no existe) se consulta sólo el catálogo,
+        # salvo que se haya cancelado o haya superado el tiempo límite
+        if profile.columns_df is None and not isinstance(e, (QueryCancelledError, QueryTimeoutError)):
+            try:
+                execute_snowflake(cs, catalog_query, catalog_params, query_class='metadata')
+                with phase('fetch'):
+                    profile.columns_df = pd.DataFrame(cs.fetchall(), columns=['column_name', 'data_type'])
+                profile.exists = not profile.columns_df.empty
+            except Exception:
+                pass
+    finally:
+        cs.close()
+        conn.close()
+    return profile, profile.error
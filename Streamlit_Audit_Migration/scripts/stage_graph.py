@@ -0,0 +1,157 @@
+# scripts/stage_graph.py
+
+import concurrent.futures
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+# Ejecución de un flujo de etapas con dependencias declaradas (un grafo acíclico pequeño, como
+# el de la auditoría de una tabla). Cada etapa empieza en cuanto terminan bien todas las que
+# requiere, de modo que el tiempo total se acerca al del camino más lento y no a la suma de
+# todas las consultas. Si una etapa falla, las que dependen de ella no se ejecutan. Las etapas
+# usan un pool de hilos propio: dentro de ellas se lanzan consultas en el ejecutor compartido
+# (scripts/task_executor.py), que no debe quedar ocupado esperando a sus propias tareas.
+
+WAIT_INTERVAL = 0.5
+
+STAGE_COLUMNS = ['stage', 'status', 'requires', 'start_ms', 'duration_ms', 'detail']
+
+
+@dataclass
+class Stage:
+    """
+    Etapa de un flujo.
+
+    Args:
+        name (str): Nombre único de la etapa.
+        func (callable): Función sin argumentos que devuelve (resultado, error); un error o
+            una excepción hacen que las etapas que dependen de esta no se ejecuten.
+        requires (tuple): Nombres de las etapas que deben terminar bien antes de empezar.
+    """
+    name: str
+    func: Callable
+    requires: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageOutcome:
+    """
+    Resultado y tiempos de una etapa.
+
+    Attributes:
+        status (str): 'ok', 'error' o 'skipped' (falló una etapa requerida).
+        value: Resultado devuelto por la etapa.
+        error (str): Error de la etapa o motivo por el que no se ejecutó.
+        start_ms (float): Milisegundos desde el inicio del flujo hasta el inicio de la etapa.
+        duration_ms (float): Duración de la etapa.
+    """
+    status: str
+    value: object = None
+    error: Optional[str] = None
+    start_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+    requires: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def _validate(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Hay etapas con el mismo nombre")
+    for stage in stages:
+        missing = [name for name in stage.requires if name not in names]
+        if missing:
+            raise ValueError(f"La etapa {stage.name} requiere etapas inexistentes: {', '.join(missing)}")
+    # Orden topológico: si no se puede completar, hay un ciclo
+    done, remaining = set(), list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.requires) <= done]
+        if not ready:
+            raise ValueError(f"Dependencias circulares entre: {', '.join(s.name for s in remaining)}")
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in done]
+
+
+def _timed(func, started):
+    start = time.monotonic()
+    try:
+        value, error = func()
+    except Exception as e:
+        value, error = None, str(e)
+    return value, error, (start - started) * 1000, (time.monotonic() - start) * 1000
+
+
+def run_stages(stages, max_workers=None, on_wait=None):
+    """
+    Ejecuta las etapas respetando sus dependencias, en paralelo cuando son independientes.
+
+    Args:
+        stages (list): Stage en cualquier orden.
+        max_workers (int): Etapas simultáneas máximas (por defecto, todas).
+        on_wait (callable): Se llama periódicamente mientras se espera, p. ej. para que
+            Streamlit pueda interrumpir la ejecución.
+
+    Returns:
+        dict: StageOutcome por nombre de etapa, en el orden en que se declararon.
+    """
+    _validate(stages)
+    started = time.monotonic()
+    outcomes = {}
+    pending = list(stages)
+    running = {}
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers or max(1, len(stages)), thread_name_prefix='audit-stage'
+    )
+    try:
+        while pending or running:
+            # Lanzar las etapas listas y descartar las que dependen de una etapa fallida
+            for stage in list(pending):
+                failed = [name for name in stage.requires if name in outcomes and outcomes[name].status != 'ok']
+                if failed:
+                    outcomes[stage.name] = StageOutcome(
+                        'skipped', error=f"No se ejecutó: falló {', '.join(failed)}", requires=stage.requires
+                    )
+                    pending.remove(stage)
+                elif all(name in outcomes for name in stage.requires):
+                    # Cada hilo recibe una copia del contexto para heredar la sesión y la sección
+                    future = executor.submit(contextvars.copy_context().run, _timed, stage.func, started)
+                    running[future] = stage
+                    pending.remove(stage)
+            if not running:
+                # Quedan etapas descartadas en cadena: se resuelven en la siguiente vuelta
+                continue
+
+            done, _ = concurrent.futures.wait(
+                running, timeout=WAIT_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                stage = running.pop(future)
+                value, error, start_ms, duration_ms = future.result()
+                outcomes[stage.name] = StageOutcome(
+                    'error' if error else 'ok', value, error, start_ms, duration_ms, stage.requires
+                )
+            if not done and on_wait is not None:
+                on_wait()
+    finally:
+        # Si se interrumpe la espera, las etapas en curso terminan solas; sus consultas se
+        # cancelan con las de la sesión (utils.helpers.cancel_superseded_queries)
+        executor.shutdown(wait=False, cancel_futures=True)
+    return {stage.name: outcomes[stage.name] for stage in stages}
+
+
+def stage_timings(outcomes):
+    """Tiempos de las etapas como DataFrame (una fila por etapa)."""
+    rows = [
+        {
+            'stage': name,
+            'status': outcome.status,
+            'requires': ', '.join(outcome.requires),
+            'start_ms': round(outcome.start_ms, 1) if outcome.start_ms is not None else None,
+            'duration_ms': round(outcome.duration_ms, 1) if outcome.duration_ms is not None else None,
+            'detail': outcome.error,
+        }
+        for name, outcome in outcomes.items()
+    ]
+    return pd.DataFrame(rows, columns=STAGE_COLUMNS)
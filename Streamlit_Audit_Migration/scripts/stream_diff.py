@@ -0,0 +1,334 @@
+# scripts/stream_diff.py
+
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.frequency_profile import value_expression
+from scripts.key_sample import compare_samples
+from scripts.row_diff import common_columns, key_hash_expression
+from scripts.snowflake_connection import stream_query_snowflake
+from scripts.redshift_connection import stream_query_redshift
+from scripts.task_executor import task_executor
+
+# Comparación completa de la partición de una fecha con memoria acotada. Cada almacén devuelve
+# todas las filas de la fecha normalizadas a texto y ordenadas por el MD5 de la clave (el mismo
+# que usa scripts/row_diff.py); ordenar por el hash y no por la clave evita depender de la
+# intercalación de cada almacén. Una tarea por almacén, en el ejecutor de tareas compartido, lee
+# el resultado por lotes (lotes Arrow en Snowflake, cursor del lado del servidor en Redshift) y
+# los deja en una cola acotada, que frena la consulta si la comparación va por detrás. Aquí se
+# cruzan ambos flujos por el hash de la clave: sólo se comparan las filas con un hash menor que
+# el último leído en los dos almacenes, de modo que en memoria hay unos pocos lotes por almacén
+# sea cual sea el tamaño de la fecha. Las diferencias se escriben en un Parquet a medida que
+# aparecen.
+
+STREAM_DIFF_BATCH_ROWS = int(os.getenv('STREAM_DIFF_BATCH_ROWS', 50000))
+# Lotes que cada almacén puede adelantar a la comparación
+STREAM_DIFF_QUEUE_BATCHES = int(os.getenv('STREAM_DIFF_QUEUE_BATCHES', 4))
+STREAM_DIFF_OUTPUT_DIR = os.getenv('STREAM_DIFF_OUTPUT_DIR', 'audit_reports')
+WAIT_INTERVAL = 0.5
+
+KEY_HASH_COLUMN = 'key_hash'
+ROW_HASH_COLUMN = 'row_hash'
+MISMATCH_COLUMNS = ['status', 'column_name', 'value_snowflake', 'value_redshift']
+
+
+@dataclass
+class StreamDiffResult:
+    """
+    Resultado de la comparación completa de una fecha.
+
+    Attributes:
+        table_name (str): Nombre completo de la tabla.
+        partition_date (datetime.date): Fecha comparada.
+        key_columns (list): Columnas clave (en minúsculas).
+        columns (list): Columnas comunes comparadas.
+        rows_snowflake (int): Filas leídas de Snowflake.
+        rows_redshift (int): Filas leídas de Redshift.
+        matched (int): Filas idénticas en ambos almacenes.
+        different (int): Claves presentes en ambos almacenes con alguna celda distinta.
+        only_snowflake (int): Claves presentes sólo en Snowflake.
+        only_redshift (int): Claves presentes sólo en Redshift.
+        mismatched_cells (int): Celdas distintas de las claves presentes en ambos almacenes.
+        output_path (str): Parquet con las diferencias: columnas clave, status, column_name,
+            value_snowflake y value_redshift (las dos últimas vacías en las claves de un solo almacén).
+        peak_buffer_rows (int): Máximo de filas retenidas a la vez para el cruce.
+        error (str): Mensaje de error, si lo hubo (el Parquet conserva lo comparado hasta entonces).
+    """
+    table_name: str
+    partition_date: Optional[object] = None
+    key_columns: List[str] = field(default_factory=list)
+    columns: List[str] = field(default_factory=list)
+    rows_snowflake: int = 0
+    rows_redshift: int = 0
+    matched: int = 0
+    different: int = 0
+    only_snowflake: int = 0
+    only_redshift: int = 0
+    mismatched_cells: int = 0
+    output_path: Optional[str] = None
+    peak_buffer_rows: int = 0
+    error: Optional[str] = None
+
+    @property
+    def identical(self):
+        """True si ambas particiones tienen exactamente las mismas filas."""
+        return self.error is None and self.different == self.only_snowflake == self.only_redshift == 0
+
+
+def stream_diff_query(table_name, date_column, partition_date, columns, key_columns, data_types, warehouse):
+    """Consulta de todas las filas normalizadas de la fecha con los hashes de su clave y de la fila, por hash ascendente."""
+    values = ",\n        ".join(
+        f"{value_expression(column, data_types.get(column.lower()), warehouse)} AS {column}"
+        for column in columns
+    )
+    return f"""
+    SELECT
+        {key_hash_expression(key_columns, data_types, warehouse)} AS {KEY_HASH_COLUMN},
+        {key_hash_expression(columns, data_types, warehouse)} AS {ROW_HASH_COLUMN},
+        {values}
+    FROM {table_name}
+    WHERE DATE({date_column}) = '{partition_date.strftime('%Y-%m-%d')}'
+    ORDER BY {KEY_HASH_COLUMN}, {ROW_HASH_COLUMN};
+    """
+
+
+def default_output_path(table_name, partition_date, output_dir=STREAM_DIFF_OUTPUT_DIR):
+    """Ruta del Parquet de diferencias de una tabla y fecha."""
+    os.makedirs(output_dir, exist_ok=True)
+    safe_table_name = table_name.replace('.', '_').replace(' ', '_')
+    creation_datetime = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(
+        output_dir, f"stream_diff_{safe_table_name}_{partition_date.strftime('%Y-%m-%d')}_{creation_datetime}.parquet"
+    )
+
+
+class _StreamEnd:
+    """Marca el final del flujo de un almacén, con su error si lo hubo."""
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+class _StreamCancelled(Exception):
+    """Interrumpe la lectura de un almacén cuando la comparación terminó o falló."""
+
+
+def _produce(stream, query, out, stop, batch_rows):
+    # Lee la consulta y deja lotes de hasta batch_rows filas en la cola; espera si está llena
+    def put(item):
+        while True:
+            if stop.is_set():
+                raise _StreamCancelled()
+            try:
+                out.put(item, timeout=WAIT_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def consume(batch):
+        table = batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+        for chunk in table.to_batches(max_chunksize=batch_rows):
+            put(chunk)
+
+    _, error = stream(query, consume)
+    try:
+        put(_StreamEnd(error))
+    except _StreamCancelled:
+        pass
+
+
+class _Side:
+    """Filas pendientes de cruzar de un almacén."""
+
+    def __init__(self, name, out, columns):
+        self.name = name
+        self.out = out
+        self.columns = [KEY_HASH_COLUMN, ROW_HASH_COLUMN] + columns
+        self.buffer = pd.DataFrame(columns=self.columns)
+        self.exhausted = False
+        self.rows = 0
+
+    @property
+    def last_hash(self):
+        return self.buffer[KEY_HASH_COLUMN].iloc[-1]
+
+    def pull(self, on_wait=None):
+        """Añade el siguiente lote al búfer; marca el flujo como agotado al llegar al final."""
+        while True:
+            try:
+                item = self.out.get(timeout=WAIT_INTERVAL)
+                break
+            except queue.Empty:
+                if on_wait is not None:
+                    on_wait()
+        if isinstance(item, _StreamEnd):
+            if item.error:
+                raise RuntimeError(f"{self.name}: {item.error}")
+            self.exhausted = True
+            return
+        chunk = item.to_pandas().rename(columns=lambda x: x.lower()).reindex(columns=self.columns)
+        if chunk.empty:
+            return
+        for column in (KEY_HASH_COLUMN, ROW_HASH_COLUMN):
+            chunk[column] = chunk[column].astype(str)
+        if not self.buffer.empty and chunk[KEY_HASH_COLUMN].iloc[0] < self.last_hash:
+            raise RuntimeError(f"{self.name}: las filas no llegaron ordenadas por el hash de la clave")
+        self.rows += len(chunk)
+        self.buffer = chunk if self.buffer.empty else pd.concat([self.buffer, chunk], ignore_index=True)
+
+    def take(self, horizon=None):
+        """Extrae las filas con un hash de la clave menor que horizon (todas si es None)."""
+        if horizon is None:
+            ready, self.buffer = self.buffer, self.buffer.iloc[0:0]
+            return ready
+        before = self.buffer[KEY_HASH_COLUMN] < horizon
+        ready = self.buffer[before]
+        self.buffer = self.buffer[~before].reset_index(drop=True)
+        return ready
+
+
+def _mismatch_schema(key_columns):
+    return pa.schema([(column, pa.string()) for column in key_columns + MISMATCH_COLUMNS])
+
+
+def _as_text(series):
+    return series.map(lambda value: None if pd.isna(value) else str(value))
+
+
+def compare_chunk(rows_snowflake, rows_redshift, key_columns, columns):
+    """
+    Compara las filas de un mismo tramo de hashes de la clave. Las filas con el mismo hash de la
+    fila en ambos almacenes son idénticas; sólo el resto se une por la clave y se compara celda a celda.
+
+    Returns:
+        tuple: (filas idénticas, DataFrame de claves distintas con su estado, DataFrame de celdas distintas)
+    """
+    # Los duplicados se emparejan por orden de aparición para no contar dos veces una misma fila
+    pair_columns = [KEY_HASH_COLUMN, ROW_HASH_COLUMN, 'occurrence']
+    rows_snowflake = rows_snowflake.assign(occurrence=rows_snowflake.groupby([KEY_HASH_COLUMN, ROW_HASH_COLUMN]).cumcount())
+    rows_redshift = rows_redshift.assign(occurrence=rows_redshift.groupby([KEY_HASH_COLUMN, ROW_HASH_COLUMN]).cumcount())
+    index_snowflake = pd.MultiIndex.from_frame(rows_snowflake[pair_columns])
+    index_redshift = pd.MultiIndex.from_frame(rows_redshift[pair_columns])
+    pending_snowflake = rows_snowflake[~index_snowflake.isin(index_redshift)]
+    pending_redshift = rows_redshift[~index_redshift.isin(index_snowflake)]
+    matched = len(rows_snowflake) - len(pending_snowflake)
+    if pending_snowflake.empty and pending_redshift.empty:
+        return matched, None, None
+
+    keys_df, cell_diff_df = compare_samples(pending_snowflake, pending_redshift, key_columns, columns)
+    matched += int((keys_df['status'] == 'coincide').sum())
+    return matched, keys_df[keys_df['status'] != 'coincide'], cell_diff_df
+
+
+def _mismatch_table(keys_df, cell_diff_df, key_columns, schema):
+    missing = keys_df[keys_df['status'].isin(['solo_snowflake', 'solo_redshift'])]
+    frame = pd.concat([
+        cell_diff_df.assign(status='diferente'),
+        missing.assign(column_name=None, value_snowflake=None, value_redshift=None),
+    ], ignore_index=True)[key_columns + MISMATCH_COLUMNS]
+    return pa.Table.from_pandas(frame.apply(_as_text), schema=schema, preserve_index=False)
+
+
+def stream_diff(table_name, date_column, partition_date, key_columns, output_path=None,
+                batch_rows=STREAM_DIFF_BATCH_ROWS, on_wait=None, progress=None):
+    """
+    Compara todas las filas de una fecha en ambos almacenes con memoria acotada y escribe las
+    diferencias en un Parquet.
+
+    Args:
+        table_name (str): Nombre completo de la tabla.
+        date_column (str): Columna de fecha.
+        partition_date (datetime.date): Fecha comparada.
+        key_columns (list): Columnas que identifican una fila.
+        output_path (str): Ruta del Parquet de diferencias; por defecto, una nueva en STREAM_DIFF_OUTPUT_DIR.
+        batch_rows (int): Filas por lote leído de cada almacén.
+        on_wait (callable): Se llama periódicamente mientras se espera a los almacenes.
+        progress (callable): progress(result) tras cada tramo comparado.
+
+    Returns:
+        StreamDiffResult: Conteos de la comparación y ruta del Parquet (con `error` si algo falló).
+    """
+    key_columns = [c.strip().lower() for c in (key_columns or []) if c.strip()]
+    result = StreamDiffResult(table_name=table_name, partition_date=partition_date, key_columns=key_columns)
+    if not key_columns:
+        result.error = "Indica las columnas clave para comparar la fecha completa."
+        return result
+    try:
+        columns, data_types = common_columns(table_name, on_wait)
+    except Exception as e:
+        result.error = str(e)
+        return result
+    missing = [c for c in key_columns if c not in columns]
+    if missing:
+        result.error = f"Columnas clave inexistentes en alguno de los almacenes: {', '.join(missing)}"
+        return result
+    result.columns = columns
+
+    streams = {'snowflake': stream_query_snowflake, 'redshift': stream_query_redshift}
+    sides = {
+        warehouse: _Side(warehouse.capitalize(), queue.Queue(maxsize=max(1, STREAM_DIFF_QUEUE_BATCHES)), columns)
+        for warehouse in streams
+    }
+    stop = threading.Event()
+    producers = []
+    result.output_path = output_path or default_output_path(table_name, partition_date)
+    schema = _mismatch_schema(key_columns)
+    writer = pq.ParquetWriter(result.output_path, schema)
+    try:
+        for warehouse, stream in streams.items():
+            query = stream_diff_query(
+                table_name, date_column, partition_date, columns, key_columns, data_types[warehouse], warehouse
+            )
+            # El ejecutor de tareas pasa una copia del contexto para heredar la sesión y la sección
+            producers.append(task_executor.submit(
+                _produce, stream, query, sides[warehouse].out, stop, batch_rows, name=f"stream_diff_{warehouse}"
+            ))
+
+        snowflake, redshift = sides['snowflake'], sides['redshift']
+        while True:
+            for side in (snowflake, redshift):
+                while side.buffer.empty and not side.exhausted:
+                    side.pull(on_wait)
+            active = [side for side in (snowflake, redshift) if not side.exhausted]
+            result.peak_buffer_rows = max(result.peak_buffer_rows, len(snowflake.buffer) + len(redshift.buffer))
+
+            # Las filas con un hash menor que el último leído en cada flujo activo ya están completas
+            horizon = min(side.last_hash for side in active) if active else None
+            matched, keys_df, cell_diff_df = compare_chunk(
+                snowflake.take(horizon), redshift.take(horizon), key_columns, columns
+            )
+            result.matched += matched
+            if keys_df is not None:
+                counts = keys_df['status'].value_counts()
+                result.different += int(counts.get('diferente', 0))
+                result.only_snowflake += int(counts.get('solo_snowflake', 0))
+                result.only_redshift += int(counts.get('solo_redshift', 0))
+                result.mismatched_cells += len(cell_diff_df)
+                writer.write_table(_mismatch_table(keys_df, cell_diff_df, key_columns, schema))
+            result.rows_snowflake, result.rows_redshift = snowflake.rows, redshift.rows
+            if progress is not None:
+                progress(result)
+            if not active:
+                break
+
+            # Sigue leyendo el flujo (o flujos) que marca el límite
+            for side in active:
+                if side.last_hash == horizon:
+                    side.pull(on_wait)
+    except Exception as e:
+        result.error = str(e)
+    finally:
+        # Los productores en curso ven `stop` y terminan; los que aún no empezaron no llegan a consultar
+        stop.set()
+        for producer in producers:
+            producer.cancel()
+        writer.close()
+    return result
@@ -0,0 +1,39 @@
+# scripts/table_profile.py
+
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+
+@dataclass
+class TableProfile:
+    """
+    Perfil de una tabla en un almacén de datos, obtenido en un solo lote de consultas.
+
+    Attributes:
+        warehouse (str): "Snowflake" o "Redshift".
+        table_name (str): Nombre completo de la tabla consultada.
+        exists (bool): Si la tabla existe en el almacén.
+        total_records (int): Conteo total de registros (None si el perfil se pidió sin total).
+        dates_df (pd.DataFrame): Conteo por fecha con columnas 'extraction_date' y 'count'.
+        columns_df (pd.DataFrame): Catálogo de columnas con 'column_name' y 'data_type'.
+        error (str): Mensaje de error si alguna parte del perfil no se pudo obtener.
+    """
+    warehouse: str
+    table_name: str
+    exists: bool = False
+    total_records: Optional[int] = None
+    dates_df: Optional[pd.DataFrame] = None
+    columns_df: Optional[pd.DataFrame] = None
+    error: Optional[str] = None
+
+    @property
+    def complete(self):
+        """True si se obtuvieron todas las partes del perfil."""
+        return (
+            self.exists
+            and self.total_records is not None
+            and self.dates_df is not None
+            and self.columns_df is not None
+        )
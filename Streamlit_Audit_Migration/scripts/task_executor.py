@@ -0,0 +1,234 @@
+# scripts/task_executor.py
+
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from scripts.query_control import CancelScope
+from scripts.query_timing import current_section
+
+# Ejecutor de tareas compartido por todo el proceso: un único pool de hilos de larga duración
+# para las consultas que las secciones lanzan en paralelo (normalmente una por almacén).
+# Los resultados se devuelven en el orden de envío o por clave; cada tarea puede tener un
+# tiempo límite y, si se pide, el fallo de una tarea cancela las demás del mismo grupo.
+# La latencia de cada tarea (espera en cola y ejecución), también de las enviadas con submit(),
+# se conserva para el panel "Performance".
+
+TASK_EXECUTOR_MAX_WORKERS = int(os.getenv('TASK_EXECUTOR_MAX_WORKERS', 32))
+TASK_TIMINGS_MAX_RECENT = int(os.getenv('TASK_TIMINGS_MAX_RECENT', 1000))
+WAIT_INTERVAL = 0.5
+
+
+class Task:
+    """
+    Tarea para TaskExecutor.run.
+
+    Args:
+        func (callable): Función sin argumentos; devuelve normalmente una tupla (resultado, error).
+        timeout (float): Segundos que puede durar la tarea desde que empieza; None sin límite.
+        name (str): Nombre de la tarea para las mediciones (por defecto, el de la función).
+    """
+
+    def __init__(self, func, timeout=None, name=None):
+        self.func = func
+        self.timeout = timeout
+        self.name = name or getattr(func, '__name__', 'task')
+
+
+class _Run:
+    # Estado de una tarea enviada: su ámbito de cancelación, tiempos y resultado final
+    def __init__(self, key, task, timeout):
+        self.key = key
+        self.task = task
+        self.timeout = timeout
+        self.scope = CancelScope()
+        self.future = None
+        # La sección se toma al enviar: el registro de las tareas de submit() no corre en su contexto
+        self.section = current_section()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.status = None
+        self.result = None
+
+
+def _failed(result):
+    return isinstance(result, tuple) and len(result) == 2 and bool(result[1])
+
+
+class TaskExecutor:
+    """
+    Pool de hilos de larga duración con resultados ordenados, tiempos límite y cancelación.
+
+    Args:
+        max_workers (int): Hilos máximos del pool.
+        max_recent (int): Mediciones de tareas que se conservan en memoria.
+    """
+
+    def __init__(self, max_workers=TASK_EXECUTOR_MAX_WORKERS, max_recent=TASK_TIMINGS_MAX_RECENT):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='audit-task')
+        self._lock = threading.Lock()
+        self._timings = deque(maxlen=max_recent)
+
+    def run(self, tasks, timeout=None, cancel_on_failure=False, on_wait=None):
+        """
+        Ejecuta las tareas en paralelo y espera a que terminen.
+
+        Args:
+            tasks (list | dict): Funciones o Task; con un dict los resultados se devuelven por clave.
+            timeout (float): Tiempo límite por defecto de las tareas que no indican el suyo.
+            cancel_on_failure (bool): Si el fallo de una tarea (excepción, error en la tupla o
+                tiempo límite) cancela las demás.
+            on_wait (callable): Se llama periódicamente mientras se espera, p. ej. para que
+                Streamlit pueda interrumpir la ejecución.
+
+        Returns:
+            list | dict: Un resultado por tarea, en el orden de envío o por clave. Las excepciones,
+            tiempos límite y cancelaciones se devuelven como (None, mensaje).
+        """
+        keyed = isinstance(tasks, dict)
+        items = tasks.items() if keyed else enumerate(tasks)
+        runs = []
+        for key, task in items:
+            if not isinstance(task, Task):
+                task = Task(task)
+            runs.append(_Run(key, task, task.timeout if task.timeout is not None else timeout))
+
+        try:
+            for run in runs:
+                # Cada hilo recibe una copia del contexto para heredar la sesión y la sección
+                run.future = self._executor.submit(contextvars.copy_context().run, self._execute, run)
+            pending = list(runs)
+            while pending:
+                concurrent.futures.wait([run.future for run in pending], timeout=WAIT_INTERVAL,
+                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                failed = self._collect(pending)
+                if failed and cancel_on_failure:
+                    for run in pending:
+                        self._cancel(run, 'cancelled', f"Tarea cancelada: falló {failed.task.name}")
+                    pending = []
+                pending = [run for run in pending if run.status is None]
+                if pending and on_wait is not None:
+                    on_wait()
+        except BaseException:
+            for run in runs:
+                self._cancel(run, 'cancelled', "Tarea cancelada")
+            raise
+
+        for run in runs:
+            self._record(run)
+        if keyed:
+            return {run.key: run.result for run in runs}
+        return [run.result for run in runs]
+
+    def submit(self, func, *args, name=None):
+        """
+        Envía una función al pool sin esperar su resultado, con una copia del contexto actual.
+        Para quien planifica sus propias tareas (p. ej. scripts/column_scheduler.py). Su espera en
+        cola y su ejecución se registran como las de las tareas de run().
+
+        Args:
+            func (callable): Función a ejecutar con `args`.
+            name (str): Nombre de la tarea para las mediciones (por defecto, el de la función).
+
+        Returns:
+            concurrent.futures.Future: Futuro de la llamada.
+        """
+        run = _Run(None, Task(func, name=name), None)
+        run.future = self._executor.submit(contextvars.copy_context().run, self._execute_submitted, run, args)
+        run.future.add_done_callback(lambda future: self._finish_submitted(run, future))
+        return run.future
+
+    def _execute_submitted(self, run, args):
+        run.started_at = time.monotonic()
+        try:
+            return run.task.func(*args)
+        finally:
+            run.finished_at = time.monotonic()
+
+    def _finish_submitted(self, run, future):
+        if future.cancelled():
+            run.status, run.finished_at = 'cancelled', time.monotonic()
+        elif future.exception() is not None or _failed(future.result()):
+            run.status = 'error'
+        else:
+            run.status = 'ok'
+        self._record(run)
+
+    def _execute(self, run):
+        with self._lock:
+            if run.status is not None:
+                return run.result
+            run.started_at = time.monotonic()
+        try:
+            with run.scope:
+                return run.task.func()
+        finally:
+            with self._lock:
+                if run.status is None:
+                    run.finished_at = time.monotonic()
+
+    def _collect(self, pending):
+        # Registra las tareas terminadas y expira las que superaron su tiempo límite.
+        # Devuelve la primera tarea fallida, si la hay.
+        failed = None
+        now = time.monotonic()
+        for run in pending:
+            if run.future.done():
+                if run.status is not None:
+                    continue
+                try:
+                    run.result = run.future.result()
+                    run.status = 'error' if _failed(run.result) else 'ok'
+                except concurrent.futures.CancelledError:
+                    run.result, run.status = (None, "Tarea cancelada"), 'cancelled'
+                except Exception as e:
+                    run.result, run.status = (None, str(e)), 'error'
+            elif (
+                run.timeout
+                and run.started_at is not None
+                and now - run.started_at > run.timeout
+            ):
+                self._cancel(run, 'timeout', f"{run.task.name} superó el tiempo límite de {run.timeout:.0f} s")
+            if run.status in ('error', 'timeout') and failed is None:
+                failed = run
+        return failed
+
+    def _cancel(self, run, status, message):
+        with self._lock:
+            if run.status is not None:
+                return
+            run.status = status
+            run.result = (None, message)
+            run.finished_at = time.monotonic()
+        if run.future is not None:
+            run.future.cancel()
+        run.scope.cancel()
+
+    def _record(self, run):
+        started = run.started_at if run.started_at is not None else run.finished_at
+        with self._lock:
+            self._timings.append({
+                'finished_at': datetime.now().isoformat(timespec='milliseconds'),
+                'task': run.task.name,
+                'section': run.section,
+                'status': run.status,
+                'queue_ms': (started - run.submitted_at) * 1000,
+                'run_ms': (run.finished_at - started) * 1000,
+            })
+
+    def recent(self):
+        """Devuelve las mediciones de las tareas recientes como DataFrame (la más reciente primero)."""
+        with self._lock:
+            records = list(reversed(self._timings))
+        return pd.DataFrame(records, columns=['finished_at', 'task', 'section', 'status', 'queue_ms', 'run_ms'])
+
+
+# Ejecutor compartido por todo el proceso
+task_executor = TaskExecutor()
@@ -0,0 +1,248 @@
+# scripts/top_frequent.py
+
+import hashlib
+import json
+
+import pandas as pd
+
+from scripts.snowflake_connection import (
+    get_top_frequent_data_snowflake, get_top_frequent_batch_snowflake, get_partition_signatures_snowflake,
+    get_approx_top_frequent_snowflake, get_approx_column_stats_snowflake
+)
+from scripts.redshift_connection import (
+    get_top_frequent_data_redshift, get_top_frequent_batch_redshift, get_partition_signatures_redshift,
+    get_approx_top_frequent_redshift, get_approx_column_stats_redshift, get_columns_redshift
+)
+from scripts.audit_store import audit_store, partition_signatures
+from scripts.async_queries import get_top_frequent_data_async
+from scripts.column_scheduler import ColumnScheduler
+from scripts.frequency_profile import (
+    LONG_COLUMNS, normalize_frequency_frame, compare_top_frequent_batch
+)
+from scripts.approximate_profile import compare_approximate_frequencies, compare_column_stats
+from scripts.task_executor import task_executor
+
+# Obtención de los datos más frecuentes por columna en ambos almacenes, sin interfaz: la usan la
+# sección "Analizar Datos Más Frecuentes", el informe y la auditoría por línea de comandos.
+# Las esperas llaman a on_wait para que Streamlit pueda interrumpir la ejecución.
+
+
+def get_top_frequent_long(full_table_name, date_column, sample_date, columns, top_n=5, async_mode=False, on_progress=None,
+                          on_wait=None):
+    """
+    Obtiene los top_n datos más frecuentes de varias columnas en ambos almacenes en formato largo.
+    Primero se intenta con una consulta por almacén; si alguna falla (p. ej. demasiadas columnas
+    para un solo GROUPING SETS) se repiten las consultas columna a columna, todas a la vez y
+    con concurrencia limitada por almacén. El resultado se guarda en el almacén de auditorías y
+    se reutiliza mientras la partición de la fecha de muestreo no cambie.
+
+    Args:
+        full_table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        columns (list): Columnas a analizar.
+        top_n (int): Número de datos más frecuentes por columna.
+        async_mode (bool): Si las consultas por columna se lanzan en modo asíncrono.
+        on_progress (callable): Se llama con (completadas, total) en las consultas por columna.
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+
+    Returns:
+        tuple: (df_snowflake, df_redshift, errores), con los DataFrame en formato largo
+        (column_name, value, count) y los errores por columna como (error_snowflake, error_redshift).
+    """
+    # Si la partición de la fecha de muestreo no cambió desde la última auditoría con las
+    # mismas columnas, se reutiliza el resultado guardado
+    partition_date = sample_date.strftime('%Y-%m-%d')
+    check_name = f"top_frequent:{date_column.lower()}:{top_n}:{hashlib.md5(repr(columns).encode('utf-8')).hexdigest()}"
+    results = task_executor.run({
+        'snowflake': lambda: get_partition_signatures_snowflake(full_table_name, date_column, sample_date, sample_date),
+        'redshift': lambda: get_partition_signatures_redshift(full_table_name, date_column, sample_date, sample_date),
+    }, on_wait=on_wait)
+    (signatures_snowflake, error_snowflake), (signatures_redshift, error_redshift) = results['snowflake'], results['redshift']
+    signature = None
+    if not error_snowflake and not error_redshift:
+        signature = partition_signatures(signatures_snowflake, signatures_redshift).get(partition_date)
+    if signature is not None:
+        _, current = audit_store.plan(full_table_name, check_name, {partition_date: signature})
+        if partition_date in current:
+            stored = current[partition_date]
+            return pd.DataFrame(stored['snowflake'], columns=LONG_COLUMNS), pd.DataFrame(stored['redshift'], columns=LONG_COLUMNS), {}
+
+    # La firma forma parte de la clave de caché: un resultado que se guarda con la firma nueva
+    # no puede salir de la caché de cuando la partición tenía otro contenido
+    cache_params = {partition_date: signature} if signature is not None else None
+    df_snowflake, df_redshift, errors = _query_top_frequent_long(
+        full_table_name, date_column, sample_date, columns, top_n, async_mode, on_progress, on_wait, cache_params
+    )
+    if signature is not None and not errors:
+        audit_store.put(full_table_name, check_name, {partition_date: (signature, {
+            'snowflake': json.loads(df_snowflake.to_json(orient='records')),
+            'redshift': json.loads(df_redshift.to_json(orient='records')),
+        })})
+    return df_snowflake, df_redshift, errors
+
+def get_approximate_top_frequent_long(full_table_name, date_column, sample_date, columns, top_n, approximate, on_wait=None):
+    """
+    Estima los top_n datos más frecuentes y los valores distintos de varias columnas en ambos
+    almacenes (modo aproximado), con una consulta de cada tipo por almacén, todas en paralelo.
+    No hay reintento columna a columna ni se guarda en el almacén de auditorías: son estimaciones.
+
+    Returns:
+        tuple: (df_snowflake, df_redshift, errores, comparación de valores distintos, error de
+        esa comparación). Los DataFrame de frecuencias incluyen la columna error_bound.
+    """
+    results = task_executor.run({
+        'snowflake': lambda: get_approx_top_frequent_snowflake(full_table_name, date_column, sample_date, columns, top_n, approximate),
+        'redshift': lambda: get_approx_top_frequent_redshift(full_table_name, date_column, sample_date, columns, top_n, approximate),
+        'stats_snowflake': lambda: get_approx_column_stats_snowflake(full_table_name, date_column, sample_date, columns),
+        'stats_redshift': lambda: get_approx_column_stats_redshift(full_table_name, date_column, sample_date, columns),
+    }, on_wait=on_wait)
+    (df_snowflake, error_snowflake), (df_redshift, error_redshift) = results['snowflake'], results['redshift']
+    empty = pd.DataFrame(columns=LONG_COLUMNS + ['error_bound'])
+    errors = {}
+    if error_snowflake or error_redshift:
+        errors = {column: (error_snowflake, error_redshift) for column in columns}
+        df_snowflake = df_snowflake if df_snowflake is not None else empty
+        df_redshift = df_redshift if df_redshift is not None else empty.copy()
+
+    (stats_snowflake, stats_error_snowflake), (stats_redshift, stats_error_redshift) = (
+        results['stats_snowflake'], results['stats_redshift']
+    )
+    stats_error = stats_error_snowflake or stats_error_redshift
+    stats_df = None if stats_error else compare_column_stats(stats_snowflake, stats_redshift)
+    return df_snowflake, df_redshift, errors, stats_df, stats_error
+
+def _query_top_frequent_long(full_table_name, date_column, sample_date, columns, top_n, async_mode, on_progress, on_wait,
+                             cache_params=None):
+    def execute_snowflake():
+        return get_top_frequent_batch_snowflake(full_table_name, date_column, sample_date, columns, top_n, cache_params)
+
+    def execute_redshift():
+        return get_top_frequent_batch_redshift(full_table_name, date_column, sample_date, columns, top_n, cache_params)
+
+    results = task_executor.run({'snowflake': execute_snowflake, 'redshift': execute_redshift}, on_wait=on_wait)
+    (df_snowflake, error_snowflake), (df_redshift, error_redshift) = results['snowflake'], results['redshift']
+    if not error_snowflake and not error_redshift:
+        return df_snowflake, df_redshift, {}
+
+    if error_snowflake:
+        print(f"Consulta por lotes fallida en Snowflake, se consulta por columna: {error_snowflake}")
+    if error_redshift:
+        print(f"Consulta por lotes fallida en Redshift, se consulta por columna: {error_redshift}")
+
+    if async_mode:
+        column_results = get_top_frequent_data_async(
+            full_table_name, date_column, sample_date, columns, top_n, on_progress=on_progress, cache_params=cache_params
+        )
+    else:
+        def execute_snowflake_column(column):
+            return get_top_frequent_data_snowflake(full_table_name, date_column, sample_date, column, top_n, cache_params)
+
+        def execute_redshift_column(column):
+            return get_top_frequent_data_redshift(full_table_name, date_column, sample_date, column, top_n, cache_params)
+
+        # Todas las columnas a la vez, con concurrencia limitada por almacén; los resultados
+        # llegan en el orden de las columnas
+        column_results = {}
+        scheduled = ColumnScheduler().run(
+            columns, execute_snowflake_column, execute_redshift_column, on_wait=on_wait
+        )
+        for done, (column, results) in enumerate(scheduled, start=1):
+            column_results[column] = results
+            if on_progress is not None:
+                on_progress(done, len(columns))
+
+    snowflake_frames, redshift_frames, errors = [], [], {}
+    for column in columns:
+        (df_snowflake, error_snowflake), (df_redshift, error_redshift) = column_results[column]
+        if error_snowflake or error_redshift:
+            errors[column] = (error_snowflake, error_redshift)
+            continue
+        snowflake_frames.append(normalize_frequency_frame(df_snowflake, column))
+        redshift_frames.append(normalize_frequency_frame(df_redshift, column))
+
+    empty = pd.DataFrame(columns=LONG_COLUMNS)
+    return (
+        pd.concat(snowflake_frames, ignore_index=True) if snowflake_frames else empty,
+        pd.concat(redshift_frames, ignore_index=True) if redshift_frames else empty.copy(),
+        errors
+    )
+
+def get_frequent_data_for_report(full_table_name, date_column, sample_date, top_n=5, max_columns=None, approximate=None,
+                                 on_wait=None):
+    """
+    Obtiene los datos más frecuentes por columna para incluir en el informe.
+    
+    Args:
+        full_table_name (str): Nombre completo de la tabla.
+        date_column (str): Nombre de la columna de fecha.
+        sample_date (datetime.date): Fecha de muestreo.
+        top_n (int): Número de datos más frecuentes.
+        max_columns (int): Número máximo de columnas a analizar.
+        approximate (ApproximateSettings): Modo aproximado; None para el modo exacto.
+        on_wait (callable): Se llama periódicamente mientras se espera a las consultas.
+    
+    Returns:
+        tuple: (dict con los datos frecuentes por columna, error). En el modo aproximado cada
+        columna incluye también los valores distintos estimados ('stats').
+    """
+    # Obtener las columnas (de Redshift)
+    columns_df, error_columns = get_columns_redshift(full_table_name)
+    if columns_df is None:
+        return {}, error_columns
+    if columns_df.empty:
+        return {}, "No se encontraron columnas en Redshift para la tabla especificada."
+    columns = columns_df['column_name'].tolist()[:max_columns]
+    
+    stats_df = None
+    if approximate is None:
+        df_snowflake, df_redshift, errors = get_top_frequent_long(
+            full_table_name, date_column, sample_date, columns, top_n, on_wait=on_wait
+        )
+    else:
+        df_snowflake, df_redshift, errors, stats_df, _ = get_approximate_top_frequent_long(
+            full_table_name, date_column, sample_date, columns, top_n, approximate, on_wait=on_wait
+        )
+    return frequent_data_from_long(columns, df_snowflake, df_redshift, errors, top_n, approximate, stats_df), None
+
+def frequent_data_from_long(columns, df_snowflake, df_redshift, errors, top_n, approximate=None, stats_df=None):
+    """
+    Arma los datos más frecuentes por columna del informe a partir de los resultados en formato
+    largo de ambos almacenes (los de la sección "Analizar Datos Más Frecuentes" o los del informe).
+
+    Returns:
+        dict: Por columna, 'comparison' (DataFrame o None si la consulta falló), 'discrepancy'
+        y, en el modo aproximado, 'stats'.
+    """
+    if approximate is None:
+        comparison_df = compare_top_frequent_batch(df_snowflake, df_redshift, top_n)
+    else:
+        comparison_df = compare_approximate_frequencies(df_snowflake, df_redshift, top_n)
+    stats_by_column = {}
+    if stats_df is not None:
+        stats_by_column = dict(tuple(stats_df.groupby('column_name', sort=False)))
+    comparison_by_column = dict(tuple(comparison_df.groupby('column_name', sort=False)))
+
+    frequent_data = {}
+    for column in columns:
+        if column in errors:
+            frequent_data[column] = {
+                'comparison': None,
+                'discrepancy': False
+            }
+            continue
+
+        column_comparison = comparison_by_column.get(column)
+        if column_comparison is not None:
+            column_comparison = column_comparison.drop(columns='column_name').reset_index(drop=True)
+        
+        frequent_data[column] = {
+            'comparison': column_comparison,
+            'discrepancy': column_comparison is not None and not column_comparison['match'].all()
+        }
+        column_stats = stats_by_column.get(column)
+        if column_stats is not None:
+            frequent_data[column]['stats'] = column_stats.drop(columns='column_name').reset_index(drop=True)
+            frequent_data[column]['discrepancy'] |= not column_stats['match'].all()
+    
+    return frequent_data
@@ -0,0 +1,70 @@
+# sections/audit_campaign.py
+
+import streamlit as st
+import os
+from scripts.campaign import (
+    CAMPAIGN_WORKERS, parse_campaign_tables, schema_tables, attach_sizes, run_campaign,
+    summary_frame, write_campaign_summary
+)
+from utils.helpers import format_date
+
+def audit_campaign(table_specs, schema_name, date_column, start_date, end_date, workers=CAMPAIGN_WORKERS, approximate=None, exact_counts=False, date_granularity='day'):
+    heartbeat = st.empty()
+
+    # Tablas de la lista (opcionalmente 'tabla:columna_de_fecha') y, si se indica, todas las del esquema
+    tables = attach_sizes(parse_campaign_tables(table_specs.splitlines(), date_column), on_wait=heartbeat.empty)
+    if schema_name:
+        found, error = schema_tables(schema_name, date_column, on_wait=heartbeat.empty)
+        if error:
+            st.warning(f"Aviso al listar el esquema {schema_name}: {error}")
+        known = {table.table_name.lower() for table in tables}
+        tables.extend(table for table in found if table.table_name.lower() not in known)
+    if not tables:
+        st.error("No hay tablas que auditar.")
+        return
+
+    st.write(
+        f"## Campaña de auditoría de **{len(tables)}** tablas entre {format_date(start_date)} y {format_date(end_date)}"
+    )
+
+    # Las tablas se auditan en paralelo (de mayor a menor) y aparecen a medida que terminan
+    progress = st.progress(0.0)
+    status = st.empty()
+    entries = []
+    for entry in run_campaign(
+        tables, start_date, end_date, approximate=approximate, exact_counts=exact_counts,
+        date_granularity=date_granularity, workers=workers, write_pdf=False, on_wait=heartbeat.empty
+    ):
+        entries.append(entry)
+        progress.progress(len(entries) / len(tables))
+        status.write(f"Última tabla terminada: **{entry.table.table_name}** ({entry.status})")
+
+    summary_df = summary_frame(entries)
+    st.subheader("Resumen de la Campaña")
+    st.dataframe(summary_df, hide_index=True)
+
+    failed = summary_df[summary_df['status'] != 'ok']
+    if failed.empty:
+        st.success("Todas las tablas coinciden en ambas bases de datos.")
+    else:
+        st.warning(f"Tablas con discrepancias o errores: {', '.join(failed['table_name'])}")
+        for entry in entries:
+            if entry.status == 'ok':
+                continue
+            with st.expander(entry.table.table_name):
+                if entry.error:
+                    st.error(entry.error)
+                if entry.result is not None:
+                    for discrepancy in entry.result.discrepancies:
+                        st.write(f"- {discrepancy}")
+                    for error in entry.result.errors:
+                        st.error(error)
+
+    csv_path, _ = write_campaign_summary(entries)
+    with open(csv_path, "rb") as file:
+        st.download_button(
+            label="Descargar Resumen CSV",
+            data=file,
+            file_name=os.path.basename(csv_path),
+            mime="text/csv"
+        )
@@ -0,0 +1,45 @@
+# sections/column_fingerprint.py
+
+import streamlit as st
+from datetime import timedelta
+from scripts.column_fingerprint import COLUMN_FINGERPRINT_TOLERANCE, compare_fingerprints, mismatched_columns
+from scripts.fingerprint_audit import get_column_fingerprints
+from scripts.session_results import column_fingerprint_check
+from utils.helpers import display_dataframe, format_date, session_results
+
+def column_fingerprint(full_table_name, date_column, sample_date, days=5, tolerance=COLUMN_FINGERPRINT_TOLERANCE):
+    start_date = sample_date - timedelta(days=days - 1)
+    if days == 1:
+        st.write(f"## Huella estadística de las columnas de **{full_table_name}** el {format_date(sample_date)}")
+    else:
+        st.write(
+            f"## Huella estadística de las columnas de **{full_table_name}** "
+            f"entre {format_date(start_date)} y {format_date(sample_date)}"
+        )
+
+    # Se reutilizan las huellas ya calculadas en esta sesión (el informe hace lo mismo); la
+    # tolerancia sólo afecta a la comparación
+    check = column_fingerprint_check(days)
+    fingerprints = session_results().get(full_table_name, date_column, sample_date, check)
+    if fingerprints is None:
+        heartbeat = st.empty()
+        with st.spinner("Calculando la huella de las columnas en Snowflake y Redshift..."):
+            fingerprint_snowflake, fingerprint_redshift, error = get_column_fingerprints(
+                full_table_name, date_column, start_date, sample_date, on_wait=heartbeat.empty
+            )
+        if error:
+            st.error(f"Error al calcular la huella de las columnas: {error}")
+            return
+        fingerprints = (fingerprint_snowflake, fingerprint_redshift)
+        session_results().put(full_table_name, date_column, sample_date, check, fingerprints)
+
+    comparison_df = compare_fingerprints(*fingerprints, tolerance=tolerance)
+    discrepant = mismatched_columns(comparison_df)
+    if not discrepant:
+        st.success("Las huellas de todas las columnas coinciden en ambas bases de datos.")
+    else:
+        st.warning(f"Columnas con estadísticas distintas: {', '.join(discrepant)}")
+        display_dataframe(comparison_df[~comparison_df['match']], "Estadísticas Distintas")
+
+    with st.expander("Huella Completa"):
+        st.dataframe(comparison_df, hide_index=True)
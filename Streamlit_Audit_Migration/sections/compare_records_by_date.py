@@ -1,69 +1,97 @@
 # sections/compare_records_by_date.py
 
 import streamlit as st
-import pandas as pd
-from scripts.snowflake_connection import get_record_count_by_date_snowflake
-from scripts.redshift_connection import get_record_count_by_date_redshift
-from utils.helpers import display_dataframe, handle_error, format_date
+from scripts.snowflake_connection import get_approx_record_count_by_date_snowflake
+from scripts.redshift_connection import get_approx_record_count_by_date_redshift
+from scripts.record_counts import get_record_counts_by_date
+from scripts.date_counts import GRANULARITIES, compare_counts_by_period, first_divergence
+from scripts.session_results import records_by_date_check
+from utils.helpers import handle_error, format_date, run_parallel_queries, session_results
 
-def compare_records_by_date(full_table_name, date_column, sample_date):
-    st.write(f"## Comparando registros por fecha para los últimos 5 días")
-    
-    # Obtener el conteo de registros agrupados por fecha en Snowflake
-    st.subheader("Registros por Fecha en Snowflake")
-    try:
-        df_snowflake_dates, error_snowflake_dates = get_record_count_by_date_snowflake(
-            table_name=full_table_name,
-            date_column=date_column,
-            sample_date=sample_date,
-            days=5
-        )
-        display_dataframe(df_snowflake_dates, "Registros por Fecha en Snowflake")
-        if error_snowflake_dates:
-            handle_error(error_snowflake_dates, "Snowflake")
-    except Exception as e:
-        st.error(f"Error inesperado al consultar Snowflake: {e}")
-    
-    # Obtener el conteo de registros agrupados por fecha en Redshift
-    st.subheader("Registros por Fecha en Redshift")
-    try:
-        df_redshift_dates, error_redshift_dates = get_record_count_by_date_redshift(
-            table_name=full_table_name,
-            date_column=date_column,
-            sample_date=sample_date,
-            days=5
+def compare_records_by_date(full_table_name, date_column, start_date, end_date, granularity='day', approximate=None):
+    st.write(
+        f"## Comparando registros por fecha entre {format_date(start_date)} y {format_date(end_date)} "
+        f"(por {GRANULARITIES[granularity].lower()})"
+    )
+    if approximate is not None and approximate.sampled:
+        compare_records_by_date_approximate(full_table_name, date_column, start_date, end_date, granularity, approximate)
+        return
+
+    # Una consulta agrupada por día en cada almacén, sólo para los días que no están ya en la
+    # caché de días cerrados (ver scripts/date_counts.py)
+    heartbeat = st.empty()
+    with st.spinner('Contando registros por fecha en Snowflake y Redshift...'):
+        counts = get_record_counts_by_date(
+            full_table_name, date_column, start_date, end_date, on_wait=heartbeat.empty
         )
-        display_dataframe(df_redshift_dates, "Registros por Fecha en Redshift")
-        if error_redshift_dates:
-            handle_error(error_redshift_dates, "Redshift")
-    except Exception as e:
-        st.error(f"Error inesperado al consultar Redshift: {e}")
-    
+    if counts.cached_days:
+        st.info(f"Conteos de {counts.cached_days} días cerrados tomados de la caché, sin consultar los almacenes.")
+    for error, warehouse in ((counts.snowflake_error, "Snowflake"), (counts.redshift_error, "Redshift")):
+        if error:
+            handle_error(error, warehouse)
+
     # Comparar los registros por fecha
     st.markdown("---")
     st.header("Resultado de la Comparación por Fecha")
-    
-    if (df_snowflake_dates is not None) and (df_redshift_dates is not None):
-        # Unir los DataFrames para comparar
-        comparison_df = pd.merge(
-            df_snowflake_dates,
-            df_redshift_dates,
-            on='extraction_date',
-            how='outer',
-            suffixes=('_snowflake', '_redshift')
-        ).fillna(0)
-        
-        # Mostrar la comparación
-        st.write("## Comparación de Registros por Fecha")
-        st.dataframe(comparison_df)
-        
-        # Verificar si los conteos coinciden por fecha
-        # Actualizar los nombres de las columnas aquí
-        comparison_df['match'] = comparison_df['count_snowflake'] == comparison_df['count_redshift']
-        
-        if comparison_df['match'].all():
-            st.success("Los conteos de registros por fecha coinciden en ambas bases de datos.")
+
+    if counts.snowflake_df is None or counts.redshift_df is None:
+        st.error("No se pudieron comparar los registros por fecha debido a errores anteriores.")
+        return
+
+    session_results().put(
+        full_table_name, date_column, end_date, records_by_date_check(_window_days(start_date, end_date)),
+        (counts.snowflake_df, counts.redshift_df)
+    )
+    comparison_df = compare_counts_by_period(counts.snowflake_df, counts.redshift_df, granularity).drop(columns='error_bound')
+    show_comparison(comparison_df)
+
+def compare_records_by_date_approximate(full_table_name, date_column, start_date, end_date, granularity, approximate):
+    # Conteos estimados sobre una muestra de las filas; no se guardan en la caché de días cerrados
+    st.info(approximate.describe())
+    with st.spinner('Estimando registros por fecha en Snowflake y Redshift...'):
+        results = run_parallel_queries({
+            'snowflake': lambda: get_approx_record_count_by_date_snowflake(
+                full_table_name, date_column, start_date, end_date, approximate.sample_percent
+            ),
+            'redshift': lambda: get_approx_record_count_by_date_redshift(
+                full_table_name, date_column, start_date, end_date, approximate.sample_percent
+            ),
+        })
+    for warehouse, label in (('snowflake', 'Snowflake'), ('redshift', 'Redshift')):
+        _, error = results[warehouse]
+        if error:
+            handle_error(error, label)
+
+    st.markdown("---")
+    st.header("Resultado de la Comparación por Fecha")
+    (df_snowflake_dates, _), (df_redshift_dates, _) = results['snowflake'], results['redshift']
+    if df_snowflake_dates is None or df_redshift_dates is None:
+        st.error("No se pudieron comparar los registros por fecha debido a errores anteriores.")
+        return
+
+    session_results().put(
+        full_table_name, date_column, end_date, records_by_date_check(_window_days(start_date, end_date), approximate),
+        (df_snowflake_dates, df_redshift_dates)
+    )
+    show_comparison(compare_counts_by_period(df_snowflake_dates, df_redshift_dates, granularity), approximate=True)
+
+def _window_days(start_date, end_date):
+    # Las comprobaciones guardadas se identifican por la última fecha y el número de días
+    return (end_date - start_date).days + 1
+
+def show_comparison(comparison_df, approximate=False):
+    st.dataframe(comparison_df, hide_index=True)
+    divergence = first_divergence(comparison_df)
+    if divergence is None:
+        if approximate:
+            st.success("Los conteos estimados por fecha coinciden dentro de la cota de error.")
         else:
-            st.warning("Existen discrepancias en los conteos de registros por fecha entre Snowflake y Redshift.")
-    else:
-        st.error("No se pudieron comparar los registros por fecha debido a errores anteriores.")
\ No newline at end of file
+            st.success("Los conteos de registros por fecha coinciden en ambas bases de datos.")
+        return
+
+    mismatches = int((~comparison_df['match']).sum())
+    st.warning(
+        f"Hay {mismatches} periodos con conteos distintos entre Snowflake y Redshift"
+        f"{' (fuera de la cota de error)' if approximate else ''}; el primero empieza el {format_date(divergence)}."
+    )
+    st.dataframe(comparison_df[~comparison_df['match']], hide_index=True)
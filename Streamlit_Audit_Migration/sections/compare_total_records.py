@@ -1,45 +1,55 @@
 # sections/compare_total_records.py
 
 import streamlit as st
-from scripts.snowflake_connection import get_total_record_count_snowflake
-from scripts.redshift_connection import get_total_record_count_redshift
-from utils.helpers import handle_error
+from scripts.record_counts import get_total_record_counts
+from scripts.session_results import TOTAL_COUNTS
+from utils.helpers import handle_error, session_results
 
-def compare_total_records(full_table_name):
+def compare_total_records(full_table_name, date_column, sample_date, exact=False):
     st.write(f"## Comparando la cantidad total de registros en **{full_table_name}**")
-    
+
+    # Primero los conteos de los metadatos de ambos almacenes; COUNT(*) sólo si no coinciden o se pide
+    heartbeat = st.empty()
+    with st.spinner('Contando registros en Snowflake y Redshift...'):
+        counts = get_total_record_counts(full_table_name, exact=exact, on_wait=heartbeat.empty)
+    snowflake_total, redshift_total = counts.snowflake, counts.redshift
+    if counts.match is not None:
+        session_results().put(full_table_name, date_column, sample_date, TOTAL_COUNTS, counts)
+
+    if counts.exact and not exact:
+        st.info(
+            "Los conteos de los metadatos no coinciden o no están disponibles "
+            f"(Snowflake: {counts.metadata_snowflake}, Redshift: {counts.metadata_redshift}); "
+            "se contó con COUNT(*)."
+        )
+
     # Obtener el conteo total de registros en Snowflake
     st.subheader("Cantidad Total de Registros en Snowflake")
-    try:
-        snowflake_total, error_snowflake_total = get_total_record_count_snowflake(full_table_name)
-        if snowflake_total is not None:
-            st.write(f"**Total de registros en Snowflake:** {snowflake_total}")
-        else:
-            handle_error(error_snowflake_total, "Snowflake")
-    except Exception as e:
-        st.error(f"Error inesperado al obtener el conteo total en Snowflake: {e}")
-    
+    if snowflake_total is not None:
+        st.write(f"**Total de registros en Snowflake:** {snowflake_total} ({counts.source})")
+    else:
+        handle_error(counts.snowflake_error, "Snowflake")
+
     # Obtener el conteo total de registros en Redshift
     st.subheader("Cantidad Total de Registros en Redshift")
-    try:
-        redshift_total, error_redshift_total = get_total_record_count_redshift(full_table_name)
-        if redshift_total is not None:
-            st.write(f"**Total de registros en Redshift:** {redshift_total}")
-        else:
-            handle_error(error_redshift_total, "Redshift")
-    except Exception as e:
-        st.error(f"Error inesperado al obtener el conteo total en Redshift: {e}")
-    
+    if redshift_total is not None:
+        st.write(f"**Total de registros en Redshift:** {redshift_total} ({counts.source})")
+    else:
+        handle_error(counts.redshift_error, "Redshift")
+
     # Comparar los totales
     st.markdown("---")
     st.header("Resultado de la Comparación de Totales")
-    
+
     if (snowflake_total is not None) and (redshift_total is not None):
         st.write(f"- **Total en Snowflake:** {snowflake_total}")
         st.write(f"- **Total en Redshift:** {redshift_total}")
-        
+        st.write(f"- **Origen de los totales:** {counts.source}")
+
         if snowflake_total == redshift_total:
             st.success("La cantidad total de registros en ambas bases de datos es **idéntica**.")
+            if not counts.exact:
+                st.caption("Los totales son estimados del catálogo; marca \"Conteo Total Exacto\" para confirmarlos con COUNT(*).")
         else:
             st.warning("**Diferencia en la cantidad total de registros** entre Snowflake y Redshift.")
     else:
@@ -0,0 +1,60 @@
+# sections/row_reconciliation.py
+
+import streamlit as st
+from scripts.row_diff import reconcile_rows
+from scripts.session_results import row_diff_check
+from utils.helpers import display_dataframe, format_date, session_results
+
+def row_reconciliation(full_table_name, date_column, start_date, end_date, key_columns):
+    days = (end_date - start_date).days + 1
+    st.write(f"## Conciliación de filas de **{full_table_name}** entre {format_date(start_date)} y {format_date(end_date)}")
+    if key_columns:
+        st.write(f"**Columnas Clave:** {', '.join(key_columns)}")
+    else:
+        st.info("Sin columnas clave sólo se comparan los hashes por fecha; indícalas en la barra lateral para localizar las filas distintas.")
+
+    # Hashes por fecha y, en las fechas distintas, por cubetas de la clave hasta aislar las filas
+    heartbeat = st.empty()
+    with st.spinner("Comparando hashes de las filas en Snowflake y Redshift..."):
+        result = reconcile_rows(
+            full_table_name, date_column, start_date, end_date, key_columns, on_wait=heartbeat.empty
+        )
+
+    if result.error:
+        st.error(f"Error en la conciliación de filas: {result.error}")
+    else:
+        session_results().put(full_table_name, date_column, end_date, row_diff_check(days, key_columns), result)
+    if result.partitions_df is None:
+        return
+
+    st.subheader("Hashes por Fecha")
+    if result.reused_partitions:
+        st.info(f"Sin cambios desde la última auditoría (hash reutilizado): {', '.join(result.reused_partitions)}")
+    display_dataframe(result.partitions_df, "Hashes por Fecha")
+
+    st.subheader("Niveles de División")
+    st.dataframe(result.levels_df, hide_index=True)
+
+    if not result.mismatched_partitions:
+        st.success("Las filas de todas las fechas coinciden en ambas bases de datos.")
+        return
+
+    st.warning(f"Fechas con filas distintas: {', '.join(result.mismatched_partitions)}")
+    if not result.complete:
+        st.warning(
+            "Las cubetas distintas contienen demasiadas filas para leerlas; "
+            "revisa las columnas clave o aumenta ROW_DIFF_MAX_ROWS."
+        )
+    if result.diff_df is None:
+        return
+
+    st.subheader("Claves con Diferencias")
+    display_dataframe(result.diff_df, "Claves con Diferencias")
+
+    col_snowflake, col_redshift = st.columns(2)
+    with col_snowflake:
+        st.subheader("Filas en Snowflake")
+        display_dataframe(result.rows_snowflake, "Snowflake")
+    with col_redshift:
+        st.subheader("Filas en Redshift")
+        display_dataframe(result.rows_redshift, "Redshift")
@@ -3,45 +3,93 @@
 import streamlit as st
 from scripts.snowflake_connection import query_snowflake_sample
 from scripts.redshift_connection import query_redshift_sample
+from scripts.key_sample import KEY_SAMPLE_ROWS, sample_by_key
 from utils.helpers import display_dataframe, handle_error, format_date, run_parallel_queries
 
-def run_sample_query(full_table_name, date_column, sample_date):
+def run_sample_query(full_table_name, date_column, sample_date, key_columns=None, sample_rows=KEY_SAMPLE_ROWS):
+    if key_columns:
+        run_key_sample(full_table_name, date_column, sample_date, key_columns, sample_rows)
+        return
+
     st.write(f"## Ejecutando `SELECT * WHERE DATE({date_column}) = '{format_date(sample_date)}' LIMIT 10` en la tabla **{full_table_name}**")
+    st.info("Sin columnas clave cada almacén devuelve filas arbitrarias; indícalas en la barra lateral para obtener una muestra alineada y comparable.")
     date_str = format_date(sample_date)
-    
+
     # Definir funciones internas para las consultas
     def execute_snowflake():
         return query_snowflake_sample(
-            table_name=full_table_name, 
-            date_value=date_str, 
+            table_name=full_table_name,
+            date_value=date_str,
             date_column=date_column,
             limit=10
         )
-    
+
     def execute_redshift():
         return query_redshift_sample(
-            table_name=full_table_name, 
-            date_value=date_str, 
+            table_name=full_table_name,
+            date_value=date_str,
             date_column=date_column,
             limit=10
         )
-    
+
     # Ejecutar consultas en paralelo utilizando helpers
     with st.spinner('Ejecutando consultas en Snowflake y Redshift...'):
-        results = run_parallel_queries([execute_snowflake, execute_redshift])
-    
+        results = run_parallel_queries({'snowflake': execute_snowflake, 'redshift': execute_redshift})
+
     # Desempaquetar los resultados
-    df_snowflake, error_snowflake = results[0]
-    df_redshift, error_redshift = results[1]
-    
+    df_snowflake, error_snowflake = results['snowflake']
+    df_redshift, error_redshift = results['redshift']
+
     # Mostrar resultados en Snowflake
     st.subheader("Resultados en Snowflake")
     display_dataframe(df_snowflake, "Snowflake")
     if error_snowflake:
         handle_error(error_snowflake, "Snowflake")
-    
+
     # Mostrar resultados en Redshift
     st.subheader("Resultados en Redshift")
     display_dataframe(df_redshift, "Redshift")
     if error_redshift:
-        handle_error(error_redshift, "Redshift")
\ No newline at end of file
+        handle_error(error_redshift, "Redshift")
+
+def run_key_sample(full_table_name, date_column, sample_date, key_columns, sample_rows):
+    st.write(
+        f"## Muestra de {sample_rows} filas de **{full_table_name}** el {format_date(sample_date)} "
+        f"alineada por el hash de {', '.join(key_columns)}"
+    )
+
+    # Ambos almacenes eligen las mismas claves (las de menor hash) y la comparación se hace aquí
+    heartbeat = st.empty()
+    with st.spinner('Muestreando las mismas claves en Snowflake y Redshift...'):
+        result = sample_by_key(
+            full_table_name, date_column, sample_date, key_columns, rows=sample_rows, on_wait=heartbeat.empty
+        )
+    if result.error:
+        st.error(f"Error en el muestreo por clave: {result.error}")
+        return
+
+    counts = result.status_counts
+    st.write(
+        f"**Claves muestreadas:** {len(result.keys_df)} — coinciden {counts.get('coincide', 0)}, "
+        f"con celdas distintas {counts.get('diferente', 0)}, sólo en Snowflake {counts.get('solo_snowflake', 0)}, "
+        f"sólo en Redshift {counts.get('solo_redshift', 0)}."
+    )
+    if len(result.keys_df) == counts.get('coincide', 0):
+        st.success("Todas las filas de la muestra coinciden en ambas bases de datos.")
+    else:
+        st.warning("Hay filas de la muestra que difieren entre Snowflake y Redshift.")
+        st.subheader("Celdas Distintas")
+        display_dataframe(result.cell_diff_df, "Celdas Distintas")
+        missing = result.keys_df[result.keys_df['status'].isin(['solo_snowflake', 'solo_redshift'])]
+        if not missing.empty:
+            st.subheader("Claves en un Solo Almacén")
+            st.dataframe(missing, hide_index=True)
+
+    with st.expander("Muestras Completas"):
+        col_snowflake, col_redshift = st.columns(2)
+        with col_snowflake:
+            st.subheader("Snowflake")
+            display_dataframe(result.rows_snowflake, "Snowflake")
+        with col_redshift:
+            st.subheader("Redshift")
+            display_dataframe(result.rows_redshift, "Redshift")
@@ -0,0 +1,52 @@
+# sections/stream_diff.py
+
+import streamlit as st
+import pyarrow.parquet as pq
+from scripts.stream_diff import stream_diff
+from utils.helpers import format_date
+
+PREVIEW_ROWS = 1000
+
+def full_partition_diff(full_table_name, date_column, sample_date, key_columns):
+    st.write(f"## Comparación completa de **{full_table_name}** el {format_date(sample_date)}")
+    if not key_columns:
+        st.info("Indica las columnas clave en la barra lateral para cruzar las filas de ambos almacenes.")
+        return
+    st.write(f"**Columnas Clave:** {', '.join(key_columns)}")
+
+    # Ambos almacenes se leen por lotes en orden del hash de la clave y se cruzan a medida que llegan
+    status = st.empty()
+
+    def show_progress(result):
+        status.write(
+            f"Filas leídas: Snowflake {result.rows_snowflake:,}, Redshift {result.rows_redshift:,} — "
+            f"diferencias hasta ahora: {result.different + result.only_snowflake + result.only_redshift:,}"
+        )
+
+    heartbeat = st.empty()
+    with st.spinner("Leyendo y cruzando la fecha completa en Snowflake y Redshift..."):
+        result = stream_diff(
+            full_table_name, date_column, sample_date, key_columns,
+            on_wait=heartbeat.empty, progress=show_progress
+        )
+    if result.error:
+        st.error(f"Error en la comparación completa: {result.error}")
+        if result.output_path is None:
+            return
+
+    st.write(
+        f"**Filas:** Snowflake {result.rows_snowflake:,}, Redshift {result.rows_redshift:,} — "
+        f"idénticas {result.matched:,}, con celdas distintas {result.different:,}, "
+        f"sólo en Snowflake {result.only_snowflake:,}, sólo en Redshift {result.only_redshift:,}."
+    )
+    st.caption(f"Máximo de filas retenidas a la vez para el cruce: {result.peak_buffer_rows:,}")
+    if result.identical:
+        st.success("Todas las filas de la fecha coinciden en ambas bases de datos.")
+        return
+    st.warning(f"Diferencias guardadas en `{result.output_path}`.")
+
+    # Vista previa de las primeras diferencias sin cargar el archivo completo
+    batch = next(pq.ParquetFile(result.output_path).iter_batches(batch_size=PREVIEW_ROWS), None)
+    if batch is not None:
+        st.subheader(f"Primeras {min(batch.num_rows, PREVIEW_ROWS)} Diferencias")
+        st.dataframe(batch.to_pandas(), hide_index=True)
@@ -1,13 +1,20 @@
 # sections/top_frequent_data.py
 
 import streamlit as st
-from scripts.snowflake_connection import get_top_frequent_data_snowflake
-from scripts.redshift_connection import get_top_frequent_data_redshift
-from utils.helpers import display_dataframe, handle_error, run_parallel_queries, format_date
+from scripts.frequency_profile import LONG_COLUMNS, compare_top_frequent_batch, discrepant_columns
+from scripts.approximate_profile import compare_approximate_frequencies
+from scripts.top_frequent import get_top_frequent_long, get_approximate_top_frequent_long, frequent_data_from_long
+from scripts.session_results import top_frequent_check
+from utils.helpers import display_dataframe, handle_error, session_results
 import pandas as pd
 
-def top_frequent_data(full_table_name, date_column, sample_date, top_n=5, max_columns=None):
+def top_frequent_data(full_table_name, date_column, sample_date, top_n=5, max_columns=None, async_mode=False, approximate=None):
     st.write(f"## Análisis de los {top_n} Datos Más Frecuentes por Columna en **{full_table_name}** para la Fecha {sample_date.strftime('%Y-%m-%d')}")
+    if approximate is not None:
+        st.info(
+            f"{approximate.describe()}. Los conteos coinciden si su diferencia no supera error_bound; "
+            "usa el modo exacto para dar por buena la migración."
+        )
     
     # Obtener la lista de columnas
     from scripts.redshift_connection import get_columns_redshift  # Usamos Redshift para obtener columnas
@@ -30,164 +37,94 @@ def top_frequent_data(full_table_name, date_column, sample_date, top_n=5, max_co
         st.error(f"Error inesperado al obtener columnas en Redshift: {e}")
         return
     
-    discrepant_columns = []
+    # Una consulta por almacén para todas las columnas; si alguna falla se consulta columna a columna
+    progress = st.empty()
+    heartbeat = st.empty()
+
+    def on_progress(done, total):
+        progress.progress(done / total, text=f"Consultas completadas: {done} de {total}")
+
+    with st.spinner("Ejecutando una consulta por almacén para todas las columnas..."):
+        if approximate is None:
+            df_snowflake, df_redshift, errors = get_top_frequent_long(
+                full_table_name, date_column, sample_date, columns, top_n,
+                async_mode=async_mode, on_progress=on_progress, on_wait=heartbeat.empty
+            )
+        else:
+            df_snowflake, df_redshift, errors, stats_df, stats_error = get_approximate_top_frequent_long(
+                full_table_name, date_column, sample_date, columns, top_n, approximate, on_wait=heartbeat.empty
+            )
+    progress.empty()
+    if approximate is None:
+        comparison_df = compare_top_frequent_batch(df_snowflake, df_redshift, top_n)
+        frame_columns = ['value', 'count']
+    else:
+        comparison_df = compare_approximate_frequencies(df_snowflake, df_redshift, top_n)
+        frame_columns = ['value', 'count', 'error_bound']
+
+    # Con todas las columnas y sin errores, el informe puede reutilizar el resultado
+    if max_columns is None and not errors and (approximate is None or not stats_error):
+        session_results().put(
+            full_table_name, date_column, sample_date, top_frequent_check(top_n, approximate),
+            frequent_data_from_long(
+                columns, df_snowflake, df_redshift, errors, top_n, approximate,
+                stats_df if approximate is not None else None
+            )
+        )
+
+    if approximate is not None:
+        # Valores distintos y mediana de cada columna (HyperLogLog y percentiles aproximados)
+        st.subheader("Valores Distintos y Mediana Aproximados")
+        if stats_error:
+            st.error(f"Error al estimar los valores distintos: {stats_error}")
+        else:
+            display_dataframe(stats_df, "Valores Distintos Aproximados")
+            stats_mismatch = stats_df.loc[~stats_df['match'], 'column_name'].tolist()
+            if stats_mismatch:
+                st.warning(f"Valores distintos fuera de la cota de error en: {', '.join(stats_mismatch)}")
+        st.markdown("---")
+
+    snowflake_by_column = dict(tuple(df_snowflake.groupby('column_name', sort=False)))
+    redshift_by_column = dict(tuple(df_redshift.groupby('column_name', sort=False)))
+    comparison_by_column = dict(tuple(comparison_df.groupby('column_name', sort=False)))
+    empty = pd.DataFrame(columns=list(dict.fromkeys(LONG_COLUMNS + frame_columns + list(comparison_df.columns))))
 
     for column in columns:
         st.markdown(f"### Columna: **{column}**")
-        
-        # Definir funciones internas para las consultas
-        def execute_snowflake():
-            return get_top_frequent_data_snowflake(full_table_name, date_column, sample_date, column, top_n)
-        
-        def execute_redshift():
-            return get_top_frequent_data_redshift(full_table_name, date_column, sample_date, column, top_n)
-        
-        # Ejecutar consultas en paralelo
-        with st.spinner(f'Ejecutando consultas para la columna "{column}"...'):
-            results = run_parallel_queries([execute_snowflake, execute_redshift])
-        
-        # Desempaquetar los resultados
-        df_snowflake, error_snowflake = results[0]
-        df_redshift, error_redshift = results[1]
-        
+
+        error_snowflake, error_redshift = errors.get(column, (None, None))
+
         # Mostrar resultados en Snowflake
         st.subheader("Top Datos en Snowflake")
-        display_dataframe(df_snowflake, "Snowflake")
         if error_snowflake:
             handle_error(error_snowflake, "Snowflake")
             continue  # Saltar a la siguiente columna en caso de error
-        
+        display_dataframe(snowflake_by_column.get(column, empty)[frame_columns].reset_index(drop=True), "Snowflake")
+
         # Mostrar resultados en Redshift
         st.subheader("Top Datos en Redshift")
-        display_dataframe(df_redshift, "Redshift")
         if error_redshift:
             handle_error(error_redshift, "Redshift")
             continue  # Saltar a la siguiente columna en caso de error
-        
+        display_dataframe(redshift_by_column.get(column, empty)[frame_columns].reset_index(drop=True), "Redshift")
+
         # Comparar los datos más frecuentes
         st.subheader("Comparación de Datos Más Frecuentes")
-        comparison_df = compare_top_frequent(df_snowflake, df_redshift, column, top_n)
-        display_dataframe(comparison_df, "Comparación")
-        
+        column_comparison = comparison_by_column.get(column, empty).drop(columns='column_name').reset_index(drop=True)
+        display_dataframe(column_comparison, "Comparación")
+
         # Verificar discrepancias
-        if comparison_df is not None and not comparison_df['match'].all():
-            discrepant_columns.append(column)
+        if not column_comparison['match'].all():
             st.warning(f"Diferencias encontradas en la columna **{column}**.")
-        elif comparison_df is not None:
+        else:
             st.success(f"No se encontraron diferencias en la columna **{column}**.")
-        
+
         st.markdown("---")
-    
+
     # Resumen de Discrepancias
-    if discrepant_columns:
+    discrepant = discrepant_columns(comparison_df)
+    if discrepant:
         st.markdown("## Resumen de Discrepancias")
-        st.warning(f"Las siguientes columnas presentaron diferencias en los datos más frecuentes: {', '.join(discrepant_columns)}")
+        st.warning(f"Las siguientes columnas presentaron diferencias en los datos más frecuentes: {', '.join(discrepant)}")
     else:
         st.success("No se encontraron discrepancias en los datos más frecuentes de las columnas analizadas.")
-
-def compare_top_frequent(df_snowflake, df_redshift, column, top_n):
-    """
-    Compara los top_n datos más frecuentes de Snowflake y Redshift para una columna específica.
-    """
-    if df_snowflake is None or df_redshift is None:
-        return None
-    
-    # Depuración: Imprimir los nombres de las columnas
-    st.write(f"**Columnas en Snowflake para {column}:** {df_snowflake.columns.tolist()}")
-    st.write(f"**Columnas en Redshift para {column}:** {df_redshift.columns.tolist()}")
-    
-    # Asegurarse de que ambos DataFrames tienen las columnas 'value' y 'count'
-    if not {'value', 'count'}.issubset([col.lower() for col in df_snowflake.columns]) or not {'value', 'count'}.issubset([col.lower() for col in df_redshift.columns]):
-        st.error(f"Formato inesperado de datos para la columna **{column}**.")
-        return None
-    
-    # Renombrar columnas para diferenciarlas (asegurarse de usar el nombre correcto)
-    df_snowflake = df_snowflake.rename(columns=lambda x: x.lower())
-    df_redshift = df_redshift.rename(columns=lambda x: x.lower())
-    
-    df_snowflake = df_snowflake.rename(columns={'count': 'count_snowflake'})
-    df_redshift = df_redshift.rename(columns={'count': 'count_redshift'})
-    
-    #cambiar a string todo antes de hacer merge
-    df_snowflake['value'] = df_snowflake['value'].astype(str)
-    df_redshift['value'] = df_redshift['value'].astype(str)
-
-    # Realizar una unión completa
-    comparison_df = pd.merge(df_snowflake, df_redshift, on='value', how='outer').fillna(0)
-    
-    # Ordenar por el valor para facilitar la lectura
-    comparison_df = comparison_df.sort_values(by='count_snowflake', ascending=False).reset_index(drop=True)
-    
-    # Añadir una columna de comparación
-    comparison_df['match'] = comparison_df['count_snowflake'] == comparison_df['count_redshift']
-    
-    # Seleccionar solo las 5 principales (en caso de más debido a la unión)
-    comparison_df = comparison_df.head(top_n)
-    
-    return comparison_df
-
-def get_frequent_data_for_report(full_table_name, date_column, sample_date, top_n=5, max_columns=None):
-    """
-    Obtiene los datos más frecuentes por columna para incluir en el informe.
-    
-    Args:
-        full_table_name (str): Nombre completo de la tabla.
-        date_column (str): Nombre de la columna de fecha.
-        sample_date (datetime.date): Fecha de muestreo.
-        top_n (int): Número de datos más frecuentes.
-        max_columns (int): Número máximo de columnas a analizar.
-    
-    Returns:
-        dict: Diccionario con datos frecuentes por columna.
-    """
-    from scripts.redshift_connection import get_columns_redshift  # Usar Redshift para obtener columnas
-    import pandas as pd
-    # No es necesario importar compare_top_frequent aquí, ya está en top_frequent_data.py
-    
-    # Obtener las columnas
-    columns_df, error_columns = get_columns_redshift(full_table_name)
-    if columns_df is not None and not columns_df.empty:
-        columns = columns_df['column_name'].tolist()[:max_columns]
-    elif columns_df is not None and columns_df.empty:
-        st.sidebar.info("No se encontraron columnas en Redshift para la tabla especificada.")
-        return {}
-    else:
-        handle_error(error_columns, "Redshift")
-        return {}
-    
-    frequent_data = {}
-
-    for column in columns:
-        # Definir funciones internas para las consultas
-        def execute_snowflake():
-            return get_top_frequent_data_snowflake(full_table_name, date_column, sample_date, column, top_n)
-        
-        def execute_redshift():
-            return get_top_frequent_data_redshift(full_table_name, date_column, sample_date, column, top_n)
-        
-        # Ejecutar consultas en paralelo
-        results = run_parallel_queries([execute_snowflake, execute_redshift])
-        
-        # Desempaquetar los resultados
-        df_snowflake, error_snowflake = results[0]
-        df_redshift, error_redshift = results[1]
-        
-        if error_snowflake or error_redshift:
-            frequent_data[column] = {
-                'comparison': None,
-                'discrepancy': False
-            }
-            continue
-        
-        # Comparar los datos más frecuentes
-        comparison_df = compare_top_frequent(df_snowflake, df_redshift, column, top_n)
-        
-        # Verificar discrepancias
-        discrepancy = not comparison_df['match'].all() if comparison_df is not None else False
-        
-        frequent_data[column] = {
-            'comparison': comparison_df,
-            'discrepancy': discrepancy
-        }
-    
-    return frequent_data
\ No newline at end of file
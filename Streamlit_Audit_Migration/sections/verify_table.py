@@ -3,14 +3,21 @@
 import streamlit as st
 from scripts.snowflake_connection import check_table_exists_snowflake
 from scripts.redshift_connection import check_table_exists_redshift
-from utils.helpers import handle_error
+from scripts.session_results import EXISTS
+from utils.helpers import handle_error, run_parallel_queries, session_results
 
-def verify_table(full_table_name):
+def verify_table(full_table_name, date_column, sample_date):
     st.write(f"## Verificando la tabla **{full_table_name}** en Snowflake y Redshift...")
     
+    # Consultar ambos almacenes en paralelo
+    results = run_parallel_queries({
+        'snowflake': lambda: check_table_exists_snowflake(full_table_name),
+        'redshift': lambda: check_table_exists_redshift(full_table_name),
+    })
+
     # Verificar en Snowflake
     try:
-        snowflake_exists, snowflake_error = check_table_exists_snowflake(full_table_name)
+        snowflake_exists, snowflake_error = results['snowflake']
         if snowflake_exists:
             st.success(f"La tabla **{full_table_name}** existe en **Snowflake**.")
         else:
@@ -21,7 +28,7 @@ def verify_table(full_table_name):
     
     # Verificar en Redshift
     try:
-        redshift_exists, redshift_error = check_table_exists_redshift(full_table_name)
+        redshift_exists, redshift_error = results['redshift']
         if redshift_exists:
             st.success(f"La tabla **{full_table_name}** existe en **Redshift**.")
         else:
@@ -30,6 +37,10 @@ def verify_table(full_table_name):
         st.error(f"Error inesperado al conectar con Redshift: {e}")
         redshift_exists = False
     
+    # Guardar el resultado para el informe si ambas consultas respondieron
+    if results['snowflake'][1] is None and results['redshift'][1] is None:
+        session_results().put(full_table_name, date_column, sample_date, EXISTS, (bool(snowflake_exists), bool(redshift_exists)))
+
     # Comparar existencia
     if 'snowflake_exists' in locals() and 'redshift_exists' in locals():
         if snowflake_exists and redshift_exists:
@@ -0,0 +1,10 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Las pruebas importan los módulos como lo hace la aplicación (scripts.*, utils.*), desde la
+# carpeta de la aplicación
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _APP_DIR not in sys.path:
+    sys.path.insert(0, _APP_DIR)
@@ -0,0 +1,143 @@
+# tests/test_connection_pool.py
+
+import contextvars
+import threading
+
+import pytest
+
+from scripts.connection_pool import CheckoutLimit, ConnectionPool, PoolTimeoutError, limit_checkouts
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        conn = FakeConnection(len(created))
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(factory, name="test", **kwargs), created
+
+
+def acquire_in_thread(pool, **kwargs):
+    # Obtiene una conexión desde otro hilo con una copia del contexto, como el ejecutor de
+    # tareas; devuelve la conexión o la excepción
+    outcome = {}
+
+    def target():
+        try:
+            outcome['conn'] = pool.acquire(**kwargs)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(target,))
+    thread.start()
+    thread.join()
+    return outcome
+
+
+def test_nested_acquire_reuses_the_thread_connection():
+    pool, created = make_pool(max_size=1)
+    outer = pool.acquire()
+    inner = pool.acquire()
+    assert inner.raw_connection is outer.raw_connection
+    assert len(created) == 1
+
+    inner.close()
+    assert pool.stats()['in_use'] == 1
+    outer.close()
+    assert pool.stats()['in_use'] == 0
+    assert pool.stats()['idle'] == 1
+
+
+def test_released_connection_is_reused():
+    pool, created = make_pool(max_size=2)
+    pool.acquire().close()
+    pool.acquire().close()
+    assert len(created) == 1
+    assert pool.stats()['hits'] == 1
+    assert pool.stats()['misses'] == 1
+
+
+def test_full_pool_times_out():
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    outcome = acquire_in_thread(pool, timeout=0.05)
+    assert isinstance(outcome['error'], PoolTimeoutError)
+    assert pool.stats()['waits'] == 0
+
+    conn.close()
+    outcome = acquire_in_thread(pool, timeout=0.05)
+    assert outcome['conn'].raw_connection is conn.raw_connection
+
+
+def test_release_from_another_thread_detaches_the_owner():
+    pool, created = make_pool(max_size=2)
+    conn = pool.acquire()
+    closer = threading.Thread(target=conn.close)
+    closer.start()
+    closer.join()
+
+    # La conexión ya no está asociada al hilo: la siguiente petición la toma del pool
+    again = pool.acquire()
+    assert again.raw_connection is created[0]
+    assert pool.stats()['hits'] == 1
+    again.close()
+
+
+def test_closed_connection_is_discarded_on_release():
+    pool, created = make_pool(max_size=1, is_closed=lambda conn: conn.closed)
+    conn = pool.acquire()
+    created[0].closed = True
+    conn.close()
+    assert pool.stats()['size'] == 0
+
+    pool.acquire().close()
+    assert len(created) == 2
+
+
+def test_checkout_limit_caps_connections_in_its_context():
+    pool, _ = make_pool(max_size=4)
+    limit = CheckoutLimit(1, timeout=0.05)
+    with limit_checkouts({pool: limit}):
+        conn = pool.acquire()
+        outcome = acquire_in_thread(pool)
+    assert isinstance(outcome['error'], PoolTimeoutError)
+
+    # Fuera del contexto el pool conserva sus límites normales
+    outcome = acquire_in_thread(pool, timeout=0.05)
+    assert 'conn' in outcome
+    outcome['conn'].close()
+
+    conn.close()
+    with limit_checkouts({pool: limit}):
+        outcome = acquire_in_thread(pool)
+    assert 'conn' in outcome
+    outcome['conn'].close()
+
+
+def test_failed_checkout_releases_the_limit_slot():
+    pool, _ = make_pool(max_size=1)
+    held = pool.acquire()
+    limit = CheckoutLimit(1)
+    with limit_checkouts({pool: limit}):
+        outcome = acquire_in_thread(pool, timeout=0.05)
+        assert isinstance(outcome['error'], PoolTimeoutError)
+        held.close()
+        outcome = acquire_in_thread(pool, timeout=0.05)
+    assert 'conn' in outcome
+    outcome['conn'].close()
+
+
+def test_checkout_limit_requires_one_slot():
+    with pytest.raises(ValueError):
+        CheckoutLimit(0)
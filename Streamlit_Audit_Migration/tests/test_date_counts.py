@@ -0,0 +1,129 @@
+# tests/test_date_counts.py
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from scripts.audit_store import AuditStore
+from scripts.date_counts import closed_until, compare_counts_by_period, daily_counts, first_divergence, rollup
+
+TODAY = date(2024, 3, 20)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AuditStore(str(tmp_path / 'audit_store.sqlite'))
+
+
+class FakeLoad:
+    """Consulta agrupada por día simulada: devuelve sólo los días con filas dentro del tramo."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.calls = []
+
+    def __call__(self, table_name, date_column, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        days = sorted(day for day in self.counts if start_date <= day <= end_date)
+        return pd.DataFrame({'extraction_date': days, 'count': [self.counts[day] for day in days]}), None
+
+
+def counts_by_day(df):
+    return dict(zip(df['extraction_date'], df['count']))
+
+
+def test_closed_until():
+    assert closed_until(TODAY, settle_days=3) == date(2024, 3, 16)
+
+
+def test_closed_days_are_cached(store):
+    # 2024-03-12 no tiene filas
+    load = FakeLoad({date(2024, 3, day): day * 10 for day in range(10, 21) if day != 12})
+    args = ('sales', 'time_extracted', date(2024, 3, 10), date(2024, 3, 20), 'snowflake', load)
+
+    (df, cached), error = daily_counts(*args, store=store, today=TODAY, settle_days=3)
+    assert error is None
+    assert cached == 0
+    assert load.calls == [(date(2024, 3, 10), date(2024, 3, 20))]
+    assert len(df) == 11
+    assert counts_by_day(df)[date(2024, 3, 12)] == 0
+
+    # Segunda vez: sólo se consultan los días abiertos, desde el 17
+    load.counts[date(2024, 3, 19)] = 1
+    (df_again, cached), error = daily_counts(*args, store=store, today=TODAY, settle_days=3)
+    assert error is None
+    assert cached == 7
+    assert load.calls[-1] == (date(2024, 3, 17), date(2024, 3, 20))
+    counts = counts_by_day(df_again)
+    assert counts[date(2024, 3, 12)] == 0
+    assert counts[date(2024, 3, 16)] == 160
+    assert counts[date(2024, 3, 19)] == 1
+
+
+def test_cache_is_per_warehouse_and_date_column(store):
+    load = FakeLoad({date(2024, 3, 1): 5})
+    window = (date(2024, 3, 1), date(2024, 3, 2))
+    daily_counts('sales', 'time_extracted', *window, 'snowflake', load, store=store, today=TODAY)
+    daily_counts('sales', 'time_extracted', *window, 'redshift', load, store=store, today=TODAY)
+    daily_counts('sales', 'created_at', *window, 'snowflake', load, store=store, today=TODAY)
+    assert len(load.calls) == 3
+
+    (df, cached), _ = daily_counts('sales', 'time_extracted', *window, 'snowflake', load, store=store, today=TODAY)
+    assert cached == 2
+    assert len(load.calls) == 3
+    assert list(df['count']) == [5, 0]
+
+
+def test_fully_cached_window_does_not_query(store):
+    load = FakeLoad({date(2024, 1, 1): 3})
+    window = ('sales', 'time_extracted', date(2024, 1, 1), date(2024, 1, 31), 'redshift', load)
+    daily_counts(*window, store=store, today=TODAY)
+    (df, cached), _ = daily_counts(*window, store=store, today=TODAY)
+    assert cached == 31
+    assert len(load.calls) == 1
+    assert df['count'].sum() == 3
+
+
+def test_failed_load_stores_nothing(store):
+    def failing(table_name, date_column, start_date, end_date):
+        return None, "sin conexión"
+
+    window = ('sales', 'time_extracted', date(2024, 1, 1), date(2024, 1, 5), 'snowflake')
+    assert daily_counts(*window, failing, store=store, today=TODAY) == (None, "sin conexión")
+
+    load = FakeLoad({})
+    (_, cached), _ = daily_counts(*window, load, store=store, today=TODAY)
+    assert cached == 0
+    assert load.calls == [(date(2024, 1, 1), date(2024, 1, 5))]
+
+
+def test_rollup_by_week_and_month():
+    days = pd.date_range('2024-01-29', '2024-02-04').date
+    df = pd.DataFrame({'extraction_date': days, 'count': range(1, 8)})
+
+    weekly = rollup(df, 'week')
+    assert list(weekly['period']) == [date(2024, 1, 29)]
+    assert list(weekly['count']) == [28]
+
+    monthly = rollup(df, 'month')
+    assert list(monthly['period']) == [date(2024, 1, 1), date(2024, 2, 1)]
+    assert list(monthly['count']) == [1 + 2 + 3, 4 + 5 + 6 + 7]
+
+
+def test_first_divergence_by_period():
+    days = list(pd.date_range('2024-01-01', '2024-02-29').date)
+    df_snowflake = pd.DataFrame({'extraction_date': days, 'count': [10] * len(days)})
+    redshift_counts = [10] * len(days)
+    redshift_counts[days.index(date(2024, 2, 10))] = 9
+    df_redshift = pd.DataFrame({'extraction_date': days, 'count': redshift_counts})
+
+    daily = compare_counts_by_period(df_snowflake, df_redshift, 'day')
+    assert first_divergence(daily) == date(2024, 2, 10)
+
+    monthly = compare_counts_by_period(df_snowflake, df_redshift, 'month')
+    assert list(monthly['match']) == [True, False]
+    assert list(monthly['difference']) == [0, 1]
+    assert first_divergence(monthly) == date(2024, 2, 1)
+
+    assert first_divergence(compare_counts_by_period(df_snowflake, df_snowflake, 'week')) is None
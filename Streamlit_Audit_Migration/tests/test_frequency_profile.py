@@ -0,0 +1,33 @@
+# tests/test_frequency_profile.py
+
+import pandas as pd
+
+from scripts.frequency_profile import compare_top_frequent_batch, discrepant_columns, normalize_frequency_frame
+
+
+def test_normalize_single_column_result():
+    df = normalize_frequency_frame(pd.DataFrame({'VALUE': ['a', None], 'COUNT': ['3', '1']}), column='status')
+    assert df.to_dict('records') == [
+        {'column_name': 'status', 'value': 'a', 'count': 3},
+        {'column_name': 'status', 'value': 'None', 'count': 1},
+    ]
+
+
+def test_compare_batch_keeps_top_n_per_column():
+    df_snowflake = normalize_frequency_frame(pd.DataFrame({
+        'column_name': ['status', 'status', 'status', 'country'],
+        'value': ['a', 'b', 'c', 'CO'],
+        'count': [5, 3, 1, 7],
+    }))
+    df_redshift = normalize_frequency_frame(pd.DataFrame({
+        'column_name': ['status', 'status', 'country'],
+        'value': ['a', 'b', 'CO'],
+        'count': [5, 2, 7],
+    }))
+
+    comparison_df = compare_top_frequent_batch(df_snowflake, df_redshift, top_n=2)
+    status = comparison_df[comparison_df['column_name'] == 'status']
+    assert list(status['value']) == ['a', 'b']
+    assert list(status['match']) == [True, False]
+    assert len(comparison_df[comparison_df['column_name'] == 'country']) == 1
+    assert discrepant_columns(comparison_df) == ['status']
@@ -0,0 +1,97 @@
+# tests/test_query_cache.py
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from scripts.query_cache import QueryCache, make_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryCache(max_memory_mb=64, spill_dir=str(tmp_path / 'spill'), default_ttl=60)
+
+
+def test_cache_key_ignores_comments_and_whitespace():
+    assert make_cache_key('Snowflake', "SELECT 1 -- conteo\n  FROM t;") == make_cache_key('snowflake', "SELECT 1 FROM t")
+    assert make_cache_key('snowflake', "SELECT %s", ['a']) != make_cache_key('snowflake', "SELECT %s", ['b'])
+
+
+def test_get_or_load_runs_the_loader_once_for_concurrent_requests(cache):
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return pd.DataFrame({'count': [1]})
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load('snowflake', "SELECT 1", loader)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(df.equals(pd.DataFrame({'count': [1]})) for df in results)
+
+
+def test_cached_values_are_copies(cache):
+    cache.put('snowflake', "SELECT 1", pd.DataFrame({'count': [1]}))
+    df = cache.get('snowflake', "SELECT 1")
+    df.loc[0, 'count'] = 99
+    assert cache.get('snowflake', "SELECT 1").loc[0, 'count'] == 1
+
+
+def test_entries_expire_with_their_dataset_ttl(cache):
+    cache.set_ttl('sales', 0.05)
+    cache.put('redshift', "SELECT 1", 'resultado', dataset='SALES')
+    assert cache.get('redshift', "SELECT 1") == 'resultado'
+    time.sleep(0.1)
+    assert cache.get('redshift', "SELECT 1") is None
+
+
+def test_invalidate_by_dataset(cache):
+    cache.put('snowflake', "SELECT 1", 1, dataset='sales')
+    cache.put('snowflake', "SELECT 2", 2, dataset='users')
+    assert cache.invalidate(dataset='Sales') == 1
+    assert cache.get('snowflake', "SELECT 1") is None
+    assert cache.get('snowflake', "SELECT 2") == 2
+
+
+def test_spilled_entries_are_read_back(tmp_path):
+    cache = QueryCache(max_memory_mb=0.1, spill_dir=str(tmp_path / 'spill'), default_ttl=60)
+    frames = {i: pd.DataFrame({'value': range(i * 10000, (i + 1) * 10000)}) for i in range(3)}
+    for i, df in frames.items():
+        cache.put('snowflake', f"SELECT {i}", df)
+
+    assert cache.stats()['spills'] > 0
+    for i, df in frames.items():
+        assert cache.get('snowflake', f"SELECT {i}").equals(df)
+
+
+def test_iter_batches_is_cached_only_when_complete(cache):
+    def batches():
+        yield pd.DataFrame({'value': [1, 2]})
+        yield pd.DataFrame({'value': [3]})
+
+    def failing():
+        yield pd.DataFrame({'value': [1]})
+        raise RuntimeError("sin conexión")
+
+    with pytest.raises(RuntimeError):
+        list(cache.iter_batches('redshift', "SELECT value", failing))
+    assert cache.stats()['entries'] == 0
+
+    first = pd.concat(cache.iter_batches('redshift', "SELECT value", batches), ignore_index=True)
+    again = pd.concat(cache.iter_batches('redshift', "SELECT value", failing), ignore_index=True)
+    assert list(first['value']) == [1, 2, 3]
+    assert list(again['value']) == [1, 2, 3]
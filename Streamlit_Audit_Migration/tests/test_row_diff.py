@@ -0,0 +1,37 @@
+# tests/test_row_diff.py
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('snowflake.connector')
+pytest.importorskip('psycopg2')
+
+from scripts.row_diff import compare_hashes, compare_rows  # noqa: E402
+
+
+def hashes(rows):
+    return pd.DataFrame(rows, columns=['PARTITION_DATE', 'ROW_COUNT', 'ROW_HASH'])
+
+
+def test_compare_hashes_matches_counts_and_sums():
+    df_snowflake = hashes([('2024-03-01', 2, 18446744073709551617), ('2024-03-02', 1, 5), ('2024-03-03', 4, 7)])
+    df_redshift = hashes([('2024-03-01', '2', '18446744073709551617'), ('2024-03-02', 1, 6)])
+
+    comparison_df = compare_hashes(df_snowflake, df_redshift, ['partition_date'])
+    assert list(comparison_df['partition_date']) == ['2024-03-01', '2024-03-02', '2024-03-03']
+    # Las sumas de hashes que superan int64 se comparan sin perder precisión
+    assert list(comparison_df['match']) == [True, False, False]
+    assert list(comparison_df['row_count_redshift']) == [2, 1, 0]
+
+
+def test_compare_rows_reports_differing_keys():
+    columns = ['partition_date', 'id', 'row_hash']
+    rows_snowflake = pd.DataFrame([('2024-03-01', 1, 'a'), ('2024-03-01', 2, 'b'), ('2024-03-01', 3, 'c')], columns=columns)
+    rows_redshift = pd.DataFrame([('2024-03-01', 1, 'a'), ('2024-03-01', 2, 'x'), ('2024-03-01', 4, 'd')], columns=columns)
+
+    diff_df = compare_rows(rows_snowflake, rows_redshift, ['id'])
+    assert diff_df.to_dict('records') == [
+        {'partition_date': '2024-03-01', 'id': 2, 'status': 'diferente'},
+        {'partition_date': '2024-03-01', 'id': 3, 'status': 'solo_snowflake'},
+        {'partition_date': '2024-03-01', 'id': 4, 'status': 'solo_redshift'},
+    ]
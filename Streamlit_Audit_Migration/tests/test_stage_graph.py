@@ -0,0 +1,96 @@
+# tests/test_stage_graph.py
+
+import threading
+import time
+
+import pytest
+
+from scripts.stage_graph import Stage, run_stages, stage_timings
+
+
+def ok(value, delay=0.0):
+    def stage():
+        time.sleep(delay)
+        return value, None
+    return stage
+
+
+def test_dependents_of_a_failed_stage_are_skipped():
+    calls = []
+
+    def failing():
+        calls.append('conteos')
+        return None, "error en Redshift"
+
+    def never():
+        calls.append('filas')
+        return 'filas', None
+
+    outcomes = run_stages([
+        Stage('columnas', ok('columnas')),
+        Stage('conteos', failing),
+        Stage('filas', never, requires=('conteos',)),
+        Stage('resumen', never, requires=('filas', 'columnas')),
+    ])
+
+    assert calls == ['conteos']
+    assert outcomes['columnas'].status == 'ok'
+    assert outcomes['conteos'].status == 'error'
+    assert outcomes['conteos'].error == "error en Redshift"
+    assert outcomes['filas'].status == 'skipped'
+    assert "conteos" in outcomes['filas'].error
+    # El descarte se propaga en cadena
+    assert outcomes['resumen'].status == 'skipped'
+    assert "filas" in outcomes['resumen'].error
+
+
+def test_exceptions_fail_the_stage():
+    def failing():
+        raise RuntimeError("sin conexión")
+
+    outcomes = run_stages([Stage('conteos', failing), Stage('filas', ok(1), requires=('conteos',))])
+    assert outcomes['conteos'].status == 'error'
+    assert outcomes['conteos'].error == "sin conexión"
+    assert outcomes['filas'].status == 'skipped'
+
+
+def test_stage_starts_after_its_requirements():
+    finished = threading.Event()
+
+    def first():
+        time.sleep(0.1)
+        finished.set()
+        return 'a', None
+
+    def second():
+        return finished.is_set(), None
+
+    outcomes = run_stages([Stage('b', second, requires=('a',)), Stage('a', first)])
+    assert outcomes['b'].value is True
+    # Los resultados siguen el orden de declaración
+    assert list(outcomes) == ['b', 'a']
+
+
+def test_independent_stages_run_in_parallel():
+    start = time.monotonic()
+    outcomes = run_stages([Stage(name, ok(name, 0.3)) for name in ('a', 'b', 'c')])
+    assert all(outcome.status == 'ok' for outcome in outcomes.values())
+    assert time.monotonic() - start < 0.8
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError):
+        run_stages([Stage('a', ok(1), requires=('b',)), Stage('b', ok(2), requires=('a',))])
+    with pytest.raises(ValueError):
+        run_stages([Stage('a', ok(1), requires=('inexistente',))])
+    with pytest.raises(ValueError):
+        run_stages([Stage('a', ok(1)), Stage('a', ok(2))])
+
+
+def test_stage_timings():
+    outcomes = run_stages([Stage('a', ok(1)), Stage('b', lambda: (None, "fallo"), requires=('a',))])
+    timings = stage_timings(outcomes)
+    assert list(timings['stage']) == ['a', 'b']
+    assert list(timings['status']) == ['ok', 'error']
+    assert timings.loc[1, 'requires'] == 'a'
+    assert timings.loc[1, 'detail'] == "fallo"
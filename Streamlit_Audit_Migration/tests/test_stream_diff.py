@@ -0,0 +1,38 @@
+# tests/test_stream_diff.py
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('snowflake.connector')
+pytest.importorskip('psycopg2')
+
+from scripts.stream_diff import compare_chunk  # noqa: E402
+
+
+def chunk(rows):
+    return pd.DataFrame(rows, columns=['key_hash', 'row_hash', 'id', 'amount'])
+
+
+def test_identical_rows_are_matched_by_hash():
+    rows = chunk([(1, 'h1', 1, 10), (2, 'h2', 2, 20)])
+    assert compare_chunk(rows, rows.copy(), ['id'], ['id', 'amount']) == (2, None, None)
+
+
+def test_duplicates_are_paired_once():
+    rows_snowflake = chunk([(1, 'h1', 1, 10), (1, 'h1', 1, 10)])
+    rows_redshift = chunk([(1, 'h1', 1, 10)])
+    matched, keys_df, _ = compare_chunk(rows_snowflake, rows_redshift, ['id'], ['id', 'amount'])
+    assert matched == 1
+    assert list(keys_df['status']) == ['solo_snowflake']
+
+
+def test_differing_rows_are_compared_cell_by_cell():
+    rows_snowflake = chunk([(1, 'h1', 1, 10), (2, 'h2', 2, 20), (3, 'h3', 3, 30)])
+    rows_redshift = chunk([(1, 'h1', 1, 10), (2, 'h9', 2, 21), (4, 'h4', 4, 40)])
+    matched, keys_df, cell_diff_df = compare_chunk(rows_snowflake, rows_redshift, ['id'], ['id', 'amount'])
+
+    assert matched == 1
+    assert dict(zip(keys_df['id'], keys_df['status'])) == {2: 'diferente', 3: 'solo_snowflake', 4: 'solo_redshift'}
+    assert cell_diff_df.to_dict('records') == [
+        {'id': 2, 'column_name': 'amount', 'value_snowflake': 20, 'value_redshift': 21}
+    ]
@@ -0,0 +1,121 @@
+# tests/test_task_executor.py
+
+import threading
+import time
+
+import pytest
+
+from scripts.query_control import QueryTracker
+from scripts.query_timing import query_section
+from scripts.task_executor import Task, TaskExecutor
+
+
+@pytest.fixture
+def executor():
+    return TaskExecutor(max_workers=4)
+
+
+def returning(value, delay=0.0):
+    def task():
+        time.sleep(delay)
+        return value, None
+    return task
+
+
+def tracked_wait(released, limit=5):
+    # Tarea con una consulta en curso que termina cuando se cancela (o al cabo de `limit` s)
+    def task():
+        with QueryTracker().track('Snowflake', 'q1', cancel=lambda query_id: released.set()):
+            released.wait(limit)
+        return ('cancelada' if released.is_set() else 'terminada'), None
+    return task
+
+
+def test_results_follow_submission_order(executor):
+    results = executor.run([returning('a', 0.2), returning('b', 0.0), returning('c', 0.1)])
+    assert results == [('a', None), ('b', None), ('c', None)]
+
+
+def test_keyed_results(executor):
+    results = executor.run({'snowflake': returning(1, 0.1), 'redshift': returning(2)})
+    assert results == {'snowflake': (1, None), 'redshift': (2, None)}
+
+
+def test_exceptions_are_returned_as_errors(executor):
+    def failing():
+        raise RuntimeError("sin conexión")
+
+    results = executor.run([failing, returning('ok')])
+    assert results == [(None, "sin conexión"), ('ok', None)]
+
+
+def test_timeout_cancels_the_running_query(executor):
+    released = threading.Event()
+    start = time.monotonic()
+    results = executor.run([Task(tracked_wait(released), timeout=0.2), returning('ok')])
+    assert results[0][0] is None
+    assert "tiempo límite" in results[0][1]
+    assert results[1] == ('ok', None)
+    # La cancelación llega a la consulta en curso en lugar de esperar a que termine sola
+    assert released.wait(1)
+    assert time.monotonic() - start < 4
+
+
+def test_default_timeout_applies_to_plain_functions(executor):
+    released = threading.Event()
+    results = executor.run([tracked_wait(released)], timeout=0.2)
+    assert "tiempo límite" in results[0][1]
+    assert released.wait(1)
+
+
+def test_failure_cancels_the_group(executor):
+    released = threading.Event()
+
+    def failing():
+        time.sleep(0.05)
+        return None, "error en Redshift"
+
+    results = executor.run([tracked_wait(released), failing], cancel_on_failure=True)
+    assert results[1] == (None, "error en Redshift")
+    assert results[0] == (None, "Tarea cancelada: falló failing")
+    assert released.wait(1)
+
+
+def test_failure_without_cancel_waits_for_all(executor):
+    def failing():
+        return None, "error en Redshift"
+
+    results = executor.run([returning('ok', 0.2), failing])
+    assert results == [('ok', None), (None, "error en Redshift")]
+
+
+def test_run_records_timings(executor):
+    with query_section('Conteos'):
+        executor.run([Task(returning('ok'), name='conteo_snowflake')])
+    timings = executor.recent()
+    assert timings.iloc[0]['task'] == 'conteo_snowflake'
+    assert timings.iloc[0]['section'] == 'Conteos'
+    assert timings.iloc[0]['status'] == 'ok'
+
+
+def test_submit_records_timings(executor):
+    def add(a, b):
+        return a + b, None
+
+    def failing():
+        raise RuntimeError("sin conexión")
+
+    with query_section('Frecuencias'):
+        assert executor.submit(add, 1, 2, name='suma').result() == (3, None)
+        future = executor.submit(failing)
+        with pytest.raises(RuntimeError):
+            future.result()
+
+    # El registro se hace en la callback del futuro, que puede correr justo después de result()
+    deadline = time.monotonic() + 2
+    while len(executor.recent()) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    timings = executor.recent().set_index('task')
+    assert timings.loc['suma', 'status'] == 'ok'
+    assert timings.loc['failing', 'status'] == 'error'
+    assert set(timings['section']) == {'Frecuencias'}
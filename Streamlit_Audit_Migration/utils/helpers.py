@@ -2,7 +2,10 @@
 
 import streamlit as st
 import pandas as pd
-import concurrent.futures
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from scripts.query_control import query_tracker, set_query_owner
+from scripts.task_executor import task_executor
+from scripts.session_results import SessionResults
 
 def display_dataframe(df, title="DataFrame"):
     """
@@ -30,23 +33,44 @@ def format_date(date):
     """
     return date.strftime("%Y-%m-%d")
 
-def run_parallel_queries(funcs):
+def cancel_superseded_queries():
     """
-    Ejecuta múltiples funciones en paralelo y devuelve sus resultados.
+    Se llama al inicio de cada ejecución del script: asocia las consultas nuevas a la sesión
+    actual y cancela las que siguen en curso de una ejecución anterior de la misma sesión,
+    cuyo resultado ya no se va a mostrar.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    set_query_owner(ctx.session_id)
+    query_tracker.cancel(owner=ctx.session_id)
+
+def session_results():
+    """
+    Resultados de las comprobaciones de la sesión actual (se crean en la primera llamada).
+    Las secciones guardan aquí lo que consultan y el informe los reutiliza.
+    """
+    if 'session_results' not in st.session_state:
+        st.session_state['session_results'] = SessionResults()
+    return st.session_state['session_results']
+
+def run_parallel_queries(funcs, timeout=None, cancel_on_failure=False):
+    """
+    Ejecuta múltiples funciones en paralelo en el ejecutor compartido y devuelve sus resultados.
+
+    Mientras espera, el hilo del script sigue atento a Streamlit: si el usuario cambia un
+    widget o pulsa otro botón, Streamlit interrumpe la ejecución y las consultas que siguen
+    en curso se cancelan en el almacén en lugar de terminar en segundo plano.
     
     Args:
-        funcs (list): Lista de funciones sin argumentos.
+        funcs (list | dict): Funciones sin argumentos (o Task); con un dict los resultados
+            se devuelven por clave.
+        timeout (float): Tiempo límite en segundos de cada función.
+        cancel_on_failure (bool): Si el fallo de una función cancela las demás.
         
     Returns:
-        list: Lista de resultados en el mismo orden que las funciones.
-    """
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(funcs)) as executor:
-        futures = [executor.submit(func) for func in funcs]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                result = future.result()
-            except Exception as e:
-                result = (None, str(e))
-            results.append(result)
-    return results
\ No newline at end of file
+        list | dict: Resultados en el mismo orden que las funciones, o por clave.
+    """
+    heartbeat = st.empty()
+    # Cualquier llamada a Streamlit permite que atienda una nueva ejecución pendiente
+    return task_executor.run(funcs, timeout=timeout, cancel_on_failure=cancel_on_failure, on_wait=heartbeat.empty)
@@ -4,6 +4,12 @@ import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from redshift_fetch import fetch_dataframe
+from query_cache import query_cache
+from query_timing import traced, phase, add_query_id, performance_panel
+
+# st.fragment sólo existe desde Streamlit 1.37; antes se llamaba st.experimental_fragment
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,39 +23,42 @@ conn_params = {
     'password': os.getenv('PASSWORD'),
 }
 
+# Consulta de la página
+QUERY = "SELECT * FROM INFORMATION_DELIVERY_PROD.mfs_marketing.lending_hxh;"
+
 # Conectar a Redshift y obtener datos
+@traced("Redshift", section="mambu_hxh")
 def get_data():
     conn = None
     try:
-        conn = psycopg2.connect(**conn_params)
+        with phase('connect'):
+            conn = psycopg2.connect(**conn_params)
+        add_query_id(f"pid:{conn.get_backend_pid()}")
         print("Conexión exitosa")
 
-        # Crear un cursor
-        cursor = conn.cursor()
-
-        # Ejecutar la consulta
-        query = "SELECT * FROM INFORMATION_DELIVERY_PROD.mfs_marketing.lending_hxh;"
-        cursor.execute(query)
-
-        # Obtener los resultados y convertirlos a un DataFrame de Pandas
-        columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
+        # Leer los resultados por bloques con un cursor del servidor
+        df = fetch_dataframe(conn, QUERY)
 
         return df
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()  # Devolver un DataFrame vacío en caso de error
-
     finally:
         if conn:
-            cursor.close()
             conn.close()
             print("Conexión cerrada")
 
-# Llamar a la función para obtener los datos
-df = get_data()
+# Botón para descartar los datos en caché y volver a consultarlos
+if st.sidebar.button("Actualizar datos"):
+    query_cache.invalidate(dataset="mfs_marketing.lending_hxh")
+
+# Obtener los datos; la caché los comparte entre sesiones durante el TTL
+try:
+    df = query_cache.get_or_load("redshift", QUERY, get_data, dataset="mfs_marketing.lending_hxh")
+except Exception as e:
+    print(f"Error: {e}")
+    df = pd.DataFrame()  # Devolver un DataFrame vacío en caso de error
+
+# Panel de tiempos de las consultas
+performance_panel()
 
 # Calcular la fecha y hora más recientes
 max_date = df['fecha'].max()
@@ -62,41 +71,48 @@ st.write("Data Team Control")
 # Mostrar la fecha y hora más recientes
 st.write(f"Most recent update: Date = {max_date}, Hour = {max_hour}")
 
-# Selector de tipo de negocio
-business_list = df['business'].unique().tolist()
-selected_business = st.multiselect('Selecciona el tipo de negocio', business_list, default=['B2C'])
+# Los filtros y el gráfico se vuelven a ejecutar de forma aislada sobre los datos ya cargados,
+# sin repetir la consulta a Redshift en cada cambio de un widget
+@fragment
+def show_disbursements(df):
+    # Selector de tipo de negocio
+    business_list = df['business'].unique().tolist()
+    selected_business = st.multiselect('Selecciona el tipo de negocio', business_list, default=['B2C'])
+
+    # Filtrar por tipo de negocio seleccionado
+    df_filtered = df[df['business'].isin(selected_business)]
 
-# Filtrar por tipo de negocio seleccionado
-df_filtered = df[df['business'].isin(selected_business)]
+    # Selector de producto
+    product_list = df_filtered['product_id'].unique().tolist()
+    selected_products = st.multiselect('Selecciona los productos', product_list, default=product_list)
 
-# Selector de producto
-product_list = df_filtered['product_id'].unique().tolist()
-selected_products = st.multiselect('Selecciona los productos', product_list, default=product_list)
+    # Filtrar por productos seleccionados
+    df_filtered = df_filtered[df_filtered['product_id'].isin(selected_products)]
 
-# Filtrar por productos seleccionados
-df_filtered = df_filtered[df_filtered['product_id'].isin(selected_products)]
+    # Selector de rango de horas
+    hour_range = st.slider('Selecciona el rango de horas', 0, 23, (0, 23))
 
-# Selector de rango de horas
-hour_range = st.slider('Selecciona el rango de horas', 0, 23, (0, 23))
+    # Filtrar por rango de horas
+    df_filtered = df_filtered[(df_filtered['hora'] >= hour_range[0]) & (df_filtered['hora'] <= hour_range[1])]
 
-# Filtrar por rango de horas
-df_filtered = df_filtered[(df_filtered['hora'] >= hour_range[0]) & (df_filtered['hora'] <= hour_range[1])]
+    # Agrupar por fecha y sumar los disbursements
+    df_grouped = df_filtered.groupby('fecha')['disbursements'].sum().reset_index()
 
-# Agrupar por fecha y sumar los disbursements
-df_grouped = df_filtered.groupby('fecha')['disbursements'].sum().reset_index()
+    # Crear gráfico de barras
+    fig, ax = plt.subplots()
+    bars = ax.barh(df_grouped['fecha'], df_grouped['disbursements'], color='blue')
+    ax.set_xlabel('Sum of Disbursements')
+    ax.set_ylabel('Fecha')
+    ax.set_title('Sum of Disbursements by Fecha')
 
-# Crear gráfico de barras
-fig, ax = plt.subplots()
-bars = ax.barh(df_grouped['fecha'], df_grouped['disbursements'], color='blue')
-ax.set_xlabel('Sum of Disbursements')
-ax.set_ylabel('Fecha')
-ax.set_title('Sum of Disbursements by Fecha')
+    # Agregar etiquetas en la parte superior de las barras
+    for bar in bars:
+        width = bar.get_width()
+        label_y = bar.get_y() + bar.get_height() / 2
+        ax.text(width, label_y, f'{width:.0f}', ha='left', va='center')
 
-# Agregar etiquetas en la parte superior de las barras
-for bar in bars:
-    width = bar.get_width()
-    label_y = bar.get_y() + bar.get_height() / 2
-    ax.text(width, label_y, f'{width:.0f}', ha='left', va='center')
+    # Mostrar gráfico en Streamlit
+    st.pyplot(fig)
+    plt.close(fig)
 
-# Mostrar gráfico en Streamlit
-st.pyplot(fig)
\ No newline at end of file
+show_disbursements(df)
@@ -4,6 +4,9 @@ import os
 import streamlit as st
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from redshift_fetch import fetch_dataframe
+from query_cache import query_cache
+from query_timing import traced, phase, add_query_id, performance_panel
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,50 +20,53 @@ conn_params = {
     'password': os.getenv('PASSWORD'),
 }
 
+# Page query
+QUERY = """
+    SELECT 
+        localcreationdate,
+        loanname,
+        CASE WHEN ncred > 1 THEN 1 ELSE 0 END AS recu,
+        COUNT(DISTINCT idmmbloan) AS q_loans,
+        COUNT(DISTINCT accountholderkey) AS q_users
+    FROM INFORMATION_DELIVERY_PROD.MFS_MARKETING.FC_LENDING_LOAN
+    WHERE idcountry = '1'
+    GROUP BY localcreationdate, loanname, recu
+    ORDER BY localcreationdate DESC
+    """
+
 # Function to query Redshift
+@traced("Redshift", section="lending_py_test")
 def query_redshift():
     conn = None
     try:
-        conn = psycopg2.connect(**conn_params)
+        with phase('connect'):
+            conn = psycopg2.connect(**conn_params)
+        add_query_id(f"pid:{conn.get_backend_pid()}")
         print("Conexión exitosa")
 
-        # Create a cursor
-        cursor = conn.cursor()
-
-        # Execute the query
-        query = """
-        SELECT 
-            localcreationdate,
-            loanname,
-            CASE WHEN ncred > 1 THEN 1 ELSE 0 END AS recu,
-            COUNT(DISTINCT idmmbloan) AS q_loans,
-            COUNT(DISTINCT accountholderkey) AS q_users
-        FROM INFORMATION_DELIVERY_PROD.MFS_MARKETING.FC_LENDING_LOAN
-        WHERE idcountry = '1'
-        GROUP BY localcreationdate, loanname, recu
-        ORDER BY localcreationdate DESC
-        """
-        cursor.execute(query)
-
-        # Fetch the results and convert them to a Pandas DataFrame
-        columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
+        # Read the results in chunks through a server-side cursor
+        df = fetch_dataframe(conn, QUERY)
 
         return df
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()  # Return an empty DataFrame in case of error
-
     finally:
         if conn:
-            cursor.close()
             conn.close()
             print("Conexión cerrada")
 
-# Call the function to get the data
-df = query_redshift()
+# Button to drop the cached data and query it again
+if st.sidebar.button("Refresh data"):
+    query_cache.invalidate(dataset="mfs_marketing.fc_lending_loan")
+
+# Get the data; the cache shares it across sessions for the TTL
+try:
+    df = query_cache.get_or_load("redshift", QUERY, query_redshift, dataset="mfs_marketing.fc_lending_loan")
+except Exception as e:
+    print(f"Error: {e}")
+    df = pd.DataFrame()  # Return an empty DataFrame in case of error
+
+# Query timings panel
+performance_panel()
 
 # Debug: Print the column names and first few rows to ensure 'localcreationdate' and 'recu' are present
 st.write("Column names of the DataFrame:", df.columns)
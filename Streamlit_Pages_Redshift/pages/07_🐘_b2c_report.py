@@ -9,37 +9,83 @@ import psycopg2
 import pandas as pd
 import pyminizip
 import tempfile
+import weakref
+import pyarrow.parquet as pq
+from redshift_fetch import fetch_to_parquet
+from query_timing import query_spans, phase, add_query_id, performance_panel
 
 # Load environment variables
 load_dotenv()
 
 # Define the function to query Redshift
-def query_redshift(query, start_date, end_date):
+def query_redshift(query, start_date, end_date, parquet_path):
     user = os.getenv('USERNAMERS')
     password = os.getenv('PASSWORD')
     host = os.getenv('HOST')
     port = os.getenv('PORT')
     dbname = os.getenv('DBNAME')
 
-    conn = psycopg2.connect(
-        dbname=dbname,
-        user=user,
-        password=password,
-        host=host,
-        port=port
-    )
-
-    cs = conn.cursor()
-
-    # Format the query with the dates
-    formatted_query = query.format(start_date=start_date, end_date=end_date)
-
-    cs.execute(formatted_query)
-    df = pd.DataFrame(cs.fetchall(), columns=[desc[0] for desc in cs.description])
-    cs.close()
-    conn.close()
-
-    return df
+    with query_spans.span("Redshift", "query_redshift", section="b2c_report") as span:
+        with phase('connect'):
+            conn = psycopg2.connect(
+                dbname=dbname,
+                user=user,
+                password=password,
+                host=host,
+                port=port
+            )
+        add_query_id(f"pid:{conn.get_backend_pid()}")
+
+        # Format the query with the dates
+        formatted_query = query.format(start_date=start_date, end_date=end_date)
+
+        # Spill the result to Parquet chunk by chunk instead of holding it in memory
+        try:
+            rows = fetch_to_parquet(conn, formatted_query, parquet_path)
+        finally:
+            conn.close()
+
+        span.rows = rows
+        span.bytes = os.path.getsize(parquet_path)
+
+    return rows
+
+# Temporary Parquet file holding the unmasked extract of one session. It is deleted when a new
+# run replaces it, when the session state is discarded or when the process exits
+class ParquetSpill:
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, remove_file, self.path)
+
+    def remove(self):
+        self._finalizer()
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Read the spilled result batch by batch, applying the filters to each batch
+def iter_filtered_batches(parquet_path, disbursement_start_date=None, disbursement_end_date=None,
+                          account_ids=None, types=None, columns=None):
+    parquet_file = pq.ParquetFile(parquet_path)
+    for batch in parquet_file.iter_batches(columns=columns):
+        df = batch.to_pandas()
+
+        # Convert disbursement_date to date only
+        df['disbursement_date'] = pd.to_datetime(df['disbursement_date']).dt.date
+
+        # Filter by disbursement_date if specified
+        if disbursement_start_date and disbursement_end_date:
+            df = df[(df['disbursement_date'] >= disbursement_start_date) & (df['disbursement_date'] <= disbursement_end_date)]
+        if account_ids is not None:
+            df = df[df['account_id'].isin(account_ids)]
+        if types is not None:
+            df = df[df['type'].isin(types)]
+
+        yield df
 
 # Function to mask PII columns
 def mask_pii(df, columns_to_mask):
@@ -60,6 +106,9 @@ WHERE creation_date BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'
 def main():
     st.title("Lending - PY | B2C | Disbursements - Collections - Adjustment | Report")
 
+    # Query timings panel
+    performance_panel()
+
     # Date pickers for start and end dates
     start_date = st.date_input("Start date")
     end_date = st.date_input("End date")
@@ -76,64 +125,70 @@ def main():
         if start_date and end_date:
             st.session_state.start_date = start_date
             st.session_state.end_date = end_date
-            st.session_state.data = query_redshift(query, str(start_date), str(end_date))
-
-            df_full = st.session_state.data
 
-            # Convert disbursement_date to date only
-            df_full['disbursement_date'] = pd.to_datetime(df_full['disbursement_date']).dt.date
+            # Drop the previous extract before spilling a new one
+            if 'spill' in st.session_state:
+                st.session_state.spill.remove()
+                del st.session_state.spill
 
-            # Filter by disbursement_date if specified
-            if disbursement_start_date and disbursement_end_date:
-                df_full = df_full[(df_full['disbursement_date'] >= disbursement_start_date) & (df_full['disbursement_date'] <= disbursement_end_date)]
+            spill = ParquetSpill()
+            try:
+                query_redshift(query, str(start_date), str(end_date), spill.path)
+            except BaseException:
+                spill.remove()
+                raise
 
-            st.session_state.filtered_data = df_full
+            st.session_state.spill = spill
+            st.session_state.disbursement_range = (disbursement_start_date, disbursement_end_date)
             st.write("Data loaded successfully. You can now apply additional filters and download the data.")
 
-    if 'filtered_data' in st.session_state:
-        df_full = st.session_state.filtered_data
-        df_sample = df_full.head(10)  # Get the first 10 rows for preview
+    if 'spill' in st.session_state:
+        parquet_path = st.session_state.spill.path
+        disbursement_range = st.session_state.disbursement_range
 
         # Button to show preview
         if st.button("Show preview"):
+            # Get the first 10 rows for preview
+            batches = iter_filtered_batches(parquet_path, *disbursement_range)
+            df_sample = next((df for df in batches if not df.empty), pd.DataFrame()).head(10)
             df_sample_masked = mask_pii(df_sample, columns_to_mask)
             st.dataframe(df_sample_masked)
 
+        # Only the filter columns are read to build the selector options
+        option_batches = list(iter_filtered_batches(parquet_path, *disbursement_range, columns=['account_id', 'type', 'disbursement_date']))
+        df_options = pd.concat(option_batches) if option_batches else pd.DataFrame(columns=['account_id', 'type'])
+
         # Multiselect for account_id
-        account_ids = ['All'] + df_full['account_id'].unique().tolist()
+        account_ids = ['All'] + df_options['account_id'].unique().tolist()
         selected_account_ids = st.multiselect("Select account_id(s)", account_ids, default='All')
 
         # Multiselect for type
-        types = ['All'] + df_full['type'].unique().tolist()
+        types = ['All'] + df_options['type'].unique().tolist()
         selected_types = st.multiselect("Select type(s)", types, default='All')
 
-        # Filter data based on selected account_ids
-        if 'All' in selected_account_ids:
-            df_filtered = df_full
-        else:
-            df_filtered = df_full[df_full['account_id'].isin(selected_account_ids)]
-
-        # Further filter data based on selected types
-        if 'All' not in selected_types:
-            df_filtered = df_filtered[df_filtered['type'].isin(selected_types)]
+        # Filter data based on selected account_ids and types
+        filter_account_ids = None if 'All' in selected_account_ids else selected_account_ids
+        filter_types = None if 'All' in selected_types else selected_types
 
         # Button to download filtered data
         if st.button("Download Data"):
-            # Convert DataFrame to CSV
-            csv = df_filtered.to_csv(index=False).encode('utf-8')
-            
-            # Create a password-protected ZIP file
-            zip_password = os.getenv('ZIP_PASSWORD')
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as csv_file:
-                csv_file.write(csv)
-                csv_file_path = csv_file.name
-
-            zip_file_path = csv_file_path + '.zip'
-            pyminizip.compress(csv_file_path, None, zip_file_path, zip_password, 0)
-            
-            # Read the ZIP file
-            with open(zip_file_path, 'rb') as zip_file:
-                zip_data = zip_file.read()
+            # Write the filtered data to CSV batch by batch and zip it; both files hold personal
+            # data, so they live in a private temporary directory removed right after reading the ZIP
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                csv_file_path = os.path.join(tmp_dir, 'data.csv')
+                with open(csv_file_path, 'w', encoding='utf-8', newline='') as csv_file:
+                    batches = iter_filtered_batches(parquet_path, *disbursement_range, account_ids=filter_account_ids, types=filter_types)
+                    for i, df_batch in enumerate(batches):
+                        df_batch.to_csv(csv_file, index=False, header=(i == 0))
+
+                # Create a password-protected ZIP file
+                zip_password = os.getenv('ZIP_PASSWORD')
+                zip_file_path = csv_file_path + '.zip'
+                pyminizip.compress(csv_file_path, None, zip_file_path, zip_password, 0)
+
+                # Read the ZIP file
+                with open(zip_file_path, 'rb') as zip_file:
+                    zip_data = zip_file.read()
 
             # Offer the ZIP file for download
             st.download_button(
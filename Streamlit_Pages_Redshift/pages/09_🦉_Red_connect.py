@@ -5,6 +5,9 @@ import psycopg2
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
+from redshift_fetch import fetch_dataframe
+from query_cache import query_cache
+from query_timing import traced, phase, add_query_id, performance_panel
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,39 +21,42 @@ conn_params = {
     'password': os.getenv('PASSWORD'),
 }
 
+# Consulta de la página
+QUERY = "SELECT * FROM INFORMATION_DELIVERY_PROD.mfs_marketing.lending_hxh LIMIT 10;"
+
 # Conectar a Redshift y obtener datos
+@traced("Redshift", section="red_connect")
 def get_data():
     conn = None
     try:
-        conn = psycopg2.connect(**conn_params)
+        with phase('connect'):
+            conn = psycopg2.connect(**conn_params)
+        add_query_id(f"pid:{conn.get_backend_pid()}")
         print("Conexión exitosa")
 
-        # Crear un cursor
-        cursor = conn.cursor()
-
-        # Ejecutar la consulta
-        query = "SELECT * FROM INFORMATION_DELIVERY_PROD.mfs_marketing.lending_hxh LIMIT 10;"
-        cursor.execute(query)
-
-        # Obtener los resultados y convertirlos a un DataFrame de Pandas
-        columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
+        # Leer los resultados por bloques con un cursor del servidor
+        df = fetch_dataframe(conn, QUERY)
 
         return df
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()  # Devolver un DataFrame vacío en caso de error
-
     finally:
         if conn:
-            cursor.close()
             conn.close()
             print("Conexión cerrada")
 
-# Llamar a la función para obtener los datos
-df = get_data()
+# Botón para descartar los datos en caché y volver a consultarlos
+if st.sidebar.button("Actualizar datos"):
+    query_cache.invalidate(dataset="mfs_marketing.lending_hxh")
+
+# Obtener los datos; la caché los comparte entre sesiones durante el TTL
+try:
+    df = query_cache.get_or_load("redshift", QUERY, get_data, dataset="mfs_marketing.lending_hxh")
+except Exception as e:
+    print(f"Error: {e}")
+    df = pd.DataFrame()  # Devolver un DataFrame vacío en caso de error
+
+# Panel de tiempos de las consultas
+performance_panel()
 
 # Configuración de Streamlit
 st.title("Test Connection")
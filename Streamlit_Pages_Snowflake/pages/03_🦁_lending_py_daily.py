@@ -4,30 +4,18 @@ import os
 import streamlit as st
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from snowflake_fetch import fetch_dataframe
+from query_cache import query_cache
+from query_timing import traced, phase, add_query_id, performance_panel
+
+# st.fragment only exists from Streamlit 1.37; earlier versions call it st.experimental_fragment
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
 
 # Load environment variables from .env file
 load_dotenv()
 
-def query_snowflake():
-    user = os.getenv('USER_SNOW')
-    password = os.getenv('PASSWORD_SNOW')
-    account = os.getenv('ACCOUNT_SNOW')
-    warehouse = os.getenv('WAREHOUSE_SNOW')
-    database = os.getenv('DATABASE_SNOW')
-    schema = os.getenv('SCHEMA_SNOW')
-
-    ctx = snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=account,
-        warehouse=warehouse,
-        database=database,
-        schema=schema
-    )
-
-    cs = ctx.cursor()
-
-    query = """
+# Page query
+QUERY = """
     SELECT 
         localcreationdate,
         loanname,
@@ -40,15 +28,45 @@ def query_snowflake():
     ORDER BY localcreationdate DESC
     """
 
-    cs.execute(query)
-    df = pd.DataFrame.from_records(iter(cs), columns=[x[0] for x in cs.description])
+@traced("Snowflake", section="lending_py_daily")
+def query_snowflake():
+    user = os.getenv('USER_SNOW')
+    password = os.getenv('PASSWORD_SNOW')
+    account = os.getenv('ACCOUNT_SNOW')
+    warehouse = os.getenv('WAREHOUSE_SNOW')
+    database = os.getenv('DATABASE_SNOW')
+    schema = os.getenv('SCHEMA_SNOW')
+
+    with phase('connect'):
+        ctx = snowflake.connector.connect(
+            user=user,
+            password=password,
+            account=account,
+            warehouse=warehouse,
+            database=database,
+            schema=schema
+        )
+
+    cs = ctx.cursor()
+
+    with phase('execute'):
+        cs.execute(QUERY)
+    add_query_id(cs.sfqid)
+    df = fetch_dataframe(cs)
     cs.close()
     ctx.close()
 
     return df
 
-# Call the function to get the data
-df = query_snowflake()
+# Button to drop the cached data and query it again
+if st.sidebar.button("Refresh data"):
+    query_cache.invalidate(dataset="mfs_marketing.fc_lending_loan")
+
+# Get the data; the cache shares it across sessions for the TTL
+df = query_cache.get_or_load("snowflake", QUERY, query_snowflake, dataset="mfs_marketing.fc_lending_loan")
+
+# Query timings panel
+performance_panel()
 
 # Convert LOCALCREATIONDATE to datetime
 df['LOCALCREATIONDATE'] = pd.to_datetime(df['LOCALCREATIONDATE'])
@@ -57,57 +75,66 @@ df['LOCALCREATIONDATE'] = pd.to_datetime(df['LOCALCREATIONDATE'])
 min_date = df['LOCALCREATIONDATE'].min()
 max_date = df['LOCALCREATIONDATE'].max()
 
-# Sidebar for date input
-selected_month = st.sidebar.date_input("Select month", value=max_date, min_value=min_date, max_value=max_date)
-start_date = pd.Timestamp(selected_month.year, selected_month.month, 1)
-end_date = (start_date + pd.DateOffset(months=1)) - pd.DateOffset(days=1)
+st.title("Daily Report: Loans by day PY")
 
-# Filter the data for the selected month
-df = df[(df['LOCALCREATIONDATE'] >= start_date) & (df['LOCALCREATIONDATE'] <= end_date)]
+# The month picker, chart and tables rerun on their own over the data already loaded, so
+# changing the month no longer queries Snowflake again. Fragments cannot write to the
+# sidebar, so the picker is shown above the chart.
+@fragment
+def show_daily_report(df):
+    # Date input
+    selected_month = st.date_input("Select month", value=max_date, min_value=min_date, max_value=max_date)
+    start_date = pd.Timestamp(selected_month.year, selected_month.month, 1)
+    end_date = (start_date + pd.DateOffset(months=1)) - pd.DateOffset(days=1)
 
-# Process the data for visualization
-df = df.groupby(['LOCALCREATIONDATE', 'RECU']).agg({'Q_LOANS': 'sum'}).reset_index()
+    # Filter the data for the selected month
+    df = df[(df['LOCALCREATIONDATE'] >= start_date) & (df['LOCALCREATIONDATE'] <= end_date)]
 
-# Pivot the data to get first loans and recurrent loans in separate columns
-df_pivot = df.pivot(index='LOCALCREATIONDATE', columns='RECU', values='Q_LOANS').fillna(0)
-df_pivot.columns = ['First Loan', 'Recurrent Loan']
+    # Process the data for visualization
+    df = df.groupby(['LOCALCREATIONDATE', 'RECU']).agg({'Q_LOANS': 'sum'}).reset_index()
 
-# Calculate total loans by day
-df_pivot['Total Loan'] = df_pivot['First Loan'] + df_pivot['Recurrent Loan']
+    # Pivot the data to get first loans and recurrent loans in separate columns
+    df_pivot = df.pivot(index='LOCALCREATIONDATE', columns='RECU', values='Q_LOANS').fillna(0)
+    df_pivot.columns = ['First Loan', 'Recurrent Loan']
 
-# Create a horizontal bar chart
-fig, ax = plt.subplots(figsize=(10, 8))
+    # Calculate total loans by day
+    df_pivot['Total Loan'] = df_pivot['First Loan'] + df_pivot['Recurrent Loan']
 
-# Plot the first loans
-bars1 = ax.barh(df_pivot.index.strftime('%Y-%m-%d'), df_pivot['First Loan'], color='blue', label='First Loan')
+    # Create a horizontal bar chart
+    fig, ax = plt.subplots(figsize=(10, 8))
 
-# Plot the recurrent loans
-bars2 = ax.barh(df_pivot.index.strftime('%Y-%m-%d'), df_pivot['Recurrent Loan'], left=df_pivot['First Loan'], color='orange', label='Recurrent Loan')
+    # Plot the first loans
+    bars1 = ax.barh(df_pivot.index.strftime('%Y-%m-%d'), df_pivot['First Loan'], color='blue', label='First Loan')
 
-# Add labels and title
-ax.set_xlabel('Number of Loans')
-ax.set_ylabel('Date')
-ax.set_title('Loans by Day')
-ax.legend()
+    # Plot the recurrent loans
+    bars2 = ax.barh(df_pivot.index.strftime('%Y-%m-%d'), df_pivot['Recurrent Loan'], left=df_pivot['First Loan'], color='orange', label='Recurrent Loan')
 
-# Add total loan labels to the bars
-for i, total in enumerate(df_pivot['Total Loan']):
-    ax.text(total, i, f'{int(total)}', va='center', ha='left', color='black', fontsize=10)
+    # Add labels and title
+    ax.set_xlabel('Number of Loans')
+    ax.set_ylabel('Date')
+    ax.set_title('Loans by Day')
+    ax.legend()
 
-# Display the plot in Streamlit
-st.title("Daily Report: Loans by day PY")
-st.pyplot(fig)
+    # Add total loan labels to the bars
+    for i, total in enumerate(df_pivot['Total Loan']):
+        ax.text(total, i, f'{int(total)}', va='center', ha='left', color='black', fontsize=10)
+
+    # Display the plot in Streamlit
+    st.pyplot(fig)
+    plt.close(fig)
+
+    # Add a table showing the numbers by date and totals, sorted in descending order
+    df_table = df_pivot.reset_index()
+    df_table['LOCALCREATIONDATE'] = df_table['LOCALCREATIONDATE'].dt.strftime('%Y-%m-%d')
+    df_table = df_table.sort_values(by='LOCALCREATIONDATE', ascending=False)
+    st.write("Detailed Table of Loans by Date")
+    st.table(df_table)
 
-# Add a table showing the numbers by date and totals, sorted in descending order
-df_table = df_pivot.reset_index()
-df_table['LOCALCREATIONDATE'] = df_table['LOCALCREATIONDATE'].dt.strftime('%Y-%m-%d')
-df_table = df_table.sort_values(by='LOCALCREATIONDATE', ascending=False)
-st.write("Detailed Table of Loans by Date")
-st.table(df_table)
+    # Add a summary table showing the overall totals
+    df_summary = df_pivot[['First Loan', 'Recurrent Loan', 'Total Loan']].sum().reset_index()
+    df_summary.columns = ['Loan Type', 'Total Loans']
 
-# Add a summary table showing the overall totals
-df_summary = df_pivot[['First Loan', 'Recurrent Loan', 'Total Loan']].sum().reset_index()
-df_summary.columns = ['Loan Type', 'Total Loans']
+    st.write("Summary Table of Loans")
+    st.table(df_summary)
 
-st.write("Summary Table of Loans")
-st.table(df_summary)
\ No newline at end of file
+show_daily_report(df)
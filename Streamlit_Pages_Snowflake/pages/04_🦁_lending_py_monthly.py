@@ -4,31 +4,16 @@ import os
 import streamlit as st
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
+from snowflake_fetch import fetch_dataframe
+from query_cache import query_cache
+from query_timing import traced, phase, add_query_id, performance_panel
 from datetime import datetime
 
 # Load environment variables from .env file
 load_dotenv()
 
-def query_snowflake():
-    user = os.getenv('USER_SNOW')
-    password = os.getenv('PASSWORD_SNOW')
-    account = os.getenv('ACCOUNT_SNOW')
-    warehouse = os.getenv('WAREHOUSE_SNOW')
-    database = os.getenv('DATABASE_SNOW')
-    schema = os.getenv('SCHEMA_SNOW')
-
-    ctx = snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=account,
-        warehouse=warehouse,
-        database=database,
-        schema=schema
-    )
-
-    cs = ctx.cursor()
-
-    query = """
+# Page query
+QUERY = """
     SELECT 
         localcreationdate,
         loanname,
@@ -41,15 +26,45 @@ def query_snowflake():
     ORDER BY localcreationdate DESC
     """
 
-    cs.execute(query)
-    df = pd.DataFrame.from_records(iter(cs), columns=[x[0] for x in cs.description])
+@traced("Snowflake", section="lending_py_monthly")
+def query_snowflake():
+    user = os.getenv('USER_SNOW')
+    password = os.getenv('PASSWORD_SNOW')
+    account = os.getenv('ACCOUNT_SNOW')
+    warehouse = os.getenv('WAREHOUSE_SNOW')
+    database = os.getenv('DATABASE_SNOW')
+    schema = os.getenv('SCHEMA_SNOW')
+
+    with phase('connect'):
+        ctx = snowflake.connector.connect(
+            user=user,
+            password=password,
+            account=account,
+            warehouse=warehouse,
+            database=database,
+            schema=schema
+        )
+
+    cs = ctx.cursor()
+
+    with phase('execute'):
+        cs.execute(QUERY)
+    add_query_id(cs.sfqid)
+    df = fetch_dataframe(cs)
     cs.close()
     ctx.close()
 
     return df
 
-# Call the function to get the data
-df = query_snowflake()
+# Button to drop the cached data and query it again
+if st.sidebar.button("Refresh data"):
+    query_cache.invalidate(dataset="mfs_marketing.fc_lending_loan")
+
+# Get the data; the cache shares it across sessions for the TTL
+df = query_cache.get_or_load("snowflake", QUERY, query_snowflake, dataset="mfs_marketing.fc_lending_loan")
+
+# Query timings panel
+performance_panel()
 
 # Convert LOCALCREATIONDATE to datetime
 df['LOCALCREATIONDATE'] = pd.to_datetime(df['LOCALCREATIONDATE'])
@@ -0,0 +1,21 @@
+# streamlit_common/__init__.py
+#
+# Módulos comunes a todas las aplicaciones del repositorio. Cada aplicación los expone con el
+# nombre que ya importan sus páginas (query_cache, scripts.query_cache, ...) mediante un módulo
+# de enlace que añade la raíz del repositorio al path; ver link_module().
+
+import importlib
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def link_module(alias, name):
+    """
+    Registra el módulo común `name` (p. ej. 'streamlit_common.query_cache') también como
+    `alias`, de modo que ambos nombres den el mismo objeto y el mismo estado del proceso.
+    """
+    module = importlib.import_module(name)
+    sys.modules[alias] = module
+    return module
@@ -0,0 +1,429 @@
+# streamlit_common/query_cache.py
+
+import copy
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Caché de resultados de consultas compartida por todas las sesiones del proceso.
+# La clave es (almacén, SQL normalizado, parámetros). Cada entrada pertenece a un
+# "dataset" (normalmente la tabla consultada) que define su TTL y permite invalidarla.
+# Cuando se supera el límite de memoria, las entradas menos usadas se vuelcan a disco
+# (Parquet para los DataFrame, pickle para el resto). Las lecturas y escrituras de disco
+# se hacen fuera del cerrojo de la caché.
+
+DEFAULT_TTL = float(os.getenv('QUERY_CACHE_TTL', 600))
+DEFAULT_MAX_MEMORY_MB = float(os.getenv('QUERY_CACHE_MAX_MEMORY_MB', 512))
+DEFAULT_SPILL_DIR = os.getenv('QUERY_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'query_cache'))
+
+
+def normalize_sql(query):
+    """
+    Normaliza una consulta para usarla como clave: quita comentarios, colapsa los
+    espacios en blanco y elimina el ';' final.
+    """
+    if not isinstance(query, str):
+        # psycopg2.sql.Composable: su representación es estable
+        query = repr(query)
+    query = re.sub(r'/\*.*?\*/', ' ', query, flags=re.S)
+    query = re.sub(r'--[^\n]*', ' ', query)
+    return re.sub(r'\s+', ' ', query).strip().rstrip(';').strip()
+
+
+def make_cache_key(warehouse, query, params=None):
+    payload = json.dumps(
+        [warehouse.lower(), normalize_sql(query), params],
+        default=str,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _normalize_dataset(dataset):
+    return dataset.lower() if dataset else None
+
+
+def _size_of(value):
+    # Tamaño aproximado en memoria, incluidos los DataFrame dentro de dataclasses y colecciones
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(_size_of(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_of(k) + _size_of(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_size_of(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Los llamadores modifican lo que reciben (DataFrame o perfiles con DataFrame dentro):
+    # la caché guarda y entrega copias
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _write_spill(value, path):
+    if isinstance(value, pd.DataFrame):
+        value.to_parquet(path, index=False)
+    else:
+        with open(path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_spill(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class _Entry:
+    def __init__(self, warehouse, dataset, expires_at, value=None, nbytes=0, path=None):
+        self.warehouse = warehouse
+        self.dataset = dataset
+        self.expires_at = expires_at
+        self.value = value
+        self.nbytes = nbytes
+        self.path = path
+        self.spilling = False
+
+
+class QueryCache:
+    """
+    Caché LRU de resultados con TTL por dataset, límite de memoria y volcado a disco.
+
+    Args:
+        max_memory_mb (float): Memoria máxima de las entradas residentes.
+        spill_dir (str): Carpeta para los archivos de las entradas volcadas.
+        default_ttl (float): TTL en segundos para datasets sin TTL propio.
+    """
+
+    def __init__(self, max_memory_mb=DEFAULT_MAX_MEMORY_MB, spill_dir=DEFAULT_SPILL_DIR, default_ttl=DEFAULT_TTL):
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+        self.default_ttl = default_ttl
+        self._ttls = {}
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._loading = {}  # clave -> [cerrojo de carga, hilos que lo usan]
+        self._readers = {}  # archivo -> lecturas en curso
+        self._doomed = set()  # archivos a borrar cuando terminen sus lecturas
+        self._stats = {'hits': 0, 'misses': 0, 'spills': 0, 'disk_hits': 0, 'evictions': 0}
+
+    def set_ttl(self, dataset, ttl):
+        """Define el TTL en segundos de un dataset."""
+        with self._lock:
+            self._ttls[_normalize_dataset(dataset)] = ttl
+
+    def get(self, warehouse, query, params=None):
+        """Devuelve el resultado en caché o None si no existe o expiró."""
+        return self._get(make_cache_key(warehouse, query, params))
+
+    def _get(self, key, count_miss=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time():
+                if entry is not None:
+                    self._remove(key)
+                if count_miss:
+                    self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            if entry.value is not None:
+                return _copy(entry.value)
+            # Entrada volcada a disco: se lee fuera del cerrojo y se vuelve a cargar en memoria
+            self._stats['disk_hits'] += 1
+            path = entry.path
+            self._begin_read(path)
+        try:
+            value = _read_spill(path)
+        finally:
+            with self._lock:
+                self._end_read(path)
+        nbytes = _size_of(value)
+        victims = []
+        with self._lock:
+            if self._entries.get(key) is entry and entry.path == path and nbytes <= self.max_memory_bytes:
+                entry.value, entry.nbytes, entry.path = value, nbytes, None
+                self._memory_bytes += nbytes
+                self._delete_file(path)
+                victims = self._select_spills()
+        self._spill(victims)
+        return _copy(value)
+
+    def put(self, warehouse, query, value, params=None, dataset=None, ttl=None):
+        """Guarda un resultado. Los valores None no se guardan."""
+        if value is None:
+            return
+        key = make_cache_key(warehouse, query, params)
+        dataset = _normalize_dataset(dataset)
+        value = _copy(value)
+        nbytes = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(warehouse.lower(), dataset, time.time() + self._ttl_for(dataset, ttl), value, nbytes)
+            self._entries[key] = entry
+            self._memory_bytes += nbytes
+            victims = self._select_spills()
+        self._spill(victims)
+
+    def get_or_load(self, warehouse, query, loader, params=None, dataset=None, ttl=None):
+        """
+        Devuelve el resultado en caché o lo obtiene con loader() y lo guarda.
+        Si varias sesiones piden la misma consulta a la vez, sólo una ejecuta loader();
+        las demás esperan y reciben el resultado en caché. Las excepciones de loader()
+        se propagan y no se guardan.
+        """
+        key = make_cache_key(warehouse, query, params)
+        value = self._get(key)
+        if value is not None:
+            return value
+        slot = self._acquire_loading(key)
+        try:
+            value = self._get(key, count_miss=False)
+            if value is not None:
+                return value
+            value = loader()
+            self.put(warehouse, query, value, params=params, dataset=dataset, ttl=ttl)
+            return value
+        finally:
+            self._release_loading(key, slot)
+
+    def iter_batches(self, warehouse, query, batch_loader, params=None, dataset=None, ttl=None):
+        """
+        Versión por lotes de get_or_load para extracciones grandes. Si el resultado está en
+        caché se lee lote a lote desde Parquet; si no, los lotes de batch_loader() se entregan
+        a medida que llegan y a la vez se escriben en disco. Sólo se registra la entrada si
+        la lectura se completa.
+
+        Yields:
+            pd.DataFrame: Lotes del resultado.
+        """
+        key = make_cache_key(warehouse, query, params)
+        found, value, path = self._lookup_stream(key)
+        slot = None
+        if not found:
+            slot = self._acquire_loading(key)
+            found, value, path = self._lookup_stream(key, count_miss=False)
+            if found:
+                self._release_loading(key, slot)
+                slot = None
+        if found:
+            if value is not None:
+                yield value
+                return
+            # El archivo queda reservado mientras se lee: una invalidación lo borra al terminar
+            try:
+                for batch in pq.ParquetFile(path).iter_batches():
+                    yield batch.to_pandas()
+            finally:
+                with self._lock:
+                    self._end_read(path)
+            return
+
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            tmp_path = os.path.join(self.spill_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+            writer = None
+            completed = False
+            try:
+                for df in batch_loader():
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                    yield df
+                completed = True
+            finally:
+                if writer is not None:
+                    writer.close()
+                if completed and writer is not None:
+                    path = self._spill_path(key, '.parquet')
+                    os.replace(tmp_path, path)
+                    dataset = _normalize_dataset(dataset)
+                    with self._lock:
+                        if key in self._entries:
+                            self._remove(key)
+                        self._entries[key] = _Entry(
+                            warehouse.lower(), dataset, time.time() + self._ttl_for(dataset, ttl), path=path
+                        )
+                else:
+                    self._delete_file(tmp_path)
+        finally:
+            self._release_loading(key, slot)
+
+    def invalidate(self, warehouse=None, dataset=None):
+        """
+        Elimina las entradas del almacén y/o dataset indicados (todas si no se indica ninguno).
+
+        Returns:
+            int: Número de entradas eliminadas.
+        """
+        warehouse = warehouse.lower() if warehouse else None
+        dataset = _normalize_dataset(dataset)
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if (warehouse is None or entry.warehouse == warehouse)
+                and (dataset is None or entry.dataset == dataset)
+            ]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """Elimina todas las entradas."""
+        return self.invalidate()
+
+    def stats(self):
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['on_disk'] = sum(1 for entry in self._entries.values() if entry.value is None)
+            stats['memory_mb'] = self._memory_bytes / (1024 * 1024)
+        return stats
+
+    def _lookup_stream(self, key, count_miss=True):
+        # Devuelve (encontrada, valor en memoria, ruta en disco) sin cargar el archivo; si la
+        # entrada está en disco, su archivo queda reservado hasta que se llame a _end_read()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                if count_miss:
+                    self._stats['misses'] += 1
+                return False, None, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            if entry.value is not None:
+                return True, _copy(entry.value), None
+            self._begin_read(entry.path)
+            return True, None, entry.path
+
+    def _ttl_for(self, dataset, ttl):
+        if ttl is not None:
+            return ttl
+        return self._ttls.get(dataset, self.default_ttl)
+
+    def _acquire_loading(self, key):
+        # Cerrojo de carga de una clave; la entrada se elimina cuando nadie lo usa
+        with self._lock:
+            slot = self._loading.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        slot[0].acquire()
+        return slot
+
+    def _release_loading(self, key, slot):
+        if slot is None:
+            return
+        slot[0].release()
+        with self._lock:
+            slot[1] -= 1
+            if slot[1] == 0 and self._loading.get(key) is slot:
+                del self._loading[key]
+
+    def _spill_path(self, key, extension):
+        # Nombre único: una entrada nueva de la misma clave no pisa el archivo de la anterior
+        return os.path.join(self.spill_dir, f"{key}.{uuid.uuid4().hex}{extension}")
+
+    def _begin_read(self, path):
+        self._readers[path] = self._readers.get(path, 0) + 1
+
+    def _end_read(self, path):
+        self._readers[path] -= 1
+        if self._readers[path] == 0:
+            del self._readers[path]
+            if path in self._doomed:
+                self._doomed.discard(path)
+                self._delete_file(path)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        if entry.value is not None:
+            self._memory_bytes -= entry.nbytes
+        if entry.path is not None:
+            self._delete_file(entry.path)
+
+    def _select_spills(self):
+        # Elige (con el cerrojo tomado) las entradas residentes menos usadas que hay que volcar
+        # para respetar el límite; el volcado se hace después en _spill(), fuera del cerrojo
+        now = time.time()
+        # Las entradas que otro hilo ya está volcando dejarán de contar al terminar
+        projected = self._memory_bytes - sum(e.nbytes for e in self._entries.values() if e.spilling)
+        victims = []
+        for key in list(self._entries):
+            if projected <= self.max_memory_bytes:
+                break
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                if entry.value is not None and not entry.spilling:
+                    projected -= entry.nbytes
+                self._remove(key)
+                continue
+            if entry.value is None or entry.spilling:
+                continue
+            entry.spilling = True
+            projected -= entry.nbytes
+            victims.append((key, entry))
+        return victims
+
+    def _spill(self, victims):
+        for key, entry in victims:
+            extension = '.parquet' if isinstance(entry.value, pd.DataFrame) else '.pkl'
+            path = self._spill_path(key, extension)
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                _write_spill(entry.value, path)
+                written = True
+            except Exception:
+                self._delete_file(path)
+                written = False
+            with self._lock:
+                entry.spilling = False
+                if self._entries.get(key) is not entry or entry.value is None:
+                    # La entrada se eliminó o se reemplazó mientras se escribía
+                    if written:
+                        self._delete_file(path)
+                    continue
+                if not written:
+                    self._remove(key)
+                    self._stats['evictions'] += 1
+                    continue
+                self._memory_bytes -= entry.nbytes
+                entry.value, entry.path = None, path
+                self._stats['spills'] += 1
+
+    def _delete_file(self, path):
+        # Si el archivo se está leyendo, se borra cuando termine la última lectura
+        if self._readers.get(path):
+            self._doomed.add(path)
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Caché compartida por todo el proceso
+query_cache = QueryCache()
@@ -0,0 +1,278 @@
+# streamlit_common/query_timing.py
+
+import contextvars
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Medición de cada llamada a los almacenes: un "span" por consulta con los tiempos de
+# conexión, ejecución y lectura, filas y bytes aproximados, query ID y la sección o página
+# que la lanzó. Los spans se añaden como líneas JSON a QUERY_SPANS_PATH y los más recientes
+# se conservan en memoria para el panel "Performance".
+
+DEFAULT_SPANS_PATH = os.getenv('QUERY_SPANS_PATH', os.path.join(tempfile.gettempdir(), 'query_spans.jsonl'))
+DEFAULT_MAX_RECENT = int(os.getenv('QUERY_SPANS_MAX_RECENT', 1000))
+
+_current_span = contextvars.ContextVar('query_span', default=None)
+_current_section = contextvars.ContextVar('query_section', default=None)
+
+
+def set_query_section(name):
+    """Atribuye a `name` las consultas que se lancen desde el contexto actual."""
+    _current_section.set(name)
+
+
+def current_section():
+    """Devuelve la sección a la que se atribuyen las consultas del contexto actual."""
+    return _current_section.get()
+
+
+@contextmanager
+def query_section(name):
+    """Atribuye a `name` las consultas que se lancen dentro del bloque `with`."""
+    token = _current_section.set(name)
+    try:
+        yield
+    finally:
+        _current_section.reset(token)
+
+
+def _measure(value):
+    # Filas y bytes aproximados de un resultado
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=True, deep=False).sum())
+    if value is None:
+        return None, None
+    frames = [v for v in getattr(value, '__dict__', {}).values() if isinstance(v, pd.DataFrame)]
+    if frames:
+        return sum(len(f) for f in frames), sum(int(f.memory_usage(index=True, deep=False).sum()) for f in frames)
+    return 1, sys.getsizeof(value)
+
+
+class QuerySpan:
+    """
+    Mediciones de una llamada a un almacén.
+
+    Attributes:
+        warehouse (str): "Snowflake" o "Redshift".
+        operation (str): Función o consulta medida.
+        section (str): Sección de la auditoría o página que la lanzó.
+        query_ids (list): Query IDs de Snowflake o PID del backend de Redshift.
+        connect_ms, execute_ms, fetch_ms (float): Tiempo acumulado por fase (None si no hubo).
+        total_ms (float): Duración total.
+        rows (int): Filas del resultado.
+        bytes (int): Tamaño aproximado del resultado en memoria.
+        cached (bool): True si no se ejecutó ninguna consulta (resultado de la caché).
+        error (str): Mensaje de error, si lo hubo.
+    """
+
+    def __init__(self, warehouse, operation, section=None):
+        self.warehouse = warehouse
+        self.operation = operation
+        self.section = section
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.query_ids = []
+        self.connect_ms = None
+        self.execute_ms = None
+        self.fetch_ms = None
+        self.total_ms = None
+        self.rows = None
+        self.bytes = None
+        self.cached = False
+        self.error = None
+        self._open_phases = set()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Suma al tiempo de la fase `name` ('connect', 'execute' o 'fetch') la duración del bloque.
+        Un bloque de la misma fase anidado en otro (p. ej. fetch_dataframe dentro de un
+        phase('fetch') del llamador) no se vuelve a sumar.
+        """
+        if name in self._open_phases:
+            yield
+            return
+        self._open_phases.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._open_phases.discard(name)
+            attr = f'{name}_ms'
+            setattr(self, attr, (getattr(self, attr) or 0.0) + (time.perf_counter() - start) * 1000)
+
+    def record_result(self, value):
+        self.rows, self.bytes = _measure(value)
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'warehouse': self.warehouse,
+            'operation': self.operation,
+            'section': self.section,
+            'query_ids': self.query_ids,
+            'connect_ms': self.connect_ms,
+            'execute_ms': self.execute_ms,
+            'fetch_ms': self.fetch_ms,
+            'total_ms': self.total_ms,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'cached': self.cached,
+            'error': self.error,
+        }
+
+
+class SpanRecorder:
+    """
+    Registra los spans en un archivo de líneas JSON y conserva los más recientes en memoria.
+
+    Args:
+        path (str): Archivo de líneas JSON; None para no escribir en disco.
+        max_recent (int): Spans que se conservan en memoria.
+    """
+
+    def __init__(self, path=DEFAULT_SPANS_PATH, max_recent=DEFAULT_MAX_RECENT):
+        self.path = path
+        self._recent = deque(maxlen=max_recent)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, warehouse, operation, section=None):
+        """
+        Mide el bloque `with` como una llamada a un almacén. Dentro del bloque, phase() y
+        add_query_id() registran sus datos en este span.
+
+        Yields:
+            QuerySpan: El span en curso.
+        """
+        span = QuerySpan(warehouse, operation, section or _current_section.get())
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.total_ms = (time.perf_counter() - start) * 1000
+            span.cached = span.execute_ms is None and span.error is None
+            self._record(span)
+
+    def recent(self):
+        """Devuelve los spans recientes como DataFrame (el más reciente primero)."""
+        with self._lock:
+            records = [span.to_dict() for span in reversed(self._recent)]
+        return pd.DataFrame(records, columns=list(QuerySpan('', '').to_dict()))
+
+    def summary(self):
+        """Agrega los spans recientes por sección y almacén."""
+        df = self.recent()
+        if df.empty:
+            return df
+        df['section'] = df['section'].fillna('-')
+        return (
+            df.groupby(['section', 'warehouse'])
+            .agg(
+                queries=('operation', 'size'),
+                cached=('cached', 'sum'),
+                errors=('error', 'count'),
+                total_s=('total_ms', lambda s: s.sum() / 1000),
+                execute_s=('execute_ms', lambda s: s.sum() / 1000),
+                fetch_s=('fetch_ms', lambda s: s.sum() / 1000),
+                rows=('rows', 'sum'),
+                mb=('bytes', lambda s: s.sum() / (1024 * 1024)),
+            )
+            .sort_values('total_s', ascending=False)
+            .reset_index()
+        )
+
+    def _record(self, span):
+        with self._lock:
+            self._recent.append(span)
+            if self.path:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(span.to_dict(), default=str, ensure_ascii=False) + '\n')
+                except OSError as e:
+                    print(f"Error al escribir el span en {self.path}: {e}")
+
+
+# Registro compartido por todo el proceso
+query_spans = SpanRecorder()
+
+
+def current_span():
+    """Devuelve el span en curso o None."""
+    return _current_span.get()
+
+
+@contextmanager
+def phase(name):
+    """Mide una fase del span en curso; no hace nada fuera de un span."""
+    span = _current_span.get()
+    if span is None:
+        yield
+        return
+    with span.phase(name):
+        yield
+
+
+def add_query_id(query_id):
+    """Añade un query ID (o PID del backend) al span en curso."""
+    span = _current_span.get()
+    if span is not None:
+        span.query_ids.append(str(query_id))
+
+
+def traced(warehouse, operation=None, section=None):
+    """
+    Decorador que mide cada llamada a la función como un span. Si la función devuelve
+    una tupla (resultado, error) como las de scripts/*_connection.py, se registran el
+    tamaño del resultado y el error. `section` fija la sección o página del span; si no
+    se indica se usa la del contexto (query_section).
+    """
+    def decorator(func):
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_spans.span(warehouse, name, section) as span:
+                result = func(*args, **kwargs)
+                value, error = result if isinstance(result, tuple) and len(result) == 2 else (result, None)
+                span.record_result(value)
+                if error:
+                    span.error = str(error)
+                return result
+        return wrapper
+    return decorator
+
+
+def performance_panel(limit=50):
+    """
+    Muestra en la barra lateral un panel desplegable "Performance" con el resumen por
+    sección y los spans más recientes. Streamlit se importa aquí para que el resto del
+    módulo pueda usarse sin interfaz.
+
+    Args:
+        limit (int): Spans recientes que se muestran.
+    """
+    import streamlit as st
+
+    with st.sidebar.expander("Performance"):
+        summary = query_spans.summary()
+        if summary.empty:
+            st.write("Todavía no hay consultas registradas.")
+            return
+        st.dataframe(summary, hide_index=True)
+        st.dataframe(query_spans.recent().head(limit), hide_index=True)
+        st.caption(f"Spans en {query_spans.path}")
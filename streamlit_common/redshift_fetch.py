@@ -0,0 +1,203 @@
+# streamlit_common/redshift_fetch.py
+
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from streamlit_common.query_timing import phase
+
+# Lectura de resultados de Redshift por bloques con cursores del lado del servidor.
+# Cada bloque de filas se convierte en columnas Arrow tipadas y se descarta, de modo
+# que el resultado nunca se mantiene a la vez como lista de tuplas y como DataFrame.
+
+DEFAULT_ITERSIZE = int(os.getenv('REDSHIFT_FETCH_ITERSIZE', 20000))
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv('REDSHIFT_FETCH_MEMORY_BUDGET_MB', 1024))
+
+# OID de PostgreSQL/Redshift -> tipo Arrow
+_ARROW_TYPES = {
+    16: pa.bool_(),                         # bool
+    20: pa.int64(),                         # int8
+    21: pa.int16(),                         # int2
+    23: pa.int32(),                         # int4
+    700: pa.float32(),                      # float4
+    701: pa.float64(),                      # float8
+    1082: pa.date32(),                      # date
+    1083: pa.time64('us'),                  # time
+    1114: pa.timestamp('us'),               # timestamp
+    1184: pa.timestamp('us', tz='UTC'),     # timestamptz
+    18: pa.string(),                        # char
+    19: pa.string(),                        # name
+    25: pa.string(),                        # text
+    1042: pa.string(),                      # bpchar
+    1043: pa.string(),                      # varchar
+}
+
+
+class MemoryBudgetExceeded(Exception):
+    """Se lanza cuando el resultado de una consulta supera el presupuesto de memoria."""
+
+
+def _arrow_type(column):
+    if column.type_code == 1700 and column.precision is not None and column.scale is not None:
+        return pa.decimal128(column.precision, column.scale)  # numeric
+    # Tipos no mapeados: Arrow los infiere en cada bloque
+    return _ARROW_TYPES.get(column.type_code)
+
+
+def _record_batch(columns, names, types):
+    # Columnas de valores -> columnas Arrow tipadas. Devuelve también los tipos con el inferido en
+    # el primer bloque con valores fijado, para que todos los bloques coincidan
+    arrays = [pa.array(values, type=t) for values, t in zip(columns, types)]
+    types = [t if t is not None or pa.types.is_null(a.type) else a.type for t, a in zip(types, arrays)]
+    return pa.RecordBatch.from_arrays(arrays, names=names), types
+
+
+def _empty_batch(names, types):
+    schema = pa.schema([(name, t or pa.null()) for name, t in zip(names, types)])
+    return pa.RecordBatch.from_pylist([], schema=schema)
+
+
+def iter_record_batches(conn, query, params=None, itersize=DEFAULT_ITERSIZE):
+    """
+    Ejecuta una consulta con un cursor con nombre (del lado del servidor) y devuelve
+    el resultado en bloques de hasta `itersize` filas como pyarrow.RecordBatch.
+    Si la consulta no devuelve filas se entrega un único bloque vacío con las columnas.
+
+    Args:
+        conn: Conexión psycopg2 (o conexión del pool).
+        query (str | psycopg2.sql.Composable): Consulta a ejecutar.
+        params (tuple, optional): Parámetros de la consulta.
+        itersize (int): Filas por viaje al servidor.
+
+    Yields:
+        pyarrow.RecordBatch: Bloque de filas con columnas tipadas.
+    """
+    if isinstance(query, str):
+        # Quitar el ';' final: la consulta se envuelve en DECLARE ... CURSOR FOR
+        query = query.strip().rstrip(';')
+    cur = conn.cursor(name=f"fetch_{uuid.uuid4().hex}")
+    cur.itersize = itersize
+    try:
+        with phase('execute'):
+            cur.execute(query, params)
+        names, types = None, None
+        yielded = False
+        while True:
+            with phase('fetch'):
+                rows = cur.fetchmany(itersize)
+                if names is None:
+                    # En los cursores con nombre la descripción sólo existe tras el primer FETCH
+                    names = [desc[0] for desc in cur.description]
+                    types = [_arrow_type(desc) for desc in cur.description]
+                if rows:
+                    columns = list(zip(*rows))
+                    del rows
+                    batch, types = _record_batch(columns, names, types)
+                    del columns
+                else:
+                    batch = None
+            if batch is None:
+                if not yielded:
+                    yield _empty_batch(names, types)
+                break
+            yielded = True
+            yield batch
+    finally:
+        cur.close()
+
+
+def fetch_arrow_table(conn, query, params=None, itersize=DEFAULT_ITERSIZE,
+                      memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Lee el resultado completo como pyarrow.Table respetando un presupuesto de memoria.
+
+    Raises:
+        MemoryBudgetExceeded: Si las columnas acumuladas superan memory_budget_mb.
+    """
+    budget_bytes = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+    tables = []
+    total_bytes = 0
+    for batch in iter_record_batches(conn, query, params, itersize):
+        total_bytes += batch.nbytes
+        if budget_bytes is not None and total_bytes > budget_bytes:
+            raise MemoryBudgetExceeded(
+                f"El resultado supera el presupuesto de memoria de {memory_budget_mb:.0f} MB"
+            )
+        tables.append(pa.Table.from_batches([batch]))
+    # Los tipos inferidos pueden variar entre bloques (p. ej. nulos y luego texto)
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def fetch_dataframe(conn, query, params=None, itersize=DEFAULT_ITERSIZE,
+                    memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Lee el resultado completo como DataFrame de pandas a partir de columnas Arrow.
+
+    Args:
+        conn: Conexión psycopg2 (o conexión del pool).
+        query (str | psycopg2.sql.Composable): Consulta a ejecutar.
+        params (tuple, optional): Parámetros de la consulta.
+        itersize (int): Filas por viaje al servidor.
+        memory_budget_mb (float): Tamaño máximo del resultado en memoria; None para no limitar.
+
+    Returns:
+        pd.DataFrame: Resultado de la consulta.
+
+    Raises:
+        MemoryBudgetExceeded: Si el resultado supera el presupuesto de memoria.
+    """
+    table = fetch_arrow_table(conn, query, params, itersize, memory_budget_mb)
+    # self_destruct libera cada columna Arrow a medida que se convierte
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def fetch_cursor_dataframe(cur):
+    """
+    Lee el resultado de un cursor ya ejecutado como DataFrame de pandas a partir de columnas
+    Arrow tipadas, con la misma conversión que fetch_dataframe. Sirve para los cursores que no
+    pueden ser del lado del servidor, como los de las conexiones asíncronas.
+
+    Args:
+        cur: Cursor psycopg2 sobre el que ya se ejecutó la consulta.
+
+    Returns:
+        pd.DataFrame: Resultado de la consulta.
+    """
+    names = [desc[0] for desc in cur.description]
+    types = [_arrow_type(desc) for desc in cur.description]
+    with phase('fetch'):
+        columns = list(zip(*cur.fetchall()))
+        batch = _record_batch(columns, names, types)[0] if columns else _empty_batch(names, types)
+        del columns
+        return pa.Table.from_batches([batch]).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def fetch_to_parquet(conn, query, path, params=None, itersize=DEFAULT_ITERSIZE):
+    """
+    Escribe el resultado de la consulta en un archivo Parquet bloque a bloque, con un
+    uso de memoria acotado por itersize independientemente del tamaño del resultado.
+
+    Returns:
+        int: Número de filas escritas.
+    """
+    writer = None
+    rows = 0
+    try:
+        for batch in iter_record_batches(conn, query, params, itersize):
+            if writer is None:
+                # Las columnas sin tipo conocido y sólo nulos en el primer bloque se escriben como texto
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                    for field in batch.schema
+                ])
+                writer = pq.ParquetWriter(path, schema)
+            if batch.schema != writer.schema:
+                batch = batch.cast(writer.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
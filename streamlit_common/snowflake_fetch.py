@@ -0,0 +1,91 @@
+# streamlit_common/snowflake_fetch.py
+
+import pandas as pd
+import pyarrow as pa
+from snowflake.connector.errors import NotSupportedError
+
+from streamlit_common.query_timing import phase
+
+# Lectura de resultados de Snowflake a partir de los lotes Arrow del conector,
+# sin construir una tupla de Python por cada fila.
+
+
+def _empty_arrow_table(cs):
+    return pa.schema([(desc[0], pa.null()) for desc in cs.description]).empty_table()
+
+
+def fetch_arrow_table(cs):
+    """
+    Devuelve el resultado de un cursor ya ejecutado como pyarrow.Table.
+
+    Args:
+        cs (SnowflakeCursor): Cursor sobre el que ya se ejecutó la consulta.
+
+    Returns:
+        pyarrow.Table: Resultado completo (vacío pero con las columnas si no hay filas).
+    """
+    with phase('fetch'):
+        try:
+            table = cs.fetch_arrow_all()
+        except NotSupportedError:
+            # Resultados que no llegan en formato Arrow (p. ej. SHOW o DESCRIBE)
+            return pa.Table.from_pandas(_fetch_records(cs), preserve_index=False)
+        return table if table is not None else _empty_arrow_table(cs)
+
+
+def fetch_dataframe(cs):
+    """
+    Devuelve el resultado de un cursor ya ejecutado como DataFrame de pandas,
+    convirtiendo los lotes Arrow directamente en columnas.
+
+    Args:
+        cs (SnowflakeCursor): Cursor sobre el que ya se ejecutó la consulta.
+
+    Returns:
+        pd.DataFrame: Resultado completo.
+    """
+    with phase('fetch'):
+        try:
+            return cs.fetch_pandas_all()
+        except NotSupportedError:
+            return _fetch_records(cs)
+
+
+def iter_arrow_batches(cs):
+    """
+    Itera el resultado de un cursor ya ejecutado en lotes pyarrow.Table,
+    para extracciones grandes que no deben cargarse completas en memoria.
+    """
+    try:
+        yield from _timed(cs.fetch_arrow_batches())
+    except NotSupportedError:
+        with phase('fetch'):
+            table = pa.Table.from_pandas(_fetch_records(cs), preserve_index=False)
+        yield table
+
+
+def iter_dataframe_batches(cs):
+    """
+    Itera el resultado de un cursor ya ejecutado en lotes de DataFrame.
+    """
+    try:
+        yield from _timed(cs.fetch_pandas_batches())
+    except NotSupportedError:
+        with phase('fetch'):
+            df = _fetch_records(cs)
+        yield df
+
+
+def _timed(batches):
+    # Medir sólo la lectura de cada lote, no el tiempo que el consumidor tarda en procesarlo
+    batches = iter(batches)
+    while True:
+        with phase('fetch'):
+            batch = next(batches, None)
+        if batch is None:
+            return
+        yield batch
+
+
+def _fetch_records(cs):
+    return pd.DataFrame.from_records(iter(cs), columns=[desc[0] for desc in cs.description])